@@ -0,0 +1,72 @@
+"""Compare making many independent JSON-RPC calls one request at a time
+against merging them into batches with a BatchingClient.
+
+Usage: python benchmarks/jsonrpc_client_batching.py [calls]
+
+The calls are made by a pool of threads to an app served by waitress on
+localhost, so the figures include the HTTP round-trips.
+
+"""
+import logging
+import sys
+import timeit
+
+from concurrent.futures import ThreadPoolExecutor
+from pyramid.config import Configurator
+from webtest.http import StopableWSGIServer
+
+from pyramid_rpc.client import BatchingClient
+from pyramid_rpc.client import JsonRpcClient
+
+
+def add(request, a, b):
+    return a + b
+
+
+def make_app():
+    config = Configurator()
+    config.include('pyramid_rpc.jsonrpc')
+    config.add_jsonrpc_endpoint('api', '/api')
+    config.add_jsonrpc_method(add, endpoint='api', method='add')
+    return config.make_wsgi_app()
+
+
+def best(func):
+    return min(timeit.repeat(func, number=1, repeat=5))
+
+
+def main(argv):
+    calls = int(argv[1]) if len(argv) > 1 else 500
+    # waitress warns about every request queued for a thread
+    logging.getLogger('waitress.queue').setLevel(logging.ERROR)
+    server = StopableWSGIServer.create(make_app())
+    client = JsonRpcClient(server.application_url + 'api')
+    batcher = BatchingClient(client, max_size=50, max_delay=0.002)
+    callers = ThreadPoolExecutor(20)
+
+    def single():
+        results = callers.map(lambda i: client.call('add', i, 1),
+                              range(calls))
+        assert sum(results) == calls * (calls + 1) // 2
+
+    def batched():
+        results = callers.map(lambda i: batcher.call('add', i, 1).result(),
+                              range(calls))
+        assert sum(results) == calls * (calls + 1) // 2
+
+    try:
+        print('%d calls' % calls)
+        print('%-12s %12s %12s' % ('client', 'total ms', 'us / call'))
+        for name, func in (('single', single), ('batched', batched)):
+            elapsed = best(func)
+            print('%-12s %12.2f %12.2f' % (
+                name, elapsed * 1000, elapsed * 1e6 / calls))
+    finally:
+        callers.shutdown()
+        batcher.close()
+        client.close()
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main(sys.argv)
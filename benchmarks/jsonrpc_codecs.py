@@ -0,0 +1,71 @@
+"""Compare the payload size and encode/decode time of the JSON-RPC codecs
+against JSON.
+
+Usage: python benchmarks/jsonrpc_codecs.py [rows]
+
+The ``msgpack`` and ``cbor2`` packages are used when installed, the pure
+Python implementations are always measured.
+
+"""
+import json
+import sys
+import timeit
+
+from pyramid_rpc import codec
+from pyramid_rpc.jsonrpc import JSONRPCRenderer
+
+
+def make_response(rows):
+    return {
+        'jsonrpc': '2.0',
+        'id': 1,
+        'result': [
+            {
+                'id': i,
+                'name': 'row %d' % i,
+                'score': i * 0.5,
+                'active': bool(i % 2),
+                'tags': ['a', 'b', 'c'],
+            }
+            for i in range(rows)
+        ],
+    }
+
+
+def best(func):
+    return min(timeit.repeat(func, number=1, repeat=5))
+
+
+def main(argv):
+    rows = int(argv[1]) if len(argv) > 1 else 10000
+    value = make_response(rows)
+    renderer = JSONRPCRenderer()
+
+    candidates = [
+        ('json', renderer.encode,
+         lambda data: json.loads(data.decode('utf-8'))),
+        ('msgpack (pure)', codec.MsgpackCodec(pure=True).dumps,
+         codec.MsgpackCodec(pure=True).loads),
+        ('cbor (pure)', codec.CborCodec(pure=True).dumps,
+         codec.CborCodec(pure=True).loads),
+    ]
+    if codec.msgpack is not None:
+        candidates.append(
+            ('msgpack', codec.MsgpackCodec().dumps, codec.MsgpackCodec().loads))
+    if codec.cbor2 is not None:
+        candidates.append(
+            ('cbor2', codec.CborCodec().dumps, codec.CborCodec().loads))
+
+    print('response of %d structs' % rows)
+    print('%-16s %10s %12s %12s' % ('codec', 'bytes', 'encode ms', 'decode ms'))
+    for name, dumps, loads in candidates:
+        data = dumps(value)
+        assert loads(data) == value
+        print('%-16s %10d %12.2f %12.2f' % (
+            name, len(data),
+            best(lambda: dumps(value)) * 1000,
+            best(lambda: loads(data)) * 1000))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
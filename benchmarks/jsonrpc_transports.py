@@ -0,0 +1,69 @@
+"""Compare the cost of dispatching small JSON-RPC calls through the WSGI app,
+as every HTTP request does, against a persistent connection.
+
+Usage: python benchmarks/jsonrpc_transports.py [calls]
+
+Neither side includes network or HTTP parsing time, only the work done by
+Pyramid and pyramid_rpc for each call.
+
+"""
+import json
+import sys
+import timeit
+
+from pyramid.config import Configurator
+from pyramid.request import Request
+
+from pyramid_rpc.connection import JsonRpcConnection
+
+
+def add(request, a, b):
+    return a + b
+
+
+def make_app():
+    config = Configurator()
+    config.include('pyramid_rpc.jsonrpc')
+    config.add_jsonrpc_endpoint('api', '/api')
+    config.add_jsonrpc_method(add, endpoint='api', method='add')
+    return config.make_wsgi_app()
+
+
+def best(func):
+    return min(timeit.repeat(func, number=1, repeat=5))
+
+
+def main(argv):
+    calls = int(argv[1]) if len(argv) > 1 else 5000
+    app = make_app()
+    body = json.dumps(
+        {'jsonrpc': '2.0', 'method': 'add', 'params': [1, 2], 'id': 1}
+    ).encode('utf-8')
+
+    def wsgi():
+        for _ in range(calls):
+            request = Request.blank('/api', method='POST', body=body,
+                                    content_type='application/json')
+            response = request.get_response(app)
+            assert response.json_body['result'] == 3
+
+    sent = []
+    connection = JsonRpcConnection(
+        app, Request.blank('/api').environ, sent.append)
+
+    def persistent():
+        for _ in range(calls):
+            connection.handle(body)
+        assert json.loads(sent[-1].decode('utf-8'))['result'] == 3
+        del sent[:]
+
+    print('%d calls' % calls)
+    print('%-12s %12s %12s' % ('transport', 'total ms', 'us / call'))
+    for name, func in (('wsgi', wsgi), ('connection', persistent)):
+        elapsed = best(func)
+        print('%-12s %12.2f %12.2f' % (
+            name, elapsed * 1000, elapsed * 1e6 / calls))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,46 @@
+"""Compare XmlRpcMarshaller against xmlrpclib.dumps on large responses.
+
+Usage: python benchmarks/xmlrpc_marshaller.py [rows]
+
+"""
+import sys
+import timeit
+
+from pyramid_rpc.compat import xmlrpclib
+from pyramid_rpc.xmlrpcmarshaller import XmlRpcMarshaller
+
+
+def make_result(rows):
+    return [
+        {
+            'id': i,
+            'name': 'row %d' % i,
+            'score': i * 0.5,
+            'active': bool(i % 2),
+            'tags': ['a', 'b', 'c'],
+        }
+        for i in range(rows)
+    ]
+
+
+def main(argv):
+    rows = int(argv[1]) if len(argv) > 1 else 10000
+    result = make_result(rows)
+    marshaller = XmlRpcMarshaller()
+    expected = xmlrpclib.dumps((result,), methodresponse=True)
+    assert marshaller.dumps(result) == expected
+
+    print('response of %d structs, %d bytes' % (rows, len(expected)))
+    for name, func in (
+        ('xmlrpclib.dumps',
+         lambda: xmlrpclib.dumps((result,), methodresponse=True)),
+        ('XmlRpcMarshaller.dumps', lambda: marshaller.dumps(result)),
+        ('XmlRpcMarshaller.iterdumps',
+         lambda: b''.join(marshaller.iterdumps(result))),
+    ):
+        best = min(timeit.repeat(func, number=1, repeat=5))
+        print('%-28s %8.2f ms' % (name, best * 1000))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
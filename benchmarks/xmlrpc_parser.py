@@ -0,0 +1,45 @@
+"""Compare XmlRpcParser against xmlrpclib.loads on large requests.
+
+Usage: python benchmarks/xmlrpc_parser.py [rows]
+
+"""
+import io
+import sys
+import timeit
+
+from pyramid_rpc.compat import xmlrpclib
+from pyramid_rpc.xmlrpcparser import XmlRpcParser
+
+
+def make_body(rows):
+    params = ([
+        {
+            'id': i,
+            'name': 'row %d' % i,
+            'score': i * 0.5,
+            'active': bool(i % 2),
+            'tags': ['a', 'b', 'c'],
+        }
+        for i in range(rows)
+    ],)
+    return xmlrpclib.dumps(params, methodname='bulk_insert').encode('utf-8')
+
+
+def main(argv):
+    rows = int(argv[1]) if len(argv) > 1 else 10000
+    body = make_body(rows)
+    parser = XmlRpcParser()
+    assert parser.load(io.BytesIO(body)) == xmlrpclib.loads(body)
+
+    print('request of %d structs, %d bytes' % (rows, len(body)))
+    for name, func in (
+        ('xmlrpclib.loads', lambda: xmlrpclib.loads(body)),
+        ('XmlRpcParser.loads', lambda: parser.loads(body)),
+        ('XmlRpcParser.load', lambda: parser.load(io.BytesIO(body))),
+    ):
+        best = min(timeit.repeat(func, number=1, repeat=5))
+        print('%-20s %8.2f ms' % (name, best * 1000))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,171 @@
+class RpcCall(object):
+    """ The state of a single RPC call, available as ``request.rpc``.
+
+    ``endpoint``
+
+        The :term:`endpoint` handling the call.
+
+    ``method``
+
+        The name of the requested method.
+
+    ``args``
+
+        The positional (a sequence) or named (a dict) parameters of the
+        call.
+
+    ``id``
+
+        The id of the call, ``None`` for notifications or protocols without
+        one.
+
+    ``version``
+
+        The protocol version requested by the client, if any.
+
+    ``renderer``
+
+        The renderer used for the method's response, ``None`` until a
+        method is found.
+
+    ``batched``
+
+        The list of calls in a batch request, otherwise ``None``.
+
+    ``parent``
+
+        The enclosing call when this call is part of an XML-RPC
+        ``system.multicall``, otherwise ``None``.
+
+    ``idempotency_key``
+
+        The key identifying retries of the call when the endpoint has an
+        idempotency cache, otherwise ``None``.
+
+    ``codec``
+
+        The binary codec negotiated for the response of a JSON-RPC call, or
+        ``None`` for JSON.
+
+    ``connection``
+
+        The :class:`~pyramid_rpc.connection.JsonRpcConnection` the call was
+        received on when served over a persistent connection, otherwise
+        ``None``.
+
+    """
+    __slots__ = (
+        'endpoint',
+        'method',
+        'args',
+        'id',
+        'version',
+        'renderer',
+        'batched',
+        'parent',
+        'idempotency_key',
+        'codec',
+        'connection',
+    )
+
+    def __init__(self, endpoint=None, method=None, args=(), id=None,
+                 version=None):
+        self.endpoint = endpoint
+        self.method = method
+        self.args = args
+        self.id = id
+        self.version = version
+        self.renderer = None
+        self.batched = None
+        self.parent = None
+        self.idempotency_key = None
+        self.codec = None
+        self.connection = None
+
+
+def _compat_property(name, attr, optional=False):
+    """ Create a ``request.<name>`` property proxying ``request.rpc.<attr>``.
+
+    An ``AttributeError`` is raised when there is no call, or for
+    ``optional`` attributes when the value is ``None``, such that code using
+    ``getattr`` with a default or ``hasattr`` keeps working.
+
+    """
+    def fget(request):
+        value = getattr(request.rpc, attr)
+        if optional and value is None:
+            raise AttributeError(name)
+        return value
+
+    def fset(request, value):
+        try:
+            call = request.rpc
+        except AttributeError:
+            call = request.rpc = RpcCall()
+        setattr(call, attr, value)
+
+    return property(fget, fset, doc='Deprecated alias of ``rpc.%s``' % attr)
+
+
+COMPAT_PROPERTIES = (
+    ('rpc_endpoint', 'endpoint', False),
+    ('rpc_method', 'method', False),
+    ('rpc_args', 'args', False),
+    ('rpc_id', 'id', False),
+    ('rpc_version', 'version', False),
+    ('rpc_renderer', 'renderer', True),
+    ('batched_rpc_requests', 'batched', True),
+)
+
+
+class RpcRequestMixin(object):
+    """ Provide the ``request.rpc_*`` compatibility properties which were
+    used to store the state of a call before :class:`RpcCall`.
+
+    The request of a call is given the properties by :func:`attach_call`.
+    Mix it into a custom request factory to define them up front.
+
+    """
+
+
+for _name, _attr, _optional in COMPAT_PROPERTIES:
+    setattr(RpcRequestMixin, _name,
+            _compat_property(_name, _attr, _optional))
+del _name, _attr, _optional
+
+
+# request class -> subclass mixing in RpcRequestMixin
+_request_classes = {}
+
+
+def rpc_request_class(cls):
+    """ Return a subclass of the request class ``cls`` providing the
+    ``request.rpc_*`` compatibility properties.
+
+    The subclass is created once per request class, rather than for every
+    request as with
+    :meth:`pyramid.config.Configurator.add_request_method`.
+
+    """
+    if issubclass(cls, RpcRequestMixin):
+        return cls
+    subclass = _request_classes.get(cls)
+    if subclass is None:
+        subclass = type(cls.__name__, (RpcRequestMixin, cls), {})
+        subclass = _request_classes.setdefault(cls, subclass)
+    return subclass
+
+
+def attach_call(request, call):
+    """ Attach ``call`` to the ``request`` as ``request.rpc`` and provide
+    the ``request.rpc_*`` compatibility properties on it.
+
+    The request factory of the application is left alone, only the class of
+    requests handled by an endpoint is switched to
+    :func:`rpc_request_class`.
+
+    """
+    cls = request.__class__
+    if not issubclass(cls, RpcRequestMixin):
+        request.__class__ = rpc_request_class(cls)
+    request.rpc = call
@@ -0,0 +1,795 @@
+"""Clients for calling pyramid_rpc services from Python.
+
+The clients keep persistent HTTP connections to each host in a
+:class:`PoolManager`, which may be shared between clients and threads.
+
+"""
+import errno
+import itertools
+import json
+import socket
+import threading
+import time
+
+from .compat import http_client
+from .compat import urlsplit
+from .compat import xmlrpclib
+from .jsonrpc import JsonRpcCursorNotFound
+from .jsonrpc import JsonRpcError
+from .jsonrpc import JsonRpcInternalError
+from .jsonrpc import JsonRpcJobNotFound
+from .jsonrpc import JsonRpcJobPending
+from .jsonrpc import JsonRpcJobQueueFull
+from .jsonrpc import JsonRpcMethodNotFound
+from .jsonrpc import JsonRpcParamsInvalid
+from .jsonrpc import JsonRpcParseError
+from .jsonrpc import JsonRpcRequestInProgress
+from .jsonrpc import JsonRpcRequestInvalid
+from .xmlrpc import MULTICALL_METHOD
+from .xmlrpc import XmlRpcApplicationError
+from .xmlrpc import XmlRpcInvalidMethodParams
+from .xmlrpc import XmlRpcMethodNotFound
+from .xmlrpc import XmlRpcParseError
+from .xmlrpc import XmlRpcRequestInvalid
+
+try:
+    from concurrent import futures
+except ImportError: # pragma: no cover
+    futures = None
+
+
+# error code -> the JsonRpcError subclass raised for it
+JSONRPC_ERRORS = dict((cls.code, cls) for cls in (
+    JsonRpcParseError,
+    JsonRpcRequestInvalid,
+    JsonRpcMethodNotFound,
+    JsonRpcParamsInvalid,
+    JsonRpcInternalError,
+    JsonRpcRequestInProgress,
+    JsonRpcJobNotFound,
+    JsonRpcJobPending,
+    JsonRpcJobQueueFull,
+    JsonRpcCursorNotFound,
+))
+
+# fault code -> the XmlRpcError subclass raised for it
+XMLRPC_FAULTS = dict((cls.faultCode, cls) for cls in (
+    XmlRpcApplicationError,
+    XmlRpcMethodNotFound,
+    XmlRpcInvalidMethodParams,
+    XmlRpcParseError,
+    XmlRpcRequestInvalid,
+))
+
+
+class TransportError(IOError):
+    """ Raised when a server answers with an unexpected HTTP status or a
+    body which cannot be decoded."""
+    def __init__(self, message, status=None, body=None):
+        IOError.__init__(self, message)
+        self.status = status
+        self.body = body
+
+
+# errors sending a request on a connection closed by the server
+_RESET_ERRNOS = frozenset([errno.ECONNRESET, errno.EPIPE, errno.ECONNABORTED])
+
+class _StaleConnection(Exception):
+    """ A request failed before any byte of its response was received."""
+    def __init__(self, error):
+        Exception.__init__(self, error)
+        self.error = error
+
+
+class HTTPConnectionPool(object):
+    """ Keep-alive HTTP connections to a single host.
+
+    At most ``max_size`` idle connections are kept, more may be opened
+    while many requests are in progress.
+
+    """
+    def __init__(self, host, port=None, scheme='http', max_size=10,
+                 timeout=None, ssl_context=None):
+        self.host = host
+        self.port = port
+        self.scheme = scheme
+        self.max_size = max_size
+        self.timeout = timeout
+        self.ssl_context = ssl_context
+        # connections waiting for a request, most recently used last
+        self.idle = []
+        self.lock = threading.Lock()
+
+    def connect(self):
+        """ Return a new connection to the host."""
+        kw = {}
+        if self.timeout is not None:
+            kw['timeout'] = self.timeout
+        if self.scheme == 'https':
+            if self.ssl_context is not None:
+                kw['context'] = self.ssl_context
+            return http_client.HTTPSConnection(self.host, self.port, **kw)
+        return http_client.HTTPConnection(self.host, self.port, **kw)
+
+    def release(self, conn):
+        """ Keep ``conn`` for another request or close it if there are
+        enough idle connections."""
+        with self.lock:
+            if len(self.idle) < self.max_size:
+                self.idle.append(conn)
+                return
+        conn.close()
+
+    def request(self, method, path, body=None, headers=None):
+        """ Send a request and return the response with its body read.
+
+        A request sent on a connection reused from the pool, which the
+        server may have closed in the meantime, is retried once on a new
+        connection when it fails before any byte of the response was
+        received. Other failures, such as a timeout while waiting for the
+        response, are raised as the server may have handled the request.
+
+        """
+        with self.lock:
+            conn = self.idle.pop() if self.idle else None
+        if conn is not None:
+            try:
+                return self._request(conn, method, path, body, headers)
+            except _StaleConnection:
+                pass
+        conn = self.connect()
+        try:
+            return self._request(conn, method, path, body, headers)
+        except _StaleConnection as exc:
+            raise exc.error
+
+    def _request(self, conn, method, path, body, headers):
+        try:
+            try:
+                conn.request(method, path, body, headers or {})
+                response = conn.getresponse()
+            except http_client.BadStatusLine as exc:
+                # the connection was closed without a response, which is
+                # RemoteDisconnected since Python 3.5
+                raise _StaleConnection(exc)
+            except socket.error as exc:
+                # a timeout is not a reset, the server may be handling it
+                if getattr(exc, 'errno', None) in _RESET_ERRNOS:
+                    raise _StaleConnection(exc)
+                raise
+            response.data = response.read()
+        except BaseException:
+            conn.close()
+            raise
+        if response.will_close:
+            conn.close()
+        else:
+            self.release(conn)
+        return response
+
+    def close(self):
+        """ Close the idle connections."""
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for conn in idle:
+            conn.close()
+
+
+class PoolManager(object):
+    """ A :class:`HTTPConnectionPool` per host, created as they are first
+    requested. The arguments are passed to the pools."""
+    def __init__(self, max_size=10, timeout=None, ssl_context=None):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.ssl_context = ssl_context
+        self.pools = {}
+        self.lock = threading.Lock()
+
+    def pool(self, scheme, host, port):
+        """ Return the pool of connections to ``host``."""
+        key = (scheme, host, port)
+        with self.lock:
+            pool = self.pools.get(key)
+            if pool is None:
+                pool = self.pools[key] = HTTPConnectionPool(
+                    host, port, scheme, max_size=self.max_size,
+                    timeout=self.timeout, ssl_context=self.ssl_context)
+        return pool
+
+    def request(self, method, url, body=None, headers=None):
+        """ Send a request to ``url`` and return the response with its body
+        read as its ``data``."""
+        parts = urlsplit(url)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        pool = self.pool(parts.scheme, parts.hostname, parts.port)
+        return pool.request(method, path, body, headers)
+
+    def close(self):
+        """ Close the idle connections of every pool."""
+        with self.lock:
+            pools = list(self.pools.values())
+        for pool in pools:
+            pool.close()
+
+
+def _params(args, kw):
+    if args and kw:
+        raise ValueError(
+            'JSON-RPC parameters are either positional or named, not both')
+    if kw:
+        return kw
+    return list(args)
+
+
+def make_error(error):
+    """ Return the :class:`~pyramid_rpc.jsonrpc.JsonRpcError` subclass
+    instance matching the ``error`` object of a response."""
+    code = error.get('code')
+    cls = JSONRPC_ERRORS.get(code, JsonRpcError)
+    return cls(code=code, message=error.get('message'),
+               data=error.get('data'))
+
+
+def _result(response):
+    error = response.get('error')
+    if error is not None:
+        raise make_error(error)
+    return response.get('result')
+
+
+class BaseClient(object):
+    """ The HTTP transport shared by the clients, posting bodies to ``url``
+    over the persistent connections of a :class:`PoolManager`."""
+    content_type = None
+
+    def __init__(self, url, headers=None, timeout=None, pool=None,
+                 max_connections=10, gzip_threshold=None, accept_gzip=False):
+        self.url = url
+        self.headers = {
+            'Content-Type': self.content_type,
+            'Accept': self.content_type,
+        }
+        if accept_gzip:
+            self.headers['Accept-Encoding'] = 'gzip'
+        self.headers.update(headers or {})
+        self.gzip_threshold = gzip_threshold
+        self.owns_pool = pool is None
+        if pool is None:
+            pool = PoolManager(max_size=max_connections, timeout=timeout)
+        self.pool = pool
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """ Close the idle connections of the client's own pool."""
+        if self.owns_pool:
+            self.pool.close()
+
+    def post(self, data, headers=None):
+        """ Post ``data`` and return the decoded body of a successful
+        response, raising a :class:`TransportError` otherwise. ``headers``
+        are sent in addition to those of the client."""
+        if headers:
+            headers = dict(self.headers, **headers)
+        else:
+            headers = self.headers
+        if (
+            self.gzip_threshold is not None and
+            len(data) >= self.gzip_threshold
+        ):
+            data = xmlrpclib.gzip_encode(data)
+            headers = dict(headers)
+            headers['Content-Encoding'] = 'gzip'
+        response = self.pool.request('POST', self.url, data, headers)
+        if response.status != 200:
+            raise TransportError(
+                'HTTP status %s' % response.status, response.status,
+                response.data)
+        body = response.data
+        if response.getheader('Content-Encoding', '').lower() == 'gzip':
+            try:
+                body = xmlrpclib.gzip_decode(body)
+            except ValueError:
+                raise TransportError('invalid gzip response',
+                                     response.status, body)
+        return body
+
+
+class JsonRpcClient(BaseClient):
+    """ Call the methods of the JSON-RPC endpoint at ``url``.
+
+    ``headers``
+
+        A dict of extra headers sent with every request, such as an
+        ``Authorization`` header.
+
+    ``timeout``
+
+        The timeout in seconds of the socket operations of a request.
+
+    ``pool``
+
+        A :class:`PoolManager` keeping persistent connections, which may be
+        shared between clients. By default the client has its own, keeping
+        up to ``max_connections`` idle connections per host.
+
+    ``hedge_after``
+
+        Send a second copy of a call when it has not completed after this
+        many seconds and use whichever response arrives first, trading
+        some extra load for a shorter tail latency. Only for methods which
+        may safely run twice. Disabled by default.
+
+    ``hedged_methods``
+
+        The names of the methods which are hedged when ``hedge_after`` is
+        set. ``None``, the default, hedges every call.
+
+    Errors returned by the server are raised as the matching
+    :class:`~pyramid_rpc.jsonrpc.JsonRpcError` subclass.
+
+    """
+    content_type = 'application/json'
+
+    def __init__(self, url, headers=None, timeout=None, pool=None,
+                 max_connections=10, hedge_after=None, hedged_methods=None):
+        BaseClient.__init__(self, url, headers, timeout, pool,
+                            max_connections)
+        self.hedge_after = hedge_after
+        self.hedged_methods = hedged_methods
+        self.executor = None
+        if hedge_after is not None:
+            self.executor = futures.ThreadPoolExecutor(max_connections)
+        self.ids = itertools.count(1)
+
+    def close(self):
+        """ Close the idle connections of the client's own pool."""
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+        BaseClient.close(self)
+
+    def request(self, method, *args, **kw):
+        """ Return a request object calling ``method``, for use in a batch
+        sent with :meth:`send`."""
+        return {
+            'jsonrpc': '2.0',
+            'method': method,
+            'params': _params(args, kw),
+            'id': next(self.ids),
+        }
+
+    def send(self, body, headers=None):
+        """ Send a request object or a list of them and return the decoded
+        response, or ``None`` if there is none. ``headers`` are sent in
+        addition to those of the client."""
+        data = json.dumps(body).encode('utf-8')
+        hedged = (
+            self.executor is not None and
+            not isinstance(body, list) and (
+                self.hedged_methods is None or
+                body['method'] in self.hedged_methods
+            )
+        )
+        if hedged:
+            body = self._hedged_post(data, headers)
+        else:
+            body = self.post(data, headers)
+        if not body:
+            return None
+        try:
+            return json.loads(body.decode('utf-8'))
+        except ValueError:
+            raise TransportError('invalid JSON response', 200, body)
+
+    def _hedged_post(self, data, headers):
+        primary = self.executor.submit(self.post, data, headers)
+        done, _ = futures.wait([primary], self.hedge_after)
+        if done:
+            return primary.result()
+        pending = set([
+            primary, self.executor.submit(self.post, data, headers)])
+        while True:
+            done, pending = futures.wait(
+                pending, return_when=futures.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None or not pending:
+                    return future.result()
+
+    def call(self, method, *args, **kw):
+        """ Call ``method`` with either positional or named parameters and
+        return its result."""
+        return _result(self.send(self.request(method, *args, **kw)))
+
+    def notify(self, method, *args, **kw):
+        """ Call ``method`` without waiting for a result."""
+        self.send({
+            'jsonrpc': '2.0',
+            'method': method,
+            'params': _params(args, kw),
+        })
+
+    def batch(self):
+        """ Return a :class:`Batch` of calls sent in a single request."""
+        return Batch(self)
+
+
+class Batch(object):
+    """ Calls and notifications sent to a :class:`JsonRpcClient` in a
+    single request by :meth:`send`, or at the end of a ``with`` block.
+
+    .. code-block:: python
+
+       with client.batch() as batch:
+           total = batch.call('add', 1, 2)
+           batch.notify('log', 'added')
+       print(total.result())
+
+    """
+    def __init__(self, client):
+        self.client = client
+        self.requests = []
+        # request id -> future of its result
+        self.futures = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is None:
+            self.send()
+
+    def call(self, method, *args, **kw):
+        """ Add a call to the batch and return a
+        :class:`concurrent.futures.Future` of its result."""
+        request = self.client.request(method, *args, **kw)
+        future = futures.Future()
+        self.requests.append(request)
+        self.futures[request['id']] = future
+        return future
+
+    def notify(self, method, *args, **kw):
+        """ Add a notification to the batch."""
+        self.requests.append({
+            'jsonrpc': '2.0',
+            'method': method,
+            'params': _params(args, kw),
+        })
+
+    def send(self):
+        """ Send the batch and resolve the futures of its calls."""
+        requests, self.requests = self.requests, []
+        pending, self.futures = self.futures, {}
+        if not requests:
+            return
+        try:
+            responses = self.client.send(requests) or []
+            if not isinstance(responses, list):
+                # the whole batch was rejected, e.g. for a parse error
+                raise make_error(responses.get('error') or {})
+        except Exception as ex:
+            for future in pending.values():
+                future.set_exception(ex)
+            raise
+        for response in responses:
+            future = pending.pop(response.get('id'), None)
+            if future is None:
+                continue
+            error = response.get('error')
+            if error is not None:
+                future.set_exception(make_error(error))
+            else:
+                future.set_result(response.get('result'))
+        for future in pending.values():
+            future.set_exception(TransportError('missing response'))
+
+
+def _send_batch(batch):
+    try:
+        batch.send()
+    except Exception:
+        # the futures of the calls carry the error
+        pass
+
+
+class BatchingClient(object):
+    """ Merge the calls made by many threads to a :class:`JsonRpcClient`
+    into batches.
+
+    :meth:`call` returns a :class:`concurrent.futures.Future` right away.
+    The calls made within ``max_delay`` seconds of the first call of a
+    batch are sent along with it in a single request, or as soon as there
+    are ``max_size`` of them. Batches are sent by ``workers`` threads so
+    that callers keep adding to the next batch meanwhile.
+
+    .. code-block:: python
+
+       batcher = BatchingClient(client)
+       users = [batcher.call('get_user', id) for id in ids]
+       names = [user.result()['name'] for user in users]
+
+    """
+    def __init__(self, client, max_size=50, max_delay=0.005, workers=4):
+        self.client = client
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self.executor = futures.ThreadPoolExecutor(workers)
+        self.batch = None
+        self.deadline = None
+        self.closed = False
+        self.cond = threading.Condition()
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _add(self):
+        if self.closed:
+            raise RuntimeError('the client is closed')
+        if self.batch is None:
+            self.batch = Batch(self.client)
+            self.deadline = time.time() + self.max_delay
+            self.cond.notify()
+        return self.batch
+
+    def _added(self):
+        if len(self.batch.requests) >= self.max_size:
+            batch, self.batch = self.batch, None
+            self.executor.submit(_send_batch, batch)
+
+    def call(self, method, *args, **kw):
+        """ Add a call to the next batch and return a future of its
+        result."""
+        with self.cond:
+            future = self._add().call(method, *args, **kw)
+            self._added()
+        return future
+
+    def notify(self, method, *args, **kw):
+        """ Add a notification to the next batch."""
+        with self.cond:
+            self._add().notify(method, *args, **kw)
+            self._added()
+
+    def _run(self):
+        # send the batches which are not full once their delay is over
+        while True:
+            with self.cond:
+                while True:
+                    if self.batch is None:
+                        if self.closed:
+                            return
+                        self.cond.wait()
+                        continue
+                    remaining = self.deadline - time.time()
+                    if remaining <= 0 or self.closed:
+                        break
+                    self.cond.wait(remaining)
+                batch, self.batch = self.batch, None
+            self.executor.submit(_send_batch, batch)
+
+    def close(self):
+        """ Send the pending calls and wait for all of the batches to be
+        answered."""
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+        self.thread.join()
+        self.executor.shutdown(wait=True)
+
+
+class AsyncBatchingClient(object):
+    """ Merge the calls made by the tasks of an :mod:`asyncio` event loop
+    to a :class:`JsonRpcClient` into batches.
+
+    :meth:`call` returns an :class:`asyncio.Future` of the result. The
+    calls made within ``max_delay`` seconds of the first call of a batch
+    are sent along with it in a single request, or as soon as there are
+    ``max_size`` of them. The requests are sent by the threads of
+    ``executor``, the default executor of the loop if omitted.
+
+    .. code-block:: python
+
+       batcher = AsyncBatchingClient(client)
+       users = await asyncio.gather(
+           *[batcher.call('get_user', id) for id in ids])
+
+    Methods must be called from the thread running the event loop.
+
+    """
+    def __init__(self, client, max_size=50, max_delay=0.005, loop=None,
+                 executor=None):
+        import asyncio
+        self.client = client
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self.loop = loop or asyncio.get_event_loop()
+        self.executor = executor
+        self.batch = None
+        self.timer = None
+        # futures of the batches being sent
+        self.sending = set()
+
+    def _add(self):
+        if self.batch is None:
+            self.batch = Batch(self.client)
+            self.timer = self.loop.call_later(self.max_delay, self.flush)
+        return self.batch
+
+    def _added(self):
+        if len(self.batch.requests) >= self.max_size:
+            self.flush()
+
+    def call(self, method, *args, **kw):
+        """ Add a call to the next batch and return a future of its
+        result."""
+        import asyncio
+        future = self._add().call(method, *args, **kw)
+        self._added()
+        return asyncio.wrap_future(future, loop=self.loop)
+
+    def notify(self, method, *args, **kw):
+        """ Add a notification to the next batch."""
+        self._add().notify(method, *args, **kw)
+        self._added()
+
+    def flush(self):
+        """ Send the pending calls now."""
+        if self.batch is None:
+            return
+        self.timer.cancel()
+        batch, self.batch, self.timer = self.batch, None, None
+        sent = self.loop.run_in_executor(self.executor, _send_batch, batch)
+        self.sending.add(sent)
+        sent.add_done_callback(self.sending.discard)
+
+    def close(self):
+        """ Send the pending calls and return a future completed once all
+        of the batches were answered."""
+        import asyncio
+        self.flush()
+        return asyncio.gather(*self.sending)
+
+
+def make_fault(code, string):
+    """ Return the :class:`~pyramid_rpc.xmlrpc.XmlRpcError` subclass
+    instance matching a fault, or a plain :class:`xmlrpclib.Fault` for an
+    application specific code."""
+    cls = XMLRPC_FAULTS.get(code)
+    if cls is None:
+        return xmlrpclib.Fault(code, string)
+    fault = cls()
+    fault.faultString = string
+    return fault
+
+
+class XmlRpcClient(BaseClient):
+    """ Call the methods of the XML-RPC endpoint at ``url``.
+
+    Unlike :class:`xmlrpclib.ServerProxy` the client may be shared between
+    threads and keeps its connections alive between calls.
+
+    ``headers``, ``timeout``, ``pool`` and ``max_connections``
+
+        As for :class:`JsonRpcClient`.
+
+    ``gzip_threshold``
+
+        Requests with a body of at least this many bytes are compressed with
+        ``gzip``, which the endpoint must accept with a
+        :class:`~pyramid_rpc.compression.RequestDecompressor`. Defaults to
+        ``None``, never compressing requests.
+
+    ``accept_gzip``
+
+        Ask for responses compressed with ``gzip``, sent by endpoints with a
+        :class:`~pyramid_rpc.compression.ResponseCompressor`. Defaults to
+        ``True``.
+
+    ``allow_none`` and ``use_datetime``
+
+        As for :class:`xmlrpclib.ServerProxy`.
+
+    Faults returned by the server are raised as the matching
+    :class:`~pyramid_rpc.xmlrpc.XmlRpcError` subclass, or as a
+    :class:`xmlrpclib.Fault` for application specific codes.
+
+    """
+    content_type = 'text/xml'
+
+    def __init__(self, url, headers=None, timeout=None, pool=None,
+                 max_connections=10, gzip_threshold=None, accept_gzip=True,
+                 allow_none=False, use_datetime=False):
+        BaseClient.__init__(self, url, headers, timeout, pool,
+                            max_connections, gzip_threshold, accept_gzip)
+        self.allow_none = allow_none
+        self.use_datetime = use_datetime
+
+    def call(self, method, *params):
+        """ Call ``method`` with ``params`` and return its result."""
+        data = xmlrpclib.dumps(params, method, allow_none=self.allow_none,
+                               encoding='utf-8')
+        body = self.post(data.encode('utf-8'))
+        try:
+            result, _ = xmlrpclib.loads(body, use_datetime=self.use_datetime)
+        except xmlrpclib.Fault as fault:
+            raise make_fault(fault.faultCode, fault.faultString)
+        except Exception:
+            raise TransportError('invalid XML-RPC response', 200, body)
+        return result[0]
+
+    def multicall(self):
+        """ Return a :class:`MultiCall` of calls sent in a single
+        ``system.multicall`` request."""
+        return MultiCall(self)
+
+
+class MultiCall(object):
+    """ Calls to a :class:`XmlRpcClient` sent in a single
+    ``system.multicall`` request by :meth:`send`, or at the end of a
+    ``with`` block.
+
+    .. code-block:: python
+
+       with client.multicall() as multicall:
+           total = multicall.call('add', 1, 2)
+           user = multicall.call('get_user', 1)
+       print(total.result())
+
+    """
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+        self.futures = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is None:
+            self.send()
+
+    def call(self, method, *params):
+        """ Add a call to the multicall and return a
+        :class:`concurrent.futures.Future` of its result."""
+        future = futures.Future()
+        self.calls.append({'methodName': method, 'params': list(params)})
+        self.futures.append(future)
+        return future
+
+    def send(self):
+        """ Send the calls and resolve their futures."""
+        calls, self.calls = self.calls, []
+        pending, self.futures = self.futures, []
+        if not calls:
+            return
+        try:
+            results = self.client.call(MULTICALL_METHOD, calls)
+            if (
+                not isinstance(results, list) or
+                len(results) != len(calls)
+            ):
+                raise TransportError('invalid multicall response')
+        except Exception as ex:
+            for future in pending:
+                future.set_exception(ex)
+            raise
+        for future, result in zip(pending, results):
+            if isinstance(result, dict):
+                future.set_exception(make_fault(
+                    result.get('faultCode'), result.get('faultString')))
+            elif isinstance(result, list) and len(result) == 1:
+                future.set_result(result[0])
+            else:
+                future.set_exception(
+                    TransportError('invalid multicall response'))
@@ -0,0 +1,619 @@
+"""Binary encodings of JSON-RPC messages.
+
+A codec encodes and decodes the same JSON-RPC 2.0 messages as JSON, using a
+binary format negotiated by the ``Content-Type`` and ``Accept`` headers of
+a request. :class:`MsgpackCodec` and :class:`CborCodec` use the
+``msgpack`` and ``cbor2`` packages when they are installed and otherwise
+fall back to the pure Python implementations in this module.
+
+"""
+import struct
+
+from .compat import PY3
+from .compat import binary_type
+from .compat import integer_types
+from .compat import text_type
+from .util import parse_qualities
+
+try:
+    import msgpack
+except ImportError: # pragma: no cover
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError: # pragma: no cover
+    cbor2 = None
+
+
+# the default maximum nesting of arrays, maps and tags accepted by the
+# decoders
+MAX_DEPTH = 128
+
+_float_types = (float,)
+_sequence_types = (list, tuple)
+
+if PY3: # pragma: no cover
+    def _byte(data, pos):
+        return data[pos]
+else:
+    def _byte(data, pos):
+        return ord(data[pos])
+
+
+class _Reader(object):
+    """ The state of a decode, reading from ``data`` at ``pos``."""
+
+    def __init__(self, data, max_depth=MAX_DEPTH):
+        self.data = data
+        self.pos = 0
+        self.depth = 0
+        self.max_depth = max_depth
+
+    def byte(self):
+        pos = self.pos
+        if pos >= len(self.data):
+            raise ValueError('truncated data')
+        self.pos = pos + 1
+        return _byte(self.data, pos)
+
+    def read(self, n):
+        pos = self.pos
+        end = pos + n
+        if end > len(self.data):
+            raise ValueError('truncated data')
+        self.pos = end
+        return self.data[pos:end]
+
+    def unpack(self, fmt):
+        return fmt.unpack(self.read(fmt.size))[0]
+
+    def check_length(self, n):
+        # every item takes at least one byte, reject lengths which cannot
+        # possibly be satisfied before allocating anything
+        if n > len(self.data) - self.pos:
+            raise ValueError('truncated data')
+
+    def enter(self):
+        self.depth += 1
+        if self.depth > self.max_depth:
+            raise ValueError('too deeply nested')
+
+    def leave(self):
+        self.depth -= 1
+
+
+_U8 = struct.Struct('>B')
+_U16 = struct.Struct('>H')
+_U32 = struct.Struct('>I')
+_U64 = struct.Struct('>Q')
+_I8 = struct.Struct('>b')
+_I16 = struct.Struct('>h')
+_I32 = struct.Struct('>i')
+_I64 = struct.Struct('>q')
+_F16 = struct.Struct('>e') if PY3 else None
+_F32 = struct.Struct('>f')
+_F64 = struct.Struct('>d')
+
+
+def _unsupported(value):
+    raise TypeError(
+        'Object of type %s cannot be encoded' % value.__class__.__name__)
+
+
+def _decode_text(data):
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError as ex:
+        raise ValueError(str(ex))
+
+
+# MessagePack
+
+def _msgpack_encode(value, out, default):
+    if value is None:
+        out.append(b'\xc0')
+    elif value is True:
+        out.append(b'\xc3')
+    elif value is False:
+        out.append(b'\xc2')
+    elif isinstance(value, integer_types):
+        if value >= 0:
+            if value < 0x80:
+                out.append(_U8.pack(value))
+            elif value <= 0xff:
+                out.append(b'\xcc' + _U8.pack(value))
+            elif value <= 0xffff:
+                out.append(b'\xcd' + _U16.pack(value))
+            elif value <= 0xffffffff:
+                out.append(b'\xce' + _U32.pack(value))
+            elif value <= 0xffffffffffffffff:
+                out.append(b'\xcf' + _U64.pack(value))
+            else:
+                raise OverflowError('integer out of range')
+        elif -0x20 <= value:
+            out.append(_I8.pack(value))
+        elif -0x80 <= value:
+            out.append(b'\xd0' + _I8.pack(value))
+        elif -0x8000 <= value:
+            out.append(b'\xd1' + _I16.pack(value))
+        elif -0x80000000 <= value:
+            out.append(b'\xd2' + _I32.pack(value))
+        elif -0x8000000000000000 <= value:
+            out.append(b'\xd3' + _I64.pack(value))
+        else:
+            raise OverflowError('integer out of range')
+    elif isinstance(value, _float_types):
+        out.append(b'\xcb' + _F64.pack(value))
+    elif isinstance(value, text_type):
+        data = value.encode('utf-8')
+        n = len(data)
+        if n < 32:
+            out.append(_U8.pack(0xa0 | n))
+        elif n <= 0xff:
+            out.append(b'\xd9' + _U8.pack(n))
+        elif n <= 0xffff:
+            out.append(b'\xda' + _U16.pack(n))
+        else:
+            out.append(b'\xdb' + _U32.pack(n))
+        out.append(data)
+    elif isinstance(value, (binary_type, bytearray)):
+        n = len(value)
+        if n <= 0xff:
+            out.append(b'\xc4' + _U8.pack(n))
+        elif n <= 0xffff:
+            out.append(b'\xc5' + _U16.pack(n))
+        else:
+            out.append(b'\xc6' + _U32.pack(n))
+        out.append(bytes(value))
+    elif isinstance(value, _sequence_types):
+        n = len(value)
+        if n < 16:
+            out.append(_U8.pack(0x90 | n))
+        elif n <= 0xffff:
+            out.append(b'\xdc' + _U16.pack(n))
+        else:
+            out.append(b'\xdd' + _U32.pack(n))
+        for item in value:
+            _msgpack_encode(item, out, default)
+    elif isinstance(value, dict):
+        n = len(value)
+        if n < 16:
+            out.append(_U8.pack(0x80 | n))
+        elif n <= 0xffff:
+            out.append(b'\xde' + _U16.pack(n))
+        else:
+            out.append(b'\xdf' + _U32.pack(n))
+        for key, item in value.items():
+            _msgpack_encode(key, out, default)
+            _msgpack_encode(item, out, default)
+    else:
+        _msgpack_encode(default(value), out, default)
+
+
+def _msgpack_array(reader, n):
+    reader.check_length(n)
+    reader.enter()
+    result = [_msgpack_decode(reader) for i in range(n)]
+    reader.leave()
+    return result
+
+
+def _msgpack_map(reader, n):
+    reader.check_length(n * 2)
+    reader.enter()
+    result = {}
+    for i in range(n):
+        key = _msgpack_decode(reader)
+        try:
+            result[key] = _msgpack_decode(reader)
+        except TypeError:
+            raise ValueError('unhashable map key')
+    reader.leave()
+    return result
+
+
+_MSGPACK_FIXED = {
+    0xc0: lambda reader: None,
+    0xc2: lambda reader: False,
+    0xc3: lambda reader: True,
+    0xc4: lambda reader: reader.read(reader.unpack(_U8)),
+    0xc5: lambda reader: reader.read(reader.unpack(_U16)),
+    0xc6: lambda reader: reader.read(reader.unpack(_U32)),
+    0xca: lambda reader: reader.unpack(_F32),
+    0xcb: lambda reader: reader.unpack(_F64),
+    0xcc: lambda reader: reader.unpack(_U8),
+    0xcd: lambda reader: reader.unpack(_U16),
+    0xce: lambda reader: reader.unpack(_U32),
+    0xcf: lambda reader: reader.unpack(_U64),
+    0xd0: lambda reader: reader.unpack(_I8),
+    0xd1: lambda reader: reader.unpack(_I16),
+    0xd2: lambda reader: reader.unpack(_I32),
+    0xd3: lambda reader: reader.unpack(_I64),
+    0xd9: lambda reader: _decode_text(reader.read(reader.unpack(_U8))),
+    0xda: lambda reader: _decode_text(reader.read(reader.unpack(_U16))),
+    0xdb: lambda reader: _decode_text(reader.read(reader.unpack(_U32))),
+    0xdc: lambda reader: _msgpack_array(reader, reader.unpack(_U16)),
+    0xdd: lambda reader: _msgpack_array(reader, reader.unpack(_U32)),
+    0xde: lambda reader: _msgpack_map(reader, reader.unpack(_U16)),
+    0xdf: lambda reader: _msgpack_map(reader, reader.unpack(_U32)),
+}
+
+
+def _msgpack_decode(reader):
+    b = reader.byte()
+    if b < 0x80:
+        return b
+    if b >= 0xe0:
+        return b - 0x100
+    if b < 0x90:
+        return _msgpack_map(reader, b & 0x0f)
+    if b < 0xa0:
+        return _msgpack_array(reader, b & 0x0f)
+    if b < 0xc0:
+        return _decode_text(reader.read(b & 0x1f))
+    f = _MSGPACK_FIXED.get(b)
+    if f is None:
+        raise ValueError('unsupported msgpack type 0x%02x' % b)
+    return f(reader)
+
+
+def msgpack_dumps(value, default=_unsupported):
+    """ Encode ``value`` as MessagePack in pure Python."""
+    out = []
+    _msgpack_encode(value, out, default)
+    return b''.join(out)
+
+
+def msgpack_loads(data, max_depth=MAX_DEPTH):
+    """ Decode MessagePack ``data`` in pure Python, raising
+    :class:`ValueError` when arrays and maps are nested more than
+    ``max_depth`` levels deep."""
+    reader = _Reader(data, max_depth)
+    value = _msgpack_decode(reader)
+    if reader.pos != len(data):
+        raise ValueError('extra data')
+    return value
+
+
+# CBOR
+
+def _cbor_head(major, n):
+    major <<= 5
+    if n < 24:
+        return _U8.pack(major | n)
+    if n <= 0xff:
+        return _U8.pack(major | 24) + _U8.pack(n)
+    if n <= 0xffff:
+        return _U8.pack(major | 25) + _U16.pack(n)
+    if n <= 0xffffffff:
+        return _U8.pack(major | 26) + _U32.pack(n)
+    return _U8.pack(major | 27) + _U64.pack(n)
+
+
+def _cbor_encode(value, out, default):
+    if value is None:
+        out.append(b'\xf6')
+    elif value is True:
+        out.append(b'\xf5')
+    elif value is False:
+        out.append(b'\xf4')
+    elif isinstance(value, integer_types):
+        if value >= 0:
+            if value <= 0xffffffffffffffff:
+                out.append(_cbor_head(0, value))
+            else:
+                # tag 2, unsigned bignum
+                data = _int_to_bytes(value)
+                out.append(b'\xc2' + _cbor_head(2, len(data)) + data)
+        else:
+            value = -1 - value
+            if value <= 0xffffffffffffffff:
+                out.append(_cbor_head(1, value))
+            else:
+                # tag 3, negative bignum
+                data = _int_to_bytes(value)
+                out.append(b'\xc3' + _cbor_head(2, len(data)) + data)
+    elif isinstance(value, _float_types):
+        out.append(b'\xfb' + _F64.pack(value))
+    elif isinstance(value, text_type):
+        data = value.encode('utf-8')
+        out.append(_cbor_head(3, len(data)))
+        out.append(data)
+    elif isinstance(value, (binary_type, bytearray)):
+        out.append(_cbor_head(2, len(value)))
+        out.append(bytes(value))
+    elif isinstance(value, _sequence_types):
+        out.append(_cbor_head(4, len(value)))
+        for item in value:
+            _cbor_encode(item, out, default)
+    elif isinstance(value, dict):
+        out.append(_cbor_head(5, len(value)))
+        for key, item in value.items():
+            _cbor_encode(key, out, default)
+            _cbor_encode(item, out, default)
+    else:
+        _cbor_encode(default(value), out, default)
+
+
+def _int_to_bytes(n):
+    data = []
+    while n:
+        data.append(n & 0xff)
+        n >>= 8
+    return bytes(bytearray(reversed(data)))
+
+
+def _bytes_to_int(data):
+    n = 0
+    for b in bytearray(data):
+        n = (n << 8) | b
+    return n
+
+
+_BREAK = object()
+
+
+def _cbor_argument(reader, info):
+    if info < 24:
+        return info
+    if info == 24:
+        return reader.unpack(_U8)
+    if info == 25:
+        return reader.unpack(_U16)
+    if info == 26:
+        return reader.unpack(_U32)
+    if info == 27:
+        return reader.unpack(_U64)
+    raise ValueError('invalid cbor argument %d' % info)
+
+
+def _cbor_chunks(reader, major):
+    """ Read the chunks of an indefinite length byte or text string."""
+    chunks = []
+    while True:
+        b = reader.byte()
+        if b == 0xff:
+            return chunks
+        if b >> 5 != major or b & 0x1f == 31:
+            raise ValueError('invalid cbor string chunk')
+        chunks.append(reader.read(_cbor_argument(reader, b & 0x1f)))
+
+
+def _cbor_decode(reader):
+    b = reader.byte()
+    major = b >> 5
+    info = b & 0x1f
+    if major == 7:
+        if info == 20:
+            return False
+        if info == 21:
+            return True
+        if info == 22 or info == 23:
+            return None
+        if info == 25:
+            if _F16 is None: # pragma: no cover
+                raise ValueError('half precision floats are not supported')
+            return reader.unpack(_F16)
+        if info == 26:
+            return reader.unpack(_F32)
+        if info == 27:
+            return reader.unpack(_F64)
+        if info == 31:
+            return _BREAK
+        raise ValueError('unsupported cbor simple value %d' % info)
+    if info == 31:
+        if major == 2:
+            return b''.join(_cbor_chunks(reader, 2))
+        if major == 3:
+            return _decode_text(b''.join(_cbor_chunks(reader, 3)))
+        if major == 4:
+            reader.enter()
+            result = []
+            while True:
+                item = _cbor_decode(reader)
+                if item is _BREAK:
+                    break
+                result.append(item)
+            reader.leave()
+            return result
+        if major == 5:
+            reader.enter()
+            result = {}
+            while True:
+                key = _cbor_decode(reader)
+                if key is _BREAK:
+                    break
+                _cbor_set(result, key, _cbor_decode(reader))
+            reader.leave()
+            return result
+        raise ValueError('invalid indefinite length cbor item')
+    n = _cbor_argument(reader, info)
+    if major == 0:
+        return n
+    if major == 1:
+        return -1 - n
+    if major == 2:
+        return reader.read(n)
+    if major == 3:
+        return _decode_text(reader.read(n))
+    if major == 4:
+        reader.check_length(n)
+        reader.enter()
+        result = [_cbor_decode(reader) for i in range(n)]
+        reader.leave()
+        if _BREAK in result:
+            raise ValueError('unexpected cbor break')
+        return result
+    if major == 5:
+        reader.check_length(n * 2)
+        reader.enter()
+        result = {}
+        for i in range(n):
+            key = _cbor_decode(reader)
+            _cbor_set(result, key, _cbor_decode(reader))
+        reader.leave()
+        return result
+    # major 6, a tagged item
+    reader.enter()
+    value = _cbor_decode(reader)
+    reader.leave()
+    if n == 2 and isinstance(value, binary_type):
+        return _bytes_to_int(value)
+    if n == 3 and isinstance(value, binary_type):
+        return -1 - _bytes_to_int(value)
+    # other tags are ignored, leaving the plain value
+    return value
+
+
+def _cbor_set(result, key, value):
+    if key is _BREAK or value is _BREAK:
+        raise ValueError('unexpected cbor break')
+    try:
+        result[key] = value
+    except TypeError:
+        raise ValueError('unhashable map key')
+
+
+def cbor_dumps(value, default=_unsupported):
+    """ Encode ``value`` as CBOR in pure Python."""
+    out = []
+    _cbor_encode(value, out, default)
+    return b''.join(out)
+
+
+def cbor_loads(data, max_depth=MAX_DEPTH):
+    """ Decode CBOR ``data`` in pure Python, raising :class:`ValueError`
+    when arrays, maps and tags are nested more than ``max_depth`` levels
+    deep."""
+    reader = _Reader(data, max_depth)
+    value = _cbor_decode(reader)
+    if value is _BREAK:
+        raise ValueError('unexpected cbor break')
+    if reader.pos != len(data):
+        raise ValueError('extra data')
+    return value
+
+
+def negotiate_codec(accept, codecs, default=None):
+    """ Return the codec in the ``codecs`` dict, mapping media types to
+    codecs, preferred by the ``Accept`` header ``accept``, or ``None`` for
+    JSON. Ties go to ``default`` and then JSON, and ``default`` is returned
+    when nothing listed is acceptable."""
+    qualities = parse_qualities(accept)
+    any_quality = qualities.get('*/*', 0.0)
+    application_quality = qualities.get('application/*', any_quality)
+
+    def quality(codec):
+        if codec is None:
+            return qualities.get('application/json', application_quality)
+        return max(qualities.get(content_type, application_quality)
+                   for content_type in codec.content_types)
+
+    best = default
+    best_quality = quality(default)
+    for codec in [None] + list(codecs.values()):
+        q = quality(codec)
+        if q > best_quality:
+            best = codec
+            best_quality = q
+    return best
+
+
+class Codec(object):
+    """ The base class of binary JSON-RPC encodings.
+
+    ``content_types`` lists the media types the codec accepts, the first is
+    used for responses. Subclasses implement :meth:`dumps` and
+    :meth:`loads`.
+
+    Responses encoded by a codec are built from the values returned by the
+    views, bypassing the renderer of the method and of the endpoint, so
+    that adapters of a custom JSON renderer do not apply.
+
+    """
+    name = None
+    content_types = ()
+
+    def dumps(self, value):
+        """ Encode ``value`` to bytes."""
+        raise NotImplementedError
+
+    def loads(self, data):
+        """ Decode the bytes ``data``, raising :class:`ValueError` when it
+        is malformed."""
+        raise NotImplementedError
+
+    @property
+    def content_type(self):
+        return self.content_types[0]
+
+
+class MsgpackCodec(Codec):
+    """ Encode messages as `MessagePack <https://msgpack.org/>`_.
+
+    The ``msgpack`` package is used when it is installed unless ``pure`` is
+    true. ``default`` may be a function returning an encodable replacement
+    for other objects. The pure Python decoder rejects messages nested more
+    than ``max_depth`` levels deep.
+
+    """
+    name = 'msgpack'
+    content_types = ('application/msgpack', 'application/x-msgpack')
+
+    def __init__(self, default=None, pure=False, max_depth=MAX_DEPTH):
+        self.default = default
+        self.pure = pure or msgpack is None
+        self.max_depth = max_depth
+
+    def dumps(self, value):
+        if self.pure:
+            return msgpack_dumps(value, self.default or _unsupported)
+        return msgpack.packb(value, use_bin_type=True, default=self.default)
+
+    def loads(self, data):
+        if self.pure:
+            return msgpack_loads(data, self.max_depth)
+        try:
+            return msgpack.unpackb(data, raw=False, strict_map_key=False)
+        except ValueError:
+            raise
+        except Exception as ex:
+            raise ValueError(str(ex))
+
+
+class CborCodec(Codec):
+    """ Encode messages as `CBOR <https://cbor.io/>`_.
+
+    The ``cbor2`` package is used when it is installed unless ``pure`` is
+    true. ``default`` may be a function returning an encodable replacement
+    for other objects. The pure Python decoder rejects messages nested more
+    than ``max_depth`` levels deep, counting tags as a level.
+
+    """
+    name = 'cbor'
+    content_types = ('application/cbor',)
+
+    def __init__(self, default=None, pure=False, max_depth=MAX_DEPTH):
+        self.default = default
+        self.pure = pure or cbor2 is None
+        self.max_depth = max_depth
+
+    def dumps(self, value):
+        if self.pure:
+            return cbor_dumps(value, self.default or _unsupported)
+        default = None
+        if self.default is not None:
+            def default(encoder, value):
+                encoder.encode(self.default(value))
+        return cbor2.dumps(value, default=default)
+
+    def loads(self, data):
+        if self.pure:
+            return cbor_loads(data, self.max_depth)
+        try:
+            return cbor2.loads(data)
+        except ValueError:
+            raise
+        except Exception as ex:
+            raise ValueError(str(ex))
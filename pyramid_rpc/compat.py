@@ -35,3 +35,25 @@ if PY3: # pragma: no cover
 else:
     def is_nonstr_iter(v):
         return hasattr(v, '__iter__')
+
+
+if PY3: # pragma: no cover
+    import socketserver
+    from http.server import BaseHTTPRequestHandler
+    from urllib.parse import unquote
+
+    def url_unquote(s):
+        # WSGI strings are bytes decoded as latin-1
+        return unquote(s, 'latin-1')
+else:
+    import SocketServer as socketserver
+    from BaseHTTPServer import BaseHTTPRequestHandler
+    from urllib import unquote as url_unquote
+
+
+if PY3: # pragma: no cover
+    import http.client as http_client
+    from urllib.parse import urlsplit
+else:
+    import httplib as http_client
+    from urlparse import urlsplit
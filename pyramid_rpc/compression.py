@@ -0,0 +1,246 @@
+"""Compression of RPC requests and responses.
+
+A :class:`ResponseCompressor` passed to an endpoint as its ``compressor``
+negotiates a ``Content-Encoding`` with the client and compresses responses
+as they are returned, including streamed responses.
+
+A :class:`RequestDecompressor` passed to an endpoint as its
+``decompressor`` decodes compressed request bodies as they are read by the
+parsers, within limits on the decompressed size and compression ratio.
+
+"""
+import zlib
+
+from .util import parse_qualities
+
+
+# encoding -> zlib window bits selecting its container format
+WBITS = {
+    'gzip': 16 + zlib.MAX_WBITS,
+    'deflate': zlib.MAX_WBITS,
+}
+
+
+class DecompressionError(ValueError):
+    """ Raised when a request body cannot be decoded."""
+
+
+class DecompressionLimitError(DecompressionError):
+    """ Raised when a request body exceeds the limits of a
+    :class:`RequestDecompressor`."""
+
+
+def negotiate_encoding(header, encodings):
+    """ Return the coding from ``encodings`` the client prefers according
+    to the ``Accept-Encoding`` ``header``, or ``None``. Ties are broken by
+    the order of ``encodings``."""
+    qualities = parse_qualities(header)
+    default = qualities.get('*', 0.0)
+    best = None
+    best_quality = 0.0
+    for encoding in encodings:
+        quality = qualities.get(encoding, default)
+        if quality > best_quality:
+            best = encoding
+            best_quality = quality
+    return best
+
+
+def iter_compressed(app_iter, compressor):
+    """ Compress the chunks of ``app_iter`` as they are produced."""
+    try:
+        for chunk in app_iter:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+    finally:
+        close = getattr(app_iter, 'close', None)
+        if close is not None:
+            close()
+
+
+class ResponseCompressor(object):
+    """ Compress the responses of an endpoint using ``gzip`` or ``deflate``
+    as negotiated with the client's ``Accept-Encoding`` header.
+
+    ``min_size``
+
+        Responses with a body smaller than this many bytes are sent
+        uncompressed. Streamed responses of unknown length are always
+        compressed. Defaults to 1024.
+
+    ``level``
+
+        The zlib compression level, from 1 (fastest) to 9 (smallest).
+        Defaults to 6.
+
+    ``encodings``
+
+        The supported codings in order of preference. Defaults to
+        ``('gzip', 'deflate')``.
+
+    Compressed responses have ``Vary: Accept-Encoding`` and their ``ETag``
+    made weak as the encoded body differs from the original.
+
+    """
+    def __init__(self, min_size=1024, level=6,
+                 encodings=('gzip', 'deflate')):
+        for encoding in encodings:
+            if encoding not in WBITS:
+                raise ValueError('unknown encoding "%s"' % encoding)
+        self.min_size = min_size
+        self.level = level
+        self.encodings = tuple(encodings)
+
+    def compressobj(self, encoding):
+        """ Return a new zlib compressor for ``encoding``."""
+        return zlib.compressobj(self.level, zlib.DEFLATED, WBITS[encoding])
+
+    def __call__(self, request, response):
+        """ Compress ``response`` in place, suitable for use as a response
+        callback."""
+        if (
+            response.content_encoding or
+            request.method == 'HEAD' or
+            response.status_int in (204, 304)
+        ):
+            return
+        app_iter = response.app_iter
+        streamed = not isinstance(app_iter, (list, tuple))
+        if not streamed and len(response.body) < self.min_size:
+            return
+
+        response.vary = tuple(response.vary or ()) + ('Accept-Encoding',)
+        header = request.headers.get('Accept-Encoding')
+        if not header:
+            return
+        encoding = negotiate_encoding(header, self.encodings)
+        if encoding is None:
+            return
+
+        etag = response.etag
+        if response.etag_strong is not None:
+            response.etag = (etag, False)
+        if (
+            response.conditional_response and etag is not None and
+            etag in request.if_none_match
+        ):
+            # answered with a 304, there is no body worth compressing
+            return
+
+        compressor = self.compressobj(encoding)
+        if streamed:
+            response.app_iter = iter_compressed(app_iter, compressor)
+            response.content_length = None
+        else:
+            response.body = (
+                compressor.compress(response.body) + compressor.flush())
+        response.content_encoding = encoding
+
+
+class DecompressingReader(object):
+    """ A read-only file decoding a compressed stream read from ``fileobj``
+    a chunk at a time.
+
+    At most ``size`` bytes are decompressed for each :meth:`read`, such that
+    neither the compressed nor the decompressed body is ever held in memory
+    as a whole unless it is read at once.
+
+    """
+    def __init__(self, fileobj, encoding, max_size=None, max_ratio=None,
+                 chunk_size=64 * 1024):
+        self.fileobj = fileobj
+        self.decompressor = zlib.decompressobj(WBITS[encoding])
+        self.max_size = max_size
+        self.max_ratio = max_ratio
+        self.chunk_size = chunk_size
+        # the number of compressed bytes read and decompressed bytes returned
+        self.compressed_size = 0
+        self.size = 0
+
+    def _check(self):
+        if self.max_size is not None and self.size > self.max_size:
+            raise DecompressionLimitError(
+                'decompressed body exceeds %d bytes' % self.max_size)
+        if (
+            self.max_ratio is not None and
+            self.size > self.chunk_size and
+            self.size > self.compressed_size * self.max_ratio
+        ):
+            raise DecompressionLimitError(
+                'compression ratio exceeds %s' % self.max_ratio)
+
+    def read(self, size=-1):
+        """ Return up to ``size`` decompressed bytes, or the rest of the
+        body when ``size`` is negative. An empty result marks the end of
+        the body."""
+        if size is None or size < 0:
+            chunks = []
+            while True:
+                chunk = self.read(self.chunk_size)
+                if not chunk:
+                    return b''.join(chunks)
+                chunks.append(chunk)
+        if size == 0:
+            return b''
+        decompressor = self.decompressor
+        while not decompressor.eof:
+            data = decompressor.unconsumed_tail
+            if not data:
+                data = self.fileobj.read(self.chunk_size)
+                if not data:
+                    raise DecompressionError('truncated body')
+                self.compressed_size += len(data)
+            try:
+                result = decompressor.decompress(data, size)
+            except zlib.error as ex:
+                raise DecompressionError(str(ex))
+            if result:
+                self.size += len(result)
+                self._check()
+                return result
+        return b''
+
+
+class RequestDecompressor(object):
+    """ Decode request bodies compressed with ``gzip`` or ``deflate`` as
+    declared by their ``Content-Encoding`` header.
+
+    ``max_size``
+
+        The maximum number of bytes a body may decompress to. Defaults to
+        10MB.
+
+    ``max_ratio``
+
+        The maximum ratio between the decompressed and compressed size of a
+        body, checked once more than ``chunk_size`` bytes have been
+        decompressed. Defaults to 100. ``None`` disables the check.
+
+    ``chunk_size``
+
+        The number of compressed bytes read from the request at a time.
+
+    Bodies which are corrupt, use an unsupported coding or exceed a limit
+    raise a :class:`DecompressionError` while they are read.
+
+    """
+    def __init__(self, max_size=10 * 1024 * 1024, max_ratio=100,
+                 chunk_size=64 * 1024):
+        self.max_size = max_size
+        self.max_ratio = max_ratio
+        self.chunk_size = chunk_size
+
+    def body_file(self, request):
+        """ Return a file reading the decoded body of ``request``."""
+        encoding = request.headers.get('Content-Encoding', '')
+        encoding = encoding.strip().lower()
+        if not encoding or encoding == 'identity':
+            return request.body_file
+        if encoding not in WBITS:
+            raise DecompressionError(
+                'unsupported content encoding "%s"' % encoding)
+        return DecompressingReader(
+            request.body_file, encoding, max_size=self.max_size,
+            max_ratio=self.max_ratio, chunk_size=self.chunk_size)
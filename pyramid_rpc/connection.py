@@ -0,0 +1,285 @@
+"""Dispatch JSON-RPC messages received on persistent connections.
+
+A :class:`JsonRpcConnection` serves the methods of a JSON-RPC endpoint to a
+single long lived connection, such as a WebSocket, without going through
+Pyramid's router for every call. The endpoint's route and root factory are
+resolved once when the connection is opened and the view of each method
+is looked up and its permission checked once, the first time the method is
+called.
+
+"""
+import json
+import logging
+import threading
+
+from pyramid.exceptions import PredicateMismatch
+from pyramid.interfaces import IRequest
+from pyramid.interfaces import IRootFactory
+from pyramid.interfaces import IRouteRequest
+from pyramid.interfaces import IRoutesMapper
+from pyramid.interfaces import IView
+from pyramid.interfaces import IViewClassifier
+from pyramid.request import apply_request_extensions
+from pyramid.threadlocal import manager
+from pyramid.traversal import DefaultRootFactory
+from zope.interface import alsoProvides
+from zope.interface import providedBy
+
+from .call import RpcCall
+from .call import attach_call
+from .compat import string_types
+from .jsonrpc import JsonRpcMethodNotFound
+from .jsonrpc import JsonRpcParseError
+from .jsonrpc import JsonRpcRequestInvalid
+from .jsonrpc import exception_view
+from .jsonrpc import make_error_response
+from .util import clone_request
+
+log = logging.getLogger(__name__)
+
+_FORBIDDEN = object()
+
+
+def find_endpoint(registry, path):
+    """ Return the route of the JSON-RPC endpoint matching ``path`` along
+    with its matchdict.
+
+    A :class:`LookupError` is raised if there is no such endpoint.
+
+    """
+    endpoints = getattr(registry, 'jsonrpc_endpoints', {})
+    mapper = registry.queryUtility(IRoutesMapper)
+    routes = mapper.get_routes() if mapper is not None else ()
+    for route in routes:
+        if route.name in endpoints:
+            match = route.match(path)
+            if match is not None:
+                return route, match
+    raise LookupError('no JSON-RPC endpoint at "%s"' % path)
+
+
+class JsonRpcConnection(object):
+    """ Serve the JSON-RPC endpoint of the Pyramid ``app`` matching the
+    ``environ`` of the request which opened a persistent connection.
+
+    ``send``
+
+        A callable accepting the bytes of a JSON-RPC message to be sent to
+        the client. It is never called concurrently.
+
+    ``executor``
+
+        An optional :class:`concurrent.futures.Executor` used to run calls
+        concurrently, their responses being sent as they complete, in any
+        order. By default each message is handled before the next is read.
+
+    ``max_pending``
+
+        The maximum number of messages of the connection submitted to the
+        ``executor`` and not answered yet. Once reached, handling another
+        message blocks until one is answered, so that a client cannot queue
+        an unbounded amount of work. Defaults to ``None``, no limit.
+
+    The request which opened the connection, with its headers, cookies and
+    therefore its authentication, is the base of every call. Calls are made
+    with a ``POST`` request method, without a body. Views find the
+    connection as ``request.rpc.connection`` and may send notifications to
+    the client via :meth:`notify`.
+
+    View predicates other than the method name are evaluated once per
+    connection, along with the permission of the view.
+
+    A :class:`LookupError` is raised if the ``environ`` does not match the
+    route of a JSON-RPC endpoint.
+
+    """
+    def __init__(self, app, environ, send, executor=None, max_pending=None):
+        registry = app.registry
+        environ = dict(environ)
+        environ['REQUEST_METHOD'] = 'POST'
+        request = app.request_factory(environ)
+        request.registry = registry
+        apply_request_extensions(request)
+
+        route, match = find_endpoint(registry, request.path_info)
+        request.matchdict = match
+        request.matched_route = route
+        request_iface = registry.queryUtility(
+            IRouteRequest, name=route.name, default=IRequest)
+        request.request_iface = request_iface
+        alsoProvides(request, request_iface)
+        self.endpoint = registry.jsonrpc_endpoints[route.name]
+        attach_call(request, RpcCall(self.endpoint))
+        request.rpc.connection = self
+
+        manager.push({'registry': registry, 'request': request})
+        try:
+            root_factory = route.factory or registry.queryUtility(
+                IRootFactory, default=DefaultRootFactory)
+            self.context = request.context = root_factory(request)
+        finally:
+            manager.pop()
+
+        self.registry = registry
+        self.request = request
+        self.send_message = send
+        self.executor = executor
+        # method name -> view, or _FORBIDDEN
+        self.views = {}
+        self.send_lock = threading.Lock()
+        self.closed = False
+        # the futures of calls submitted to the executor and not done yet
+        self.pending = set()
+        self.pending_slots = None
+        if executor is not None and max_pending is not None:
+            self.pending_slots = threading.Semaphore(max_pending)
+
+    def send(self, data):
+        """ Send the encoded message ``data`` unless the connection is
+        closed."""
+        with self.send_lock:
+            if self.closed:
+                return
+            self.send_message(data)
+
+    def notify(self, method, params=None):
+        """ Send a notification of ``method`` with ``params`` to the
+        client."""
+        message = {'jsonrpc': '2.0', 'method': method}
+        if params is not None:
+            message['params'] = params
+        self.send(json.dumps(message).encode('utf-8'))
+
+    def close(self):
+        """ Stop sending messages, the responses of calls still in progress
+        are discarded."""
+        with self.send_lock:
+            self.closed = True
+
+    def handle(self, message):
+        """ Handle a JSON-RPC message, a single call or a batch, received
+        as text or UTF-8 encoded bytes."""
+        try:
+            if not isinstance(message, string_types):
+                message = message.decode('utf-8')
+            body = json.loads(message)
+        except ValueError:
+            self.send(self.error(JsonRpcParseError()))
+            return
+        if isinstance(body, list):
+            if not body:
+                self.send(self.error(JsonRpcRequestInvalid()))
+                return
+            self.submit(self.respond_batch, body)
+        else:
+            self.submit(self.respond, body)
+
+    def submit(self, func, body):
+        if self.executor is None:
+            func(body)
+            return
+        slots = self.pending_slots
+        if slots is not None:
+            slots.acquire()
+        try:
+            future = self.executor.submit(func, body)
+        except Exception:
+            if slots is not None:
+                slots.release()
+            raise
+        self.pending.add(future)
+        future.add_done_callback(self._done)
+
+    def _done(self, future):
+        self.pending.discard(future)
+        if self.pending_slots is not None:
+            self.pending_slots.release()
+
+    def wait(self, timeout=None):
+        """ Wait up to ``timeout`` seconds for the calls in progress to
+        complete and send their responses."""
+        if self.pending:
+            from concurrent.futures import wait
+            wait(list(self.pending), timeout)
+
+    def respond(self, body):
+        result = self.call(body)
+        if result is not None:
+            self.send(result)
+
+    def respond_batch(self, batch):
+        results = [self.call(body) for body in batch]
+        results = [result for result in results if result is not None]
+        if results:
+            self.send(b'[' + b', '.join(results) + b']')
+
+    def error(self, error, id=None):
+        return make_error_response(self.request, error, id).body
+
+    def call(self, body):
+        """ Invoke a single call, returning the encoded response or
+        ``None`` for notifications."""
+        if not isinstance(body, dict):
+            return self.error(JsonRpcRequestInvalid())
+        rpc = RpcCall(
+            self.endpoint,
+            method=body.get('method'),
+            args=body.get('params', ()),
+            id=body.get('id'),
+            version=body.get('jsonrpc'),
+        )
+        rpc.connection = self
+        context = self.context
+        request = clone_request(self.request, rpc, context)
+        manager.push({'registry': self.registry, 'request': request})
+        try:
+            try:
+                if rpc.version != '2.0' or rpc.method is None:
+                    log.debug('id:%s invalid rpc request', rpc.id)
+                    raise JsonRpcRequestInvalid
+                view = self.find_view(context, request)
+                response = view(context, request)
+            except Exception as exc:
+                response = exception_view(exc, request)
+        finally:
+            manager.pop()
+        if rpc.id is None:
+            return None
+        return response.body
+
+    def find_view(self, context, request):
+        """ Return the view of the called method, checking its predicates
+        and permission the first time it is called."""
+        method = request.rpc.method
+        view = self.views.get(method)
+        if view is None:
+            view = self._resolve_view(context, request)
+            self.views[method] = view
+        if view is _FORBIDDEN:
+            log.debug('json-rpc method forbidden "%s"', method)
+            raise JsonRpcRequestInvalid
+        return view
+
+    def _resolve_view(self, context, request):
+        view = self.registry.adapters.lookup(
+            (IViewClassifier, request.request_iface, providedBy(context)),
+            IView, name='', default=None)
+        if view is None:
+            raise JsonRpcMethodNotFound
+        try:
+            match = getattr(view, 'match', None)
+            if match is not None:
+                view = match(context, request)
+            else:
+                predicated = getattr(view, '__predicated__', None)
+                if predicated is not None and not predicated(
+                        context, request):
+                    raise PredicateMismatch(request.rpc.method)
+        except PredicateMismatch:
+            raise JsonRpcMethodNotFound
+        permitted = getattr(view, '__permitted__', None)
+        if permitted is not None:
+            if not permitted(context, request):
+                return _FORBIDDEN
+            view = getattr(view, '__call_permissive__', view)
+        return view
@@ -0,0 +1,197 @@
+"""Return large results a page at a time.
+
+A method returning a :class:`Cursor` responds with the first page of its
+items and a token from which the client fetches the following pages. The
+underlying iterator is kept in a :class:`CursorTable` in between, so that
+the result is never held in memory nor encoded as a whole.
+
+"""
+import collections
+import itertools
+import threading
+import time
+import uuid
+
+
+class Cursor(object):
+    """ Returned by a method to send the items of ``iterable`` a page at a
+    time.
+
+    ``page_size``
+
+        The number of items in a page, unless the client asks for fewer.
+        Defaults to the ``page_size`` of the endpoint's
+        :class:`CursorTable`.
+
+    The iterable is consumed lazily, such as the rows of a database query,
+    and closed once exhausted or discarded if it has a ``close`` method.
+
+    """
+    __slots__ = ('iterable', 'page_size')
+
+    def __init__(self, iterable, page_size=None):
+        self.iterable = iterable
+        self.page_size = page_size
+
+
+class CursorNotFound(KeyError):
+    """ Raised for a token which is unknown, exhausted or expired."""
+
+
+def _close(iterator):
+    close = getattr(iterator, 'close', None)
+    if close is not None:
+        try:
+            close()
+        except Exception:
+            # a generator still running in another thread
+            pass
+
+
+class _Entry(object):
+    __slots__ = ('iterator', 'head', 'info', 'expires', 'lock')
+
+    def __init__(self, iterator, head, info, expires):
+        self.iterator = iterator
+        # the item read ahead to tell whether there is another page
+        self.head = head
+        self.info = info
+        self.expires = expires
+        self.lock = threading.Lock()
+
+
+class CursorTable(object):
+    """ A bounded table of the open cursors of an endpoint.
+
+    ``max_cursors``
+
+        The maximum number of open cursors, the least recently used are
+        discarded first. Defaults to 1000.
+
+    ``ttl``
+
+        The number of seconds a cursor is kept after it was last used.
+        Defaults to 300.
+
+    ``page_size``
+
+        The default number of items in a page. Defaults to 100.
+
+    ``max_page_size``
+
+        The maximum number of items in a page, whatever the method or
+        client ask for. Defaults to 1000.
+
+    Cursors are kept in the memory of each process, clients must fetch all
+    of the pages of a cursor from the same process.
+
+    """
+    def __init__(self, max_cursors=1000, ttl=300, page_size=100,
+                 max_page_size=1000, clock=time.time):
+        self.max_cursors = max_cursors
+        self.ttl = ttl
+        self.page_size = page_size
+        self.max_page_size = max_page_size
+        self.clock = clock
+        # token -> _Entry, least recently used first
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def _size(self, size, default):
+        if size is None:
+            size = default if default is not None else self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def _page(self, iterator, size, head):
+        """ Return the next ``size`` items along with the item following
+        them, or ``None`` and the exhausted iterator closed."""
+        items = [] if head is None else [head[0]]
+        items.extend(itertools.islice(iterator, size - len(items)))
+        for item in iterator:
+            return items, (item,)
+        _close(iterator)
+        return items, None
+
+    def open(self, cursor, info=None):
+        """ Return the first page of ``cursor`` and the token of the rest,
+        or ``None`` if there are no more items. ``info`` is returned along
+        with each following page."""
+        iterator = iter(cursor.iterable)
+        size = self._size(None, cursor.page_size)
+        items, head = self._page(iterator, size, None)
+        if head is None:
+            return items, None
+        token = uuid.uuid4().hex
+        entry = _Entry(iterator, head, (size, info), self.clock() + self.ttl)
+        discarded = []
+        with self.lock:
+            self.entries[token] = entry
+            self._purge(discarded)
+        for old in discarded:
+            _close(old.iterator)
+        return items, token
+
+    def fetch(self, token, size=None):
+        """ Return the next page of the cursor ``token`` as a tuple of its
+        items, the token of the rest or ``None`` when there are no more
+        items, and the ``info`` the cursor was opened with.
+
+        :class:`CursorNotFound` is raised for an unknown token.
+
+        """
+        discarded = []
+        with self.lock:
+            self._purge(discarded)
+            entry = self.entries.pop(token, None)
+            if entry is not None:
+                # most recently used
+                self.entries[token] = entry
+                entry.expires = self.clock() + self.ttl
+        for old in discarded:
+            _close(old.iterator)
+        if entry is None:
+            raise CursorNotFound(token)
+        default_size, info = entry.info
+        size = self._size(size, default_size)
+        with entry.lock:
+            if entry.head is None:
+                # exhausted by a concurrent fetch
+                raise CursorNotFound(token)
+            try:
+                items, entry.head = self._page(
+                    entry.iterator, size, entry.head)
+            except Exception:
+                # the iterator is broken, there is no next page
+                entry.head = None
+                with self.lock:
+                    self.entries.pop(token, None)
+                raise
+        if entry.head is None:
+            with self.lock:
+                self.entries.pop(token, None)
+            token = None
+        return items, token, info
+
+    def close(self, token):
+        """ Discard the cursor ``token``, returning ``False`` if it was
+        unknown."""
+        with self.lock:
+            entry = self.entries.pop(token, None)
+        if entry is None:
+            return False
+        _close(entry.iterator)
+        return True
+
+    def _purge(self, discarded):
+        now = self.clock()
+        entries = self.entries
+        while entries:
+            oldest = next(iter(entries))
+            entry = entries[oldest]
+            if (
+                len(entries) <= self.max_cursors and
+                entry.expires > now
+            ):
+                break
+            del entries[oldest]
+            discarded.append(entry)
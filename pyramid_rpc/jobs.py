@@ -0,0 +1,176 @@
+"""Run long calls in the background as jobs.
+
+A method registered with ``async_job=True`` returns the id of a job right
+away while its view runs on the bounded pool of a :class:`JobRunner`. The
+outcome of the job is kept in a bounded store until the client collects it.
+
+"""
+import collections
+import threading
+import time
+import uuid
+
+from .compat import PY3
+
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class JobQueueFull(Exception):
+    """ Raised by :meth:`JobRunner.submit` when too many jobs are
+    unfinished."""
+
+
+class Job(object):
+    """ The state of a job submitted to a :class:`JobRunner`.
+
+    ``status`` is one of ``'pending'``, ``'running'``, ``'done'`` or
+    ``'failed'``. Once done, ``result`` is the value returned by the job,
+    or once failed ``error`` is the exception it raised, without its
+    traceback such that the frames of the job are not kept alive.
+
+    """
+    __slots__ = (
+        'id',
+        'method',
+        'status',
+        'result',
+        'error',
+        'created',
+        'finished',
+    )
+
+    def __init__(self, id, method, created):
+        self.id = id
+        self.method = method
+        self.status = PENDING
+        self.result = None
+        self.error = None
+        self.created = created
+        self.finished = None
+
+    def describe(self):
+        """ Return a dict describing the job to a client."""
+        return {
+            'id': self.id,
+            'method': self.method,
+            'status': self.status,
+            'created': self.created,
+            'finished': self.finished,
+        }
+
+
+class JobRunner(object):
+    """ Run jobs on a bounded pool of threads and keep their outcome.
+
+    ``workers``
+
+        The number of threads running jobs. Defaults to 4.
+
+    ``max_pending``
+
+        The maximum number of jobs waiting or running at a time, further
+        submissions are refused. Defaults to 100.
+
+    ``max_results``
+
+        The maximum number of finished jobs kept, the oldest are discarded
+        first. Defaults to 1000.
+
+    ``ttl``
+
+        The number of seconds a finished job is kept. Defaults to 3600.
+
+    ``executor``
+
+        An optional :class:`concurrent.futures.Executor` to run the jobs on
+        instead of a pool of ``workers`` threads.
+
+    The jobs are kept in the memory of each process.
+
+    """
+    def __init__(self, workers=4, max_pending=100, max_results=1000,
+                 ttl=3600, executor=None, clock=time.time):
+        if executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            executor = ThreadPoolExecutor(workers)
+        self.executor = executor
+        self.max_pending = max_pending
+        self.max_results = max_results
+        self.ttl = ttl
+        self.clock = clock
+        # job id -> Job for every known job
+        self.jobs = {}
+        # ids of the finished jobs in the order they finished
+        self.finished = collections.OrderedDict()
+        self.pending = 0
+        self.lock = threading.Lock()
+
+    def submit(self, method, func):
+        """ Run ``func`` in the background and return its :class:`Job`.
+
+        :class:`JobQueueFull` is raised when ``max_pending`` jobs are
+        unfinished.
+
+        """
+        with self.lock:
+            if self.pending >= self.max_pending:
+                raise JobQueueFull
+            job = Job(uuid.uuid4().hex, method, self.clock())
+            self.jobs[job.id] = job
+            self.pending += 1
+        try:
+            self.executor.submit(self._run, job, func)
+        except Exception:
+            with self.lock:
+                del self.jobs[job.id]
+                self.pending -= 1
+            raise
+        return job
+
+    def _run(self, job, func):
+        job.status = RUNNING
+        try:
+            job.result = func()
+            status = DONE
+        except Exception as ex:
+            if PY3:
+                ex.__traceback__ = None
+                ex.__context__ = None
+            job.error = ex
+            status = FAILED
+        with self.lock:
+            job.status = status
+            job.finished = self.clock()
+            self.pending -= 1
+            self.finished[job.id] = None
+            self._purge()
+
+    def get(self, job_id):
+        """ Return the :class:`Job` with ``job_id``, or ``None`` if it is
+        unknown or was discarded."""
+        with self.lock:
+            self._purge()
+            return self.jobs.get(job_id)
+
+    def _purge(self):
+        now = self.clock()
+        finished = self.finished
+        while finished:
+            job_id = next(iter(finished))
+            job = self.jobs[job_id]
+            if (
+                len(finished) <= self.max_results and
+                job.finished + self.ttl > now
+            ):
+                break
+            del finished[job_id]
+            del self.jobs[job_id]
+
+    def shutdown(self, wait=True):
+        """ Stop accepting jobs, waiting for the running jobs to finish
+        when ``wait`` is true."""
+        self.executor.shutdown(wait=wait)
@@ -1,27 +1,63 @@
+import base64
+import hashlib
+import inspect
 import json
 import logging
 import copy
+import re
+import sys
+import uuid
 
 import venusian
 from pyramid.exceptions import ConfigurationError
 from pyramid.httpexceptions import HTTPForbidden
 from pyramid.httpexceptions import HTTPNotFound
+from pyramid.interfaces import IRendererFactory
+from pyramid.interfaces import PHASE3_CONFIG
 from pyramid.renderers import null_renderer
 from pyramid.renderers import render
-from pyramid.request import Request
 from pyramid.response import Response
 from pyramid.security import NO_PERMISSION_REQUIRED
-
+from pyramid.threadlocal import manager
+
+from pyramid_rpc import jobs
+from pyramid_rpc.call import RpcCall
+from pyramid_rpc.call import attach_call
+from pyramid_rpc.codec import negotiate_codec
+from pyramid_rpc.compat import PY3
+from pyramid_rpc.compat import binary_type
+from pyramid_rpc.compat import integer_types
 from pyramid_rpc.compat import is_nonstr_iter
+from pyramid_rpc.compat import string_types
+from pyramid_rpc.compat import text_type
+from pyramid_rpc.compression import DecompressionLimitError
+from pyramid_rpc.cursors import Cursor
+from pyramid_rpc.cursors import CursorNotFound
+from pyramid_rpc.jobs import JobQueueFull
+from pyramid_rpc.jobs import JobRunner
 from pyramid_rpc.mapper import MapplyViewMapper
 from pyramid_rpc.mapper import ViewMapperArgsInvalid
+from pyramid_rpc.mapper import _inspect_ob
+from pyramid_rpc.util import IdempotencyTimeout
+from pyramid_rpc.util import clone_request
 from pyramid_rpc.util import combine
+from pyramid_rpc.util import forbidden_methods
 
 
 log = logging.getLogger(__name__)
 
 DEFAULT_RENDERER = 'pyramid_rpc:jsonrpc'
 
+DISCOVER_METHOD = 'rpc.discover'
+
+JOB_STATUS_METHOD = 'rpc.job.status'
+JOB_RESULT_METHOD = 'rpc.job.result'
+
+CURSOR_NEXT_METHOD = 'rpc.cursor.next'
+CURSOR_CLOSE_METHOD = 'rpc.cursor.close'
+
+OPENRPC_VERSION = '1.2.6'
+
 _marker = object()
 
 
@@ -73,6 +109,41 @@ class JsonRpcInternalError(JsonRpcError):
     message = 'internal error'
 
 
+class JsonRpcRequestInProgress(JsonRpcError):
+    code = -32000
+    message = 'request in progress'
+
+
+class JsonRpcJobNotFound(JsonRpcError):
+    code = -32001
+    message = 'job not found'
+
+
+class JsonRpcJobPending(JsonRpcError):
+    code = -32002
+    message = 'job not finished'
+
+
+class JsonRpcJobQueueFull(JsonRpcError):
+    code = -32003
+    message = 'too many jobs'
+
+
+class JsonRpcCursorNotFound(JsonRpcError):
+    code = -32004
+    message = 'cursor not found'
+
+
+# errors with a fixed representation whose responses can be prepared up front
+STATIC_ERRORS = (
+    JsonRpcParseError,
+    JsonRpcRequestInvalid,
+    JsonRpcMethodNotFound,
+    JsonRpcParamsInvalid,
+    JsonRpcInternalError,
+)
+
+
 def make_error_response(request, error, id=None):
     """ Marshal a Python Exception into a ``Response`` object with a
     body that is a JSON string suitable for use as a JSON-RPC response
@@ -81,47 +152,95 @@ def make_error_response(request, error, id=None):
     """
     # we may need to render a parse error, at which point we don't know
     # much about the request
-    renderer = getattr(request, 'rpc_renderer', DEFAULT_RENDERER)
-    out = {
-        'jsonrpc': '2.0',
-        'id': id,
-        'error': error.as_dict(),
-    }
-    body = render(renderer, out, request=request).encode('utf-8')
+    rpc = getattr(request, 'rpc', None)
+    renderer = DEFAULT_RENDERER
+    if rpc is not None and rpc.renderer is not None:
+        renderer = rpc.renderer
+    codec = getattr(rpc, 'codec', None)
+    encoder = request.registry.jsonrpc_encoders.get(renderer)
+    if codec is not None:
+        body = codec.dumps({
+            'jsonrpc': '2.0',
+            'id': id,
+            'error': error.as_dict(),
+        })
+        response = Response(body)
+        response.content_type = codec.content_type
+        return response
+    elif encoder is not None:
+        body = encoder.encode_error(error, id)
+    else:
+        out = {
+            'jsonrpc': '2.0',
+            'id': id,
+            'error': error.as_dict(),
+        }
+        body = render(renderer, out, request=request).encode('utf-8')
 
     response = Response(body, charset='utf-8')
     response.content_type = 'application/json'
     return response
 
 
-def exception_view(exc, request):
-    rpc_id = getattr(request, 'rpc_id', None)
+def log_suppressed(limiter):
+    """ Log the summary of the exceptions suppressed by ``limiter`` if it
+    is time for another one."""
+    summary = limiter.summarize()
+    if summary is not None:
+        log.error('json-rpc %s', summary)
+
+
+def _make_fault(exc, rpc):
+    """ Return the ``JsonRpcError`` reported to the client for ``exc``,
+    logging unexpected exceptions."""
+    rpc_id = rpc.id
+    debug = log.isEnabledFor(logging.DEBUG)
     if isinstance(exc, JsonRpcError):
         fault = exc
-        log.debug('json-rpc error rpc_id:%s "%s"',
-                  rpc_id, exc.message)
+        if debug:
+            log.debug('json-rpc error rpc_id:%s "%s"',
+                      rpc_id, exc.message)
     elif isinstance(exc, HTTPNotFound):
         fault = JsonRpcMethodNotFound()
-        log.debug('json-rpc method not found rpc_id:%s "%s"',
-                  rpc_id, request.rpc_method)
+        if debug:
+            log.debug('json-rpc method not found rpc_id:%s "%s"',
+                      rpc_id, rpc.method)
     elif isinstance(exc, HTTPForbidden):
         fault = JsonRpcRequestInvalid()
-        log.debug('json-rpc method forbidden rpc_id:%s "%s"',
-                  rpc_id, request.rpc_method)
+        if debug:
+            log.debug('json-rpc method forbidden rpc_id:%s "%s"',
+                      rpc_id, rpc.method)
     elif isinstance(exc, ViewMapperArgsInvalid):
         fault = JsonRpcParamsInvalid()
-        log.debug('json-rpc invalid method params')
+        if debug:
+            log.debug('json-rpc invalid method params')
     else:
         fault = JsonRpcInternalError()
-        log.exception('json-rpc exception rpc_id:%s "%s"', rpc_id, exc)
+        limiter = getattr(rpc.endpoint, 'exception_log_limiter', None)
+        if limiter is None or limiter.allow(rpc.method, exc):
+            if log.isEnabledFor(logging.ERROR):
+                log.exception('json-rpc exception rpc_id:%s "%s"',
+                              rpc_id, exc)
+        if limiter is not None:
+            log_suppressed(limiter)
+    return fault
+
 
-    return make_error_response(request, fault, rpc_id)
+def exception_view(exc, request):
+    rpc = getattr(request, 'rpc', None)
+    if rpc is None:
+        rpc = RpcCall()
+    return make_error_response(request, _make_fault(exc, rpc), rpc.id)
 
 
 def make_response(request, result):
-    rpc_id = getattr(request, 'rpc_id', None)
+    rpc = request.rpc
+    rpc_id = rpc.id
     response = request.response
 
+    if isinstance(result, Cursor):
+        result = open_cursor(request, result)
+
     # store content_type before render is called
     ct = response.content_type
 
@@ -129,10 +248,21 @@ def make_response(request, result):
         'jsonrpc': '2.0',
         'id': rpc_id,
         'result': result,
-    } if request.rpc_id is not None else ''
-    response.body = render(
-        request.rpc_renderer, out, request=request
-    ).encode(response.charset)
+    } if rpc_id is not None else ''
+    codec = rpc.codec
+    if codec is not None:
+        response.body = codec.dumps(out)
+        if ct == response.default_content_type:
+            response.content_type = codec.content_type
+        return response
+
+    encoder = request.registry.jsonrpc_encoders.get(rpc.renderer)
+    if encoder is not None:
+        response.body = encoder.encode(out)
+    else:
+        response.body = render(
+            rpc.renderer, out, request=request
+        ).encode(response.charset)
 
     if ct == response.default_content_type:
         response.content_type = 'application/json'
@@ -140,52 +270,585 @@ def make_response(request, result):
     return response
 
 
-def _render(value, system):
-    return json.dumps(value)
+_SIGNED_FORMATS = frozenset('bhilqn')
+_UNSIGNED_FORMATS = frozenset('BHILQN')
+_FLOAT_FORMATS = frozenset('efd')
+_BYTEORDERS = {
+    '<': '<',
+    '>': '>',
+    '!': '>',
+    '=': '<' if sys.byteorder == 'little' else '>',
+    '@': '<' if sys.byteorder == 'little' else '>',
+}
+
+
+def _buffer_view(obj, unpack=True):
+    """ Return a ``memoryview`` of ``obj`` if it exposes numeric data via
+    the buffer protocol, otherwise ``None``.
+
+    As ``memoryview.tolist()`` only unpacks native formats, buffers with an
+    explicit byte order, such as ``ctypes`` arrays, are only returned when
+    ``unpack`` is false and they are not scalars.
 
+    """
+    if not PY3:  # pragma: no cover
+        # the memoryviews of python 2 cannot be cast, arrays are left to
+        # ``default`` like any other object
+        return None
+    if isinstance(obj, (binary_type, bytearray)):
+        # raw bytes are not numeric arrays, leave them to ``default``
+        return None
+    try:
+        view = memoryview(obj)
+    except TypeError:
+        return None
+    fmt = view.format
+    if fmt[:1] in _BYTEORDERS:
+        if fmt[0] != '@' and (unpack or view.ndim == 0):
+            return None
+        fmt = fmt[1:]
+    if (
+        fmt not in _SIGNED_FORMATS and
+        fmt not in _UNSIGNED_FORMATS and
+        fmt not in _FLOAT_FORMATS and
+        fmt != '?'
+    ):
+        return None
+    return view
+
+
+def _buffer_dtype(view):
+    """ Return the NumPy-style type string (e.g. ``<f8``) of a view."""
+    fmt = view.format
+    order = _BYTEORDERS['@']
+    if fmt[0] in _BYTEORDERS:
+        order = _BYTEORDERS[fmt[0]]
+        fmt = fmt[1:]
+    if fmt in _SIGNED_FORMATS:
+        kind = 'i'
+    elif fmt in _UNSIGNED_FORMATS:
+        kind = 'u'
+    elif fmt in _FLOAT_FORMATS:
+        kind = 'f'
+    else:
+        kind = 'b'
+    if view.itemsize == 1:
+        order = '|'
+    return '%s%s%d' % (order, kind, view.itemsize)
 
-def jsonrpc_renderer(info):
-    return _render
+
+# the number of items of a buffer converted to python objects at a time
+_BUFFER_CHUNK_SIZE = 4096
+
+
+def _encode_buffer_list(view, encoder):
+    """ Encode a buffer as the text of a JSON array.
+
+    One dimensional buffers are encoded in chunks, so that only a chunk of
+    the items exists as python objects at a time.
+
+    """
+    if view.ndim != 1:
+        return encoder.encode(view.tolist())
+    encode = encoder.encode
+    chunks = [
+        encode(view[start:start + _BUFFER_CHUNK_SIZE].tolist())[1:-1]
+        for start in range(0, len(view), _BUFFER_CHUNK_SIZE)
+    ]
+    return '[' + encoder.item_separator.join(chunks) + ']'
+
+
+def _encode_buffer_base64(view, encoder):
+    """ Encode a buffer as a compact ``dtype``/``shape``/``base64`` object."""
+    if not view.c_contiguous:
+        view = memoryview(view.tobytes()).cast('B')
+    return encoder.encode({
+        'dtype': _buffer_dtype(view),
+        'shape': list(view.shape),
+        'base64': base64.b64encode(view).decode('ascii'),
+    })
+
+
+class JSONRPCRenderer(object):
+    """ The default JSON-RPC renderer.
+
+    Values are serialized using :func:`json.dumps`, any extra keyword
+    arguments are passed through to it.
+
+    On Python 3, objects exposing numeric data through the buffer
+    protocol, such as ``array.array``, ``memoryview`` and NumPy arrays, are
+    encoded in bulk without first being converted into Python lists. They
+    honor the ``allow_nan`` and ``separators`` arguments but are never
+    indented. Arrays with an explicit byte order, such as ``ctypes`` arrays,
+    are left to ``default`` unless encoded with ``buffers='base64'``.
+
+    ``buffers``
+
+        Controls how such objects are encoded. The default, ``'list'``,
+        encodes them as plain JSON arrays. ``'base64'`` instead encodes
+        each array as an object with ``dtype``, ``shape`` and ``base64``
+        keys which is considerably smaller for clients that support it.
+
+    """
+    def __init__(self, buffers='list', **kw):
+        if buffers == 'list':
+            self.encode_buffer = _encode_buffer_list
+        elif buffers == 'base64':
+            self.encode_buffer = _encode_buffer_base64
+        else:
+            raise ValueError('unknown buffers option "%s"' % buffers)
+        self.buffers = buffers
+        self.default = kw.pop('default', None)
+        self.kw = kw
+        separators = kw.get('separators')
+        if separators is None:
+            # the defaults of json.dumps
+            if kw.get('indent') is None:
+                separators = (', ', ': ')
+            else:
+                separators = (',', ': ')
+        self.buffer_encoder = json.JSONEncoder(
+            allow_nan=kw.get('allow_nan', True), separators=separators,
+            sort_keys=True)
+        self.error_templates = {}
+        for error_class in STATIC_ERRORS:
+            self.error_templates[error_class] = self._make_error_template(
+                error_class())
+
+    def _make_template(self, key, value):
+        """ Pre-encode a response with ``value`` as its ``key`` member into
+        a ``(prefix, suffix, null_body)`` tuple of bytes, the prefix and
+        suffix surrounding the encoded ``id``."""
+        marker = '\0pyramid_rpc:id:%s\0' % uuid.uuid4().hex
+        body = self.encode({
+            'jsonrpc': '2.0',
+            'id': marker,
+            key: value,
+        })
+        prefix, suffix = body.split(json.dumps(marker).encode('utf-8'))
+        return prefix, suffix, prefix + b'null' + suffix
+
+    def _make_error_template(self, error):
+        return self._make_template('error', error.as_dict())
+
+    def make_result_template(self, result):
+        """ Pre-encode the response for a constant ``result`` into a
+        ``(prefix, suffix, null_body)`` tuple of bytes. The body of a
+        response is ``prefix + encode(id) + suffix``."""
+        return self._make_template('result', result)
+
+    def dumps(self, value):
+        """ Serialize ``value`` to a JSON string."""
+        # a unique token followed by the encoded buffers, each replacing a
+        # placeholder string holding its index
+        fragments = []
+
+        def default(obj):
+            view = _buffer_view(obj, self.buffers == 'list')
+            if view is None:
+                if self.default is not None:
+                    return self.default(obj)
+                raise TypeError(
+                    'Object of type %s is not JSON serializable' %
+                    obj.__class__.__name__)
+            if view.ndim == 0:
+                return view.tolist()
+            if not fragments:
+                fragments.append(uuid.uuid4().hex)
+            placeholder = '\0pyramid_rpc:%s:%d\0' % (
+                fragments[0], len(fragments))
+            fragments.append(self.encode_buffer(view, self.buffer_encoder))
+            return placeholder
+
+        text = json.dumps(value, default=default, **self.kw)
+        if fragments:
+            # control characters are always escaped by the json module
+            pattern = re.compile(
+                r'"\\u0000pyramid_rpc:%s:(\d+)\\u0000"' % fragments[0])
+            text = pattern.sub(
+                lambda match: fragments[int(match.group(1))], text)
+        return text
+
+    def encode(self, value):
+        """ Serialize ``value`` to UTF-8 encoded JSON bytes."""
+        return self.dumps(value).encode('utf-8')
+
+    def encode_error(self, error, id=None):
+        """ Serialize a JSON-RPC error response to UTF-8 encoded JSON bytes.
+
+        The standard errors raised by pyramid_rpc itself are served from
+        templates prepared up front, only the ``id`` is encoded per call.
+
+        """
+        template = self.error_templates.get(error.__class__)
+        if template is None or error.__dict__:
+            return self.encode({
+                'jsonrpc': '2.0',
+                'id': id,
+                'error': error.as_dict(),
+            })
+        if id is None:
+            return template[2]
+        return template[0] + self.encode(id) + template[1]
+
+    def __call__(self, info):
+        def _render(value, system):
+            return self.dumps(value)
+        return _render
+
+
+jsonrpc_renderer = JSONRPCRenderer()
+
+
+def register_encoder(config, renderer):
+    """ Resolve the renderer named ``renderer`` when the configuration is
+    committed.
+
+    If it is a :class:`JSONRPCRenderer` it is used directly to encode
+    responses, bypassing :func:`pyramid.renderers.render` and
+    therefore also the ``BeforeRender`` event. Any other renderer is
+    invoked through :func:`pyramid.renderers.render` as usual.
+
+    """
+    registry = config.registry
+
+    def register():
+        factory = registry.queryUtility(IRendererFactory, name=renderer)
+        if isinstance(factory, JSONRPCRenderer):
+            registry.jsonrpc_encoders[renderer] = factory
+        else:
+            registry.jsonrpc_encoders.pop(renderer, None)
+
+    config.action(None, register)
+
+
+def _version_etag(version):
+    """ Return the ETag for a version supplied by an ``http_etag``
+    callable."""
+    if not isinstance(version, binary_type):
+        version = text_type(version).encode('utf-8')
+    return hashlib.sha1(version).hexdigest()
 
 
 class jsonrpc_view(object):
     """ Decorator that wraps a view and converts the result into a valid
     JSON-RPC Response object.
 
+    ``http_cache`` and ``http_etag`` control the caching of calls made via
+    HTTP GET and ``async_job`` runs the view as a background job, see
+    :func:`~pyramid_rpc.jsonrpc.add_jsonrpc_method`.
+
     """
-    def __init__(self, renderer=DEFAULT_RENDERER):
+    def __init__(self, renderer=DEFAULT_RENDERER, http_cache=None,
+                 http_etag=None, async_job=False):
         self.renderer = renderer
+        self.async_job = async_job
+        self.http_etag = http_etag
+        self.cache_seconds = None
+        self.cache_options = {}
+        if isinstance(http_cache, (tuple, list)):
+            self.cache_seconds, self.cache_options = http_cache
+        else:
+            self.cache_seconds = http_cache
 
     def __call__(self, wrapped):
-        def wrapper(context, request):
-            request.rpc_renderer = self.renderer
+        def call(context, request):
             result = wrapped(context, request)
             if not request.is_response(result):
                 result = make_response(request, result)
             return result
-        return wrapper
+
+        if self.async_job:
+            def call(context, request):
+                return submit_job(wrapped, context, request)
+
+        if self.cache_seconds is None and self.http_etag is None:
+            def wrapper(context, request):
+                rpc = request.rpc
+                rpc.renderer = self.renderer
+                if rpc.idempotency_key is not None:
+                    return idempotent_call(call, context, request)
+                return call(context, request)
+            return wrapper
+
+        def cached_wrapper(context, request):
+            rpc = request.rpc
+            rpc.renderer = self.renderer
+            if request.method != 'GET' or rpc.batched is not None:
+                if rpc.idempotency_key is not None:
+                    return idempotent_call(call, context, request)
+                return call(context, request)
+
+            etag = None
+            if self.http_etag is not None:
+                etag = _version_etag(self.http_etag(request))
+                if etag in request.if_none_match:
+                    # the client's copy is current, skip the call entirely
+                    response = request.response
+                    response.status_int = 304
+                    response.etag = etag
+                    self.cache_headers(response)
+                    return response
+
+            result = wrapped(context, request)
+            if request.is_response(result):
+                return result
+            response = make_response(request, result)
+            if etag is None:
+                etag = hashlib.sha1(response.body).hexdigest()
+            response.etag = etag
+            response.conditional_response = True
+            self.cache_headers(response)
+            return response
+        return cached_wrapper
+
+    def cache_headers(self, response):
+        """ Set the ``Cache-Control`` and ``Expires`` headers of a cached
+        response."""
+        if self.cache_seconds is None:
+            return
+        if getattr(response.cache_control, 'prevent_auto', False):
+            return
+        response.cache_expires(self.cache_seconds, **self.cache_options)
+
+
+def _key_default(obj):
+    # values decoded by the binary codecs which json cannot encode
+    if isinstance(obj, binary_type):
+        return ['bytes', base64.b64encode(obj).decode('ascii')]
+    return [type(obj).__name__, repr(obj)]
+
+
+def _dump_key(value):
+    try:
+        return json.dumps(value, sort_keys=True, default=_key_default)
+    except (TypeError, ValueError):
+        # mappings with keys of several types cannot be sorted
+        return repr(value)
+
+
+def idempotency_key(request):
+    """ Return the key storing the response of the call of ``request`` in
+    the endpoint's :class:`~pyramid_rpc.util.IdempotencyCache`.
+
+    The key includes the idempotency key, the authenticated user, the
+    method, the id and a digest of the params of the call, so that a key
+    reused by another user or with other params does not replay a response
+    which was not meant for the call.
+
+    """
+    rpc = request.rpc
+    digest = hashlib.sha256(
+        _dump_key(rpc.args).encode('utf-8')).hexdigest()
+    return _dump_key([rpc.idempotency_key, request.authenticated_userid,
+                      rpc.method, rpc.id, digest])
+
+
+def idempotent_call(call, context, request):
+    """ Invoke ``call`` at most once per idempotency key.
+
+    The response of the first call with a key is stored in the endpoint's
+    :class:`~pyramid_rpc.util.IdempotencyCache` and replayed for retries,
+    which wait for the first call to finish if it is still in progress.
+    Calls raising an exception are not stored.
+
+    """
+    rpc = request.rpc
+    cache = rpc.endpoint.idempotency_cache
+    key = idempotency_key(request)
+    try:
+        found, stored = cache.acquire(key)
+    except IdempotencyTimeout:
+        log.debug('id:%s idempotency key %s still in progress',
+                  rpc.id, rpc.idempotency_key)
+        raise JsonRpcRequestInProgress
+    response = request.response
+    if found:
+        log.debug('id:%s replaying idempotency key %s',
+                  rpc.id, rpc.idempotency_key)
+        response.status, response.content_type, response.charset, \
+            response.body = stored
+        response.headers['Idempotent-Replayed'] = 'true'
+        return response
+    try:
+        response = call(context, request)
+    except Exception:
+        cache.abandon(key)
+        raise
+    cache.complete(key, (response.status, response.content_type,
+                         response.charset, response.body))
+    return response
+
+
+def submit_job(view, context, request):
+    """ Run ``view`` as a job of the endpoint's
+    :class:`~pyramid_rpc.jobs.JobRunner` and respond with the id of the job.
+
+    The view runs on another thread as soon as the runner has a free
+    worker, possibly before the response to the original request is sent.
+    It is called with a new request made from the environ of the original
+    one, see :func:`pyramid_rpc.util.clone_request`, so that it does not
+    share resources which are closed when the original request finishes.
+    Resources managed by tweens, such as the transaction of
+    ``pyramid_tm``, are not set up for the job.
+
+    """
+    rpc = request.rpc
+    job_request = clone_request(request, copy.copy(rpc))
+    registry = request.registry
+
+    def run():
+        manager.push({'registry': registry, 'request': job_request})
+        try:
+            result = view(job_request.context, job_request)
+        except Exception as exc:
+            raise _make_fault(exc, job_request.rpc)
+        finally:
+            manager.pop()
+        return job_request.rpc.renderer, result
+
+    try:
+        job = rpc.endpoint.job_runner.submit(rpc.method, run)
+    except JobQueueFull:
+        log.debug('id:%s too many jobs for method "%s"', rpc.id, rpc.method)
+        raise JsonRpcJobQueueFull
+    log.debug('id:%s started job %s', rpc.id, job.id)
+    return make_response(request, job.id)
+
+
+def _find_job(request, job_id):
+    runner = request.rpc.endpoint.job_runner
+    job = None
+    if isinstance(job_id, string_types):
+        job = runner.get(job_id)
+    if job is None:
+        raise JsonRpcJobNotFound
+    return job
+
+
+def job_status_view(request, job_id):
+    """ Return the status of a job, one of ``pending``, ``running``,
+    ``done`` or ``failed``, along with its method and the times it was
+    created and finished."""
+    return _find_job(request, job_id).describe()
+
+
+def job_result_view(request, job_id):
+    """ Return the result of a finished job, or the error it failed
+    with."""
+    job = _find_job(request, job_id)
+    if job.status == jobs.FAILED:
+        # raising the stored error would extend its traceback on every poll
+        error = job.error
+        raise JsonRpcError(error.code, error.message, error.data)
+    if job.status != jobs.DONE:
+        raise JsonRpcJobPending
+    renderer, result = job.result
+    # render the result as the method would have
+    request.rpc.renderer = renderer
+    return result
+
+
+def register_job_methods(config, endpoint):
+    """ Add the methods collecting the outcome of jobs to ``endpoint``."""
+    add_jsonrpc_method(config, job_status_view, endpoint=endpoint.name,
+                       method=JOB_STATUS_METHOD, mapper=MapplyViewMapper)
+    add_jsonrpc_method(config, job_result_view, endpoint=endpoint.name,
+                       method=JOB_RESULT_METHOD, mapper=MapplyViewMapper)
+
+
+def open_cursor(request, cursor):
+    """ Store ``cursor`` in the endpoint's
+    :class:`~pyramid_rpc.cursors.CursorTable` and return the result
+    carrying its first page."""
+    rpc = request.rpc
+    table = rpc.endpoint.cursor_table
+    if table is None:
+        raise ValueError(
+            'method "%s" returned a cursor but endpoint "%s" has no '
+            'cursor_table' % (rpc.method, rpc.endpoint.name))
+    items, token = table.open(cursor, rpc.renderer)
+    if token is not None:
+        log.debug('id:%s opened cursor %s', rpc.id, token)
+    return {'items': items, 'cursor': token}
+
+
+def cursor_next_view(request, cursor, size=None):
+    """ Return the next page of items of a cursor, along with the cursor
+    to fetch the following page, which is ``null`` after the last page."""
+    if size is not None and (
+        not isinstance(size, integer_types) or isinstance(size, bool) or
+        size < 1
+    ):
+        raise JsonRpcParamsInvalid
+    table = request.rpc.endpoint.cursor_table
+    try:
+        if not isinstance(cursor, string_types):
+            raise CursorNotFound(cursor)
+        items, token, renderer = table.fetch(cursor, size)
+    except CursorNotFound:
+        raise JsonRpcCursorNotFound
+    # render the items as the method would have
+    request.rpc.renderer = renderer
+    return {'items': items, 'cursor': token}
+
+
+def cursor_close_view(request, cursor):
+    """ Discard a cursor before its last page, returning ``false`` if it
+    was unknown."""
+    if not isinstance(cursor, string_types):
+        return False
+    return request.rpc.endpoint.cursor_table.close(cursor)
+
+
+def register_cursor_methods(config, endpoint):
+    """ Add the methods fetching the pages of cursors to ``endpoint``."""
+    add_jsonrpc_method(config, cursor_next_view, endpoint=endpoint.name,
+                       method=CURSOR_NEXT_METHOD, mapper=MapplyViewMapper)
+    add_jsonrpc_method(config, cursor_close_view, endpoint=endpoint.name,
+                       method=CURSOR_CLOSE_METHOD, mapper=MapplyViewMapper)
 
 
 def parse_request_GET(request):
     """ Parse JSON-RPC parameters from the request query string."""
-    args = request.GET.get('params')
+    rpc = request.rpc
+    GET = request.GET
+    args = GET.get('params')
     if args is not None:
         try:
-            request.rpc_args = json.loads(args)
+            rpc.args = json.loads(args)
         except ValueError:
             raise JsonRpcParseError
     else:
-        request.rpc_args = ()
+        rpc.args = ()
 
-    request.rpc_method = request.GET.get('method')
-    request.rpc_id = request.GET.get('id')
-    request.rpc_version = request.GET.get('jsonrpc')
+    rpc.method = GET.get('method')
+    rpc.id = GET.get('id')
+    rpc.version = GET.get('jsonrpc')
 
 
 def parse_request_POST(request):
     """ Parse JSON-RPC parameters from the request body."""
+    rpc = request.rpc
+    endpoint = rpc.endpoint
+    decompressor = endpoint.decompressor
+    codec = endpoint.codecs.get(request.content_type)
     try:
-        body = request.json_body
+        if decompressor is not None and 'Content-Encoding' in request.headers:
+            data = decompressor.body_file(request).read()
+        elif codec is not None:
+            data = request.body
+        else:
+            data = None
+        if codec is not None:
+            body = codec.loads(data)
+        elif data is not None:
+            body = json.loads(data.decode(request.charset))
+        else:
+            body = request.json_body
+    except DecompressionLimitError as ex:
+        log.debug('request body exceeds decompression limits: %s', ex)
+        raise JsonRpcRequestInvalid
     except ValueError:
         raise JsonRpcParseError
 
@@ -195,16 +858,32 @@ def parse_request_POST(request):
         batched = None
 
     if batched is not None:
-        request.batched_rpc_requests = batched
+        rpc.batched = batched
     else:
-        request.rpc_id = body.get('id')
-        request.rpc_args = body.get('params', ())
-        request.rpc_method = body.get('method')
-        request.rpc_version = body.get('jsonrpc')
+        rpc.id = body.get('id')
+        rpc.args = body.get('params', ())
+        rpc.method = body.get('method')
+        rpc.version = body.get('jsonrpc')
+        cache = rpc.endpoint.idempotency_cache
+        if cache is not None:
+            key = None
+            if cache.field is not None:
+                key = body.get(cache.field)
+            if key is None and cache.header is not None:
+                key = request.headers.get(cache.header)
+            rpc.idempotency_key = key
 
 
 def setup_request(endpoint, request):
     """ Parse a JSON-RPC request body."""
+    codecs = endpoint.codecs
+    if codecs:
+        rpc = request.rpc
+        rpc.codec = codecs.get(request.content_type)
+        accept = request.headers.get('Accept')
+        if accept:
+            rpc.codec = negotiate_codec(accept, codecs, rpc.codec)
+
     if request.method == 'GET':
         parse_request_GET(request)
     elif request.method == 'POST':
@@ -213,25 +892,33 @@ def setup_request(endpoint, request):
         log.debug('unsupported request method "%s"', request.method)
         raise JsonRpcRequestInvalid
 
-    if hasattr(request, 'batched_rpc_requests'):
+    rpc = request.rpc
+    if rpc.batched is not None:
         log.debug('handling batched rpc request')
         # the checks below will look at the subrequests
         return
 
-    if request.rpc_version != '2.0':
-        log.debug('id:%s invalid rpc version %s',
-                  request.rpc_id, request.rpc_version)
+    if request.method == 'GET' and not request.GET:
+        # a plain GET of the endpoint is answered with its description,
+        # told apart from rpc.discover calls by the missing version
+        log.debug('handling discovery request')
+        rpc.method = DISCOVER_METHOD
+        return
+
+    if rpc.version != '2.0':
+        log.debug('id:%s invalid rpc version %s', rpc.id, rpc.version)
         raise JsonRpcRequestInvalid
 
-    if request.rpc_method is None:
-        log.debug('id:%s invalid rpc method', request.rpc_id)
+    if rpc.method is None:
+        log.debug('id:%s invalid rpc method', rpc.id)
         raise JsonRpcRequestInvalid
 
-    log.debug('handling id:%s method:%s',
-              request.rpc_id, request.rpc_method)
+    log.debug('handling id:%s method:%s', rpc.id, rpc.method)
 
 
 class EndpointPredicate(object):
+    __slots__ = ('val',)
+
     def __init__(self, val, config):
         self.val = val
 
@@ -246,12 +933,17 @@ class EndpointPredicate(object):
             key = info['route'].name
             endpoint = request.registry.jsonrpc_endpoints[key]
 
+            # attach the call state along with the endpoint information
+            attach_call(request, RpcCall(endpoint))
+            if endpoint.compressor is not None:
+                request.add_response_callback(endpoint.compressor)
+            if endpoint.exception_log_limiter is not None:
+                # flush the summary even once the exceptions stopped
+                log_suppressed(endpoint.exception_log_limiter)
+
             # potentially setup either rpc v1 or v2 from the parsed body
             setup_request(endpoint, request)
 
-            # update request with endpoint information
-            request.rpc_endpoint = endpoint
-
             # Always return True so that even if it isn't a valid RPC it
             # will fall through to the notfound_view which will still
             # return a valid JSON-RPC response.
@@ -259,6 +951,8 @@ class EndpointPredicate(object):
 
 
 class MethodPredicate(object):
+    __slots__ = ('method',)
+
     def __init__(self, val, config):
         self.method = val
 
@@ -268,10 +962,13 @@ class MethodPredicate(object):
     phash = text
 
     def __call__(self, context, request):
-        return getattr(request, 'rpc_method', None) == self.method
+        rpc = getattr(request, 'rpc', None)
+        return rpc is not None and rpc.method == self.method
 
 
 class BatchedRequestPredicate(object):
+    __slots__ = ('val',)
+
     def __init__(self, val, config):
         self.val = val
 
@@ -282,26 +979,45 @@ class BatchedRequestPredicate(object):
 
     def __call__(self, context, request):
         if self.val:
-            return hasattr(request, 'batched_rpc_requests')
+            rpc = getattr(request, 'rpc', None)
+            return rpc is not None and rpc.batched is not None
 
 
 def batched_request_view(request):
     json_response = []
     response = request.response
-    for rpc_request in request.batched_rpc_requests:
-        body = json.dumps(rpc_request).encode(request.charset)
+    rpc = request.rpc
+    codec = rpc.endpoint.codecs.get(request.content_type)
+    for rpc_request in rpc.batched:
+        if codec is not None:
+            body = codec.dumps(rpc_request)
+        else:
+            body = json.dumps(rpc_request).encode(request.charset)
         subrequest_headers = copy.copy(request.headers)
         subrequest_headers.pop('Content-Length', None)
-        subrequest = Request.blank(path=request.path,
-                                   environ=request.environ,
-                                   base_url=request.application_url,
-                                   headers=subrequest_headers,
-                                   POST=body,
-                                   charset=request.charset)
+        # the subrequest has the class of the configured request factory
+        subrequest = request.__class__.blank(
+            path=request.path,
+            environ=request.environ,
+            base_url=request.application_url,
+            headers=subrequest_headers,
+            POST=body,
+            charset=request.charset)
+        # the batch response is compressed as a whole and the body of the
+        # subrequest is not
+        subrequest.environ.pop('HTTP_ACCEPT_ENCODING', None)
+        subrequest.environ.pop('HTTP_CONTENT_ENCODING', None)
         subresponse = request.invoke_subrequest(subrequest, use_tweens=True)
-        if subresponse.json_body != '':
-            json_response.append(subresponse.json_body)
-    if json_response:
+        if rpc.codec is not None:
+            result = rpc.codec.loads(subresponse.body)
+        else:
+            result = subresponse.json_body
+        if result != '':
+            json_response.append(result)
+    if json_response and rpc.codec is not None:
+        response.body = rpc.codec.dumps(json_response)
+        response.content_type = rpc.codec.content_type
+    elif json_response:
         # use charset and content-type from last subresponse
         response.charset = subresponse.charset
         response.content_type = subresponse.content_type
@@ -315,11 +1031,168 @@ def batched_request_view(request):
     return response
 
 
+def describe_method(method, view, attr=None, mapper=None):
+    """ Describe a method as an OpenRPC method object.
+
+    The parameters are found by inspecting the signature of the view when
+    it uses a :class:`~pyramid_rpc.mapper.MapplyViewMapper`.
+
+    """
+    ob = view
+    if attr is not None:
+        ob = getattr(view, attr, view)
+    elif inspect.isclass(view):
+        ob = getattr(view, '__call__', None)
+    info = {
+        'name': method,
+        'params': [],
+        'result': {'name': 'result', 'schema': {}},
+    }
+    doc = inspect.getdoc(ob)
+    if doc:
+        info['description'] = doc
+    if (
+        inspect.isclass(mapper) and issubclass(mapper, MapplyViewMapper)
+    ):
+        try:
+            names, defaults = _inspect_ob(ob)
+        except AttributeError:
+            return info
+        # the first argument is the request, or self for class views
+        names = names[1:]
+        nrequired = len(names) - len(defaults or ())
+        info['params'] = [
+            {'name': name, 'required': i < nrequired, 'schema': {}}
+            for i, name in enumerate(names)
+        ]
+    return info
+
+
+def register_method(config, endpoint, method, info, permission=None):
+    """ Add ``method`` to the description of ``endpoint`` when the
+    configuration is committed, listed for the callers granted
+    ``permission`` or the default permission when it is ``None``."""
+    def register():
+        endpoint.method_info[method] = info
+        # a method may have several views, each with its permission
+        endpoint.method_permissions.setdefault(method, []).append(permission)
+        # rebuilt with the new method when next requested
+        endpoint.discovery = None
+
+    config.action(None, register)
+
+
+def build_discovery(registry, endpoint, hidden=()):
+    """ Build the OpenRPC document describing ``endpoint``, leaving out the
+    ``hidden`` methods.
+
+    Returns a ``(document, body, etag, template)`` tuple, where ``body`` is
+    the encoded document and ``template`` the pre-encoded ``rpc.discover``
+    response when the default renderer is a :class:`JSONRPCRenderer`.
+
+    """
+    info = {'title': endpoint.name, 'version': '0'}
+    if endpoint.openrpc_info:
+        info.update(endpoint.openrpc_info)
+    document = {
+        'openrpc': OPENRPC_VERSION,
+        'info': info,
+        'methods': [
+            endpoint.method_info[name]
+            for name in sorted(endpoint.method_info)
+            if name != DISCOVER_METHOD and name not in hidden
+        ],
+    }
+    encoder = registry.jsonrpc_encoders.get(endpoint.default_renderer)
+    if encoder is not None:
+        body = encoder.encode(document)
+        template = encoder.make_result_template(document)
+    else:
+        body = json.dumps(document, sort_keys=True).encode('utf-8')
+        template = None
+    etag = hashlib.sha1(body).hexdigest()
+    return document, body, etag, template
+
+
+def discover_view(request):
+    """ Return the OpenRPC document describing the methods of the
+    endpoint which the caller is permitted to call."""
+    rpc = request.rpc
+    endpoint = rpc.endpoint
+    forbidden = forbidden_methods(request, endpoint)
+    if forbidden:
+        # tailored to the caller, not kept
+        discovery = build_discovery(request.registry, endpoint, forbidden)
+    else:
+        discovery = endpoint.discovery
+        if discovery is None:
+            discovery = build_discovery(request.registry, endpoint)
+            endpoint.discovery = discovery
+    document, body, etag, template = discovery
+
+    response = request.response
+    if rpc.version is None:
+        # a plain GET, conditional on the ETag
+        response.body = body
+        response.content_type = 'application/json'
+        response.charset = 'utf-8'
+        response.etag = etag
+        response.conditional_response = True
+        return response
+
+    if template is None or rpc.id is None or rpc.codec is not None:
+        return document
+    response.body = template[0] + json.dumps(rpc.id).encode('utf-8') + \
+        template[1]
+    response.content_type = 'application/json'
+    response.charset = 'utf-8'
+    return response
+
+
 class Endpoint(object):
-    def __init__(self, name, default_mapper, default_renderer):
+    __slots__ = (
+        'name',
+        'default_mapper',
+        'default_renderer',
+        'exception_log_limiter',
+        'idempotency_cache',
+        'compressor',
+        'decompressor',
+        'codecs',
+        'job_runner',
+        'cursor_table',
+        'openrpc_info',
+        'method_info',
+        'method_permissions',
+        'discovery',
+    )
+
+    def __init__(self, name, default_mapper, default_renderer,
+                 exception_log_limiter=None, openrpc_info=None,
+                 idempotency_cache=None, compressor=None,
+                 decompressor=None, codecs=(), job_runner=None,
+                 cursor_table=None):
         self.name = name
         self.default_mapper = default_mapper
         self.default_renderer = default_renderer
+        self.exception_log_limiter = exception_log_limiter
+        self.idempotency_cache = idempotency_cache
+        self.compressor = compressor
+        self.decompressor = decompressor
+        # media type -> codec of the accepted binary encodings
+        self.codecs = {}
+        for codec in codecs:
+            for content_type in codec.content_types:
+                self.codecs[content_type] = codec
+        self.job_runner = job_runner
+        self.cursor_table = cursor_table
+        self.openrpc_info = openrpc_info
+        # method name -> OpenRPC method object of every registered method
+        self.method_info = {}
+        # method name -> permissions of its views, None for the default
+        self.method_permissions = {}
+        # the prepared OpenRPC document, see build_discovery
+        self.discovery = None
 
 
 def add_jsonrpc_endpoint(config, name, *args, **kw):
@@ -341,20 +1214,100 @@ def add_jsonrpc_endpoint(config, name, *args, **kw):
         string name of the renderer, registered via
         :meth:`pyramid.config.Configurator.add_renderer`.
 
+    ``exception_log_limiter``
+
+        An optional :class:`pyramid_rpc.util.ExceptionLogLimiter` used to
+        sample and rate limit the logging of unexpected exceptions raised
+        by the endpoint's methods.
+
+    ``idempotency_cache``
+
+        An optional :class:`pyramid_rpc.util.IdempotencyCache`. Calls made
+        via POST carrying an idempotency key, in the cache's ``header`` or
+        as the ``field`` member of the request object, are run at most once
+        per key, method and id. Retries receive the stored response
+        without running the method and duplicates arriving while the
+        original is in progress wait for it to finish.
+
+    ``compressor``
+
+        An optional :class:`pyramid_rpc.compression.ResponseCompressor`
+        used to compress the endpoint's responses with ``gzip`` or
+        ``deflate`` when the client accepts it.
+
+    ``decompressor``
+
+        An optional :class:`pyramid_rpc.compression.RequestDecompressor`
+        used to decode request bodies compressed with ``gzip`` or
+        ``deflate``. Bodies exceeding its limits are rejected with a
+        :class:`~pyramid_rpc.jsonrpc.JsonRpcRequestInvalid` error.
+
+    ``codecs``
+
+        An optional sequence of binary codecs, such as
+        :class:`pyramid_rpc.codec.MsgpackCodec` and
+        :class:`pyramid_rpc.codec.CborCodec`, accepted in addition to JSON.
+        Requests are decoded according to their ``Content-Type`` and
+        responses encoded according to the ``Accept`` header, defaulting to
+        the encoding of the request. Responses encoded by a codec bypass the
+        renderers of the methods and the ``default_renderer``.
+
+    ``job_runner``
+
+        An optional :class:`pyramid_rpc.jobs.JobRunner` running the methods
+        added with ``async_job=True``. A runner with the default limits is
+        created for the endpoint when such a method is added without one.
+
+    ``cursor_table``
+
+        An optional :class:`pyramid_rpc.cursors.CursorTable` allowing the
+        endpoint's methods to return a :class:`pyramid_rpc.cursors.Cursor`.
+        The result is sent a page at a time, fetched by the client with the
+        ``rpc.cursor.next`` method, and the cursor may be discarded early
+        with the ``rpc.cursor.close`` method.
+
+    ``openrpc_info``
+
+        An optional dict merged into the ``info`` object of the OpenRPC
+        document describing the endpoint, such as
+        ``{'title': 'My API', 'version': '1.0'}``.
+
+    Every endpoint provides the ``rpc.discover`` method returning an
+    `OpenRPC <https://spec.open-rpc.org/>`_ document describing the methods
+    the caller is permitted to call. The document is also returned by a
+    plain ``GET`` of the endpoint.
+
     A JSON-RPC method also accepts all of the arguments supplied to
     :meth:`pyramid.config.Configurator.add_route`.
 
     """
     default_mapper = kw.pop('default_mapper', MapplyViewMapper)
     default_renderer = kw.pop('default_renderer', DEFAULT_RENDERER)
+    exception_log_limiter = kw.pop('exception_log_limiter', None)
+    idempotency_cache = kw.pop('idempotency_cache', None)
+    compressor = kw.pop('compressor', None)
+    decompressor = kw.pop('decompressor', None)
+    codecs = kw.pop('codecs', ())
+    job_runner = kw.pop('job_runner', None)
+    cursor_table = kw.pop('cursor_table', None)
+    openrpc_info = kw.pop('openrpc_info', None)
 
     endpoint = Endpoint(
         name,
         default_mapper=default_mapper,
         default_renderer=default_renderer,
+        exception_log_limiter=exception_log_limiter,
+        idempotency_cache=idempotency_cache,
+        compressor=compressor,
+        decompressor=decompressor,
+        codecs=codecs,
+        job_runner=job_runner,
+        cursor_table=cursor_table,
+        openrpc_info=openrpc_info,
     )
 
     config.registry.jsonrpc_endpoints[name] = endpoint
+    register_encoder(config, default_renderer)
 
     kw['jsonrpc_endpoint'] = True
     config.add_route(name, *args, **kw)
@@ -366,6 +1319,19 @@ def add_jsonrpc_endpoint(config, name, *args, **kw):
                     permission=NO_PERMISSION_REQUIRED, **kw)
     config.add_view(exception_view, route_name=name, context=Exception,
                     permission=NO_PERMISSION_REQUIRED)
+    add_jsonrpc_method(config, discover_view, endpoint=name,
+                       method=DISCOVER_METHOD, mapper=MapplyViewMapper,
+                       permission=NO_PERMISSION_REQUIRED)
+    if job_runner is not None:
+        register_job_methods(config, endpoint)
+    if cursor_table is not None:
+        register_cursor_methods(config, endpoint)
+
+    def build():
+        endpoint.discovery = build_discovery(config.registry, endpoint)
+
+    # prepare the document once every method is known
+    config.action(None, build, order=PHASE3_CONFIG + 1)
 
 
 def add_jsonrpc_method(config, view, **kw):
@@ -379,11 +1345,41 @@ def add_jsonrpc_method(config, view, **kw):
 
         The name of the method.
 
+    ``http_cache``
+
+        Cache the results of calls made via HTTP GET. The value is the
+        same as the ``http_cache`` argument of
+        :meth:`pyramid.config.Configurator.add_view`, an integer number of
+        seconds, a :class:`datetime.timedelta` or a ``(seconds, options)``
+        tuple, and is used to set the ``Cache-Control`` and ``Expires``
+        headers. The response carries an ``ETag`` computed from its body
+        and an ``If-None-Match`` request matching it is answered with a
+        ``304 Not Modified``. Calls made via POST are never cached.
+
+    ``http_etag``
+
+        An optional callable accepting the request and returning a version
+        of the method's result, such as a modification counter or
+        timestamp, for calls made via HTTP GET. The ``ETag`` is derived
+        from this version instead of the body, allowing a matching
+        ``If-None-Match`` request to be answered with a ``304 Not
+        Modified`` without calling the method at all.
+
+    ``async_job``
+
+        If ``True``, calls return the id of a job right away while the
+        method runs in the background on the endpoint's
+        :class:`~pyramid_rpc.jobs.JobRunner`. Clients collect the outcome
+        with the ``rpc.job.status`` and ``rpc.job.result`` methods, which
+        are added to the endpoint along with the first such method. Calls
+        are refused with a ``JsonRpcJobQueueFull`` error when the runner
+        has too many unfinished jobs. Defaults to ``False``.
+
     A JSON-RPC method also accepts all of the arguments supplied to
     :meth:`pyramid.config.Configurator.add_view`.
 
     A view mapper is registered by default which will match the
-    ``request.rpc_args`` to parameters on the view. To override this
+    ``request.rpc.args`` to parameters on the view. To override this
     behavior simply set the ``mapper`` argument to None or another
     view mapper.
 
@@ -420,10 +1416,33 @@ def add_jsonrpc_method(config, view, **kw):
     if renderer is None:
         renderer = endpoint.default_renderer
     kw['renderer'] = null_renderer
+    register_encoder(config, renderer)
 
     kw['jsonrpc_method'] = method
 
-    rpc_decorator = jsonrpc_view(renderer)
+    http_cache = kw.pop('http_cache', None)
+    http_etag = kw.pop('http_etag', None)
+    settings = config.get_settings() or {}
+    if settings.get('prevent_http_cache', False):
+        http_cache = None
+    if isinstance(http_cache, (tuple, list)) and len(http_cache) != 2:
+        raise ConfigurationError(
+            'If http_cache parameter is a tuple or list, it must be '
+            'in the form (seconds, options); not %s' % (http_cache,))
+    if http_etag is not None:
+        http_etag = config.maybe_dotted(http_etag)
+
+    async_job = kw.pop('async_job', False)
+    if async_job:
+        if http_cache is not None or http_etag is not None:
+            raise ConfigurationError(
+                'The async_job and http_cache or http_etag parameters '
+                'cannot be combined')
+        if endpoint.job_runner is None:
+            endpoint.job_runner = JobRunner()
+            register_job_methods(config, endpoint)
+
+    rpc_decorator = jsonrpc_view(renderer, http_cache, http_etag, async_job)
     decorator = kw.get('decorator', None)
     if decorator is None:
         decorator = rpc_decorator
@@ -437,6 +1456,9 @@ def add_jsonrpc_method(config, view, **kw):
     kw['decorator'] = decorator
 
     config.add_view(view, route_name=endpoint_name, **kw)
+    register_method(config, endpoint, method, describe_method(
+        method, config.maybe_dotted(view), kw.get('attr'), mapper),
+        kw.get('permission'))
 
 
 class jsonrpc_method(object):
@@ -487,23 +1509,34 @@ def includeme(config):
        config = Configurator()
        config.include('pyramid_rpc.jsonrpc')
 
-    Once this function has been invoked, two new directives will be
+    Once this function has been invoked, three new directives will be
     available on the configurator:
 
     - ``add_jsonrpc_endpoint``: Add an endpoint for handling JSON-RPC.
 
     - ``add_jsonrpc_method``: Add a method to a JSON-RPC endpoint.
 
+    - ``add_jsonrpc_gateway``: Add an endpoint forwarding JSON-RPC calls to
+      upstream endpoints.
+
     """
     if not hasattr(config.registry, 'jsonrpc_endpoints'):
         config.registry.jsonrpc_endpoints = {}
+    if not hasattr(config.registry, 'jsonrpc_encoders'):
+        config.registry.jsonrpc_encoders = {}
+    if not hasattr(config.registry, 'jsonrpc_gateways'):
+        config.registry.jsonrpc_gateways = {}
 
     config.add_view_predicate('jsonrpc_method', MethodPredicate)
     config.add_view_predicate('jsonrpc_batched', BatchedRequestPredicate)
     config.add_route_predicate('jsonrpc_endpoint', EndpointPredicate)
 
     config.add_renderer(DEFAULT_RENDERER, jsonrpc_renderer)
+    register_encoder(config, DEFAULT_RENDERER)
     config.add_directive('add_jsonrpc_endpoint', add_jsonrpc_endpoint)
     config.add_directive('add_jsonrpc_method', add_jsonrpc_method)
+    # imported when needed as the gateway depends on this module
+    config.add_directive('add_jsonrpc_gateway',
+                         'pyramid_rpc.jsonrpcgateway.add_jsonrpc_gateway')
     config.add_view(exception_view, context=JsonRpcError,
                     permission=NO_PERMISSION_REQUIRED)
@@ -0,0 +1,380 @@
+"""Forward JSON-RPC calls to upstream services.
+
+A gateway endpoint accepts JSON-RPC requests and batches like any other
+endpoint but has no methods of its own. Each call is routed to the URL of
+an upstream JSON-RPC endpoint by a router, such as a :class:`PrefixRouter`
+or a :class:`HashRouter`, and the calls of a batch bound to the same
+upstream are forwarded together as a single batch.
+
+"""
+import bisect
+import hashlib
+import json
+import logging
+import threading
+
+from pyramid.response import Response
+from pyramid.security import NO_PERMISSION_REQUIRED
+
+from pyramid_rpc.client import JsonRpcClient
+from pyramid_rpc.client import PoolManager
+from pyramid_rpc.compat import string_types
+from pyramid_rpc.jsonrpc import JsonRpcError
+from pyramid_rpc.jsonrpc import JsonRpcInternalError
+from pyramid_rpc.jsonrpc import JsonRpcMethodNotFound
+from pyramid_rpc.jsonrpc import JsonRpcParamsInvalid
+from pyramid_rpc.jsonrpc import JsonRpcParseError
+from pyramid_rpc.jsonrpc import JsonRpcRequestInvalid
+
+
+log = logging.getLogger(__name__)
+
+
+_marker = object()
+
+
+def _resolve(target, call):
+    if callable(target):
+        return target(call)
+    return target
+
+
+class PrefixRouter(object):
+    """ Route calls by the prefix of their method name.
+
+    ``routes``
+
+        A dict mapping method name prefixes, such as ``'users.'``, to the
+        URL of an upstream endpoint or to another router, such as a
+        :class:`HashRouter` spreading the calls over shards. The longest
+        matching prefix wins.
+
+    ``default``
+
+        The URL or router of the calls matching no prefix. Defaults to
+        ``None``, answering them with a
+        :class:`~pyramid_rpc.jsonrpc.JsonRpcMethodNotFound` error.
+
+    """
+    def __init__(self, routes, default=None):
+        self.routes = dict(routes)
+        # longest first, so that the most specific prefix is found first
+        self.prefixes = sorted(self.routes, key=len, reverse=True)
+        self.default = default
+
+    def __call__(self, call):
+        method = call['method']
+        for prefix in self.prefixes:
+            if method.startswith(prefix):
+                return _resolve(self.routes[prefix], call)
+        if self.default is None:
+            raise JsonRpcMethodNotFound
+        return _resolve(self.default, call)
+
+
+class HashRouter(object):
+    """ Route calls by consistent hashing of one of their params, sending
+    the calls with an equal value to the same upstream.
+
+    ``upstreams``
+
+        The URLs of the upstream endpoints.
+
+    ``param``
+
+        The name of the param hashed when params are passed by name.
+
+    ``position``
+
+        The index of the param hashed when params are passed by position.
+        Defaults to ``None``, only accepting named params.
+
+    ``replicas``
+
+        The number of points of each upstream on the hash ring. Adding or
+        removing an upstream only moves the values hashed to its points.
+        Defaults to 100.
+
+    Calls lacking the param are answered with a
+    :class:`~pyramid_rpc.jsonrpc.JsonRpcParamsInvalid` error.
+
+    """
+    def __init__(self, upstreams, param, position=None, replicas=100):
+        if not upstreams:
+            raise ValueError('at least one upstream is required')
+        self.param = param
+        self.position = position
+        ring = []
+        for upstream in upstreams:
+            for replica in range(replicas):
+                ring.append((self.hash('%s-%d' % (upstream, replica)),
+                             upstream))
+        ring.sort()
+        self.points = [point for point, _ in ring]
+        self.upstreams = [upstream for _, upstream in ring]
+
+    def hash(self, key):
+        """ Return the point of ``key`` on the ring."""
+        digest = hashlib.md5(key.encode('utf-8')).hexdigest()
+        return int(digest[:16], 16)
+
+    def key(self, call):
+        """ Return the hashed param of ``call``."""
+        params = call.get('params')
+        value = _marker
+        if isinstance(params, dict):
+            value = params.get(self.param, _marker)
+        elif isinstance(params, list) and self.position is not None:
+            if self.position < len(params):
+                value = params[self.position]
+        if value is _marker:
+            raise JsonRpcParamsInvalid
+        if isinstance(value, string_types):
+            return value
+        return json.dumps(value, sort_keys=True)
+
+    def __call__(self, call):
+        index = bisect.bisect(self.points, self.hash(self.key(call)))
+        return self.upstreams[index % len(self.upstreams)]
+
+
+def _error(exc, id):
+    return {'jsonrpc': '2.0', 'id': id, 'error': exc.as_dict()}
+
+
+class JsonRpcGateway(object):
+    """ The view of a gateway endpoint, see
+    :func:`~pyramid_rpc.jsonrpcgateway.add_jsonrpc_gateway`."""
+    def __init__(self, router, pool=None, workers=10, timeout=None,
+                 forward_headers=('Authorization',),
+                 max_body_size=10 * 1024 * 1024):
+        from concurrent.futures import ThreadPoolExecutor
+        self.router = router
+        if pool is None:
+            pool = PoolManager(timeout=timeout)
+        self.pool = pool
+        self.executor = ThreadPoolExecutor(workers)
+        self.forward_headers = tuple(forward_headers)
+        self.max_body_size = max_body_size
+        # upstream url -> JsonRpcClient
+        self.clients = {}
+        self.lock = threading.Lock()
+
+    def client(self, url):
+        """ Return the client of the upstream at ``url``."""
+        with self.lock:
+            client = self.clients.get(url)
+            if client is None:
+                client = self.clients[url] = JsonRpcClient(
+                    url, pool=self.pool)
+        return client
+
+    def read_body(self, request):
+        """ Return the body of ``request``, or ``None`` if it is larger
+        than ``max_body_size``."""
+        max_size = self.max_body_size
+        if max_size is None:
+            return request.body
+        length = request.content_length
+        if length is not None and length > max_size:
+            return None
+        # the length of chunked bodies is only known once they are read
+        body = request.body_file.read(max_size + 1)
+        if len(body) > max_size:
+            return None
+        return body
+
+    def __call__(self, request):
+        body = self.read_body(request)
+        if body is None:
+            log.debug('json-rpc gateway body exceeds %d bytes',
+                      self.max_body_size)
+            return self.respond(_error(JsonRpcRequestInvalid(), None))
+        try:
+            body = json.loads(body.decode(request.charset or 'utf-8'))
+        except ValueError:
+            log.debug('json-rpc gateway body is not valid json')
+            return self.respond(_error(JsonRpcParseError(), None))
+        if isinstance(body, list):
+            if not body:
+                return self.respond(_error(JsonRpcRequestInvalid(), None))
+            return self.respond(self.forward(request, body))
+        responses = self.forward(request, [body])
+        return self.respond(responses[0] if responses else None)
+
+    def respond(self, out):
+        if not out:
+            # only notifications, there can be no response
+            response = Response(b'', content_type='text/plain')
+        else:
+            response = Response(json.dumps(out).encode('utf-8'),
+                                content_type='application/json',
+                                charset='utf-8')
+        return response
+
+    def forward(self, request, calls):
+        """ Forward ``calls`` to their upstreams and return their responses
+        in the same order, omitting the notifications."""
+        headers = {}
+        for name in self.forward_headers:
+            value = request.headers.get(name)
+            if value is not None:
+                headers[name] = value
+        # the response of each call with an id, in order
+        responses = [None] * len(calls)
+        # upstream url -> list of (index, call) sent there
+        groups = {}
+        for index, call in enumerate(calls):
+            if (
+                not isinstance(call, dict) or
+                not isinstance(call.get('method'), string_types)
+            ):
+                responses[index] = _error(JsonRpcRequestInvalid(), None)
+                continue
+            try:
+                url = self.router(call)
+            except JsonRpcError as exc:
+                if 'id' in call:
+                    responses[index] = _error(exc, call['id'])
+                continue
+            except Exception:
+                log.exception('json-rpc gateway router failed on "%s"',
+                              call['method'])
+                if 'id' in call:
+                    responses[index] = _error(JsonRpcInternalError(),
+                                              call['id'])
+                continue
+            groups.setdefault(url, []).append((index, call))
+
+        groups = list(groups.items())
+        if len(groups) == 1:
+            self.send(groups[0][0], groups[0][1], headers, responses)
+        else:
+            pending = [
+                self.executor.submit(self.send, url, group, headers,
+                                     responses)
+                for url, group in groups
+            ]
+            for future in pending:
+                future.result()
+        return [response for response in responses if response is not None]
+
+    def send(self, url, group, headers, responses):
+        """ Send the calls of ``group`` to the upstream at ``url`` in a
+        single request, storing their responses into ``responses``."""
+        # the index of a call in the incoming batch is its upstream id, as
+        # the ids of the clients may collide
+        upstream_calls = []
+        ids = {}
+        for index, call in group:
+            call = dict(call)
+            if 'id' in call:
+                ids[index] = call['id']
+                call['id'] = index
+            upstream_calls.append(call)
+        try:
+            if len(upstream_calls) == 1:
+                out = self.client(url).send(upstream_calls[0], headers)
+                out = [out] if out is not None else []
+            else:
+                out = self.client(url).send(upstream_calls, headers) or []
+        except Exception as exc:
+            log.warning('json-rpc gateway upstream "%s" failed: %s', url, exc)
+            out = JsonRpcInternalError()
+        if isinstance(out, dict):
+            # the whole batch was rejected
+            error = out.get('error') or {}
+            out = JsonRpcError(error.get('code'), error.get('message'),
+                               error.get('data'))
+        elif not isinstance(out, (list, JsonRpcError)):
+            log.warning('json-rpc gateway upstream "%s" sent an invalid '
+                        'response', url)
+            out = JsonRpcInternalError()
+        if isinstance(out, JsonRpcError):
+            for index, id in ids.items():
+                responses[index] = _error(out, id)
+            return
+        for response in out:
+            index = response.get('id') if isinstance(response, dict) else None
+            if index in ids:
+                response = dict(response, id=ids.pop(index))
+                responses[index] = response
+        for index, id in ids.items():
+            responses[index] = _error(JsonRpcInternalError(), id)
+
+    def close(self):
+        """ Stop the threads forwarding the calls and close the idle
+        connections to the upstreams."""
+        self.executor.shutdown(wait=True)
+        self.pool.close()
+
+
+def add_jsonrpc_gateway(config, name, *args, **kw):
+    """Add an endpoint forwarding JSON-RPC calls to upstream endpoints.
+
+    ``name``
+
+        The name of the endpoint.
+
+    ``router``
+
+        A callable accepting a request object and returning the URL of the
+        upstream endpoint to forward it to, such as a :class:`PrefixRouter`
+        or a :class:`HashRouter`. It may raise a
+        :class:`~pyramid_rpc.jsonrpc.JsonRpcError` to answer the call with
+        an error. Any other exception is logged and the call is answered
+        with a :class:`~pyramid_rpc.jsonrpc.JsonRpcInternalError`.
+
+    ``pool``
+
+        An optional :class:`pyramid_rpc.client.PoolManager` keeping the
+        connections to the upstreams alive.
+
+    ``workers``
+
+        The number of threads forwarding the parts of a batch bound to
+        different upstreams concurrently. Defaults to 10.
+
+    ``timeout``
+
+        The timeout in seconds of the socket operations of a forwarded
+        request, when no ``pool`` is given.
+
+    ``forward_headers``
+
+        The names of the request headers copied to the forwarded requests.
+        Defaults to ``('Authorization',)``.
+
+    ``max_body_size``
+
+        The maximum size in bytes of a request body, larger requests are
+        answered with a :class:`~pyramid_rpc.jsonrpc.JsonRpcRequestInvalid`
+        error without being decoded. ``None`` accepts any size. Defaults to
+        10 MiB.
+
+    ``permission``
+
+        The permission required to call the gateway. Defaults to none, as
+        the upstreams authorize the calls themselves.
+
+    The gateway accepts all of the other arguments supplied to
+    :meth:`pyramid.config.Configurator.add_route`.
+
+    """
+    router = kw.pop('router')
+    pool = kw.pop('pool', None)
+    workers = kw.pop('workers', 10)
+    timeout = kw.pop('timeout', None)
+    forward_headers = kw.pop('forward_headers', ('Authorization',))
+    max_body_size = kw.pop('max_body_size', 10 * 1024 * 1024)
+    permission = kw.pop('permission', NO_PERMISSION_REQUIRED)
+
+    gateway = JsonRpcGateway(router, pool=pool, workers=workers,
+                             timeout=timeout,
+                             forward_headers=forward_headers,
+                             max_body_size=max_body_size)
+    config.registry.jsonrpc_gateways[name] = gateway
+
+    config.add_route(name, *args, **kw)
+    config.add_view(gateway, route_name=name, request_method='POST',
+                    permission=permission)
@@ -65,7 +65,11 @@ class MapplyViewMapper(object):
         attr = self.attr
         if inspect.isclass(view):
             def _class_view(context, request):
-                params = getattr(request, 'rpc_args', ())
+                rpc = getattr(request, 'rpc', None)
+                if rpc is not None:
+                    params = rpc.args
+                else:
+                    params = getattr(request, 'rpc_args', ())
                 keywords = dict(request.params.items())
                 if request.matchdict:
                     keywords.update(request.matchdict)
@@ -86,7 +90,11 @@ class MapplyViewMapper(object):
             mapped_view = _class_view
         else:
             def _nonclass_view(context, request):
-                params = getattr(request, 'rpc_args', ())
+                rpc = getattr(request, 'rpc', None)
+                if rpc is not None:
+                    params = rpc.args
+                else:
+                    params = getattr(request, 'rpc_args', ())
                 keywords = dict(request.params.items())
                 if request.matchdict:
                     keywords.update(request.matchdict)
@@ -0,0 +1,260 @@
+"""Serve JSON-RPC endpoints over raw TCP or Unix domain sockets.
+
+Meant for sidecars and callers on the same host, each connection carries a
+stream of JSON-RPC messages, framed either by newlines or by a length
+prefix, without any HTTP parsing or WSGI overhead. Messages are dispatched
+by a :class:`~pyramid_rpc.connection.JsonRpcConnection` to the views of the
+endpoint.
+
+"""
+import json
+import logging
+import os
+import socket
+import struct
+
+from pyramid.request import Request
+
+from .compat import socketserver
+from .connection import JsonRpcConnection
+from .connection import find_endpoint
+
+log = logging.getLogger(__name__)
+
+FRAMINGS = ('newline', 'length')
+
+_LENGTH = struct.Struct('!I')
+
+
+class FramingError(ValueError):
+    """ Raised when a peer sends a message which cannot be framed."""
+
+
+def read_message(rfile, framing, max_size):
+    """ Read the next message from ``rfile``, returning ``None`` at the end
+    of the stream.
+
+    With ``newline`` framing each message is terminated by a ``\\n`` and
+    empty lines are skipped. With ``length`` framing each message is
+    preceded by its size as a 4 byte big-endian unsigned integer.
+
+    """
+    if framing == 'newline':
+        while True:
+            line = rfile.readline(max_size + 1)
+            if not line:
+                return None
+            if not line.endswith(b'\n'):
+                if len(line) > max_size:
+                    raise FramingError('message exceeds %d bytes' % max_size)
+                raise FramingError('truncated message')
+            line = line.strip()
+            if line:
+                return line
+    header = rfile.read(_LENGTH.size)
+    if not header:
+        return None
+    if len(header) != _LENGTH.size:
+        raise FramingError('truncated length')
+    size, = _LENGTH.unpack(header)
+    if size > max_size:
+        raise FramingError('message exceeds %d bytes' % max_size)
+    data = rfile.read(size)
+    if len(data) != size:
+        raise FramingError('truncated message')
+    return data
+
+
+def frame_message(data, framing):
+    """ Frame the encoded message ``data`` for sending."""
+    if framing == 'newline':
+        if b'\n' in data:
+            # a renderer indenting its output, compact it
+            data = json.dumps(
+                json.loads(data.decode('utf-8')),
+                separators=(',', ':')).encode('utf-8')
+        return data + b'\n'
+    return _LENGTH.pack(len(data)) + data
+
+
+class StreamHandler(socketserver.StreamRequestHandler):
+    """ Serve the messages of a connection until the client closes it.
+
+    Requests are pipelined: messages are read and dispatched as they
+    arrive, without waiting for the responses of earlier calls.
+
+    """
+    def make_environ(self):
+        server = self.server
+        environ = Request.blank(server.path).environ
+        if isinstance(self.client_address, tuple):
+            environ['REMOTE_ADDR'] = self.client_address[0]
+        environ.update(server.environ)
+        return environ
+
+    def handle(self):
+        server = self.server
+        framing = server.framing
+        wfile = self.wfile
+
+        def send(data):
+            wfile.write(frame_message(data, framing))
+            wfile.flush()
+
+        connection = JsonRpcConnection(
+            server.app, self.make_environ(), send, executor=server.executor,
+            max_pending=server.max_pending)
+        try:
+            while True:
+                try:
+                    message = read_message(
+                        self.rfile, framing, server.max_message_size)
+                except FramingError as ex:
+                    log.debug('json-rpc framing error "%s"', ex)
+                    break
+                if message is None:
+                    break
+                connection.handle(message)
+            # the client may have only shut down its side of the connection
+            connection.wait()
+        finally:
+            connection.close()
+
+
+class StreamServerMixin(object):
+    """ The configuration shared by the TCP and Unix socket servers, see
+    :func:`make_socket_server`."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def configure(self, app, path, framing, executor, max_message_size,
+                  environ, max_pending=None):
+        self.app = app
+        self.path = path
+        self.framing = framing
+        self.executor = executor
+        self.max_message_size = max_message_size
+        self.environ = environ or {}
+        self.max_pending = max_pending
+
+    def server_close(self):
+        socketserver.TCPServer.server_close(self)
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+
+    def handle_error(self, request, client_address):
+        log.debug('json-rpc connection error', exc_info=True)
+
+
+class TCPStreamServer(StreamServerMixin, socketserver.ThreadingMixIn,
+                      socketserver.TCPServer):
+    """ Serve JSON-RPC over TCP."""
+
+
+if hasattr(socket, 'AF_UNIX'):
+    class UnixStreamServer(StreamServerMixin, socketserver.ThreadingMixIn,
+                           socketserver.UnixStreamServer):
+        """ Serve JSON-RPC over a Unix domain socket."""
+        # whether the socket file was created by this server
+        bound = False
+
+        def server_bind(self):
+            socketserver.UnixStreamServer.server_bind(self)
+            self.bound = True
+
+        def server_close(self):
+            StreamServerMixin.server_close(self)
+            # never remove the socket of another server on the same path
+            if self.bound and os.path.exists(self.server_address):
+                os.unlink(self.server_address)
+            self.bound = False
+else:  # pragma: no cover
+    UnixStreamServer = None
+
+
+def make_socket_server(app, address, path, framing='newline', workers=10,
+                       max_message_size=1024 * 1024, environ=None,
+                       max_pending=100):
+    """ Create a server for the JSON-RPC endpoint at ``path`` of the Pyramid
+    ``app``, usually the result of
+    :meth:`pyramid.config.Configurator.make_wsgi_app`.
+
+    ``address``
+
+        A ``(host, port)`` tuple to listen on TCP, or the filesystem path
+        of a Unix domain socket.
+
+    ``path``
+
+        The URL path of the endpoint, such as ``'/api/jsonrpc'``, the
+        request paths are matched against the routes of the app just like
+        HTTP requests.
+
+    ``framing``
+
+        ``'newline'`` for messages terminated by a newline, or ``'length'``
+        for messages preceded by their size as a 4 byte big-endian unsigned
+        integer. Responses are framed the same way.
+
+    ``workers``
+
+        The number of threads shared by all connections to run calls
+        concurrently. Clients may send many requests without waiting for
+        their responses, which are sent as they complete and are matched to
+        the requests by ``id``. With ``0`` the calls of a connection are
+        run, and answered, in the order they are received.
+
+    ``max_message_size``
+
+        The maximum size in bytes of a message, larger messages close the
+        connection.
+
+    ``environ``
+
+        Extra WSGI environ keys for the requests of every call, for example
+        ``HTTP_AUTHORIZATION`` credentials or ``REMOTE_USER``.
+
+    ``max_pending``
+
+        The maximum number of calls of a connection waiting for, or running
+        on, the ``workers``. Further messages are not read from the
+        connection until a call completes. Defaults to 100.
+
+    A :class:`LookupError` is raised if there is no JSON-RPC endpoint at
+    ``path``. Start the server with ``serve_forever()``.
+
+    """
+    if framing not in FRAMINGS:
+        raise ValueError('unknown framing "%s"' % framing)
+    find_endpoint(app.registry, path)
+    if isinstance(address, tuple):
+        server_class = TCPStreamServer
+    else:
+        server_class = UnixStreamServer
+        if server_class is None:  # pragma: no cover
+            raise ValueError('Unix domain sockets are not supported')
+    executor = None
+    if workers:
+        from concurrent.futures import ThreadPoolExecutor
+        executor = ThreadPoolExecutor(workers)
+    server = server_class(address, StreamHandler, bind_and_activate=False)
+    server.configure(app, path, framing, executor, max_message_size, environ,
+                     max_pending)
+    try:
+        server.server_bind()
+        server.server_activate()
+    except Exception:
+        server.server_close()
+        raise
+    return server
+
+
+def serve_socket(app, address, path, **kw):
+    """ Serve the JSON-RPC endpoint at ``path`` of the Pyramid ``app`` on
+    ``address`` until interrupted. The arguments are those of
+    :func:`make_socket_server`."""
+    server = make_socket_server(app, address, path, **kw)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
@@ -0,0 +1,137 @@
+import unittest
+
+from pyramid import testing
+
+
+class TestRpcCall(unittest.TestCase):
+
+    def _makeOne(self, *args, **kw):
+        from pyramid_rpc.call import RpcCall
+        return RpcCall(*args, **kw)
+
+    def test_defaults(self):
+        call = self._makeOne()
+        self.assertEqual(call.endpoint, None)
+        self.assertEqual(call.method, None)
+        self.assertEqual(call.args, ())
+        self.assertEqual(call.id, None)
+        self.assertEqual(call.renderer, None)
+        self.assertEqual(call.batched, None)
+
+    def test_slots(self):
+        call = self._makeOne()
+        self.assertRaises(AttributeError, setattr, call, 'foo', 1)
+
+
+class TestCompatProperties(unittest.TestCase):
+
+    def setUp(self):
+        self.config = testing.setUp()
+
+    def tearDown(self):
+        testing.tearDown()
+
+    def _makeRequest(self):
+        from pyramid.request import Request
+        from pyramid_rpc.call import rpc_request_class
+        request = rpc_request_class(Request).blank('/')
+        request.registry = self.config.registry
+        return request
+
+    def test_without_call(self):
+        request = self._makeRequest()
+        self.assertEqual(getattr(request, 'rpc_id', 'missing'), 'missing')
+        self.assertFalse(hasattr(request, 'batched_rpc_requests'))
+
+    def test_with_call(self):
+        from pyramid_rpc.call import RpcCall
+        request = self._makeRequest()
+        request.rpc = RpcCall(method='foo', args=[1], id=5)
+        self.assertEqual(request.rpc_method, 'foo')
+        self.assertEqual(request.rpc_args, [1])
+        self.assertEqual(request.rpc_id, 5)
+        self.assertEqual(getattr(request, 'rpc_renderer', 'default'),
+                         'default')
+        self.assertFalse(hasattr(request, 'batched_rpc_requests'))
+        request.rpc.batched = []
+        self.assertEqual(request.batched_rpc_requests, [])
+
+    def test_set_creates_call(self):
+        request = self._makeRequest()
+        request.rpc_args = (1, 2)
+        self.assertEqual(request.rpc.args, (1, 2))
+        request.rpc_method = 'foo'
+        self.assertEqual(request.rpc.method, 'foo')
+
+    def test_request_class(self):
+        from pyramid.request import Request
+        from pyramid_rpc.call import RpcCall
+        from pyramid_rpc.call import attach_call
+        request = Request.blank('/')
+        other = Request.blank('/')
+        attach_call(request, RpcCall(method='foo'))
+        attach_call(other, RpcCall(method='bar'))
+        # the properties do not require a new class per request
+        self.assertTrue(type(request) is type(other))
+        self.assertTrue(isinstance(request, Request))
+        self.assertEqual(request.rpc_method, 'foo')
+        self.assertFalse(hasattr(Request.blank('/'), 'rpc_method'))
+
+    def test_mixin_factory(self):
+        from pyramid.request import Request
+        from pyramid_rpc.call import RpcCall
+        from pyramid_rpc.call import RpcRequestMixin
+        from pyramid_rpc.call import attach_call
+
+        class MyRequest(RpcRequestMixin, Request):
+            pass
+        request = MyRequest.blank('/')
+        attach_call(request, RpcCall(method='foo'))
+        self.assertTrue(type(request) is MyRequest)
+        self.assertEqual(request.rpc_method, 'foo')
+
+
+class TestRequestFactory(unittest.TestCase):
+
+    def _makeApp(self, config):
+        from webtest import TestApp
+
+        def view(request):
+            return [request.rpc_method, type(request).__name__]
+        config.add_jsonrpc_endpoint('api', '/api')
+        config.add_jsonrpc_method(view, endpoint='api', method='view')
+        return TestApp(config.make_wsgi_app())
+
+    def _call(self, app):
+        resp = app.post_json('/api', {
+            'jsonrpc': '2.0', 'id': 1, 'method': 'view'})
+        return resp.json['result']
+
+    def test_custom_factory(self):
+        from pyramid.config import Configurator
+        from pyramid.request import Request
+
+        class MyRequest(Request):
+            pass
+        config = Configurator(request_factory=MyRequest)
+        config.include('pyramid_rpc.jsonrpc')
+        app = self._makeApp(config)
+        self.assertTrue(app.app.request_factory is MyRequest)
+        self.assertEqual(self._call(app), ['view', 'MyRequest'])
+
+    def test_factory_set_by_included_module(self):
+        from pyramid.config import Configurator
+        from pyramid.request import Request
+
+        class MyRequest(Request):
+            pass
+
+        def includeme(config):
+            config.set_request_factory(MyRequest)
+        config = Configurator()
+        config.include(includeme)
+        config.include('pyramid_rpc.jsonrpc')
+        config.include('pyramid_rpc.xmlrpc')
+        app = self._makeApp(config)
+        self.assertTrue(app.app.request_factory is MyRequest)
+        self.assertEqual(self._call(app), ['view', 'MyRequest'])
@@ -0,0 +1,646 @@
+import errno
+import io
+import json
+import socket
+import threading
+import time
+import unittest
+
+from pyramid import testing
+
+
+class TestJsonRpcClient(unittest.TestCase):
+
+    def setUp(self):
+        self.config = testing.setUp()
+        self.config.include('pyramid_rpc.jsonrpc')
+        self.config.add_jsonrpc_endpoint('rpc', '/api/jsonrpc')
+        self.notified = []
+
+        def add(request, a, b):
+            return a + b
+
+        def echo(request, a):
+            return {'a': a}
+
+        def notify(request, value):
+            self.notified.append(value)
+
+        def fail(request):
+            from pyramid_rpc.jsonrpc import JsonRpcError
+            raise JsonRpcError(code=-31000, message='failed', data=[1])
+        self.config.add_jsonrpc_method(add, endpoint='rpc', method='add')
+        self.config.add_jsonrpc_method(echo, endpoint='rpc', method='echo')
+        self.config.add_jsonrpc_method(notify, endpoint='rpc',
+                                       method='notify')
+        self.config.add_jsonrpc_method(fail, endpoint='rpc', method='fail')
+
+    def tearDown(self):
+        testing.tearDown()
+
+    def _serve(self):
+        from webtest.http import StopableWSGIServer
+        server = StopableWSGIServer.create(self.config.make_wsgi_app())
+        self.addCleanup(server.shutdown)
+        return server
+
+    def _makeOne(self, server=None, **kw):
+        from pyramid_rpc.client import JsonRpcClient
+        if server is None:
+            server = self._serve()
+        client = JsonRpcClient(server.application_url + 'api/jsonrpc', **kw)
+        self.addCleanup(client.close)
+        return client
+
+    def test_call(self):
+        client = self._makeOne()
+        self.assertEqual(client.call('add', 2, 3), 5)
+        self.assertEqual(client.call('echo', a=1), {'a': 1})
+
+    def test_call_mixed_params(self):
+        client = self._makeOne()
+        self.assertRaises(ValueError, client.call, 'add', 2, b=3)
+
+    def test_keep_alive(self):
+        client = self._makeOne()
+        client.call('add', 1, 2)
+        pool, = client.pool.pools.values()
+        conn, = pool.idle
+        client.call('add', 1, 2)
+        self.assertEqual(pool.idle, [conn])
+
+    def test_shared_pool(self):
+        from pyramid_rpc.client import PoolManager
+        pool = PoolManager()
+        server = self._serve()
+        client1 = self._makeOne(server, pool=pool)
+        client2 = self._makeOne(server, pool=pool)
+        client1.call('add', 1, 2)
+        client2.call('add', 1, 2)
+        self.assertEqual(len(pool.pools), 1)
+        client1.close()
+        self.assertEqual(len(list(pool.pools.values())[0].idle), 1)
+
+    def test_notify(self):
+        client = self._makeOne()
+        self.assertEqual(client.notify('notify', 'hello'), None)
+        self.assertEqual(self.notified, ['hello'])
+
+    def test_errors(self):
+        from pyramid_rpc.jsonrpc import JsonRpcError
+        from pyramid_rpc.jsonrpc import JsonRpcMethodNotFound
+        from pyramid_rpc.jsonrpc import JsonRpcParamsInvalid
+        client = self._makeOne()
+        self.assertRaises(JsonRpcMethodNotFound, client.call, 'missing')
+        self.assertRaises(JsonRpcParamsInvalid, client.call, 'add', 1)
+        try:
+            client.call('fail')
+        except JsonRpcError as ex:
+            self.assertEqual(type(ex), JsonRpcError)
+            self.assertEqual(ex.code, -31000)
+            self.assertEqual(ex.message, 'failed')
+            self.assertEqual(ex.data, [1])
+        else: # pragma: no cover
+            raise AssertionError('JsonRpcError not raised')
+
+    def _addUnavailable(self):
+        from pyramid.httpexceptions import HTTPServiceUnavailable
+        self.config.add_route('busy', '/busy')
+        self.config.add_view(lambda request: HTTPServiceUnavailable(),
+                             route_name='busy')
+
+    def test_http_error(self):
+        from pyramid_rpc.client import TransportError
+        from pyramid_rpc.client import JsonRpcClient
+        self._addUnavailable()
+        server = self._serve()
+        client = JsonRpcClient(server.application_url + 'busy')
+        self.addCleanup(client.close)
+        try:
+            client.call('add', 1, 2)
+        except TransportError as ex:
+            self.assertEqual(ex.status, 503)
+        else: # pragma: no cover
+            raise AssertionError('TransportError not raised')
+
+    def test_batch(self):
+        from pyramid_rpc.jsonrpc import JsonRpcMethodNotFound
+        client = self._makeOne()
+        with client.batch() as batch:
+            total = batch.call('add', 1, 2)
+            batch.notify('notify', 'hello')
+            missing = batch.call('missing')
+            named = batch.call('echo', a=1)
+            self.assertFalse(total.done())
+        self.assertEqual(total.result(), 3)
+        self.assertEqual(named.result(), {'a': 1})
+        self.assertRaises(JsonRpcMethodNotFound, missing.result)
+        self.assertEqual(self.notified, ['hello'])
+
+    def test_batch_notifications_only(self):
+        client = self._makeOne()
+        batch = client.batch()
+        batch.notify('notify', 1)
+        batch.notify('notify', 2)
+        batch.send()
+        self.assertEqual(sorted(self.notified), [1, 2])
+
+    def test_batch_not_sent_on_error(self):
+        client = self._makeOne()
+
+        def run():
+            with client.batch() as batch:
+                batch.notify('notify', 'hello')
+                raise ValueError
+        self.assertRaises(ValueError, run)
+        self.assertEqual(self.notified, [])
+
+    def test_batch_transport_error(self):
+        from pyramid_rpc.client import JsonRpcClient
+        from pyramid_rpc.client import TransportError
+        self._addUnavailable()
+        server = self._serve()
+        client = JsonRpcClient(server.application_url + 'busy')
+        self.addCleanup(client.close)
+        batch = client.batch()
+        future = batch.call('add', 1, 2)
+        self.assertRaises(TransportError, batch.send)
+        self.assertRaises(TransportError, future.result)
+
+    def test_hedged(self):
+        calls = []
+        release = threading.Event()
+
+        def slow(request, value):
+            calls.append(value)
+            if len(calls) == 1:
+                # the first copy is stuck until the test is over
+                release.wait(5)
+            return value
+        self.config.add_jsonrpc_method(slow, endpoint='rpc', method='slow')
+        client = self._makeOne(hedge_after=0.05)
+        self.addCleanup(release.set)
+        self.assertEqual(client.call('slow', 'x'), 'x')
+        self.assertEqual(calls, ['x', 'x'])
+
+    def test_hedged_methods(self):
+        calls = []
+
+        def count(request):
+            calls.append(None)
+            return len(calls)
+        self.config.add_jsonrpc_method(count, endpoint='rpc', method='count')
+        client = self._makeOne(hedge_after=0, hedged_methods=['add'])
+        self.assertEqual(client.call('count'), 1)
+        self.assertEqual(client.call('add', 1, 2), 3)
+
+
+class ScriptedServer(object):
+    """ An HTTP server answering each request according to the next entry
+    of ``script``: ``'respond'`` keeps the connection alive, ``'close'``
+    responds then closes it and ``'hang'`` reads the request and never
+    responds."""
+
+    body = b'{"jsonrpc": "2.0", "id": 1, "result": 3}'
+    response = (b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                b'Content-Length: %d\r\n\r\n' % len(body)) + body
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.requests = 0
+        self.sock = socket.socket()
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen(5)
+        self.url = 'http://127.0.0.1:%d/api' % self.sock.getsockname()[1]
+        self.done = threading.Event()
+        self.thread = threading.Thread(target=self.serve)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def serve(self):
+        while self.script:
+            try:
+                conn, _ = self.sock.accept()
+            except socket.error:
+                return
+            rfile = conn.makefile('rb')
+            while self.script:
+                headers = {}
+                line = rfile.readline()
+                if not line:
+                    break
+                while True:
+                    line = rfile.readline().strip()
+                    if not line:
+                        break
+                    name, value = line.split(b':', 1)
+                    headers[name.strip().lower()] = value.strip()
+                rfile.read(int(headers[b'content-length']))
+                self.requests += 1
+                action = self.script.pop(0)
+                if action == 'hang':
+                    self.done.wait(5)
+                    break
+                conn.sendall(self.response)
+                if action == 'close':
+                    break
+            rfile.close()
+            conn.close()
+
+    def close(self):
+        self.done.set()
+        self.sock.close()
+
+
+class TestHTTPConnectionPool(unittest.TestCase):
+
+    def _makeOne(self, script, **kw):
+        from pyramid_rpc.client import JsonRpcClient
+        server = ScriptedServer(script)
+        self.addCleanup(server.close)
+        client = JsonRpcClient(server.url, **kw)
+        self.addCleanup(client.close)
+        return server, client
+
+    def test_retry_closed_connection(self):
+        server, client = self._makeOne(['close', 'respond'])
+        self.assertEqual(client.call('add', 1, 2), 3)
+        # the server closed the idle connection without saying so
+        time.sleep(0.05)
+        self.assertEqual(client.call('add', 1, 2), 3)
+        self.assertEqual(server.requests, 2)
+
+    def test_no_retry_after_timeout(self):
+        server, client = self._makeOne(['respond', 'hang', 'respond'],
+                                       timeout=0.2)
+        self.assertEqual(client.call('add', 1, 2), 3)
+        # the request was received, sending it again could run it twice
+        self.assertRaises(socket.timeout, client.call, 'add', 1, 2)
+        self.assertEqual(server.requests, 2)
+
+    def test_single_retry(self):
+        from pyramid_rpc.client import HTTPConnectionPool
+        attempts = []
+
+        class DummyConnection(object):
+            def request(self, *args):
+                attempts.append(self)
+                raise socket.error(errno.ECONNRESET, 'reset')
+
+            def close(self):
+                pass
+        pool = HTTPConnectionPool('127.0.0.1')
+        pool.connect = DummyConnection
+        pool.idle = [DummyConnection(), DummyConnection()]
+        self.assertRaises(socket.error, pool.request, 'POST', '/')
+        # one reused idle connection then a new one
+        self.assertEqual(len(attempts), 2)
+        self.assertEqual(len(pool.idle), 1)
+
+
+class BatchingTests(object):
+
+    def setUp(self):
+        self.config = testing.setUp()
+        self.config.include('pyramid_rpc.jsonrpc')
+        self.config.add_jsonrpc_endpoint('rpc', '/api/jsonrpc')
+        self.notified = []
+
+        def add(request, a, b):
+            return a + b
+
+        def notify(request, value):
+            self.notified.append(value)
+        self.config.add_jsonrpc_method(add, endpoint='rpc', method='add')
+        self.config.add_jsonrpc_method(notify, endpoint='rpc',
+                                       method='notify')
+
+    def tearDown(self):
+        testing.tearDown()
+
+    def _makeClient(self):
+        from pyramid_rpc.client import JsonRpcClient
+        from webtest.http import StopableWSGIServer
+        app = self.config.make_wsgi_app()
+        self.bodies = []
+
+        def counting_app(environ, start_response):
+            body = environ['wsgi.input'].read(
+                int(environ['CONTENT_LENGTH']))
+            self.bodies.append(json.loads(body.decode('utf-8')))
+            environ['wsgi.input'] = io.BytesIO(body)
+            return app(environ, start_response)
+        server = StopableWSGIServer.create(counting_app)
+        self.addCleanup(server.shutdown)
+        client = JsonRpcClient(server.application_url + 'api/jsonrpc')
+        self.addCleanup(client.close)
+        return client
+
+
+class TestBatchingClient(BatchingTests, unittest.TestCase):
+
+    def _makeOne(self, **kw):
+        from pyramid_rpc.client import BatchingClient
+        batcher = BatchingClient(self._makeClient(), **kw)
+        self.addCleanup(batcher.close)
+        return batcher
+
+    def test_merged(self):
+        batcher = self._makeOne(max_delay=0.1)
+        results = [batcher.call('add', i, 1) for i in range(10)]
+        batcher.notify('notify', 'hello')
+        self.assertEqual([r.result(5) for r in results], list(range(1, 11)))
+        self.assertEqual(len(self.bodies), 1)
+        self.assertEqual(len(self.bodies[0]), 11)
+        batcher.close()
+        self.assertEqual(self.notified, ['hello'])
+
+    def test_threads(self):
+        batcher = self._makeOne(max_delay=0.1)
+        results = {}
+
+        def run(i):
+            results[i] = batcher.call('add', i, i).result(5)
+        threads = [threading.Thread(target=run, args=(i,))
+                   for i in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, dict((i, i * 2) for i in range(20)))
+        self.assertTrue(len(self.bodies) < 20)
+
+    def test_max_size(self):
+        batcher = self._makeOne(max_size=3, max_delay=5)
+        results = [batcher.call('add', i, 1) for i in range(7)]
+        self.assertEqual([r.result(2) for r in results[:6]],
+                         list(range(1, 7)))
+        # the last call waits for more calls until closed
+        self.assertFalse(results[6].done())
+        batcher.close()
+        self.assertEqual(results[6].result(), 7)
+        self.assertEqual(sorted(len(body) for body in self.bodies),
+                         [1, 3, 3])
+
+    def test_errors(self):
+        from pyramid_rpc.jsonrpc import JsonRpcMethodNotFound
+        batcher = self._makeOne(max_delay=0.01)
+        missing = batcher.call('missing')
+        total = batcher.call('add', 1, 2)
+        self.assertRaises(JsonRpcMethodNotFound, missing.result, 5)
+        self.assertEqual(total.result(5), 3)
+
+    def test_closed(self):
+        batcher = self._makeOne()
+        batcher.close()
+        self.assertRaises(RuntimeError, batcher.call, 'add', 1, 2)
+
+
+class TestAsyncBatchingClient(BatchingTests, unittest.TestCase):
+
+    def setUp(self):
+        import asyncio
+        BatchingTests.setUp(self)
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+
+    def _makeOne(self, **kw):
+        from pyramid_rpc.client import AsyncBatchingClient
+        return AsyncBatchingClient(self._makeClient(), loop=self.loop, **kw)
+
+    def test_merged(self):
+        import asyncio
+        batcher = self._makeOne(max_delay=0.05)
+        calls = [batcher.call('add', i, 1) for i in range(10)]
+        batcher.notify('notify', 'hello')
+        results = self.loop.run_until_complete(asyncio.gather(*calls))
+        self.assertEqual(results, list(range(1, 11)))
+        self.assertEqual(len(self.bodies), 1)
+        self.assertEqual(len(self.bodies[0]), 11)
+        self.assertEqual(self.notified, ['hello'])
+
+    def test_max_size(self):
+        import asyncio
+        batcher = self._makeOne(max_size=3, max_delay=5)
+        calls = [batcher.call('add', i, 1) for i in range(7)]
+        self.loop.run_until_complete(asyncio.gather(*calls[:6]))
+        self.assertFalse(calls[6].done())
+        self.loop.run_until_complete(batcher.close())
+        self.assertEqual(calls[6].result(), 7)
+        self.assertEqual(sorted(len(body) for body in self.bodies),
+                         [1, 3, 3])
+
+    def test_errors(self):
+        import asyncio
+        from pyramid_rpc.jsonrpc import JsonRpcMethodNotFound
+        batcher = self._makeOne(max_delay=0.01)
+        missing = batcher.call('missing')
+        total = batcher.call('add', 1, 2)
+        self.loop.run_until_complete(
+            asyncio.wait([missing, total]))
+        self.assertRaises(JsonRpcMethodNotFound, missing.result)
+        self.assertEqual(total.result(), 3)
+        self.assertEqual(len(self.bodies), 1)
+
+
+class TestBatch(unittest.TestCase):
+
+    def _makeOne(self, responses):
+        from pyramid_rpc.client import Batch
+
+        class DummyClient(object):
+            def __init__(self):
+                import itertools
+                self.ids = itertools.count(1)
+                self.sent = []
+
+            def request(self, method, *args):
+                return {'method': method, 'params': list(args),
+                        'id': next(self.ids)}
+
+            def send(self, body):
+                self.sent.append(json.loads(json.dumps(body)))
+                return responses
+        return Batch(DummyClient())
+
+    def test_out_of_order(self):
+        batch = self._makeOne([
+            {'jsonrpc': '2.0', 'id': 2, 'result': 'b'},
+            {'jsonrpc': '2.0', 'id': 1, 'result': 'a'},
+        ])
+        a = batch.call('a')
+        b = batch.call('b')
+        batch.send()
+        self.assertEqual((a.result(), b.result()), ('a', 'b'))
+
+    def test_missing_response(self):
+        from pyramid_rpc.client import TransportError
+        batch = self._makeOne([{'jsonrpc': '2.0', 'id': 1, 'result': 'a'}])
+        a = batch.call('a')
+        b = batch.call('b')
+        batch.send()
+        self.assertEqual(a.result(), 'a')
+        self.assertRaises(TransportError, b.result)
+
+    def test_rejected(self):
+        from pyramid_rpc.jsonrpc import JsonRpcParseError
+        batch = self._makeOne({
+            'jsonrpc': '2.0', 'id': None,
+            'error': {'code': -32700, 'message': 'parse error'},
+        })
+        a = batch.call('a')
+        self.assertRaises(JsonRpcParseError, batch.send)
+        self.assertRaises(JsonRpcParseError, a.result)
+
+    def test_empty(self):
+        batch = self._makeOne([])
+        batch.send()
+        self.assertEqual(batch.client.sent, [])
+
+
+class TestXmlRpcClient(unittest.TestCase):
+
+    def setUp(self):
+        from pyramid_rpc.compression import RequestDecompressor
+        from pyramid_rpc.compression import ResponseCompressor
+        self.config = testing.setUp()
+        self.config.include('pyramid_rpc.xmlrpc')
+        self.config.add_xmlrpc_endpoint(
+            'rpc', '/api/xmlrpc', compressor=ResponseCompressor(min_size=100),
+            decompressor=RequestDecompressor())
+
+        def add(request, a, b):
+            return a + b
+
+        def echo(request, value):
+            return value
+
+        def fail(request):
+            from pyramid_rpc.compat import xmlrpclib
+            raise xmlrpclib.Fault(42, 'failed')
+        self.config.add_xmlrpc_method(add, endpoint='rpc', method='add')
+        self.config.add_xmlrpc_method(echo, endpoint='rpc', method='echo')
+        self.config.add_xmlrpc_method(fail, endpoint='rpc', method='fail')
+
+    def tearDown(self):
+        testing.tearDown()
+
+    def _makeOne(self, **kw):
+        from pyramid_rpc.client import XmlRpcClient
+        from webtest.http import StopableWSGIServer
+        app = self.config.make_wsgi_app()
+        self.requests = []
+
+        def recording_app(environ, start_response):
+            self.requests.append(environ.get('HTTP_CONTENT_ENCODING'))
+            return app(environ, start_response)
+        server = StopableWSGIServer.create(recording_app)
+        self.addCleanup(server.shutdown)
+        client = XmlRpcClient(server.application_url + 'api/xmlrpc', **kw)
+        self.addCleanup(client.close)
+        return client
+
+    def test_call(self):
+        client = self._makeOne()
+        self.assertEqual(client.call('add', 2, 3), 5)
+        self.assertEqual(client.call('echo', {'a': [1, 'b']}),
+                         {'a': [1, 'b']})
+
+    def test_keep_alive(self):
+        client = self._makeOne()
+        client.call('add', 1, 2)
+        pool, = client.pool.pools.values()
+        conn, = pool.idle
+        client.call('add', 1, 2)
+        self.assertEqual(pool.idle, [conn])
+
+    def test_threads(self):
+        client = self._makeOne()
+        results = {}
+
+        def run(i):
+            results[i] = client.call('add', i, i)
+        threads = [threading.Thread(target=run, args=(i,))
+                   for i in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, dict((i, i * 2) for i in range(10)))
+        pool, = client.pool.pools.values()
+        self.assertTrue(1 <= len(pool.idle) <= 10)
+
+    def test_faults(self):
+        from pyramid_rpc.compat import xmlrpclib
+        from pyramid_rpc.xmlrpc import XmlRpcInvalidMethodParams
+        from pyramid_rpc.xmlrpc import XmlRpcMethodNotFound
+        client = self._makeOne()
+        self.assertRaises(XmlRpcMethodNotFound, client.call, 'missing')
+        self.assertRaises(XmlRpcInvalidMethodParams, client.call, 'add', 1)
+        try:
+            client.call('fail')
+        except xmlrpclib.Fault as fault:
+            self.assertEqual(fault.faultCode, 42)
+            self.assertEqual(fault.faultString, 'failed')
+        else: # pragma: no cover
+            raise AssertionError('Fault not raised')
+
+    def test_gzip(self):
+        client = self._makeOne(gzip_threshold=500)
+        self.assertEqual(client.call('echo', 'x'), 'x')
+        value = 'x' * 1000
+        self.assertEqual(client.call('echo', value), value)
+        self.assertEqual(self.requests, [None, 'gzip'])
+
+    def test_gzip_response(self):
+        client = self._makeOne()
+        value = 'x' * 1000
+        response = client.pool.request(
+            'POST', client.url,
+            xmlrpclib_dumps(('x' * 1000,), 'echo'), client.headers)
+        self.assertEqual(response.getheader('Content-Encoding'), 'gzip')
+        self.assertEqual(client.call('echo', value), value)
+
+    def test_no_gzip_response(self):
+        client = self._makeOne(accept_gzip=False)
+        response = client.pool.request(
+            'POST', client.url,
+            xmlrpclib_dumps(('x' * 1000,), 'echo'), client.headers)
+        self.assertEqual(response.getheader('Content-Encoding'), None)
+
+    def test_multicall(self):
+        from pyramid_rpc.xmlrpc import XmlRpcMethodNotFound
+        client = self._makeOne()
+        with client.multicall() as multicall:
+            total = multicall.call('add', 1, 2)
+            missing = multicall.call('missing')
+            value = multicall.call('echo', [1, 2])
+            self.assertFalse(total.done())
+        self.assertEqual(total.result(), 3)
+        self.assertEqual(value.result(), [1, 2])
+        self.assertRaises(XmlRpcMethodNotFound, missing.result)
+        self.assertEqual(len(self.requests), 1)
+
+    def test_multicall_not_sent_on_error(self):
+        client = self._makeOne()
+
+        def run():
+            with client.multicall() as multicall:
+                multicall.call('add', 1, 2)
+                raise ValueError
+        self.assertRaises(ValueError, run)
+        self.assertEqual(self.requests, [])
+
+    def test_multicall_error(self):
+        from pyramid_rpc.client import TransportError
+        client = self._makeOne()
+        client.url += '/missing'
+        multicall = client.multicall()
+        future = multicall.call('add', 1, 2)
+        self.assertRaises(TransportError, multicall.send)
+        self.assertRaises(TransportError, future.result)
+
+
+def xmlrpclib_dumps(params, method):
+    from pyramid_rpc.compat import xmlrpclib
+    return xmlrpclib.dumps(params, method).encode('utf-8')
@@ -0,0 +1,205 @@
+import binascii
+import unittest
+
+
+SAMPLE = {
+    'jsonrpc': '2.0',
+    'id': 5,
+    'result': [
+        None, True, False, 0, 1, -1, -32, -33, 127, 128, 255, 256, 65535,
+        65536, 2 ** 32, 2 ** 63, -128, -129, -2 ** 15 - 1, -2 ** 31 - 1,
+        -2 ** 63, 1.5, u'', u'S\xe9bastien', u'x' * 40, u'y' * 300,
+        u'z' * 70000, b'\x00\xff', b'b' * 300, b'c' * 70000,
+        list(range(20)), list(range(70000)),
+        dict(('k%d' % i, i) for i in range(20)),
+        {'nested': [{'a': [[]]}]},
+    ],
+}
+
+
+class _CodecTests(object):
+
+    def test_round_trip(self):
+        codec = self._makeOne()
+        self.assertEqual(codec.loads(codec.dumps(SAMPLE)), SAMPLE)
+
+    def test_tuple(self):
+        codec = self._makeOne()
+        self.assertEqual(codec.loads(codec.dumps((1, 2))), [1, 2])
+
+    def test_default(self):
+        codec = self._makeOne(default=lambda obj: repr(obj))
+        value = object()
+        self.assertEqual(codec.loads(codec.dumps([value])), [repr(value)])
+        self.assertRaises(TypeError, self._makeOne().dumps, object())
+
+    def test_malformed(self):
+        codec = self._makeOne()
+        data = codec.dumps(SAMPLE)
+        for bad in (b'', data[:-1], data + b'\x00', data[:100]):
+            self.assertRaises(ValueError, codec.loads, bad)
+
+    def test_too_deep(self):
+        codec = self._makeOne()
+        value = []
+        for i in range(200):
+            value = [value]
+        self.assertRaises(ValueError, codec.loads, codec.dumps(value))
+
+    def test_max_depth(self):
+        value = [[[1]]]
+        codec = self._makeOne(max_depth=3)
+        self.assertEqual(codec.loads(codec.dumps(value)), value)
+        codec = self._makeOne(max_depth=2)
+        self.assertRaises(ValueError, codec.loads, codec.dumps(value))
+
+    def test_huge_length(self):
+        codec = self._makeOne()
+        # an array claiming 2**32 - 1 items
+        self.assertRaises(ValueError, codec.loads, self.huge_array)
+
+
+class TestMsgpackCodec(_CodecTests, unittest.TestCase):
+
+    huge_array = b'\xdd\xff\xff\xff\xff'
+
+    def _makeOne(self, **kw):
+        from pyramid_rpc.codec import MsgpackCodec
+        kw.setdefault('pure', True)
+        return MsgpackCodec(**kw)
+
+    def test_known_values(self):
+        codec = self._makeOne()
+        for value, hex in (
+            ({'a': 1}, '81a16101'),
+            ([None, True, False], '93c0c3c2'),
+            (-1, 'ff'),
+            (200, 'ccc8'),
+            (-200, 'd1ff38'),
+            (1.5, 'cb3ff8000000000000'),
+            (b'ab', 'c4026162'),
+        ):
+            data = binascii.unhexlify(hex)
+            self.assertEqual(codec.dumps(value), data)
+            self.assertEqual(codec.loads(data), value)
+
+    def test_float32(self):
+        self.assertEqual(self._makeOne().loads(b'\xca\x3f\xc0\x00\x00'), 1.5)
+
+    def test_unsupported_type(self):
+        self.assertRaises(ValueError, self._makeOne().loads, b'\xc1')
+        # ext types
+        self.assertRaises(ValueError, self._makeOne().loads, b'\xd4\x01\x00')
+
+    def test_overflow(self):
+        codec = self._makeOne()
+        self.assertRaises(OverflowError, codec.dumps, 2 ** 64)
+        self.assertRaises(OverflowError, codec.dumps, -2 ** 63 - 1)
+
+    def test_content_type(self):
+        self.assertEqual(self._makeOne().content_type, 'application/msgpack')
+
+
+class TestCborCodec(_CodecTests, unittest.TestCase):
+
+    huge_array = b'\x9a\xff\xff\xff\xff'
+
+    def _makeOne(self, **kw):
+        from pyramid_rpc.codec import CborCodec
+        kw.setdefault('pure', True)
+        return CborCodec(**kw)
+
+    def test_known_values(self):
+        # examples from RFC 8949 appendix A
+        codec = self._makeOne()
+        for value, hex in (
+            (0, '00'),
+            (23, '17'),
+            (24, '1818'),
+            (1000000, '1a000f4240'),
+            (18446744073709551615, '1bffffffffffffffff'),
+            (18446744073709551616, 'c249010000000000000000'),
+            (-18446744073709551617, 'c349010000000000000000'),
+            (-1000, '3903e7'),
+            (None, 'f6'),
+            (b'\x01\x02\x03\x04', '4401020304'),
+            (u'ü', '62c3bc'),
+            ([1, [2, 3], [4, 5]], '8301820203820405'),
+            ({'a': 1, 'b': [2, 3]}, 'a26161016162820203'),
+        ):
+            data = binascii.unhexlify(hex)
+            self.assertEqual(codec.dumps(value), data)
+            self.assertEqual(codec.loads(data), value)
+
+    def test_decode_only(self):
+        codec = self._makeOne()
+        for hex, value in (
+            ('f93c00', 1.0),
+            ('fa47c35000', 100000.0),
+            ('f7', None),
+            ('5f42010243030405ff', b'\x01\x02\x03\x04\x05'),
+            ('7f657374726561646d696e67ff', u'streaming'),
+            ('9f018202039f0405ffff', [1, [2, 3], [4, 5]]),
+            ('bf61610161629f0203ffff', {'a': 1, 'b': [2, 3]}),
+            ('c074323031332d30332d32315432303a30343a30305a',
+             u'2013-03-21T20:04:00Z'),
+        ):
+            self.assertEqual(codec.loads(binascii.unhexlify(hex)), value)
+
+    def test_invalid(self):
+        codec = self._makeOne()
+        for hex in ('ff', '1c', 'f8', '5f01ff', '9f', 'bf01ff', '81ff',
+                    '3f', 'a1ff01'):
+            self.assertRaises(ValueError, codec.loads, binascii.unhexlify(hex))
+
+    def test_nested_tags(self):
+        codec = self._makeOne()
+        # a date/time tag
+        data = b'\xc0' * 10 + b'\x01'
+        self.assertEqual(codec.loads(data), 1)
+        data = b'\xc0' * 100000 + b'\x01'
+        self.assertRaises(ValueError, codec.loads, data)
+        self.assertRaises(ValueError, self._makeOne(max_depth=9).loads,
+                          b'\xc0' * 10 + b'\x01')
+
+    def test_content_type(self):
+        self.assertEqual(self._makeOne().content_type, 'application/cbor')
+
+
+class TestNegotiateCodec(unittest.TestCase):
+
+    def _callFUT(self, accept, default=None):
+        from pyramid_rpc.codec import CborCodec
+        from pyramid_rpc.codec import MsgpackCodec
+        from pyramid_rpc.codec import negotiate_codec
+        self.msgpack = MsgpackCodec()
+        self.cbor = CborCodec()
+        codecs = {
+            'application/msgpack': self.msgpack,
+            'application/x-msgpack': self.msgpack,
+            'application/cbor': self.cbor,
+        }
+        if default is not None:
+            default = codecs[default]
+        return negotiate_codec(accept, codecs, default)
+
+    def test_it(self):
+        self.assertTrue(self._callFUT('application/cbor') is self.cbor)
+        self.assertTrue(
+            self._callFUT('application/x-msgpack') is self.msgpack)
+        self.assertEqual(self._callFUT('application/json'), None)
+        self.assertTrue(self._callFUT(
+            'application/json;q=0.5, application/msgpack') is self.msgpack)
+
+    def test_ties(self):
+        self.assertEqual(self._callFUT('*/*'), None)
+        self.assertTrue(
+            self._callFUT('*/*', 'application/cbor') is self.cbor)
+        self.assertEqual(self._callFUT(
+            'application/json, application/cbor', 'application/msgpack'),
+            None)
+
+    def test_nothing_acceptable(self):
+        self.assertEqual(self._callFUT('text/html'), None)
+        self.assertTrue(
+            self._callFUT('text/html', 'application/cbor') is self.cbor)
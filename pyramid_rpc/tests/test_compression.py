@@ -0,0 +1,207 @@
+import gzip
+import io
+import unittest
+import zlib
+
+
+class TestNegotiateEncoding(unittest.TestCase):
+
+    def _callFUT(self, header, encodings=('gzip', 'deflate')):
+        from pyramid_rpc.compression import negotiate_encoding
+        return negotiate_encoding(header, encodings)
+
+    def test_it(self):
+        self.assertEqual(self._callFUT('gzip, deflate, br'), 'gzip')
+        self.assertEqual(self._callFUT('deflate'), 'deflate')
+        self.assertEqual(self._callFUT('gzip;q=0.5, deflate'), 'deflate')
+        self.assertEqual(self._callFUT('GZIP;Q=0.5'), 'gzip')
+        self.assertEqual(self._callFUT('*'), 'gzip')
+        self.assertEqual(self._callFUT('*, gzip;q=0'), 'deflate')
+
+    def test_none_acceptable(self):
+        self.assertEqual(self._callFUT('br'), None)
+        self.assertEqual(self._callFUT('identity'), None)
+        self.assertEqual(self._callFUT('gzip;q=0'), None)
+        self.assertEqual(self._callFUT('gzip;q=bad'), None)
+        self.assertEqual(self._callFUT(', ,'), None)
+
+
+class TestResponseCompressor(unittest.TestCase):
+
+    def _makeOne(self, **kw):
+        from pyramid_rpc.compression import ResponseCompressor
+        return ResponseCompressor(**kw)
+
+    def _makeRequest(self, accept_encoding='gzip, deflate'):
+        from pyramid.request import Request
+        request = Request.blank('/')
+        if accept_encoding is not None:
+            request.headers['Accept-Encoding'] = accept_encoding
+        return request
+
+    def _makeResponse(self, body=b'x' * 2000):
+        from pyramid.response import Response
+        return Response(body, content_type='application/json')
+
+    def test_gzip(self):
+        compressor = self._makeOne()
+        response = self._makeResponse()
+        compressor(self._makeRequest(), response)
+        self.assertEqual(response.content_encoding, 'gzip')
+        self.assertEqual(response.vary, ('Accept-Encoding',))
+        self.assertTrue(len(response.body) < 100)
+        self.assertEqual(response.content_length, len(response.body))
+        self.assertEqual(
+            gzip.GzipFile(fileobj=io.BytesIO(response.body)).read(),
+            b'x' * 2000)
+
+    def test_deflate(self):
+        compressor = self._makeOne(level=9)
+        response = self._makeResponse()
+        compressor(self._makeRequest('deflate'), response)
+        self.assertEqual(response.content_encoding, 'deflate')
+        self.assertEqual(zlib.decompress(response.body), b'x' * 2000)
+
+    def test_small_response(self):
+        compressor = self._makeOne(min_size=4096)
+        response = self._makeResponse()
+        compressor(self._makeRequest(), response)
+        self.assertEqual(response.content_encoding, None)
+        self.assertEqual(response.vary, None)
+        self.assertEqual(response.body, b'x' * 2000)
+
+    def test_not_accepted(self):
+        compressor = self._makeOne()
+        for header in (None, 'br'):
+            response = self._makeResponse()
+            compressor(self._makeRequest(header), response)
+            self.assertEqual(response.content_encoding, None)
+            self.assertEqual(response.vary, ('Accept-Encoding',))
+
+    def test_already_encoded(self):
+        compressor = self._makeOne()
+        response = self._makeResponse()
+        response.content_encoding = 'br'
+        compressor(self._makeRequest(), response)
+        self.assertEqual(response.content_encoding, 'br')
+        self.assertEqual(response.body, b'x' * 2000)
+
+    def test_etag_made_weak(self):
+        compressor = self._makeOne()
+        response = self._makeResponse()
+        response.etag = 'abc'
+        compressor(self._makeRequest(), response)
+        self.assertEqual(response.headers['ETag'], 'W/"abc"')
+
+    def test_not_modified_is_not_compressed(self):
+        compressor = self._makeOne()
+        response = self._makeResponse()
+        response.etag = 'abc'
+        response.conditional_response = True
+        request = self._makeRequest()
+        request.headers['If-None-Match'] = 'W/"abc"'
+        compressor(request, response)
+        self.assertEqual(response.content_encoding, None)
+        self.assertEqual(response.headers['ETag'], 'W/"abc"')
+
+    def test_streamed(self):
+        closed = []
+        class AppIter(object):
+            def __iter__(self):
+                return iter([b'a' * 100] * 100)
+            def close(self):
+                closed.append(True)
+        compressor = self._makeOne(min_size=1000000)
+        response = self._makeResponse()
+        response.app_iter = AppIter()
+        compressor(self._makeRequest(), response)
+        self.assertEqual(response.content_encoding, 'gzip')
+        self.assertEqual(response.content_length, None)
+        body = b''.join(response.app_iter)
+        self.assertEqual(closed, [True])
+        self.assertEqual(zlib.decompress(body, 16 + zlib.MAX_WBITS),
+                         b'a' * 10000)
+
+    def test_unknown_encoding(self):
+        self.assertRaises(ValueError, self._makeOne, encodings=('br',))
+
+
+class TestRequestDecompressor(unittest.TestCase):
+
+    def _makeOne(self, **kw):
+        from pyramid_rpc.compression import RequestDecompressor
+        return RequestDecompressor(**kw)
+
+    def _makeRequest(self, body, encoding=None):
+        from pyramid.request import Request
+        request = Request.blank('/', method='POST', body=body)
+        if encoding is not None:
+            request.headers['Content-Encoding'] = encoding
+        return request
+
+    def _gzip(self, data):
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return compressor.compress(data) + compressor.flush()
+
+    def test_identity(self):
+        decompressor = self._makeOne()
+        for encoding in (None, 'identity'):
+            request = self._makeRequest(b'abc', encoding)
+            self.assertEqual(decompressor.body_file(request).read(), b'abc')
+
+    def test_gzip(self):
+        data = bytes(bytearray(range(256))) * 100
+        decompressor = self._makeOne(chunk_size=100)
+        body_file = decompressor.body_file(
+            self._makeRequest(self._gzip(data), 'gzip'))
+        chunks = []
+        while True:
+            chunk = body_file.read(1000)
+            if not chunk:
+                break
+            self.assertTrue(len(chunk) <= 1000)
+            chunks.append(chunk)
+        self.assertEqual(b''.join(chunks), data)
+        self.assertEqual(body_file.read(0), b'')
+
+    def test_deflate(self):
+        decompressor = self._makeOne()
+        body_file = decompressor.body_file(
+            self._makeRequest(zlib.compress(b'abc'), 'Deflate'))
+        self.assertEqual(body_file.read(), b'abc')
+
+    def test_unsupported_encoding(self):
+        from pyramid_rpc.compression import DecompressionError
+        decompressor = self._makeOne()
+        self.assertRaises(DecompressionError, decompressor.body_file,
+                          self._makeRequest(b'abc', 'br'))
+
+    def test_corrupt(self):
+        from pyramid_rpc.compression import DecompressionError
+        decompressor = self._makeOne()
+        for body in (b'not gzip', self._gzip(b'abc' * 100)[:20]):
+            body_file = decompressor.body_file(
+                self._makeRequest(body, 'gzip'))
+            self.assertRaises(DecompressionError, body_file.read)
+
+    def test_max_size(self):
+        from pyramid_rpc.compression import DecompressionLimitError
+        decompressor = self._makeOne(max_size=1000, max_ratio=None)
+        body_file = decompressor.body_file(
+            self._makeRequest(self._gzip(b'a' * 1001), 'gzip'))
+        self.assertRaises(DecompressionLimitError, body_file.read)
+        body_file = decompressor.body_file(
+            self._makeRequest(self._gzip(b'a' * 1000), 'gzip'))
+        self.assertEqual(body_file.read(), b'a' * 1000)
+
+    def test_max_ratio(self):
+        from pyramid_rpc.compression import DecompressionLimitError
+        decompressor = self._makeOne(max_ratio=10, chunk_size=1024)
+        body = self._gzip(b'\0' * 1000000)
+        body_file = decompressor.body_file(self._makeRequest(body, 'gzip'))
+        def read():
+            while body_file.read(4096):
+                pass
+        self.assertRaises(DecompressionLimitError, read)
+        # the whole bomb is never decompressed
+        self.assertTrue(body_file.size < 10 * len(body) + 4096)
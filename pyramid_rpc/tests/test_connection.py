@@ -0,0 +1,288 @@
+import json
+import threading
+import unittest
+
+from pyramid import testing
+
+
+class TestJsonRpcConnection(unittest.TestCase):
+
+    def setUp(self):
+        self.config = testing.setUp()
+        self.config.include('pyramid_rpc.jsonrpc')
+        self.config.add_jsonrpc_endpoint('rpc', '/api/jsonrpc')
+        self.sent = []
+
+    def tearDown(self):
+        testing.tearDown()
+
+    def _makeOne(self, path='/api/jsonrpc', executor=None, max_pending=None,
+                 **environ):
+        from pyramid.request import Request
+        from pyramid_rpc.connection import JsonRpcConnection
+        app = self.config.make_wsgi_app()
+        environ = Request.blank(path, environ=environ).environ
+        return JsonRpcConnection(app, environ, self.sent.append,
+                                 executor=executor, max_pending=max_pending)
+
+    def _call(self, conn, method, params=None, id=1):
+        body = {'jsonrpc': '2.0', 'method': method, 'id': id}
+        if params is not None:
+            body['params'] = params
+        del self.sent[:]
+        conn.handle(json.dumps(body))
+        self.assertEqual(len(self.sent), 1)
+        return json.loads(self.sent[0].decode('utf-8'))
+
+    def test_it(self):
+        def view(request, a, b):
+            return [a, b]
+        self.config.add_jsonrpc_method(view, endpoint='rpc', method='dummy')
+        conn = self._makeOne()
+        result = self._call(conn, 'dummy', [2, 3])
+        self.assertEqual(result, {'jsonrpc': '2.0', 'id': 1, 'result': [2, 3]})
+        result = self._call(conn, 'dummy', {'a': 4, 'b': 5}, id='x')
+        self.assertEqual(result['id'], 'x')
+        self.assertEqual(result['result'], [4, 5])
+
+    def test_bytes_message(self):
+        self.config.add_jsonrpc_method(
+            lambda r: 'ok', endpoint='rpc', method='dummy')
+        conn = self._makeOne()
+        conn.handle(b'{"jsonrpc": "2.0", "method": "dummy", "id": 1}')
+        self.assertEqual(json.loads(self.sent[0].decode('utf-8'))['result'],
+                         'ok')
+
+    def test_request_state(self):
+        calls = []
+
+        def view(request):
+            calls.append(request)
+            return request.headers['X-Token']
+        self.config.add_jsonrpc_method(view, endpoint='rpc', method='dummy')
+        conn = self._makeOne(HTTP_X_TOKEN='secret')
+        result = self._call(conn, 'dummy')
+        self.assertEqual(result['result'], 'secret')
+        self._call(conn, 'dummy', id=2)
+        first, second = calls
+        self.assertTrue(first is not second)
+        self.assertEqual(first.method, 'POST')
+        self.assertEqual(first.matched_route.name, 'rpc')
+        self.assertTrue(first.context is second.context)
+        self.assertTrue(first.rpc.connection is conn)
+        self.assertEqual(second.rpc.id, 2)
+
+    def test_views_resolved_once(self):
+        self.config.add_jsonrpc_method(
+            lambda r: 'ok', endpoint='rpc', method='dummy')
+        conn = self._makeOne()
+        resolved = []
+        orig = conn._resolve_view
+
+        def resolve(context, request):
+            resolved.append(request.rpc.method)
+            return orig(context, request)
+        conn._resolve_view = resolve
+        for id in range(3):
+            self.assertEqual(self._call(conn, 'dummy', id=id)['result'], 'ok')
+        self.assertEqual(resolved, ['dummy'])
+
+    def test_method_not_found(self):
+        conn = self._makeOne()
+        result = self._call(conn, 'missing')
+        self.assertEqual(result['error']['code'], -32601)
+
+    def test_predicate_mismatch(self):
+        self.config.add_jsonrpc_method(
+            lambda r: 'ok', endpoint='rpc', method='dummy',
+            request_param='nope')
+        conn = self._makeOne()
+        result = self._call(conn, 'dummy')
+        self.assertEqual(result['error']['code'], -32601)
+
+    def test_multiple_views(self):
+        self.config.add_jsonrpc_method(
+            lambda r: 'a', endpoint='rpc', method='a')
+        self.config.add_jsonrpc_method(
+            lambda r: 'b', endpoint='rpc', method='b')
+        conn = self._makeOne()
+        self.assertEqual(self._call(conn, 'b')['result'], 'b')
+        self.assertEqual(self._call(conn, 'a')['result'], 'a')
+
+    def test_forbidden(self):
+        self.config.testing_securitypolicy(userid='bob', permissive=False)
+        self.config.add_jsonrpc_method(
+            lambda r: 'ok', endpoint='rpc', method='dummy',
+            permission='admin')
+        conn = self._makeOne()
+        result = self._call(conn, 'dummy')
+        self.assertEqual(result['error']['code'], -32600)
+        result = self._call(conn, 'dummy', id=2)
+        self.assertEqual(result['error']['code'], -32600)
+
+    def test_permitted(self):
+        self.config.testing_securitypolicy(userid='bob', permissive=True)
+        self.config.add_jsonrpc_method(
+            lambda r: 'ok', endpoint='rpc', method='dummy',
+            permission='admin')
+        conn = self._makeOne()
+        self.assertEqual(self._call(conn, 'dummy')['result'], 'ok')
+
+    def test_exception(self):
+        def view(request):
+            raise ValueError
+        self.config.add_jsonrpc_method(view, endpoint='rpc', method='dummy')
+        conn = self._makeOne()
+        result = self._call(conn, 'dummy')
+        self.assertEqual(result['error']['code'], -32603)
+
+    def test_invalid_params(self):
+        self.config.add_jsonrpc_method(
+            lambda r, a: a, endpoint='rpc', method='dummy')
+        conn = self._makeOne()
+        result = self._call(conn, 'dummy', [1, 2])
+        self.assertEqual(result['error']['code'], -32602)
+
+    def test_parse_error(self):
+        conn = self._makeOne()
+        conn.handle('{')
+        result = json.loads(self.sent[0].decode('utf-8'))
+        self.assertEqual(result['error']['code'], -32700)
+        self.assertEqual(result['id'], None)
+
+    def test_invalid_requests(self):
+        conn = self._makeOne()
+        for body in ('[]', '1', '{"method": "dummy", "id": 1}',
+                     '{"jsonrpc": "2.0", "id": 1}'):
+            del self.sent[:]
+            conn.handle(body)
+            result = json.loads(self.sent[0].decode('utf-8'))
+            self.assertEqual(result['error']['code'], -32600)
+
+    def test_notification(self):
+        calls = []
+        self.config.add_jsonrpc_method(
+            lambda r: calls.append(r), endpoint='rpc', method='dummy')
+        conn = self._makeOne()
+        conn.handle('{"jsonrpc": "2.0", "method": "dummy"}')
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(self.sent, [])
+
+    def test_batch(self):
+        self.config.add_jsonrpc_method(
+            lambda r, a: a * 2, endpoint='rpc', method='dummy')
+        conn = self._makeOne()
+        conn.handle(json.dumps([
+            {'jsonrpc': '2.0', 'method': 'dummy', 'params': [1], 'id': 1},
+            {'jsonrpc': '2.0', 'method': 'dummy', 'params': [2]},
+            {'jsonrpc': '2.0', 'method': 'dummy', 'params': [3], 'id': 3},
+        ]))
+        result = json.loads(self.sent[0].decode('utf-8'))
+        self.assertEqual([r['result'] for r in result], [2, 6])
+        self.assertEqual([r['id'] for r in result], [1, 3])
+
+    def test_batch_of_notifications(self):
+        self.config.add_jsonrpc_method(
+            lambda r: None, endpoint='rpc', method='dummy')
+        conn = self._makeOne()
+        conn.handle('[{"jsonrpc": "2.0", "method": "dummy"}]')
+        self.assertEqual(self.sent, [])
+
+    def test_notify(self):
+        def view(request):
+            request.rpc.connection.notify('progress', {'done': 1})
+            return 'ok'
+        self.config.add_jsonrpc_method(view, endpoint='rpc', method='dummy')
+        conn = self._makeOne()
+        conn.handle('{"jsonrpc": "2.0", "method": "dummy", "id": 1}')
+        notification, result = [
+            json.loads(data.decode('utf-8')) for data in self.sent]
+        self.assertEqual(notification, {
+            'jsonrpc': '2.0', 'method': 'progress', 'params': {'done': 1}})
+        self.assertEqual(result['result'], 'ok')
+        conn.notify('bye')
+        self.assertEqual(json.loads(self.sent[-1].decode('utf-8')),
+                         {'jsonrpc': '2.0', 'method': 'bye'})
+
+    def test_close(self):
+        self.config.add_jsonrpc_method(
+            lambda r: 'ok', endpoint='rpc', method='dummy')
+        conn = self._makeOne()
+        conn.close()
+        conn.handle('{"jsonrpc": "2.0", "method": "dummy", "id": 1}')
+        self.assertEqual(self.sent, [])
+
+    def test_concurrent_calls(self):
+        from concurrent.futures import ThreadPoolExecutor
+        gate = threading.Event()
+
+        def slow(request):
+            gate.wait(5)
+            return 'slow'
+
+        def fast(request):
+            gate.set()
+            return 'fast'
+        self.config.add_jsonrpc_method(slow, endpoint='rpc', method='slow')
+        self.config.add_jsonrpc_method(fast, endpoint='rpc', method='fast')
+        executor = ThreadPoolExecutor(2)
+        conn = self._makeOne(executor=executor)
+        conn.handle('{"jsonrpc": "2.0", "method": "slow", "id": 1}')
+        conn.handle('{"jsonrpc": "2.0", "method": "fast", "id": 2}')
+        executor.shutdown(wait=True)
+        results = [json.loads(data.decode('utf-8')) for data in self.sent]
+        # the fast call completes while the slow call is in flight
+        self.assertEqual([r['id'] for r in results], [2, 1])
+        self.assertEqual([r['result'] for r in results], ['fast', 'slow'])
+
+    def test_max_pending(self):
+        from concurrent.futures import ThreadPoolExecutor
+        gate = threading.Event()
+
+        def slow(request):
+            gate.wait(5)
+            return 'slow'
+        self.config.add_jsonrpc_method(slow, endpoint='rpc', method='slow')
+        executor = ThreadPoolExecutor(4)
+        self.addCleanup(executor.shutdown)
+        conn = self._makeOne(executor=executor, max_pending=2)
+        conn.handle('{"jsonrpc": "2.0", "method": "slow", "id": 1}')
+        conn.handle('{"jsonrpc": "2.0", "method": "slow", "id": 2}')
+        handled = threading.Event()
+
+        def handle():
+            conn.handle('{"jsonrpc": "2.0", "method": "slow", "id": 3}')
+            handled.set()
+        thread = threading.Thread(target=handle)
+        thread.start()
+        # the third message waits for a call to complete
+        self.assertFalse(handled.wait(0.2))
+        self.assertEqual(len(conn.pending), 2)
+        gate.set()
+        thread.join(5)
+        self.assertTrue(handled.is_set())
+        conn.wait(5)
+        self.assertEqual(len(self.sent), 3)
+
+    def test_route_pattern(self):
+        def view(request):
+            return request.matchdict['tenant']
+        self.config.add_jsonrpc_endpoint('tenant', '/t/{tenant}/rpc')
+        self.config.add_jsonrpc_method(view, endpoint='tenant',
+                                       method='dummy')
+        conn = self._makeOne('/t/acme/rpc')
+        self.assertEqual(self._call(conn, 'dummy')['result'], 'acme')
+
+    def test_root_factory(self):
+        class Root(object):
+            def __init__(self, request):
+                self.request = request
+        self.config.add_jsonrpc_endpoint('other', '/other', factory=Root)
+        self.config.add_jsonrpc_method(
+            lambda r: type(r.context).__name__, endpoint='other',
+            method='dummy')
+        conn = self._makeOne('/other')
+        self.assertEqual(self._call(conn, 'dummy')['result'], 'Root')
+
+    def test_no_endpoint(self):
+        self.assertRaises(LookupError, self._makeOne, '/missing')
@@ -0,0 +1,134 @@
+import unittest
+
+
+class DummyIterator(object):
+    """ An iterator recording whether it was closed."""
+
+    def __init__(self, count):
+        self.items = iter(range(count))
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self.items)
+
+    next = __next__
+
+    def close(self):
+        self.closed = True
+
+
+class TestCursorTable(unittest.TestCase):
+
+    def _makeOne(self, **kw):
+        from pyramid_rpc.cursors import CursorTable
+        self.now = 0.0
+        kw.setdefault('clock', lambda: self.now)
+        return CursorTable(**kw)
+
+    def _makeCursor(self, iterable, page_size=None):
+        from pyramid_rpc.cursors import Cursor
+        return Cursor(iterable, page_size)
+
+    def test_pages(self):
+        table = self._makeOne(page_size=4)
+        items, token = table.open(self._makeCursor(range(10)), 'info')
+        self.assertEqual(items, [0, 1, 2, 3])
+        items, next_token, info = table.fetch(token)
+        self.assertEqual(items, [4, 5, 6, 7])
+        self.assertEqual(next_token, token)
+        self.assertEqual(info, 'info')
+        items, next_token, info = table.fetch(token)
+        self.assertEqual(items, [8, 9])
+        self.assertEqual(next_token, None)
+        self.assertEqual(list(table.entries), [])
+
+    def test_single_page(self):
+        table = self._makeOne(page_size=4)
+        iterator = DummyIterator(4)
+        self.assertEqual(table.open(self._makeCursor(iterator)),
+                         ([0, 1, 2, 3], None))
+        self.assertTrue(iterator.closed)
+        self.assertEqual(list(table.entries), [])
+
+    def test_last_page_is_full(self):
+        table = self._makeOne(page_size=2)
+        items, token = table.open(self._makeCursor(range(4)))
+        self.assertEqual(table.fetch(token), ([2, 3], None, None))
+
+    def test_page_sizes(self):
+        table = self._makeOne(page_size=2, max_page_size=5)
+        items, token = table.open(self._makeCursor(range(100), page_size=3))
+        self.assertEqual(items, [0, 1, 2])
+        self.assertEqual(table.fetch(token)[0], [3, 4, 5])
+        self.assertEqual(table.fetch(token, 1)[0], [6])
+        self.assertEqual(table.fetch(token, 50)[0], [7, 8, 9, 10, 11])
+
+    def test_lazy(self):
+        consumed = []
+
+        def generate():
+            for i in range(100):
+                consumed.append(i)
+                yield i
+        table = self._makeOne(page_size=10)
+        items, token = table.open(self._makeCursor(generate()))
+        # only the item telling whether there is a next page is read ahead
+        self.assertEqual(len(consumed), 11)
+        table.fetch(token)
+        self.assertEqual(len(consumed), 21)
+
+    def test_unknown(self):
+        from pyramid_rpc.cursors import CursorNotFound
+        table = self._makeOne()
+        self.assertRaises(CursorNotFound, table.fetch, 'missing')
+
+    def test_close(self):
+        table = self._makeOne(page_size=2)
+        iterator = DummyIterator(10)
+        items, token = table.open(self._makeCursor(iterator))
+        self.assertTrue(table.close(token))
+        self.assertTrue(iterator.closed)
+        self.assertFalse(table.close(token))
+
+    def test_ttl(self):
+        from pyramid_rpc.cursors import CursorNotFound
+        table = self._makeOne(page_size=1, ttl=10)
+        iterator = DummyIterator(10)
+        items, token = table.open(self._makeCursor(iterator))
+        self.now = 9.0
+        table.fetch(token)
+        # the ttl restarts with every page
+        self.now = 18.0
+        table.fetch(token)
+        self.now = 28.0
+        self.assertRaises(CursorNotFound, table.fetch, token)
+        self.assertTrue(iterator.closed)
+
+    def test_max_cursors(self):
+        from pyramid_rpc.cursors import CursorNotFound
+        table = self._makeOne(page_size=1, max_cursors=2)
+        iterators = [DummyIterator(10) for _ in range(3)]
+        tokens = [table.open(self._makeCursor(iterators[0]))[1],
+                  table.open(self._makeCursor(iterators[1]))[1]]
+        # the first cursor is now the most recently used
+        table.fetch(tokens[0])
+        tokens.append(table.open(self._makeCursor(iterators[2]))[1])
+        self.assertTrue(iterators[1].closed)
+        self.assertRaises(CursorNotFound, table.fetch, tokens[1])
+        self.assertEqual(table.fetch(tokens[0])[0], [2])
+        self.assertEqual(table.fetch(tokens[2])[0], [1])
+
+    def test_broken_iterator(self):
+        from pyramid_rpc.cursors import CursorNotFound
+
+        def generate():
+            yield 1
+            yield 2
+            raise ValueError
+        table = self._makeOne(page_size=1)
+        items, token = table.open(self._makeCursor(generate()))
+        self.assertRaises(ValueError, table.fetch, token)
+        self.assertRaises(CursorNotFound, table.fetch, token)
@@ -0,0 +1,132 @@
+import threading
+import unittest
+
+
+class DummyExecutor(object):
+    """ Run submitted functions when ``run`` is called."""
+
+    def __init__(self):
+        self.queue = []
+        self.shutdown_called = None
+
+    def submit(self, func, *args):
+        self.queue.append((func, args))
+
+    def run(self):
+        queue, self.queue = self.queue, []
+        for func, args in queue:
+            func(*args)
+
+    def shutdown(self, wait=True):
+        self.shutdown_called = wait
+
+
+class TestJobRunner(unittest.TestCase):
+
+    def _makeOne(self, **kw):
+        from pyramid_rpc.jobs import JobRunner
+        self.now = 0.0
+        self.executor = DummyExecutor()
+        kw.setdefault('executor', self.executor)
+        kw.setdefault('clock', lambda: self.now)
+        return JobRunner(**kw)
+
+    def test_done(self):
+        runner = self._makeOne()
+        job = runner.submit('export', lambda: 'result')
+        self.assertEqual(job.status, 'pending')
+        self.assertTrue(runner.get(job.id) is job)
+        self.now = 5.0
+        self.executor.run()
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(job.result, 'result')
+        self.assertEqual(job.describe(), {
+            'id': job.id,
+            'method': 'export',
+            'status': 'done',
+            'created': 0.0,
+            'finished': 5.0,
+        })
+
+    def test_failed(self):
+        runner = self._makeOne()
+        error = ValueError('boom')
+
+        def fail():
+            raise error
+        job = runner.submit('export', fail)
+        self.executor.run()
+        self.assertEqual(job.status, 'failed')
+        self.assertTrue(job.error is error)
+        self.assertEqual(getattr(error, '__traceback__', None), None)
+
+    def test_running(self):
+        states = []
+        runner = self._makeOne()
+        job = runner.submit('export', lambda: states.append(job.status))
+        self.executor.run()
+        self.assertEqual(states, ['running'])
+
+    def test_unique_ids(self):
+        runner = self._makeOne()
+        ids = set(runner.submit('m', lambda: None).id for _ in range(10))
+        self.assertEqual(len(ids), 10)
+
+    def test_unknown(self):
+        runner = self._makeOne()
+        self.assertEqual(runner.get('missing'), None)
+
+    def test_max_pending(self):
+        from pyramid_rpc.jobs import JobQueueFull
+        runner = self._makeOne(max_pending=2)
+        runner.submit('m', lambda: None)
+        runner.submit('m', lambda: None)
+        self.assertRaises(JobQueueFull, runner.submit, 'm', lambda: None)
+        self.executor.run()
+        runner.submit('m', lambda: None)
+
+    def test_submit_failure(self):
+        runner = self._makeOne()
+
+        def submit(func, *args):
+            raise RuntimeError
+        self.executor.submit = submit
+        self.assertRaises(RuntimeError, runner.submit, 'm', lambda: None)
+        self.assertEqual(runner.jobs, {})
+        self.assertEqual(runner.pending, 0)
+
+    def test_max_results(self):
+        runner = self._makeOne(max_results=2)
+        jobs = [runner.submit('m', lambda: None) for _ in range(3)]
+        self.executor.run()
+        self.assertEqual(runner.get(jobs[0].id), None)
+        self.assertTrue(runner.get(jobs[1].id) is jobs[1])
+        self.assertTrue(runner.get(jobs[2].id) is jobs[2])
+
+    def test_ttl(self):
+        runner = self._makeOne(ttl=10)
+        job = runner.submit('m', lambda: None)
+        pending = runner.submit('m', lambda: None)
+        self.executor.queue.pop()
+        self.executor.run()
+        self.now = 9.0
+        self.assertTrue(runner.get(job.id) is job)
+        self.now = 10.0
+        self.assertEqual(runner.get(job.id), None)
+        # unfinished jobs are never discarded
+        self.assertTrue(runner.get(pending.id) is pending)
+
+    def test_shutdown(self):
+        runner = self._makeOne()
+        runner.shutdown(wait=False)
+        self.assertEqual(self.executor.shutdown_called, False)
+
+    def test_thread_pool(self):
+        from pyramid_rpc.jobs import JobRunner
+        runner = JobRunner(workers=1)
+        self.addCleanup(runner.shutdown)
+        done = threading.Event()
+        job = runner.submit('m', done.set)
+        self.assertTrue(done.wait(5))
+        runner.shutdown(wait=True)
+        self.assertEqual(job.status, 'done')
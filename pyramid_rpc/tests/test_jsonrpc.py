@@ -6,6 +6,16 @@ from pyramid import testing
 from webtest import TestApp
 
 
+class DummyExecutor(object):
+    """ An executor never running the submitted functions."""
+
+    def submit(self, func, *args):
+        pass
+
+    def shutdown(self, wait=True):
+        pass
+
+
 class Test_add_jsonrpc_method(unittest.TestCase):
 
     def setUp(self):
@@ -84,6 +94,24 @@ class TestJSONRPCIntegration(unittest.TestCase):
         result = self._callFUT(app, 'dummy', [2, 3])
         self.assertEqual(result['result'], {'a': 2, 'b': 3})
 
+    def test_it_with_call_state(self):
+        from pyramid_rpc.call import RpcCall
+        def view(request):
+            self.assertTrue(isinstance(request.rpc, RpcCall))
+            self.assertEqual(request.rpc.method, 'dummy')
+            self.assertEqual(request.rpc.endpoint.name, 'rpc')
+            self.assertEqual(request.rpc_args, request.rpc.args)
+            return request.rpc.args
+        config = self.config
+        config.include('pyramid_rpc.jsonrpc')
+        config.add_jsonrpc_endpoint('rpc', '/api/jsonrpc')
+        config.add_jsonrpc_method(view, endpoint='rpc', method='dummy',
+                                  mapper=None)
+        app = config.make_wsgi_app()
+        app = TestApp(app)
+        result = self._callFUT(app, 'dummy', [2, 3])
+        self.assertEqual(result['result'], [2, 3])
+
     def test_it_with_no_mapper(self):
         def view(request):
             return request.rpc_args[0]
@@ -337,6 +365,58 @@ class TestJSONRPCIntegration(unittest.TestCase):
         result = self._callFUT(app, 'dummy', [2, 3])
         self.assertEqual(result['error']['code'], -32603)
 
+    def test_it_with_exception_log_limiter(self):
+        from pyramid_rpc.util import ExceptionLogLimiter
+        def view(request):
+            raise ValueError
+        config = self.config
+        config.include('pyramid_rpc.jsonrpc')
+        limiter = ExceptionLogLimiter(rate=1, summary_interval=0)
+        config.add_jsonrpc_endpoint('rpc', '/api/jsonrpc',
+                                    exception_log_limiter=limiter)
+        config.add_jsonrpc_method(view, endpoint='rpc', method='dummy')
+        app = config.make_wsgi_app()
+        app = TestApp(app)
+        with self.assertLogs('pyramid_rpc.jsonrpc') as logs:
+            for i in range(3):
+                result = self._callFUT(app, 'dummy', [])
+                self.assertEqual(result['error']['code'], -32603)
+        messages = [r.getMessage() for r in logs.records]
+        self.assertEqual(len(messages), 3)
+        self.assertTrue(messages[0].startswith('json-rpc exception'))
+        self.assertEqual(
+            messages[1],
+            'json-rpc suppressed 1 exception logs: dummy:ValueError=1')
+
+    def test_it_with_exception_log_limiter_when_errors_stop(self):
+        from pyramid_rpc.util import ExceptionLogLimiter
+        now = [0.0]
+        def view(request, fail):
+            if fail:
+                raise ValueError
+            return 'ok'
+        config = self.config
+        config.include('pyramid_rpc.jsonrpc')
+        limiter = ExceptionLogLimiter(rate=1, summary_interval=10,
+                                      clock=lambda: now[0])
+        config.add_jsonrpc_endpoint('rpc', '/api/jsonrpc',
+                                    exception_log_limiter=limiter)
+        config.add_jsonrpc_method(view, endpoint='rpc', method='dummy')
+        app = TestApp(config.make_wsgi_app())
+        with self.assertLogs('pyramid_rpc.jsonrpc') as logs:
+            for i in range(3):
+                self._callFUT(app, 'dummy', [True])
+            now[0] += 5
+            self._callFUT(app, 'dummy', [False])
+            self.assertEqual(len(logs.records), 1)
+            now[0] += 5
+            result = self._callFUT(app, 'dummy', [False])
+            self.assertEqual(result['result'], 'ok')
+        messages = [r.getMessage() for r in logs.records]
+        self.assertEqual(
+            messages[1:],
+            ['json-rpc suppressed 2 exception logs: dummy:ValueError=2'])
+
     def test_it_with_rpc_error(self):
         from pyramid_rpc.jsonrpc import JsonRpcError
         def view(request):
@@ -524,6 +604,603 @@ class TestJSONRPCIntegration(unittest.TestCase):
         self.assertEqual(dummy_renderer.called, False)
         self.assertEqual(dummy_renderer2.called, True)
 
+    def test_default_renderer_bypasses_render(self):
+        from pyramid.events import BeforeRender
+        events = []
+        def view(request, fail=False):
+            if fail:
+                raise Exception
+            return 'bar'
+        config = self.config
+        config.include('pyramid_rpc.jsonrpc')
+        config.add_subscriber(events.append, BeforeRender)
+        config.add_jsonrpc_endpoint('rpc', '/api/jsonrpc')
+        config.add_jsonrpc_method(view, endpoint='rpc', method='dummy')
+        app = config.make_wsgi_app()
+        app = TestApp(app)
+        result = self._callFUT(app, 'dummy', [])
+        self.assertEqual(result['result'], 'bar')
+        result = self._callFUT(app, 'dummy', [True])
+        self.assertEqual(result['error']['code'], -32603)
+        self.assertEqual(events, [])
+
+    def test_overridden_default_renderer_uses_render(self):
+        from pyramid_rpc.jsonrpc import DEFAULT_RENDERER
+        def view(request):
+            return 'bar'
+        config = self.config
+        config.include('pyramid_rpc.jsonrpc')
+        dummy_renderer = DummyRenderer('foo')
+        config.add_renderer(DEFAULT_RENDERER, dummy_renderer)
+        config.add_jsonrpc_endpoint('rpc', '/api/jsonrpc')
+        config.add_jsonrpc_method(view, endpoint='rpc', method='dummy')
+        app = config.make_wsgi_app()
+        app = TestApp(app)
+        result = self._callFUT(app, 'dummy', [])
+        self.assertEqual(result['result'], 'foo')
+        self.assertEqual(dummy_renderer.called, True)
+
+    def _makeDiscoveryApp(self, config, **kw):
+        def add(request, a, b=1):
+            """ Add two numbers."""
+            return a + b
+        class Greeter(object):
+            def __init__(self, request):
+                self.request = request
+            def greet(self, name):
+                return 'Hello, ' + name
+        config.include('pyramid_rpc.jsonrpc')
+        config.add_jsonrpc_endpoint('rpc', '/api/jsonrpc', **kw)
+        config.add_jsonrpc_method(add, endpoint='rpc', method='add')
+        config.add_jsonrpc_method(Greeter, endpoint='rpc', method='greet',
+                                  attr='greet')
+        config.add_jsonrpc_method(lambda r: None, endpoint='rpc',
+                                  method='raw', mapper=None)
+        return TestApp(config.make_wsgi_app())
+
+    def test_discover(self):
+        app = self._makeDiscoveryApp(
+            self.config, openrpc_info={'version': '1.0'})
+        result = self._callFUT(app, 'rpc.discover', [])['result']
+        self.assertEqual(result['openrpc'], '1.2.6')
+        self.assertEqual(result['info'], {'title': 'rpc', 'version': '1.0'})
+        methods = dict((m['name'], m) for m in result['methods'])
+        self.assertEqual(sorted(methods), ['add', 'greet', 'raw'])
+        self.assertEqual(methods['add']['description'], 'Add two numbers.')
+        self.assertEqual(methods['add']['params'], [
+            {'name': 'a', 'required': True, 'schema': {}},
+            {'name': 'b', 'required': False, 'schema': {}},
+        ])
+        self.assertEqual(methods['greet']['params'], [
+            {'name': 'name', 'required': True, 'schema': {}},
+        ])
+        self.assertEqual(methods['raw']['params'], [])
+        self.assertEqual(self._callFUT(app, 'rpc.discover', [], id=None), '')
+
+    def test_discover_with_GET(self):
+        app = self._makeDiscoveryApp(self.config)
+        resp = app.get('/api/jsonrpc')
+        self.assertEqual(resp.content_type, 'application/json')
+        self.assertEqual(resp.json['openrpc'], '1.2.6')
+        etag = resp.headers['ETag']
+        self.assertFalse(etag.startswith('W/'))
+        resp = app.get('/api/jsonrpc', headers={'If-None-Match': etag},
+                       status=304)
+        self.assertEqual(resp.body, b'')
+        result = self._callFUT(app, 'rpc.discover', [])['result']
+        self.assertEqual(result, app.get('/api/jsonrpc').json)
+
+    def test_discover_prepared_on_commit(self):
+        from pyramid.config import Configurator
+        config = Configurator()
+        app = self._makeDiscoveryApp(config)
+        endpoint = app.app.registry.jsonrpc_endpoints['rpc']
+        discovery = endpoint.discovery
+        self.assertEqual(len(discovery[0]['methods']), 3)
+        self._callFUT(app, 'rpc.discover', [])
+        self.assertTrue(endpoint.discovery is discovery)
+
+    def test_discover_with_custom_renderer(self):
+        config = self.config
+        config.add_renderer('other', 'pyramid.renderers.json_renderer_factory')
+        app = self._makeDiscoveryApp(config, default_renderer='other')
+        result = self._callFUT(app, 'rpc.discover', [])['result']
+        self.assertEqual(len(result['methods']), 3)
+        self.assertEqual(app.get('/api/jsonrpc').json, result)
+
+    def test_discover_with_permissions(self):
+        from pyramid.security import NO_PERMISSION_REQUIRED
+        config = self.config
+        config.include('pyramid_rpc.jsonrpc')
+        config.set_default_permission('view')
+        config.add_jsonrpc_endpoint('rpc', '/api/jsonrpc')
+        config.add_jsonrpc_method(lambda r: 1, endpoint='rpc',
+                                  method='public',
+                                  permission=NO_PERMISSION_REQUIRED)
+        config.add_jsonrpc_method(lambda r: 2, endpoint='rpc',
+                                  method='viewer')
+        config.add_jsonrpc_method(lambda r: 3, endpoint='rpc',
+                                  method='admin', permission='admin')
+        policy = config.testing_securitypolicy(userid='bob',
+                                               permissive=False)
+        app = TestApp(config.make_wsgi_app())
+        def listed():
+            result = self._callFUT(app, 'rpc.discover', [])['result']
+            self.assertEqual(app.get('/api/jsonrpc').json, result)
+            return [m['name'] for m in result['methods']]
+        self.assertEqual(listed(), ['public'])
+        policy.permissive = True
+        self.assertEqual(listed(), ['admin', 'public', 'viewer'])
+
+    def test_discover_with_method_permitted_by_any_view(self):
+        config = self.config
+        config.include('pyramid_rpc.jsonrpc')
+        config.add_jsonrpc_endpoint('rpc', '/api/jsonrpc')
+        config.add_jsonrpc_method(lambda r: 1, endpoint='rpc',
+                                  method='dummy', permission='admin')
+        config.add_jsonrpc_method(lambda r: 2, endpoint='rpc',
+                                  method='dummy', request_method='GET')
+        config.testing_securitypolicy(userid='bob', permissive=False)
+        app = TestApp(config.make_wsgi_app())
+        result = self._callFUT(app, 'rpc.discover', [])['result']
+        self.assertEqual([m['name'] for m in result['methods']], ['dummy'])
+
+    def _makeIdempotentApp(self, **kw):
+        from pyramid_rpc.jsonrpc import JsonRpcError
+        from pyramid_rpc.util import IdempotencyCache
+        calls = []
+        def create(request, name):
+            calls.append(name)
+            if name == 'bad':
+                raise JsonRpcError(code=1)
+            return len(calls)
+        config = self.config
+        config.include('pyramid_rpc.jsonrpc')
+        config.add_jsonrpc_endpoint('rpc', '/api/jsonrpc',
+                                    idempotency_cache=IdempotencyCache(**kw))
+        config.add_jsonrpc_method(create, endpoint='rpc', method='create')
+        return TestApp(config.make_wsgi_app()), calls
+
+    def test_idempotency_key_header(self):
+        app, calls = self._makeIdempotentApp()
+        body = json.dumps({'jsonrpc': '2.0', 'id': 5, 'method': 'create',
+                           'params': ['a']})
+        headers = {'Idempotency-Key': 'k1'}
+        resp = app.post('/api/jsonrpc', body, headers=headers,
+                        content_type='application/json')
+        self.assertEqual(resp.json['result'], 1)
+        self.assertFalse('Idempotent-Replayed' in resp.headers)
+        retry = app.post('/api/jsonrpc', body, headers=headers,
+                         content_type='application/json')
+        self.assertEqual(retry.body, resp.body)
+        self.assertEqual(retry.content_type, 'application/json')
+        self.assertEqual(retry.headers['Idempotent-Replayed'], 'true')
+        self.assertEqual(calls, ['a'])
+        # other keys, and calls without a key, run again
+        self._callFUT(app, 'create', ['a'])
+        app.post('/api/jsonrpc', body, headers={'Idempotency-Key': 'k2'},
+                 content_type='application/json')
+        self.assertEqual(calls, ['a', 'a', 'a'])
+
+    def test_idempotency_key_field(self):
+        app, calls = self._makeIdempotentApp(header=None)
+        body = [
+            {'jsonrpc': '2.0', 'id': 1, 'method': 'create', 'params': ['a'],
+             'idempotency_key': 'k1'},
+            {'jsonrpc': '2.0', 'id': 2, 'method': 'create', 'params': ['b'],
+             'idempotency_key': 'k2'},
+        ]
+        resp = app.post('/api/jsonrpc', json.dumps(body),
+                        content_type='application/json')
+        self.assertEqual([r['result'] for r in resp.json], [1, 2])
+        resp = app.post('/api/jsonrpc', json.dumps(body),
+                        content_type='application/json')
+        self.assertEqual([r['result'] for r in resp.json], [1, 2])
+        self.assertEqual(calls, ['a', 'b'])
+
+    def test_idempotency_key_errors_are_not_stored(self):
+        app, calls = self._makeIdempotentApp()
+        for i in range(2):
+            resp = app.post('/api/jsonrpc', json.dumps(
+                {'jsonrpc': '2.0', 'id': 5, 'method': 'create',
+                 'params': ['bad']}),
+                headers={'Idempotency-Key': 'k1'},
+                content_type='application/json')
+            self.assertEqual(resp.json['error']['code'], 1)
+        self.assertEqual(calls, ['bad', 'bad'])
+
+    def test_idempotency_key_in_progress(self):
+        app, calls = self._makeIdempotentApp(wait_timeout=0)
+        cache = app.app.registry.jsonrpc_endpoints['rpc'].idempotency_cache
+        cache.acquire(self._idempotencyKey('k1', 'create', 5, ['a']))
+        resp = app.post('/api/jsonrpc', json.dumps(
+            {'jsonrpc': '2.0', 'id': 5, 'method': 'create', 'params': ['a']}),
+            headers={'Idempotency-Key': 'k1'},
+            content_type='application/json')
+        self.assertEqual(resp.json['error']['code'], -32000)
+        self.assertEqual(calls, [])
+
+    def _idempotencyKey(self, key, method, id, params, userid=None):
+        from pyramid_rpc.call import RpcCall
+        from pyramid_rpc.jsonrpc import idempotency_key
+        request = testing.DummyRequest(authenticated_userid=userid)
+        request.rpc = RpcCall(method=method, id=id, args=params)
+        request.rpc.idempotency_key = key
+        return idempotency_key(request)
+
+    def test_idempotency_key_per_user_and_params(self):
+        app, calls = self._makeIdempotentApp()
+        self.config.testing_securitypolicy(userid='alice')
+        for name in ('a', 'b', 'a'):
+            app.post('/api/jsonrpc', json.dumps(
+                {'jsonrpc': '2.0', 'id': 5, 'method': 'create',
+                 'params': [name]}),
+                headers={'Idempotency-Key': 'k1'},
+                content_type='application/json')
+        self.assertEqual(calls, ['a', 'b'])
+        self.config.testing_securitypolicy(userid='bob')
+        app.post('/api/jsonrpc', json.dumps(
+            {'jsonrpc': '2.0', 'id': 5, 'method': 'create',
+             'params': ['a']}),
+            headers={'Idempotency-Key': 'k1'},
+            content_type='application/json')
+        self.assertEqual(calls, ['a', 'b', 'a'])
+
+    def test_idempotency_key_with_binary_values(self):
+        key = self._idempotencyKey(b'k', 'create', b'\xff',
+                                   {1: b'\x00', 'a': 2}, userid='bob')
+        self.assertEqual(
+            key, self._idempotencyKey(b'k', 'create', b'\xff',
+                                      {1: b'\x00', 'a': 2}, userid='bob'))
+        self.assertNotEqual(
+            key, self._idempotencyKey(b'k', 'create', b'\xfe',
+                                      {1: b'\x00', 'a': 2}, userid='bob'))
+        self.assertNotEqual(
+            key, self._idempotencyKey(b'k', 'create', b'\xff',
+                                      {1: b'\x01', 'a': 2}, userid='bob'))
+
+    def _makeJobApp(self, **kw):
+        from pyramid_rpc.jsonrpc import JsonRpcError
+        def export(request, name):
+            if name == 'bad':
+                raise JsonRpcError(code=1, message='bad name')
+            if name == 'crash':
+                raise ValueError
+            return {'name': name, 'rpc': request.rpc.method}
+        config = self.config
+        config.include('pyramid_rpc.jsonrpc')
+        config.add_jsonrpc_endpoint('rpc', '/api/jsonrpc', **kw)
+        config.add_jsonrpc_method(export, endpoint='rpc', method='export',
+                                  async_job=True)
+        app = config.make_wsgi_app()
+        runner = app.registry.jsonrpc_endpoints['rpc'].job_runner
+        self.addCleanup(runner.shutdown)
+        return TestApp(app), runner
+
+    def test_async_job(self):
+        app, runner = self._makeJobApp()
+        job_id = self._callFUT(app, 'export', ['a'])['result']
+        runner.shutdown(wait=True)
+        status = self._callFUT(app, 'rpc.job.status', [job_id])['result']
+        self.assertEqual(status['id'], job_id)
+        self.assertEqual(status['method'], 'export')
+        self.assertEqual(status['status'], 'done')
+        result = self._callFUT(app, 'rpc.job.result', [job_id], id=6)
+        self.assertEqual(result['result'], {'name': 'a', 'rpc': 'export'})
+
+    def test_async_job_pending(self):
+        from pyramid_rpc.jobs import JobRunner
+        app, runner = self._makeJobApp(
+            job_runner=JobRunner(executor=DummyExecutor()))
+        job_id = self._callFUT(app, 'export', ['a'])['result']
+        status = self._callFUT(app, 'rpc.job.status', [job_id])['result']
+        self.assertEqual(status['status'], 'pending')
+        self.assertEqual(status['finished'], None)
+        result = self._callFUT(app, 'rpc.job.result', [job_id])
+        self.assertEqual(result['error']['code'], -32002)
+
+    def test_async_job_errors(self):
+        app, runner = self._makeJobApp()
+        bad = self._callFUT(app, 'export', ['bad'])['result']
+        crash = self._callFUT(app, 'export', ['crash'])['result']
+        runner.shutdown(wait=True)
+        status = self._callFUT(app, 'rpc.job.status', [bad])['result']
+        self.assertEqual(status['status'], 'failed')
+        result = self._callFUT(app, 'rpc.job.result', [bad])
+        self.assertEqual(result['error'], {'code': 1, 'message': 'bad name'})
+        result = self._callFUT(app, 'rpc.job.result', [crash])
+        self.assertEqual(result['error']['code'], -32603)
+
+    def test_async_job_error_polled_repeatedly(self):
+        app, runner = self._makeJobApp()
+        bad = self._callFUT(app, 'export', ['bad'])['result']
+        runner.shutdown(wait=True)
+        for i in range(5):
+            result = self._callFUT(app, 'rpc.job.result', [bad])
+            self.assertEqual(result['error'],
+                             {'code': 1, 'message': 'bad name'})
+        error = runner.get(bad).error
+        self.assertEqual(getattr(error, '__traceback__', None), None)
+        self.assertEqual(getattr(error, '__context__', None), None)
+
+    def test_async_job_not_found(self):
+        app, runner = self._makeJobApp()
+        for job_id in ('missing', 5):
+            result = self._callFUT(app, 'rpc.job.result', [job_id])
+            self.assertEqual(result['error']['code'], -32001)
+            result = self._callFUT(app, 'rpc.job.status', [job_id])
+            self.assertEqual(result['error']['code'], -32001)
+
+    def test_async_job_queue_full(self):
+        from pyramid_rpc.jobs import JobRunner
+        app, runner = self._makeJobApp(
+            job_runner=JobRunner(max_pending=1, executor=DummyExecutor()))
+        self._callFUT(app, 'export', ['a'])
+        result = self._callFUT(app, 'export', ['b'])
+        self.assertEqual(result['error']['code'], -32003)
+
+    def test_async_job_with_custom_renderer(self):
+        from pyramid.renderers import JSON
+        config = self.config
+        config.include('pyramid_rpc.jsonrpc')
+        renderer = JSON()
+        renderer.add_adapter(set, lambda obj, request: sorted(obj))
+        config.add_renderer('sets', renderer)
+        config.add_jsonrpc_endpoint('rpc', '/api/jsonrpc')
+        config.add_jsonrpc_method(lambda r: set([2, 1]), endpoint='rpc',
+                                  method='numbers', renderer='sets',
+                                  async_job=True)
+        app = config.make_wsgi_app()
+        runner = app.registry.jsonrpc_endpoints['rpc'].job_runner
+        app = TestApp(app)
+        job_id = self._callFUT(app, 'numbers', [])['result']
+        runner.shutdown(wait=True)
+        result = self._callFUT(app, 'rpc.job.result', [job_id])
+        self.assertEqual(result['result'], [1, 2])
+
+    def test_async_job_with_http_cache(self):
+        from pyramid.exceptions import ConfigurationError
+        config = self.config
+        config.include('pyramid_rpc.jsonrpc')
+        config.add_jsonrpc_endpoint('rpc', '/api/jsonrpc')
+        self.assertRaises(ConfigurationError, config.add_jsonrpc_method,
+                          lambda r: None, endpoint='rpc', method='dummy',
+                          async_job=True, http_cache=60)
+
+    def test_job_methods_only_with_jobs(self):
+        config = self.config
+        config.include('pyramid_rpc.jsonrpc')
+        config.add_jsonrpc_endpoint('rpc', '/api/jsonrpc')
+        app = TestApp(config.make_wsgi_app())
+        result = self._callFUT(app, 'rpc.job.status', ['x'])
+        self.assertEqual(result['error']['code'], -32601)
+
+    def _makeCursorApp(self, **kw):
+        from pyramid_rpc.cursors import Cursor
+        from pyramid_rpc.cursors import CursorTable
+        def numbers(request, count, page_size=None):
+            return Cursor(range(count), page_size=page_size)
+        config = self.config
+        config.include('pyramid_rpc.jsonrpc')
+        config.add_jsonrpc_endpoint('rpc', '/api/jsonrpc',
+                                    cursor_table=CursorTable(**kw))
+        config.add_jsonrpc_method(numbers, endpoint='rpc', method='numbers')
+        return TestApp(config.make_wsgi_app())
+
+    def test_cursor(self):
+        app = self._makeCursorApp(page_size=4)
+        result = self._callFUT(app, 'numbers', [10])['result']
+        self.assertEqual(result['items'], [0, 1, 2, 3])
+        token = result['cursor']
+        result = self._callFUT(app, 'rpc.cursor.next', [token])['result']
+        self.assertEqual(result, {'items': [4, 5, 6, 7], 'cursor': token})
+        result = self._callFUT(app, 'rpc.cursor.next', {'cursor': token,
+                                                        'size': 1})['result']
+        self.assertEqual(result, {'items': [8], 'cursor': token})
+        result = self._callFUT(app, 'rpc.cursor.next', [token])['result']
+        self.assertEqual(result, {'items': [9], 'cursor': None})
+        result = self._callFUT(app, 'rpc.cursor.next', [token])
+        self.assertEqual(result['error']['code'], -32004)
+
+    def test_cursor_single_page(self):
+        app = self._makeCursorApp()
+        result = self._callFUT(app, 'numbers', [3])['result']
+        self.assertEqual(result, {'items': [0, 1, 2], 'cursor': None})
+
+    def test_cursor_page_size_of_method(self):
+        app = self._makeCursorApp(page_size=4)
+        result = self._callFUT(app, 'numbers', [10, 2])['result']
+        self.assertEqual(result['items'], [0, 1])
+        result = self._callFUT(app, 'rpc.cursor.next',
+                               [result['cursor']])['result']
+        self.assertEqual(result['items'], [2, 3])
+
+    def test_cursor_close(self):
+        app = self._makeCursorApp(page_size=4)
+        token = self._callFUT(app, 'numbers', [10])['result']['cursor']
+        self.assertEqual(
+            self._callFUT(app, 'rpc.cursor.close', [token])['result'], True)
+        self.assertEqual(
+            self._callFUT(app, 'rpc.cursor.close', [token])['result'], False)
+        self.assertEqual(
+            self._callFUT(app, 'rpc.cursor.close', [5])['result'], False)
+        result = self._callFUT(app, 'rpc.cursor.next', [token])
+        self.assertEqual(result['error']['code'], -32004)
+
+    def test_cursor_invalid_params(self):
+        app = self._makeCursorApp(page_size=4)
+        token = self._callFUT(app, 'numbers', [10])['result']['cursor']
+        for size in (0, 'a', True):
+            result = self._callFUT(app, 'rpc.cursor.next', [token, size])
+            self.assertEqual(result['error']['code'], -32602)
+        result = self._callFUT(app, 'rpc.cursor.next', [5])
+        self.assertEqual(result['error']['code'], -32004)
+
+    def test_cursor_with_custom_renderer(self):
+        from pyramid.renderers import JSON
+        from pyramid_rpc.cursors import Cursor
+        from pyramid_rpc.cursors import CursorTable
+        config = self.config
+        config.include('pyramid_rpc.jsonrpc')
+        renderer = JSON()
+        renderer.add_adapter(set, lambda obj, request: sorted(obj))
+        config.add_renderer('sets', renderer)
+        config.add_jsonrpc_endpoint('rpc', '/api/jsonrpc',
+                                    cursor_table=CursorTable(page_size=1))
+        config.add_jsonrpc_method(
+            lambda r: Cursor([set([2, 1]), set([4, 3])]), endpoint='rpc',
+            method='sets', renderer='sets')
+        app = TestApp(config.make_wsgi_app())
+        result = self._callFUT(app, 'sets', [])['result']
+        self.assertEqual(result['items'], [[1, 2]])
+        result = self._callFUT(app, 'rpc.cursor.next',
+                               [result['cursor']])['result']
+        self.assertEqual(result['items'], [[3, 4]])
+
+    def test_cursor_without_table(self):
+        from pyramid_rpc.cursors import Cursor
+        config = self.config
+        config.include('pyramid_rpc.jsonrpc')
+        config.add_jsonrpc_endpoint('rpc', '/api/jsonrpc')
+        config.add_jsonrpc_method(lambda r: Cursor([]), endpoint='rpc',
+                                  method='dummy')
+        app = TestApp(config.make_wsgi_app())
+        result = self._callFUT(app, 'dummy', [])
+        self.assertEqual(result['error']['code'], -32603)
+        result = self._callFUT(app, 'rpc.cursor.next', ['x'])
+        self.assertEqual(result['error']['code'], -32601)
+
+    def test_compressor_with_batch(self):
+        import zlib
+        from pyramid.request import Request
+        from pyramid_rpc.compression import ResponseCompressor
+        config = self.config
+        config.include('pyramid_rpc.jsonrpc')
+        config.add_jsonrpc_endpoint('rpc', '/api/jsonrpc',
+                                    compressor=ResponseCompressor(min_size=200))
+        config.add_jsonrpc_method(lambda r, n: 'x' * n, endpoint='rpc',
+                                  method='dummy')
+        app = config.make_wsgi_app()
+        def call(body):
+            request = Request.blank('/api/jsonrpc', method='POST',
+                                    body=json.dumps(body).encode('utf-8'),
+                                    content_type='application/json',
+                                    headers={'Accept-Encoding': 'deflate'})
+            return request.get_response(app)
+        body = [{'jsonrpc': '2.0', 'id': i, 'method': 'dummy',
+                 'params': [300]} for i in range(3)]
+        resp = call(body)
+        self.assertEqual(resp.content_encoding, 'deflate')
+        self.assertEqual(resp.headers['Vary'], 'Accept-Encoding')
+        result = json.loads(zlib.decompress(resp.body).decode('utf-8'))
+        self.assertEqual([r['result'] for r in result], ['x' * 300] * 3)
+        # small responses are not compressed
+        resp = call({'jsonrpc': '2.0', 'id': 1, 'method': 'dummy',
+                     'params': [10]})
+        self.assertEqual(resp.content_encoding, None)
+        self.assertEqual(resp.json['result'], 'x' * 10)
+
+    def test_decompressor(self):
+        import zlib
+        from pyramid_rpc.compression import RequestDecompressor
+        config = self.config
+        config.include('pyramid_rpc.jsonrpc')
+        config.add_jsonrpc_endpoint(
+            'rpc', '/api/jsonrpc',
+            decompressor=RequestDecompressor(max_size=10000))
+        config.add_jsonrpc_method(lambda r, s: len(s), endpoint='rpc',
+                                  method='dummy')
+        app = TestApp(config.make_wsgi_app())
+        def call(body, encoding='deflate'):
+            body = zlib.compress(json.dumps(body).encode('utf-8'))
+            return app.post('/api/jsonrpc', body,
+                            content_type='application/json',
+                            headers={'Content-Encoding': encoding}).json
+        batch = [{'jsonrpc': '2.0', 'id': i, 'method': 'dummy',
+                  'params': ['a' * i]} for i in range(3)]
+        self.assertEqual([r['result'] for r in call(batch)], [0, 1, 2])
+        result = call({'jsonrpc': '2.0', 'id': 1, 'method': 'dummy',
+                       'params': ['a' * 10000]})
+        self.assertEqual(result['error']['code'], -32600)
+        result = call(batch[0], encoding='br')
+        self.assertEqual(result['error']['code'], -32700)
+
+    def _makeCodecApp(self):
+        from pyramid_rpc.codec import CborCodec
+        from pyramid_rpc.codec import MsgpackCodec
+        config = self.config
+        config.include('pyramid_rpc.jsonrpc')
+        config.add_jsonrpc_endpoint(
+            'rpc', '/api/jsonrpc',
+            codecs=[MsgpackCodec(pure=True), CborCodec(pure=True)])
+        config.add_jsonrpc_method(lambda r, data: [data, len(data)],
+                                  endpoint='rpc', method='echo')
+        return TestApp(config.make_wsgi_app())
+
+    def test_msgpack(self):
+        from pyramid_rpc.codec import msgpack_dumps
+        from pyramid_rpc.codec import msgpack_loads
+        app = self._makeCodecApp()
+        body = msgpack_dumps({'jsonrpc': '2.0', 'id': 1, 'method': 'echo',
+                              'params': [b'\x00\xff']})
+        resp = app.post('/api/jsonrpc', body,
+                        content_type='application/msgpack')
+        self.assertEqual(resp.content_type, 'application/msgpack')
+        self.assertEqual(msgpack_loads(resp.body), {
+            'jsonrpc': '2.0', 'id': 1, 'result': [b'\x00\xff', 2]})
+        # errors use the same encoding
+        resp = app.post('/api/jsonrpc', b'\xc1',
+                        content_type='application/msgpack')
+        self.assertEqual(resp.content_type, 'application/msgpack')
+        self.assertEqual(msgpack_loads(resp.body)['error']['code'], -32700)
+        body = msgpack_dumps({'jsonrpc': '2.0', 'id': 1, 'method': 'missing',
+                              'params': []})
+        resp = app.post('/api/jsonrpc', body,
+                        content_type='application/msgpack')
+        self.assertEqual(msgpack_loads(resp.body)['error']['code'], -32601)
+
+    def test_codec_negotiated_by_accept(self):
+        from pyramid_rpc.codec import cbor_loads
+        from pyramid_rpc.codec import msgpack_dumps
+        app = self._makeCodecApp()
+        body = {'jsonrpc': '2.0', 'id': 1, 'method': 'echo', 'params': ['a']}
+        resp = app.post('/api/jsonrpc', json.dumps(body),
+                        content_type='application/json',
+                        headers={'Accept': 'application/cbor'})
+        self.assertEqual(resp.content_type, 'application/cbor')
+        self.assertEqual(cbor_loads(resp.body)['result'], ['a', 1])
+        resp = app.post('/api/jsonrpc', msgpack_dumps(body),
+                        content_type='application/msgpack',
+                        headers={'Accept': 'application/json'})
+        self.assertEqual(resp.json['result'], ['a', 1])
+        resp = app.get('/api/jsonrpc', params={
+            'jsonrpc': '2.0', 'id': '1', 'method': 'echo',
+            'params': '["a"]'}, headers={'Accept': 'application/cbor'})
+        self.assertEqual(cbor_loads(resp.body)['result'], ['a', 1])
+        resp = app.post('/api/jsonrpc', json.dumps(
+            {'jsonrpc': '2.0', 'id': 1, 'method': 'rpc.discover'}),
+            content_type='application/json',
+            headers={'Accept': 'application/cbor'})
+        self.assertEqual(
+            cbor_loads(resp.body)['result']['methods'][0]['name'], 'echo')
+
+    def test_codec_with_batch(self):
+        from pyramid_rpc.codec import cbor_dumps
+        from pyramid_rpc.codec import cbor_loads
+        app = self._makeCodecApp()
+        body = [
+            {'jsonrpc': '2.0', 'id': 1, 'method': 'echo', 'params': [b'a']},
+            {'jsonrpc': '2.0', 'method': 'echo', 'params': [b'b']},
+            {'jsonrpc': '2.0', 'id': 3, 'method': 'echo', 'params': [b'cc']},
+        ]
+        resp = app.post('/api/jsonrpc', cbor_dumps(body),
+                        content_type='application/cbor')
+        self.assertEqual(resp.content_type, 'application/cbor')
+        self.assertEqual(cbor_loads(resp.body), [
+            {'jsonrpc': '2.0', 'id': 1, 'result': [b'a', 1]},
+            {'jsonrpc': '2.0', 'id': 3, 'result': [b'cc', 2]},
+        ])
+
     def test_nonascii_request(self):
         def view(request, a):
             return a
@@ -538,6 +1215,158 @@ class TestJSONRPCIntegration(unittest.TestCase):
         self.assertEqual(result['result'], val)
 
 
+class TestJSONRPCRenderer(unittest.TestCase):
+
+    def _makeOne(self, **kw):
+        from pyramid_rpc.jsonrpc import JSONRPCRenderer
+        return JSONRPCRenderer(**kw)
+
+    def test_plain_values(self):
+        renderer = self._makeOne()
+        value = {'a': [1, 2.5, None, True], 'b': 'foo'}
+        self.assertEqual(json.loads(renderer.dumps(value)), value)
+
+    def test_array(self):
+        import array
+        renderer = self._makeOne()
+        value = {'ints': array.array('i', [1, -2, 3]),
+                 'floats': array.array('d', [0.5, 1e20])}
+        result = renderer.dumps(value)
+        self.assertEqual(json.loads(result),
+                         {'ints': [1, -2, 3], 'floats': [0.5, 1e20]})
+
+    def test_array_matches_json_dumps(self):
+        import array
+        renderer = self._makeOne()
+        floats = [0.1, -2.0, float('nan'), float('inf'), float('-inf')]
+        self.assertEqual(renderer.dumps([array.array('d', floats)]),
+                         json.dumps([floats]))
+        ints = list(range(-5, 5))
+        self.assertEqual(renderer.dumps(array.array('q', ints)),
+                         json.dumps(ints))
+
+    def test_array_in_chunks(self):
+        import array
+        renderer = self._makeOne()
+        floats = [i / 7.0 for i in range(10000)]
+        value = [array.array('d', floats), 'x', array.array('i', [1])]
+        self.assertEqual(renderer.dumps(value),
+                         json.dumps([floats, 'x', [1]]))
+        self.assertEqual(renderer.dumps(array.array('d')), '[]')
+
+    def test_array_with_json_options(self):
+        import array
+        renderer = self._makeOne(separators=(',', ':'), allow_nan=False)
+        value = {'a': array.array('i', [1, 2]), 'b': 1}
+        self.assertEqual(renderer.dumps(value), '{"a":[1,2],"b":1}')
+        self.assertRaises(ValueError, renderer.dumps,
+                          [array.array('d', [float('nan')])])
+        renderer = self._makeOne(indent=2)
+        self.assertEqual(json.loads(renderer.dumps(value)),
+                         {'a': [1, 2], 'b': 1})
+
+    def test_memoryview(self):
+        import array
+        renderer = self._makeOne()
+        view = memoryview(array.array('i', range(6))).cast('B').cast(
+            'i', (2, 3))
+        self.assertEqual(json.loads(renderer.dumps([view])),
+                         [[[0, 1, 2], [3, 4, 5]]])
+
+    def test_non_native_byte_order(self):
+        import ctypes
+        renderer = self._makeOne(default=lambda obj: list(obj))
+        big = (ctypes.c_double.__ctype_be__ * 2)(0.5, 2.0)
+        little = (ctypes.c_int.__ctype_le__ * 2)(1, -2)
+        self.assertEqual(memoryview(big).format, '>d')
+        self.assertEqual(memoryview(little).format, '<i')
+        # only unpacked by the default
+        self.assertEqual(json.loads(renderer.dumps([big, little])),
+                         [[0.5, 2.0], [1, -2]])
+        renderer = self._makeOne()
+        self.assertRaises(TypeError, renderer.dumps, big)
+        self.assertRaises(TypeError, renderer.dumps, little)
+
+    def test_bytes_are_not_arrays(self):
+        renderer = self._makeOne()
+        self.assertRaises(TypeError, renderer.dumps, b'foo')
+        self.assertRaises(TypeError, renderer.dumps, object())
+
+    def test_custom_default(self):
+        renderer = self._makeOne(default=lambda obj: 'custom')
+        self.assertEqual(json.loads(renderer.dumps([object()])), ['custom'])
+
+    def test_base64(self):
+        import array
+        import base64
+        import sys
+        renderer = self._makeOne(buffers='base64')
+        arr = array.array('d', [1.0, 2.0])
+        result = json.loads(renderer.dumps({'x': arr}))
+        order = '<' if sys.byteorder == 'little' else '>'
+        self.assertEqual(result['x']['dtype'], order + 'f8')
+        self.assertEqual(result['x']['shape'], [2])
+        self.assertEqual(base64.b64decode(result['x']['base64']),
+                         arr.tobytes())
+
+    def test_base64_non_native_byte_order(self):
+        import base64
+        import ctypes
+        renderer = self._makeOne(buffers='base64')
+        big = (ctypes.c_double.__ctype_be__ * 2)(0.5, 2.0)
+        result = json.loads(renderer.dumps([big]))[0]
+        self.assertEqual(result['dtype'], '>f8')
+        self.assertEqual(result['shape'], [2])
+        self.assertEqual(base64.b64decode(result['base64']),
+                         memoryview(big).tobytes())
+        little = (ctypes.c_int.__ctype_le__ * 2)(1, -2)
+        result = json.loads(renderer.dumps([little]))[0]
+        self.assertEqual(result['dtype'], '<i4')
+
+    def test_encode_error_uses_template(self):
+        from pyramid_rpc.jsonrpc import JsonRpcMethodNotFound
+        renderer = self._makeOne()
+        error = JsonRpcMethodNotFound()
+        for id in (None, 5, 'abc', 1.5):
+            expected = renderer.encode({
+                'jsonrpc': '2.0',
+                'id': id,
+                'error': error.as_dict(),
+            })
+            self.assertEqual(renderer.encode_error(error, id), expected)
+
+    def test_encode_error_with_custom_message(self):
+        from pyramid_rpc.jsonrpc import JsonRpcParamsInvalid
+        renderer = self._makeOne()
+        error = JsonRpcParamsInvalid(data={'name': 'a'})
+        result = json.loads(renderer.encode_error(error, 1).decode('utf-8'))
+        self.assertEqual(result['error'], {
+            'code': -32602,
+            'message': 'invalid params',
+            'data': {'name': 'a'},
+        })
+
+    def test_invalid_buffers_option(self):
+        self.assertRaises(ValueError, self._makeOne, buffers='foo')
+
+    def test_integration(self):
+        import array
+        def view(request):
+            return array.array('l', [1, 2, 3])
+        config = testing.setUp()
+        try:
+            config.include('pyramid_rpc.jsonrpc')
+            config.add_jsonrpc_endpoint('rpc', '/api/jsonrpc')
+            config.add_jsonrpc_method(view, endpoint='rpc', method='dummy')
+            app = TestApp(config.make_wsgi_app())
+            body = {'id': 1, 'jsonrpc': '2.0', 'method': 'dummy'}
+            resp = app.post('/api/jsonrpc', content_type='application/json',
+                            params=json.dumps(body))
+            self.assertEqual(resp.json['result'], [1, 2, 3])
+        finally:
+            testing.tearDown()
+
+
 class TestGET(unittest.TestCase):
 
     def setUp(self):
@@ -631,6 +1460,86 @@ class TestGET(unittest.TestCase):
         result = self._callFUT(app, 'err', [], id=None, expect_error=True)
         self.assertEqual(result['error']['code'], -32603)
 
+    def _cachedQuery(self, method='cached'):
+        return [('jsonrpc', '2.0'), ('id', '5'), ('method', method),
+                ('params', '[2]')]
+
+    def test_http_cache(self):
+        calls = []
+        def view(request, a):
+            calls.append(a)
+            return a * 2
+        self.config.add_jsonrpc_method(view, endpoint='rpc', method='cached',
+                                       http_cache=60)
+        app = self._makeTestApp()
+        resp = app.get('/api/jsonrpc', params=self._cachedQuery())
+        self.assertEqual(resp.json['result'], 4)
+        self.assertEqual(resp.cache_control.max_age, 60)
+        etag = resp.headers['ETag']
+        resp = app.get('/api/jsonrpc', params=self._cachedQuery(),
+                       headers={'If-None-Match': etag}, status=304)
+        self.assertEqual(resp.body, b'')
+        self.assertEqual(calls, [2, 2])
+        # POST calls are not cached
+        resp = app.post('/api/jsonrpc', content_type='application/json',
+                        params=json.dumps({'jsonrpc': '2.0', 'id': 5,
+                                           'method': 'cached',
+                                           'params': [2]}))
+        self.assertEqual(resp.json['result'], 4)
+        self.assertFalse('ETag' in resp.headers)
+        self.assertFalse('Cache-Control' in resp.headers)
+
+    def test_http_cache_errors_not_cached(self):
+        def view(request):
+            raise Exception
+        self.config.add_jsonrpc_method(view, endpoint='rpc', method='err',
+                                       http_cache=60)
+        app = self._makeTestApp()
+        result = self._callFUT(app, 'err', [], expect_error=True)
+        self.assertEqual(result['error']['code'], -32603)
+
+    def test_http_cache_with_options(self):
+        def view(request, a):
+            return a
+        self.config.add_jsonrpc_method(
+            view, endpoint='rpc', method='cached',
+            http_cache=(30, {'public': True}))
+        app = self._makeTestApp()
+        resp = app.get('/api/jsonrpc', params=self._cachedQuery())
+        self.assertEqual(resp.cache_control.max_age, 30)
+        self.assertTrue(resp.cache_control.public)
+
+    def test_http_cache_invalid(self):
+        from pyramid.exceptions import ConfigurationError
+        self.assertRaises(ConfigurationError,
+                          self.config.add_jsonrpc_method, lambda r: None,
+                          endpoint='rpc', method='bad', http_cache=(1, 2, 3))
+
+    def test_http_etag(self):
+        calls = []
+        versions = [1]
+        def view(request, a):
+            calls.append(a)
+            return a
+        self.config.add_jsonrpc_method(
+            view, endpoint='rpc', method='cached', http_cache=0,
+            http_etag=lambda request: versions[0])
+        app = self._makeTestApp()
+        resp = app.get('/api/jsonrpc', params=self._cachedQuery())
+        etag = resp.headers['ETag']
+        resp = app.get('/api/jsonrpc', params=self._cachedQuery(),
+                       headers={'If-None-Match': etag}, status=304)
+        self.assertEqual(resp.headers['ETag'], etag)
+        self.assertTrue(resp.cache_control.no_cache)
+        # the method was not called for the revalidation
+        self.assertEqual(calls, [2])
+        versions[0] = 2
+        resp = app.get('/api/jsonrpc', params=self._cachedQuery(),
+                       headers={'If-None-Match': etag})
+        self.assertEqual(resp.json['result'], 2)
+        self.assertNotEqual(resp.headers['ETag'], etag)
+        self.assertEqual(calls, [2, 2])
+
     def test_PUT(self):
         app = self._makeTestApp()
         response = app.put('/api/jsonrpc')
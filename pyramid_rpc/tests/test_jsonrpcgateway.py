@@ -0,0 +1,328 @@
+import json
+import threading
+import unittest
+
+from pyramid import testing
+from pyramid.config import Configurator
+
+
+class TestPrefixRouter(unittest.TestCase):
+
+    def _makeOne(self, routes, default=None):
+        from pyramid_rpc.jsonrpcgateway import PrefixRouter
+        return PrefixRouter(routes, default)
+
+    def test_longest_prefix(self):
+        router = self._makeOne({'users.': 'a', 'users.admin.': 'b'})
+        self.assertEqual(router({'method': 'users.get'}), 'a')
+        self.assertEqual(router({'method': 'users.admin.get'}), 'b')
+
+    def test_default(self):
+        router = self._makeOne({'users.': 'a'}, default='b')
+        self.assertEqual(router({'method': 'orders.get'}), 'b')
+
+    def test_not_found(self):
+        from pyramid_rpc.jsonrpc import JsonRpcMethodNotFound
+        router = self._makeOne({'users.': 'a'})
+        self.assertRaises(JsonRpcMethodNotFound, router,
+                          {'method': 'orders.get'})
+
+    def test_nested_router(self):
+        router = self._makeOne({'users.': lambda call: call['params'][0]})
+        self.assertEqual(router({'method': 'users.get', 'params': ['c']}),
+                         'c')
+
+
+class TestHashRouter(unittest.TestCase):
+
+    def _makeOne(self, upstreams, param='key', **kw):
+        from pyramid_rpc.jsonrpcgateway import HashRouter
+        return HashRouter(upstreams, param, **kw)
+
+    def _route(self, router, key):
+        return router({'method': 'get', 'params': {'key': key}})
+
+    def test_stable(self):
+        router = self._makeOne(['a', 'b', 'c'])
+        for key in range(50):
+            self.assertEqual(self._route(router, key),
+                             self._route(router, key))
+        routed = set(self._route(router, key) for key in range(100))
+        self.assertEqual(routed, set(['a', 'b', 'c']))
+
+    def test_consistent(self):
+        before = self._makeOne(['a', 'b', 'c'])
+        after = self._makeOne(['a', 'b'])
+        for key in range(200):
+            upstream = self._route(before, key)
+            if upstream != 'c':
+                # only the keys of the removed upstream move
+                self.assertEqual(self._route(after, key), upstream)
+
+    def test_positional(self):
+        router = self._makeOne(['a', 'b', 'c'], position=1)
+        self.assertEqual(router({'method': 'get', 'params': [0, 'k']}),
+                         self._route(router, 'k'))
+
+    def test_missing_param(self):
+        from pyramid_rpc.jsonrpc import JsonRpcParamsInvalid
+        router = self._makeOne(['a'])
+        self.assertRaises(JsonRpcParamsInvalid, router,
+                          {'method': 'get', 'params': {}})
+        self.assertRaises(JsonRpcParamsInvalid, router,
+                          {'method': 'get', 'params': ['k']})
+        self.assertRaises(JsonRpcParamsInvalid, router, {'method': 'get'})
+
+    def test_no_upstreams(self):
+        self.assertRaises(ValueError, self._makeOne, [])
+
+
+class TestJsonRpcGateway(unittest.TestCase):
+
+    def setUp(self):
+        self.config = testing.setUp()
+        self.config.include('pyramid_rpc.jsonrpc')
+        # upstream name -> list of (request bodies, headers) received
+        self.received = {}
+        self.users = self._serveUpstream('users')
+        self.orders = self._serveUpstream('orders')
+
+    def tearDown(self):
+        testing.tearDown()
+
+    def _serveUpstream(self, name):
+        from webtest.http import StopableWSGIServer
+        config = Configurator()
+        config.include('pyramid_rpc.jsonrpc')
+        config.add_jsonrpc_endpoint('api', '/api')
+        received = self.received[name] = []
+
+        def get(request, id):
+            return {'upstream': name, 'id': id}
+
+        def fail(request):
+            from pyramid_rpc.jsonrpc import JsonRpcError
+            raise JsonRpcError(code=-31000, message='failed', data=name)
+
+        def log(request, value):
+            pass
+        config.add_jsonrpc_method(get, endpoint='api', method=name + '.get')
+        config.add_jsonrpc_method(fail, endpoint='api',
+                                  method=name + '.fail')
+        config.add_jsonrpc_method(log, endpoint='api', method=name + '.log')
+        app = config.make_wsgi_app()
+
+        def recording_app(environ, start_response):
+            from webob import Request
+            request = Request(environ)
+            received.append((json.loads(request.body.decode('utf-8')),
+                             request.headers.get('Authorization')))
+            return app(environ, start_response)
+        server = StopableWSGIServer.create(recording_app)
+        self.addCleanup(server.shutdown)
+        return server.application_url + 'api'
+
+    def _makeApp(self, router=None, **kw):
+        from webtest import TestApp
+        from pyramid_rpc.jsonrpcgateway import PrefixRouter
+        if router is None:
+            router = PrefixRouter({'users.': self.users,
+                                   'orders.': self.orders})
+        self.config.add_jsonrpc_gateway('gateway', '/gateway', router=router,
+                                        **kw)
+        gateway = self.config.registry.jsonrpc_gateways['gateway']
+        self.addCleanup(gateway.close)
+        return TestApp(self.config.make_wsgi_app())
+
+    def _call(self, app, body, headers=None):
+        resp = app.post('/gateway', json.dumps(body),
+                        content_type='application/json', headers=headers)
+        self.assertEqual(resp.status_int, 200)
+        if not resp.body:
+            return None
+        return resp.json
+
+    def test_call(self):
+        app = self._makeApp()
+        out = self._call(app, {'jsonrpc': '2.0', 'method': 'users.get',
+                               'params': [1], 'id': 'a'})
+        self.assertEqual(out, {'jsonrpc': '2.0', 'id': 'a',
+                               'result': {'upstream': 'users', 'id': 1}})
+
+    def test_notification(self):
+        app = self._makeApp()
+        out = self._call(app, {'jsonrpc': '2.0', 'method': 'users.log',
+                               'params': [1]})
+        self.assertEqual(out, None)
+        self.assertEqual(len(self.received['users']), 1)
+
+    def test_batch(self):
+        app = self._makeApp()
+        out = self._call(app, [
+            {'jsonrpc': '2.0', 'method': 'users.get', 'params': [1],
+             'id': 1},
+            {'jsonrpc': '2.0', 'method': 'orders.get', 'params': [2],
+             'id': 1},
+            {'jsonrpc': '2.0', 'method': 'users.log', 'params': [3]},
+            {'jsonrpc': '2.0', 'method': 'orders.fail', 'id': 'x'},
+            {'jsonrpc': '2.0', 'method': 'users.get', 'params': {'id': 4},
+             'id': 2},
+        ])
+        self.assertEqual(out, [
+            {'jsonrpc': '2.0', 'id': 1,
+             'result': {'upstream': 'users', 'id': 1}},
+            {'jsonrpc': '2.0', 'id': 1,
+             'result': {'upstream': 'orders', 'id': 2}},
+            {'jsonrpc': '2.0', 'id': 'x',
+             'error': {'code': -31000, 'message': 'failed',
+                       'data': 'orders'}},
+            {'jsonrpc': '2.0', 'id': 2,
+             'result': {'upstream': 'users', 'id': 4}},
+        ])
+        # a single batch per upstream
+        (users, _), = self.received['users']
+        (orders, _), = self.received['orders']
+        self.assertEqual([c['method'] for c in users],
+                         ['users.get', 'users.log', 'users.get'])
+        self.assertEqual([c['method'] for c in orders],
+                         ['orders.get', 'orders.fail'])
+
+    def test_batch_concurrent(self):
+        from pyramid_rpc.jsonrpcgateway import JsonRpcGateway
+        threads = set()
+        send = JsonRpcGateway.send
+
+        def recording_send(gateway, *args):
+            threads.add(threading.current_thread())
+            return send(gateway, *args)
+        app = self._makeApp()
+        gateway = self.config.registry.jsonrpc_gateways['gateway']
+        gateway.send = lambda *args: recording_send(gateway, *args)
+        out = self._call(app, [
+            {'jsonrpc': '2.0', 'method': 'users.get', 'params': [1],
+             'id': 1},
+            {'jsonrpc': '2.0', 'method': 'orders.get', 'params': [2],
+             'id': 2},
+        ])
+        self.assertEqual([r['id'] for r in out], [1, 2])
+        self.assertFalse(threading.current_thread() in threads)
+
+    def test_method_not_found(self):
+        app = self._makeApp()
+        out = self._call(app, [
+            {'jsonrpc': '2.0', 'method': 'missing', 'id': 1},
+            {'jsonrpc': '2.0', 'method': 'missing'},
+            {'jsonrpc': '2.0', 'method': 'users.get', 'params': [1],
+             'id': 2},
+        ])
+        self.assertEqual(out[0]['error']['code'], -32601)
+        self.assertEqual(out[1]['result']['id'], 1)
+        self.assertEqual(len(out), 2)
+
+    def test_upstream_method_not_found(self):
+        app = self._makeApp()
+        out = self._call(app, {'jsonrpc': '2.0', 'method': 'users.missing',
+                               'id': 1})
+        self.assertEqual(out['error']['code'], -32601)
+
+    def test_hash_router(self):
+        from pyramid_rpc.jsonrpcgateway import HashRouter
+        from pyramid_rpc.jsonrpcgateway import PrefixRouter
+        shards = HashRouter([self.users, self.orders], 'id', position=0)
+        app = self._makeApp(PrefixRouter({}, default=shards))
+        expected = dict(
+            (id, 'users' if shards({'params': [id]}) == self.users
+             else 'orders')
+            for id in range(20))
+        for id in range(20):
+            # the shard only receives the notification, whatever its method
+            self.received['users'][:] = []
+            self.received['orders'][:] = []
+            self._call(app, {'jsonrpc': '2.0', 'method': 'users.log',
+                             'params': [id]})
+            upstream = expected[id]
+            self.assertEqual(len(self.received[upstream]), 1)
+        self.assertEqual(set(expected.values()), set(['users', 'orders']))
+
+    def test_router_failure(self):
+        def router(call):
+            if call['method'] == 'crash':
+                raise KeyError('boom')
+            return self.users
+        app = self._makeApp(router)
+        with self.assertLogs('pyramid_rpc.jsonrpcgateway') as logs:
+            out = self._call(app, [
+                {'jsonrpc': '2.0', 'method': 'crash', 'id': 1},
+                {'jsonrpc': '2.0', 'method': 'crash'},
+                {'jsonrpc': '2.0', 'method': 'users.get', 'params': [1],
+                 'id': 2},
+            ])
+        self.assertEqual(out[0], {'jsonrpc': '2.0', 'id': 1, 'error': {
+            'code': -32603, 'message': 'internal error'}})
+        self.assertEqual(out[1]['result']['id'], 1)
+        self.assertEqual(len(out), 2)
+        self.assertEqual(len(logs.records), 2)
+
+    def test_max_body_size(self):
+        app = self._makeApp(max_body_size=100)
+        call = {'jsonrpc': '2.0', 'method': 'users.get', 'params': [1],
+                'id': 1}
+        self.assertEqual(self._call(app, call)['result']['id'], 1)
+        call['params'] = ['x' * 100]
+        out = self._call(app, call)
+        self.assertEqual(out['error']['code'], -32600)
+        self.assertEqual(len(self.received['users']), 1)
+
+    def test_max_body_size_chunked(self):
+        app = self._makeApp(max_body_size=100)
+        body = json.dumps({'jsonrpc': '2.0', 'method': 'users.get',
+                           'params': ['x' * 100], 'id': 1}).encode('utf-8')
+        resp = app.post('/gateway', body, content_type='application/json',
+                        extra_environ={'CONTENT_LENGTH': ''})
+        self.assertEqual(resp.json['error']['code'], -32600)
+
+    def test_upstream_down(self):
+        from pyramid_rpc.jsonrpcgateway import PrefixRouter
+        app = self._makeApp(PrefixRouter({
+            'users.': self.users,
+            'down.': 'http://127.0.0.1:1/api',
+        }))
+        out = self._call(app, [
+            {'jsonrpc': '2.0', 'method': 'down.get', 'id': 1},
+            {'jsonrpc': '2.0', 'method': 'users.get', 'params': [1],
+             'id': 2},
+        ])
+        self.assertEqual(out[0], {'jsonrpc': '2.0', 'id': 1, 'error': {
+            'code': -32603, 'message': 'internal error'}})
+        self.assertEqual(out[1]['result']['id'], 1)
+
+    def test_forward_headers(self):
+        app = self._makeApp()
+        self._call(app, {'jsonrpc': '2.0', 'method': 'users.log',
+                         'params': [1]},
+                   headers={'Authorization': 'Bearer token',
+                            'X-Other': 'x'})
+        self.assertEqual(self.received['users'][0][1], 'Bearer token')
+
+    def test_invalid(self):
+        app = self._makeApp()
+        resp = app.post('/gateway', 'not json',
+                        content_type='application/json')
+        self.assertEqual(resp.json['error']['code'], -32700)
+        self.assertEqual(self._call(app, [])['error']['code'], -32600)
+        out = self._call(app, [1, {'jsonrpc': '2.0', 'method': 'users.get',
+                                   'params': [1], 'id': 2}])
+        self.assertEqual(out[0], {'jsonrpc': '2.0', 'id': None, 'error': {
+            'code': -32600, 'message': 'invalid request'}})
+        self.assertEqual(out[1]['id'], 2)
+
+    def test_ids_rewritten(self):
+        app = self._makeApp()
+        out = self._call(app, [
+            {'jsonrpc': '2.0', 'method': 'users.get', 'params': [1],
+             'id': 7},
+            {'jsonrpc': '2.0', 'method': 'users.get', 'params': [2],
+             'id': 7},
+        ])
+        self.assertEqual([(r['id'], r['result']['id']) for r in out],
+                         [(7, 1), (7, 2)])
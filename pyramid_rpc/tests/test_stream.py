@@ -0,0 +1,243 @@
+import io
+import json
+import os
+import shutil
+import socket
+import struct
+import tempfile
+import threading
+import time
+import unittest
+
+from pyramid import testing
+
+
+class Test_read_message(unittest.TestCase):
+
+    def _callFUT(self, data, framing='newline', max_size=100):
+        from pyramid_rpc.stream import read_message
+        return read_message(io.BytesIO(data), framing, max_size)
+
+    def test_newline(self):
+        from pyramid_rpc.stream import read_message
+        stream = io.BytesIO(b'{"a": 1}\n\r\n{"b": 2}\r\n')
+        self.assertEqual(read_message(stream, 'newline', 100), b'{"a": 1}')
+        self.assertEqual(read_message(stream, 'newline', 100), b'{"b": 2}')
+        self.assertEqual(read_message(stream, 'newline', 100), None)
+
+    def test_newline_too_big(self):
+        from pyramid_rpc.stream import FramingError
+        self.assertRaises(FramingError, self._callFUT, b'x' * 200 + b'\n')
+
+    def test_newline_truncated(self):
+        from pyramid_rpc.stream import FramingError
+        self.assertRaises(FramingError, self._callFUT, b'{"a": 1}')
+
+    def test_length(self):
+        from pyramid_rpc.stream import read_message
+        stream = io.BytesIO(struct.pack('!I', 3) + b'abc' +
+                            struct.pack('!I', 0))
+        self.assertEqual(read_message(stream, 'length', 100), b'abc')
+        self.assertEqual(read_message(stream, 'length', 100), b'')
+        self.assertEqual(read_message(stream, 'length', 100), None)
+
+    def test_length_too_big(self):
+        from pyramid_rpc.stream import FramingError
+        self.assertRaises(FramingError, self._callFUT,
+                          struct.pack('!I', 200) + b'x' * 200, 'length')
+
+    def test_length_truncated(self):
+        from pyramid_rpc.stream import FramingError
+        self.assertRaises(FramingError, self._callFUT, b'\x00\x00', 'length')
+        self.assertRaises(FramingError, self._callFUT,
+                          struct.pack('!I', 3) + b'ab', 'length')
+
+
+class Test_frame_message(unittest.TestCase):
+
+    def _callFUT(self, data, framing):
+        from pyramid_rpc.stream import frame_message
+        return frame_message(data, framing)
+
+    def test_newline(self):
+        self.assertEqual(self._callFUT(b'{"a": 1}', 'newline'),
+                         b'{"a": 1}\n')
+
+    def test_newline_compacts_indented_output(self):
+        self.assertEqual(self._callFUT(b'{\n  "a": "\\n"\n}', 'newline'),
+                         b'{"a":"\\n"}\n')
+
+    def test_length(self):
+        self.assertEqual(self._callFUT(b'abc', 'length'),
+                         b'\x00\x00\x00\x03abc')
+
+
+class TestServer(unittest.TestCase):
+
+    def setUp(self):
+        self.config = testing.setUp()
+        self.config.include('pyramid_rpc.jsonrpc')
+        self.config.add_jsonrpc_endpoint('rpc', '/api/jsonrpc')
+
+        def add(request, a, b):
+            return a + b
+        self.config.add_jsonrpc_method(add, endpoint='rpc', method='add')
+
+    def tearDown(self):
+        testing.tearDown()
+
+    def _serve(self, address=('127.0.0.1', 0), path='/api/jsonrpc', **kw):
+        from pyramid_rpc.stream import make_socket_server
+        app = self.config.make_wsgi_app()
+        server = make_socket_server(app, address, path, **kw)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def _connect(self, server):
+        if isinstance(server.server_address, tuple):
+            sock = socket.create_connection(server.server_address, timeout=5)
+        else:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(5)
+            sock.connect(server.server_address)
+        self.addCleanup(sock.close)
+        return sock
+
+    def _requests(self, count, method='add'):
+        return [
+            {'jsonrpc': '2.0', 'method': method, 'params': [i, 1], 'id': i}
+            for i in range(count)
+        ]
+
+    def _readlines(self, sock, count):
+        rfile = sock.makefile('rb')
+        try:
+            return [json.loads(rfile.readline().decode('utf-8'))
+                    for _ in range(count)]
+        finally:
+            rfile.close()
+
+    def test_newline_pipelined(self):
+        server = self._serve(workers=0)
+        sock = self._connect(server)
+        sock.sendall(b''.join(
+            json.dumps(body).encode('utf-8') + b'\n'
+            for body in self._requests(50)))
+        results = self._readlines(sock, 50)
+        self.assertEqual([r['id'] for r in results], list(range(50)))
+        self.assertEqual([r['result'] for r in results], list(range(1, 51)))
+
+    def test_length_prefixed(self):
+        server = self._serve(framing='length')
+        sock = self._connect(server)
+        for body in self._requests(10):
+            data = json.dumps(body).encode('utf-8')
+            sock.sendall(struct.pack('!I', len(data)) + data)
+        sock.shutdown(socket.SHUT_WR)
+        rfile = sock.makefile('rb')
+        self.addCleanup(rfile.close)
+        results = []
+        while True:
+            header = rfile.read(4)
+            if not header:
+                break
+            size, = struct.unpack('!I', header)
+            results.append(json.loads(rfile.read(size).decode('utf-8')))
+        # calls run concurrently, their responses are matched by id
+        self.assertEqual(sorted((r['id'], r['result']) for r in results),
+                         [(i, i + 1) for i in range(10)])
+
+    def test_half_closed_waits_for_responses(self):
+        def slow(request):
+            time.sleep(0.2)
+            return 'done'
+        self.config.add_jsonrpc_method(slow, endpoint='rpc', method='slow')
+        server = self._serve(workers=2)
+        sock = self._connect(server)
+        sock.sendall(b'{"jsonrpc": "2.0", "method": "slow", "id": 1}\n')
+        sock.shutdown(socket.SHUT_WR)
+        self.assertEqual(self._readlines(sock, 1)[0]['result'], 'done')
+
+    def test_notification_and_batch(self):
+        server = self._serve(workers=0)
+        sock = self._connect(server)
+        sock.sendall(
+            b'{"jsonrpc": "2.0", "method": "add", "params": [1, 2]}\n' +
+            json.dumps(self._requests(3)).encode('utf-8') + b'\n')
+        results, = self._readlines(sock, 1)
+        self.assertEqual([r['result'] for r in results], [1, 2, 3])
+
+    def test_environ(self):
+        self.config.add_jsonrpc_method(
+            lambda r: [r.remote_user, r.remote_addr], endpoint='rpc',
+            method='whoami')
+        server = self._serve(workers=0, environ={'REMOTE_USER': 'sidecar'})
+        sock = self._connect(server)
+        sock.sendall(b'{"jsonrpc": "2.0", "method": "whoami", "id": 1}\n')
+        self.assertEqual(self._readlines(sock, 1)[0]['result'],
+                         ['sidecar', '127.0.0.1'])
+
+    def test_max_pending(self):
+        gate = threading.Event()
+        self.addCleanup(gate.set)
+
+        def slow(request):
+            gate.wait(5)
+            return 'slow'
+        self.config.add_jsonrpc_method(slow, endpoint='rpc', method='slow')
+        server = self._serve(workers=4, max_pending=1)
+        self.assertEqual(server.max_pending, 1)
+        sock = self._connect(server)
+        sock.sendall(
+            b'{"jsonrpc": "2.0", "method": "slow", "id": 1}\n'
+            b'{"jsonrpc": "2.0", "method": "add", "params": [1, 2], '
+            b'"id": 2}\n')
+        # the second call waits for the first one to complete
+        time.sleep(0.1)
+        gate.set()
+        results = self._readlines(sock, 2)
+        self.assertEqual([r['id'] for r in results], [1, 2])
+
+    def test_message_too_big(self):
+        server = self._serve(max_message_size=10)
+        sock = self._connect(server)
+        sock.sendall(b'{"jsonrpc": "2.0", "method": "add", "id": 1}\n')
+        self.assertEqual(sock.recv(1024), b'')
+
+    @unittest.skipUnless(hasattr(socket, 'AF_UNIX'), 'requires AF_UNIX')
+    def test_unix_socket(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        path = os.path.join(tmpdir, 'rpc.sock')
+        server = self._serve(address=path, workers=0)
+        sock = self._connect(server)
+        sock.sendall(b'{"jsonrpc": "2.0", "method": "add", '
+                     b'"params": [2, 3], "id": 1}\n')
+        self.assertEqual(self._readlines(sock, 1)[0]['result'], 5)
+        server.shutdown()
+        server.server_close()
+        self.assertFalse(os.path.exists(path))
+
+    @unittest.skipUnless(hasattr(socket, 'AF_UNIX'), 'requires AF_UNIX')
+    def test_unix_socket_in_use(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        path = os.path.join(tmpdir, 'rpc.sock')
+        server = self._serve(address=path, workers=0)
+        self.assertRaises(socket.error, self._serve, address=path, workers=0)
+        # the socket of the running server is left alone
+        self.assertTrue(os.path.exists(path))
+        sock = self._connect(server)
+        sock.sendall(b'{"jsonrpc": "2.0", "method": "add", '
+                     b'"params": [2, 3], "id": 1}\n')
+        self.assertEqual(self._readlines(sock, 1)[0]['result'], 5)
+
+    def test_no_endpoint(self):
+        self.assertRaises(LookupError, self._serve, path='/missing')
+
+    def test_unknown_framing(self):
+        self.assertRaises(ValueError, self._serve, framing='xml')
@@ -0,0 +1,183 @@
+import unittest
+
+
+class TestExceptionLogLimiter(unittest.TestCase):
+
+    def _makeOne(self, **kw):
+        from pyramid_rpc.util import ExceptionLogLimiter
+        self.now = 0.0
+        kw.setdefault('clock', lambda: self.now)
+        return ExceptionLogLimiter(**kw)
+
+    def test_unlimited(self):
+        limiter = self._makeOne()
+        for i in range(100):
+            self.assertTrue(limiter.allow('foo', ValueError()))
+        self.assertEqual(limiter.suppressed, {})
+
+    def test_rate(self):
+        limiter = self._makeOne(rate=2)
+        results = [limiter.allow('foo', ValueError()) for i in range(5)]
+        self.assertEqual(results, [True, True, False, False, False])
+        self.now += 0.5
+        self.assertTrue(limiter.allow('foo', ValueError()))
+        self.assertFalse(limiter.allow('foo', ValueError()))
+
+    def test_rate_is_per_method_and_type(self):
+        limiter = self._makeOne(rate=1)
+        self.assertTrue(limiter.allow('foo', ValueError()))
+        self.assertFalse(limiter.allow('foo', ValueError()))
+        self.assertTrue(limiter.allow('foo', KeyError()))
+        self.assertTrue(limiter.allow('bar', ValueError()))
+
+    def test_sample(self):
+        values = iter([0.05, 0.5, 0.09, 0.95])
+        limiter = self._makeOne(sample=0.1, random=lambda: next(values))
+        results = [limiter.allow('foo', ValueError()) for i in range(4)]
+        self.assertEqual(results, [True, False, True, False])
+
+    def test_overrides(self):
+        limiter = self._makeOne(
+            methods={'foo': {'rate': 1}},
+            exceptions={LookupError: {'rate': 1, 'burst': 2}},
+        )
+        self.assertTrue(limiter.allow('foo', KeyError()))
+        self.assertFalse(limiter.allow('foo', KeyError()))
+        self.assertTrue(limiter.allow('bar', KeyError()))
+        self.assertTrue(limiter.allow('bar', KeyError()))
+        self.assertFalse(limiter.allow('bar', KeyError()))
+        self.assertTrue(limiter.allow('bar', ValueError()))
+        self.assertTrue(limiter.allow('bar', ValueError()))
+
+    def test_summarize(self):
+        limiter = self._makeOne(rate=1, summary_interval=10)
+        for i in range(3):
+            limiter.allow('foo', ValueError())
+        limiter.allow('bar', KeyError())
+        limiter.allow('bar', KeyError())
+        self.assertEqual(limiter.summarize(), None)
+        self.now += 10
+        self.assertEqual(
+            limiter.summarize(),
+            'suppressed 3 exception logs: bar:KeyError=1, foo:ValueError=2')
+        self.now += 10
+        self.assertEqual(limiter.summarize(), None)
+
+
+class TestIdempotencyCache(unittest.TestCase):
+
+    def _makeOne(self, **kw):
+        from pyramid_rpc.util import IdempotencyCache
+        self.now = 0.0
+        kw.setdefault('clock', lambda: self.now)
+        return IdempotencyCache(**kw)
+
+    def test_complete(self):
+        cache = self._makeOne(ttl=10)
+        self.assertEqual(cache.acquire('a'), (False, None))
+        cache.complete('a', 'result')
+        self.assertEqual(cache.acquire('a'), (True, 'result'))
+        self.now += 10
+        self.assertEqual(cache.acquire('a'), (False, None))
+
+    def test_abandon(self):
+        cache = self._makeOne()
+        self.assertEqual(cache.acquire('a'), (False, None))
+        cache.abandon('a')
+        self.assertEqual(cache.acquire('a'), (False, None))
+
+    def test_max_entries(self):
+        cache = self._makeOne(max_entries=2)
+        for key in 'abc':
+            cache.acquire(key)
+            cache.complete(key, key)
+        self.assertEqual(list(cache.entries), ['b', 'c'])
+
+    def test_expired_entries_are_purged(self):
+        cache = self._makeOne(ttl=10)
+        cache.acquire('a')
+        cache.complete('a', 'a')
+        self.now += 20
+        cache.acquire('b')
+        cache.complete('b', 'b')
+        self.assertEqual(list(cache.entries), ['b'])
+
+    def test_duplicates_wait(self):
+        import threading
+        from pyramid_rpc.util import IdempotencyCache
+        cache = IdempotencyCache()
+        self.assertEqual(cache.acquire('a'), (False, None))
+        results = []
+        def duplicate():
+            results.append(cache.acquire('a'))
+        threads = [threading.Thread(target=duplicate) for i in range(3)]
+        for thread in threads:
+            thread.start()
+        cache.complete('a', 'result')
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [(True, 'result')] * 3)
+
+    def test_wait_timeout(self):
+        from pyramid_rpc.util import IdempotencyCache
+        from pyramid_rpc.util import IdempotencyTimeout
+        cache = IdempotencyCache(wait_timeout=0.01)
+        cache.acquire('a')
+        self.assertRaises(IdempotencyTimeout, cache.acquire, 'a')
+
+
+class Test_clone_request(unittest.TestCase):
+
+    def setUp(self):
+        from pyramid import testing
+        self.config = testing.setUp()
+
+    def tearDown(self):
+        from pyramid import testing
+        testing.tearDown()
+
+    def _makeRequest(self):
+        from pyramid.interfaces import IRequestFactory
+        from pyramid.request import Request
+        from pyramid.request import apply_request_extensions
+        registry = self.config.registry
+        factory = registry.queryUtility(IRequestFactory, default=Request)
+        request = factory.blank('/api')
+        request.registry = registry
+        request.matchdict = {}
+        request.matched_route = None
+        apply_request_extensions(request)
+        return request
+
+    def _callFUT(self, request, rpc, context=None):
+        from pyramid_rpc.util import clone_request
+        return clone_request(request, rpc, context)
+
+    def test_reified_attributes_not_shared(self):
+        self.config.add_request_method(lambda r: object(), 'session',
+                                       reify=True)
+        self.config.commit()
+        request = self._makeRequest()
+        session = request.session
+        request.foo = 'bar'
+        subrequest = self._callFUT(request, 'rpc')
+        self.assertEqual(subrequest.rpc, 'rpc')
+        self.assertTrue(subrequest.session is not session)
+        self.assertTrue(subrequest.session is subrequest.session)
+        self.assertFalse(hasattr(subrequest, 'foo'))
+        self.assertEqual(request.foo, 'bar')
+        self.assertEqual(subrequest.path, '/api')
+
+    def test_context(self):
+        from pyramid.interfaces import IRootFactory
+        class Root(object):
+            def __init__(self, request):
+                self.request = request
+        self.config.registry.registerUtility(Root, IRootFactory)
+        request = self._makeRequest()
+        subrequest = self._callFUT(request, 'rpc')
+        self.assertTrue(isinstance(subrequest.context, Root))
+        self.assertTrue(subrequest.context.request is subrequest)
+        context = object()
+        subrequest = self._callFUT(request, 'rpc', context)
+        self.assertTrue(subrequest.context is context)
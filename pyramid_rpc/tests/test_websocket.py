@@ -0,0 +1,299 @@
+import io
+import json
+import socket
+import struct
+import threading
+import unittest
+
+from pyramid import testing
+
+
+class Test_accept_key(unittest.TestCase):
+
+    def test_it(self):
+        from pyramid_rpc.websocket import accept_key
+        # the example of RFC 6455
+        self.assertEqual(accept_key('dGhlIHNhbXBsZSBub25jZQ=='),
+                         's3pPLMBiTxaQ9kYGzzhZRbK+xOo=')
+
+
+class TestFrames(unittest.TestCase):
+
+    def _roundtrip(self, payload, mask_key=None, **kw):
+        from pyramid_rpc.websocket import encode_frame
+        from pyramid_rpc.websocket import read_frame
+        data = encode_frame(0x1, payload, mask_key=mask_key)
+        return read_frame(io.BytesIO(data), masked=mask_key is not None,
+                          **kw)
+
+    def test_sizes(self):
+        for size in (0, 5, 125, 126, 65535, 65536, 70000):
+            payload = b'x' * size
+            self.assertEqual(self._roundtrip(payload), (True, 1, payload))
+            self.assertEqual(self._roundtrip(payload, b'abcd'),
+                             (True, 1, payload))
+
+    def test_masked(self):
+        from pyramid_rpc.websocket import encode_frame
+        data = encode_frame(0x1, b'Hello', mask_key=b'\x37\xfa\x21\x3d')
+        # the example of RFC 6455
+        self.assertEqual(data, b'\x81\x85\x37\xfa\x21\x3d\x7f\x9f\x4d\x51\x58')
+
+    def test_unmasked_client_frame(self):
+        from pyramid_rpc.websocket import WebSocketError
+        from pyramid_rpc.websocket import encode_frame
+        from pyramid_rpc.websocket import read_frame
+        data = encode_frame(0x1, b'Hello')
+        self.assertRaises(WebSocketError, read_frame, io.BytesIO(data))
+
+    def test_too_big(self):
+        from pyramid_rpc.websocket import WebSocketError
+        try:
+            self._roundtrip(b'x' * 200, b'abcd', max_size=100)
+        except WebSocketError as ex:
+            self.assertEqual(ex.code, 1009)
+        else:  # pragma: no cover
+            self.fail('expected WebSocketError')
+
+    def test_truncated(self):
+        from pyramid_rpc.websocket import encode_frame
+        from pyramid_rpc.websocket import read_frame
+        data = encode_frame(0x1, b'Hello', mask_key=b'abcd')[:-1]
+        self.assertRaises(EOFError, read_frame, io.BytesIO(data))
+
+
+class TestWebSocket(unittest.TestCase):
+
+    def _makeOne(self, *frames, **kw):
+        from pyramid_rpc.websocket import WebSocket
+        from pyramid_rpc.websocket import encode_frame
+        data = b''.join(
+            encode_frame(opcode, payload, fin=fin, mask_key=b'abcd')
+            for opcode, payload, fin in frames)
+        self.output = io.BytesIO()
+        return WebSocket(io.BytesIO(data), self.output, **kw)
+
+    def _sent(self):
+        from pyramid_rpc.websocket import read_frame
+        stream = io.BytesIO(self.output.getvalue())
+        frames = []
+        while stream.tell() < len(self.output.getvalue()):
+            frames.append(read_frame(stream, masked=False))
+        return frames
+
+    def test_text(self):
+        ws = self._makeOne((0x1, b'\xc3\xa9t\xc3\xa9', True))
+        self.assertEqual(ws.receive(), u'\xe9t\xe9')
+
+    def test_binary(self):
+        ws = self._makeOne((0x2, b'\xff', True))
+        self.assertEqual(ws.receive(), b'\xff')
+
+    def test_fragmented_with_ping(self):
+        ws = self._makeOne((0x1, b'ab', False), (0x9, b'p', True),
+                           (0x0, b'cd', True))
+        self.assertEqual(ws.receive(), u'abcd')
+        self.assertEqual(self._sent(), [(True, 0xA, b'p')])
+
+    def test_close(self):
+        ws = self._makeOne((0x8, struct.pack('!H', 1001), True))
+        self.assertEqual(ws.receive(), None)
+        self.assertEqual(self._sent(), [(True, 0x8, struct.pack('!H', 1001))])
+        self.assertTrue(ws.closed)
+        ws.send(u'ignored')
+        self.assertEqual(len(self._sent()), 1)
+
+    def test_eof(self):
+        ws = self._makeOne()
+        self.assertEqual(ws.receive(), None)
+        self.assertTrue(ws.closed)
+
+    def test_invalid_utf8(self):
+        ws = self._makeOne((0x1, b'\xff', True))
+        self.assertEqual(ws.receive(), None)
+        self.assertEqual(self._sent()[0][2][:2], struct.pack('!H', 1007))
+
+    def test_fragmented_too_big(self):
+        ws = self._makeOne((0x1, b'x' * 60, False), (0x0, b'x' * 60, True),
+                           max_message_size=100)
+        self.assertEqual(ws.receive(), None)
+        self.assertEqual(self._sent()[0][2][:2], struct.pack('!H', 1009))
+
+    def test_unexpected_continuation(self):
+        ws = self._makeOne((0x0, b'x', True))
+        self.assertEqual(ws.receive(), None)
+        self.assertEqual(self._sent()[0][2][:2], struct.pack('!H', 1002))
+
+    def test_send(self):
+        ws = self._makeOne()
+        ws.send(u'\xe9')
+        ws.send(b'\xff')
+        ws.send_text(b'{}')
+        self.assertEqual(self._sent(), [
+            (True, 0x1, b'\xc3\xa9'),
+            (True, 0x2, b'\xff'),
+            (True, 0x1, b'{}'),
+        ])
+
+
+class Client(object):
+    """ A minimal blocking client for the tests."""
+
+    def __init__(self, address, path='/api/jsonrpc', headers=None):
+        from pyramid_rpc.websocket import WebSocket
+        self.sock = socket.create_connection(address, timeout=5)
+        lines = [
+            'GET %s HTTP/1.1' % path,
+            'Host: %s:%s' % address,
+            'Upgrade: websocket',
+            'Connection: Upgrade',
+            'Sec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==',
+            'Sec-WebSocket-Version: 13',
+        ]
+        for name, value in (headers or {}).items():
+            lines.append('%s: %s' % (name, value))
+        self.sock.sendall(('\r\n'.join(lines) + '\r\n\r\n').encode('ascii'))
+        self.rfile = self.sock.makefile('rb')
+        self.status = int(self.rfile.readline().split()[1])
+        self.headers = {}
+        while True:
+            line = self.rfile.readline().decode('ascii').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            self.headers[name.lower()] = value.strip()
+        self.ws = WebSocket(self.rfile, self.sock.makefile('wb'),
+                            masked=False)
+
+    def send(self, body):
+        self.ws.send(json.dumps(body))
+
+    def receive(self):
+        return json.loads(self.ws.receive())
+
+    def close(self):
+        self.ws.close()
+        self.rfile.close()
+        self.sock.close()
+
+
+class TestServer(unittest.TestCase):
+
+    def setUp(self):
+        self.config = testing.setUp()
+        self.config.include('pyramid_rpc.jsonrpc')
+        self.config.add_jsonrpc_endpoint('rpc', '/api/jsonrpc')
+        self.server = None
+
+    def tearDown(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+        testing.tearDown()
+
+    def _serve(self, **kw):
+        from pyramid_rpc.websocket import make_server
+        app = self.config.make_wsgi_app()
+        self.server = make_server('127.0.0.1', 0, app, **kw)
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self.server.server_address
+
+    def _connect(self, address, **kw):
+        client = Client(address, **kw)
+        self.addCleanup(client.close)
+        return client
+
+    def test_it(self):
+        def view(request, a, b):
+            return a + b
+        self.config.add_jsonrpc_method(view, endpoint='rpc', method='add')
+        client = self._connect(self._serve())
+        self.assertEqual(client.status, 101)
+        self.assertEqual(client.headers['sec-websocket-accept'],
+                         's3pPLMBiTxaQ9kYGzzhZRbK+xOo=')
+        for id in range(3):
+            client.send({'jsonrpc': '2.0', 'method': 'add',
+                         'params': [id, 1], 'id': id})
+            self.assertEqual(client.receive(),
+                             {'jsonrpc': '2.0', 'id': id, 'result': id + 1})
+
+    def test_headers_of_handshake(self):
+        self.config.add_jsonrpc_method(
+            lambda r: r.headers['X-Token'], endpoint='rpc', method='token')
+        client = self._connect(self._serve(), headers={'X-Token': 'secret'})
+        client.send({'jsonrpc': '2.0', 'method': 'token', 'id': 1})
+        self.assertEqual(client.receive()['result'], 'secret')
+
+    def test_multiplexed(self):
+        gate = threading.Event()
+
+        def slow(request):
+            gate.wait(5)
+            return 'slow'
+
+        def fast(request):
+            gate.set()
+            return 'fast'
+        self.config.add_jsonrpc_method(slow, endpoint='rpc', method='slow')
+        self.config.add_jsonrpc_method(fast, endpoint='rpc', method='fast')
+        client = self._connect(self._serve(workers=2))
+        client.send({'jsonrpc': '2.0', 'method': 'slow', 'id': 1})
+        client.send({'jsonrpc': '2.0', 'method': 'fast', 'id': 2})
+        self.assertEqual(client.receive()['id'], 2)
+        self.assertEqual(client.receive()['id'], 1)
+
+    def test_server_notifications(self):
+        def subscribe(request):
+            request.rpc.connection.notify('event', ['subscribed'])
+            return True
+        self.config.add_jsonrpc_method(subscribe, endpoint='rpc',
+                                       method='subscribe')
+        client = self._connect(self._serve(workers=0))
+        client.send({'jsonrpc': '2.0', 'method': 'subscribe', 'id': 1})
+        self.assertEqual(client.receive()['params'], ['subscribed'])
+        self.assertEqual(client.receive()['result'], True)
+        self.server.notify_all('event', ['broadcast'])
+        self.assertEqual(client.receive(), {
+            'jsonrpc': '2.0', 'method': 'event', 'params': ['broadcast']})
+
+    def test_no_endpoint(self):
+        client = self._connect(self._serve(), path='/missing')
+        self.assertEqual(client.status, 404)
+
+    def test_same_origin(self):
+        address = self._serve()
+        client = self._connect(address, headers={
+            'Origin': 'http://%s:%s' % address})
+        self.assertEqual(client.status, 101)
+        client = self._connect(address, headers={
+            'Origin': 'http://evil.example.com'})
+        self.assertEqual(client.status, 403)
+
+    def test_allowed_origins(self):
+        address = self._serve(allowed_origins=['https://app.example.com/'])
+        client = self._connect(address, headers={
+            'Origin': 'https://App.example.com'})
+        self.assertEqual(client.status, 101)
+        for origin in ('http://%s:%s' % address, 'null'):
+            client = self._connect(address, headers={'Origin': origin})
+            self.assertEqual(client.status, 403)
+
+    def test_any_origin(self):
+        address = self._serve(allowed_origins=['*'])
+        client = self._connect(address, headers={
+            'Origin': 'http://evil.example.com'})
+        self.assertEqual(client.status, 101)
+
+    def test_not_upgrade(self):
+        address = self._serve()
+        sock = socket.create_connection(address, timeout=5)
+        self.addCleanup(sock.close)
+        sock.sendall(b'GET /api/jsonrpc HTTP/1.1\r\nHost: x\r\n\r\n')
+        self.assertTrue(sock.recv(1024).startswith(b'HTTP/1.1 426'))
+
+    def test_close(self):
+        client = self._connect(self._serve())
+        client.ws.close(1000)
+        self.assertEqual(client.ws.receive(), None)
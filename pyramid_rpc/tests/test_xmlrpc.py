@@ -148,6 +148,460 @@ class TestXMLRPCIntegration(unittest.TestCase):
         else: # pragma: no cover
             raise AssertionError
 
+    def test_it_with_parser_limits(self):
+        config = self.config
+        config.include('pyramid_rpc.xmlrpc')
+        config.add_xmlrpc_endpoint('rpc', '/api/xmlrpc', max_depth=1)
+        config.add_xmlrpc_method(lambda r, a: a, endpoint='rpc',
+                                 method='dummy')
+        app = config.make_wsgi_app()
+        app = TestApp(app)
+        self.assertEqual(self._callFUT(app, 'dummy', ([1],)), [1])
+        try:
+            self._callFUT(app, 'dummy', ([[1]],))
+        except xmlrpclib.Fault:
+            exc = sys.exc_info()[1] # 2.5 compat
+            self.assertEqual(exc.faultCode, -32600)
+        else: # pragma: no cover
+            raise AssertionError
+
+    def test_it_with_streaming_renderer(self):
+        from pyramid_rpc.xmlrpc import XMLRPCRenderer
+        config = self.config
+        config.include('pyramid_rpc.xmlrpc')
+        config.add_renderer('xmlrpc_stream', XMLRPCRenderer(chunk_size=64))
+        config.add_xmlrpc_endpoint('rpc', '/api/xmlrpc',
+                                   default_renderer='xmlrpc_stream')
+        config.add_xmlrpc_method(lambda r, n: list(range(n)),
+                                 endpoint='rpc', method='dummy')
+        app = config.make_wsgi_app()
+        app = TestApp(app)
+        self.assertEqual(self._callFUT(app, 'dummy', (50,)), list(range(50)))
+        try:
+            self._callFUT(app, 'missing', ())
+        except xmlrpclib.Fault:
+            exc = sys.exc_info()[1] # 2.5 compat
+            self.assertEqual(exc.faultCode, -32601)
+        else: # pragma: no cover
+            raise AssertionError
+
+    def test_it_with_compressor(self):
+        import zlib
+        from pyramid.request import Request
+        from pyramid_rpc.compression import ResponseCompressor
+        from pyramid_rpc.xmlrpc import XMLRPCRenderer
+        config = self.config
+        config.include('pyramid_rpc.xmlrpc')
+        config.add_renderer('xmlrpc_stream', XMLRPCRenderer(chunk_size=64))
+        config.add_xmlrpc_endpoint('rpc', '/api/xmlrpc',
+                                   compressor=ResponseCompressor())
+        config.add_xmlrpc_endpoint('stream', '/api/stream',
+                                   default_renderer='xmlrpc_stream',
+                                   compressor=ResponseCompressor())
+        for name in ('rpc', 'stream'):
+            config.add_xmlrpc_method(lambda r, n: list(range(n)),
+                                     endpoint=name, method='dummy')
+        app = config.make_wsgi_app()
+        def call(path, n):
+            xml = xmlrpclib.dumps((n,), methodname='dummy').encode('utf-8')
+            request = Request.blank(path, method='POST', body=xml,
+                                    content_type='text/xml',
+                                    headers={'Accept-Encoding': 'gzip'})
+            return request.get_response(app)
+        for path in ('/api/xmlrpc', '/api/stream'):
+            resp = call(path, 500)
+            self.assertEqual(resp.content_encoding, 'gzip')
+            body = zlib.decompress(resp.body, 16 + zlib.MAX_WBITS)
+            self.assertEqual(xmlrpclib.loads(body)[0][0], list(range(500)))
+        # small responses are not compressed
+        resp = call('/api/xmlrpc', 5)
+        self.assertEqual(resp.content_encoding, None)
+        self.assertEqual(xmlrpclib.loads(resp.body)[0][0], list(range(5)))
+
+    def test_it_with_decompressor(self):
+        import zlib
+        from pyramid_rpc.compression import RequestDecompressor
+        config = self.config
+        config.include('pyramid_rpc.xmlrpc')
+        config.add_xmlrpc_endpoint(
+            'rpc', '/api/xmlrpc',
+            decompressor=RequestDecompressor(max_size=10000))
+        config.add_xmlrpc_method(lambda r, s: len(s), endpoint='rpc',
+                                 method='dummy')
+        app = TestApp(config.make_wsgi_app())
+        def call(value, encoding='deflate'):
+            xml = xmlrpclib.dumps((value,), methodname='dummy')
+            resp = app.post('/api/xmlrpc', content_type='text/xml',
+                            params=zlib.compress(xml.encode('utf-8')),
+                            headers={'Content-Encoding': encoding})
+            try:
+                return xmlrpclib.loads(resp.body)[0][0]
+            except xmlrpclib.Fault:
+                return sys.exc_info()[1].faultCode
+        self.assertEqual(call('a' * 5000), 5000)
+        self.assertEqual(call('a' * 10000), -32600)
+        self.assertEqual(call('a', encoding='gzip'), -32700)
+
+    def _makeMulticallApp(self, **kw):
+        config = self.config
+        config.include('pyramid_rpc.xmlrpc')
+        config.add_xmlrpc_endpoint('rpc', '/api/xmlrpc', **kw)
+        def fail(request):
+            raise Exception
+        def fault(request):
+            raise xmlrpclib.Fault(42, 'custom')
+        config.add_xmlrpc_method(lambda r, a, b: a + b, endpoint='rpc',
+                                 method='add')
+        config.add_xmlrpc_method(fail, endpoint='rpc', method='fail')
+        config.add_xmlrpc_method(fault, endpoint='rpc', method='fault')
+        config.add_xmlrpc_method(lambda r: r.rpc.method, endpoint='rpc',
+                                 method='name')
+        app = config.make_wsgi_app()
+        return TestApp(app)
+
+    def test_multicall(self):
+        app = self._makeMulticallApp()
+        calls = [
+            {'methodName': 'add', 'params': [1, 2]},
+            {'methodName': 'name', 'params': []},
+            {'methodName': 'fault', 'params': []},
+            {'methodName': 'fail', 'params': []},
+            {'methodName': 'missing', 'params': []},
+            {'methodName': 'add', 'params': [1]},
+            {'methodName': 'system.multicall', 'params': [[]]},
+            {'params': []},
+            'add',
+        ]
+        result = self._callFUT(app, 'system.multicall', (calls,))
+        self.assertEqual(result, [
+            [3],
+            ['name'],
+            {'faultCode': 42, 'faultString': 'custom'},
+            {'faultCode': -32500, 'faultString': 'application error'},
+            {'faultCode': -32601,
+             'faultString': 'server error; requested method not found'},
+            {'faultCode': -32602,
+             'faultString': 'server error; invalid method params'},
+            {'faultCode': -32600, 'faultString':
+             'server error; invalid xml-rpc; not conforming to spec'},
+            {'faultCode': -32600, 'faultString':
+             'server error; invalid xml-rpc; not conforming to spec'},
+            {'faultCode': -32600, 'faultString':
+             'server error; invalid xml-rpc; not conforming to spec'},
+        ])
+
+    def test_multicall_with_invalid_params(self):
+        app = self._makeMulticallApp()
+        try:
+            self._callFUT(app, 'system.multicall', ('add',))
+        except xmlrpclib.Fault:
+            exc = sys.exc_info()[1] # 2.5 compat
+            self.assertEqual(exc.faultCode, -32602)
+        else: # pragma: no cover
+            raise AssertionError
+
+    def test_multicall_with_client(self):
+        app = self._makeMulticallApp()
+        body = []
+        class Transport(object):
+            def request(self, host, handler, request_body, verbose=False):
+                resp = app.post('/api/xmlrpc', content_type='text/xml',
+                                params=request_body)
+                body.append(resp.body)
+                return xmlrpclib.loads(resp.body)[0]
+        proxy = xmlrpclib.ServerProxy('http://localhost/api/xmlrpc',
+                                      transport=Transport())
+        multicall = xmlrpclib.MultiCall(proxy)
+        multicall.add(1, 2)
+        multicall.add(3, 4)
+        self.assertEqual(list(multicall()), [3, 7])
+        self.assertEqual(len(body), 1)
+
+    def test_multicall_with_workers(self):
+        import threading
+        from pyramid.threadlocal import get_current_request
+        config = self.config
+        config.include('pyramid_rpc.xmlrpc')
+        config.add_xmlrpc_endpoint('rpc', '/api/xmlrpc', multicall_workers=2)
+        barrier = threading.Barrier(2, timeout=5)
+        def view(request, a):
+            barrier.wait()
+            self.assertTrue(get_current_request() is request)
+            self.assertEqual(request.rpc_args, (a,))
+            return [a, threading.current_thread().name]
+        config.add_xmlrpc_method(view, endpoint='rpc', method='dummy')
+        app = TestApp(config.make_wsgi_app())
+        calls = [
+            {'methodName': 'dummy', 'params': [1]},
+            {'methodName': 'dummy', 'params': [2]},
+        ]
+        result = self._callFUT(app, 'system.multicall', (calls,))
+        self.assertEqual([r[0][0] for r in result], [1, 2])
+        self.assertNotEqual(result[0][0][1], result[1][0][1])
+
+    def test_multicall_with_workers_fresh_requests(self):
+        config = self.config
+        config.include('pyramid_rpc.xmlrpc')
+        config.add_request_method(lambda r: object(), 'session', reify=True)
+        roots = []
+        sessions = []
+        class Root(object):
+            def __init__(self, request):
+                # the session of the multicall request is computed first
+                self.session = request.session
+                roots.append(self)
+        config.set_root_factory(Root)
+        config.add_xmlrpc_endpoint('rpc', '/api/xmlrpc', multicall_workers=2)
+        def view(request):
+            self.assertTrue(request.context.session is request.session)
+            sessions.append(request.session)
+            return True
+        config.add_xmlrpc_method(view, endpoint='rpc', method='dummy')
+        app = TestApp(config.make_wsgi_app())
+        calls = [
+            {'methodName': 'dummy', 'params': []},
+            {'methodName': 'dummy', 'params': []},
+        ]
+        self._callFUT(app, 'system.multicall', (calls,))
+        self.assertEqual(len(roots), 3)
+        self.assertEqual(len(sessions), 2)
+        self.assertTrue(sessions[0] is not sessions[1])
+        self.assertFalse(roots[0].session in sessions)
+
+    def test_renderer_helper_per_renderer(self):
+        config = self.config
+        config.include('pyramid_rpc.xmlrpc')
+        config.add_xmlrpc_endpoint('rpc', '/api/xmlrpc')
+        config.add_xmlrpc_method(lambda r: 1, endpoint='rpc', method='one')
+        config.add_xmlrpc_method(lambda r: 2, endpoint='rpc', method='two')
+        app = TestApp(config.make_wsgi_app())
+        endpoint = config.registry.xmlrpc_endpoints['rpc']
+        self.assertEqual(list(endpoint.renderer_helpers), ['xmlrpc'])
+        self.assertEqual(self._callFUT(app, 'one', ()), 1)
+        self.assertEqual(self._callFUT(app, 'two', ()), 2)
+
+    def test_exception_log_limiter_when_errors_stop(self):
+        from pyramid_rpc.util import ExceptionLogLimiter
+        now = [0.0]
+        def view(request, fail):
+            if fail:
+                raise ValueError
+            return 'ok'
+        config = self.config
+        config.include('pyramid_rpc.xmlrpc')
+        limiter = ExceptionLogLimiter(rate=1, summary_interval=10,
+                                      clock=lambda: now[0])
+        config.add_xmlrpc_endpoint('rpc', '/api/xmlrpc',
+                                   exception_log_limiter=limiter)
+        config.add_xmlrpc_method(view, endpoint='rpc', method='dummy')
+        app = TestApp(config.make_wsgi_app())
+        with self.assertLogs('pyramid_rpc.xmlrpc') as logs:
+            for i in range(3):
+                self.assertRaises(xmlrpclib.Fault, self._callFUT, app,
+                                  'dummy', (True,))
+            now[0] += 10
+            self.assertEqual(self._callFUT(app, 'dummy', (False,)), 'ok')
+        messages = [r.getMessage() for r in logs.records]
+        self.assertEqual(
+            messages[1:],
+            ['xml-rpc suppressed 2 exception logs: dummy:ValueError=2'])
+
+    def test_it_with_spooled_binary(self):
+        import tempfile
+        config = self.config
+        config.include('pyramid_rpc.xmlrpc')
+        config.add_xmlrpc_endpoint('rpc', '/api/xmlrpc', spool_threshold=100)
+        def echo(request, data):
+            self.assertTrue(isinstance(data, tempfile.SpooledTemporaryFile))
+            return data
+        config.add_xmlrpc_method(echo, endpoint='rpc', method='echo')
+        app = TestApp(config.make_wsgi_app())
+        data = b'\x00\x01' * 1000
+        result = self._callFUT(app, 'echo', (xmlrpclib.Binary(data),))
+        self.assertEqual(result.data, data)
+
+    def test_it_with_method_table(self):
+        config = self.config
+        config.include('pyramid_rpc.xmlrpc')
+        config.add_xmlrpc_endpoint('rpc', '/api/xmlrpc')
+        config.add_xmlrpc_method(lambda r: 'foo', endpoint='rpc',
+                                 method='foo')
+        config.add_xmlrpc_method(lambda r: 'bar', endpoint='rpc',
+                                 method='bar')
+        notfound = []
+        config.add_notfound_view(lambda r: notfound.append(r) or r.response)
+        endpoint = config.registry.xmlrpc_endpoints['rpc']
+        self.assertEqual(sorted(endpoint.methods),
+                         ['bar', 'foo', 'system.listMethods',
+                          'system.methodHelp', 'system.methodSignature',
+                          'system.multicall'])
+        app = TestApp(config.make_wsgi_app())
+        self.assertEqual(self._callFUT(app, 'foo', ()), 'foo')
+        self.assertEqual(self._callFUT(app, 'bar', ()), 'bar')
+        try:
+            self._callFUT(app, 'baz', ())
+        except xmlrpclib.Fault:
+            exc = sys.exc_info()[1] # 2.5 compat
+            self.assertEqual(exc.faultCode, -32601)
+        else: # pragma: no cover
+            raise AssertionError
+        self.assertEqual(notfound, [])
+
+    def test_it_with_method_for_context(self):
+        from zope.interface import Interface
+        from zope.interface import alsoProvides
+        class IDummy(Interface):
+            pass
+        def factory(request):
+            context = testing.DummyResource()
+            alsoProvides(context, IDummy)
+            return context
+        config = self.config
+        config.include('pyramid_rpc.xmlrpc')
+        config.add_xmlrpc_endpoint('rpc', '/api/xmlrpc', factory=factory)
+        config.add_xmlrpc_method(lambda r: 'foo', endpoint='rpc',
+                                 method='foo', context=IDummy)
+        app = TestApp(config.make_wsgi_app())
+        self.assertEqual(self._callFUT(app, 'foo', ()), 'foo')
+
+    def test_it_with_method_for_context_and_generic(self):
+        class Admin(object):
+            def __init__(self, request):
+                pass
+        config = self.config
+        config.include('pyramid_rpc.xmlrpc')
+        config.add_xmlrpc_endpoint('rpc', '/api/xmlrpc', factory=Admin)
+        config.add_xmlrpc_method(lambda r: 'generic', endpoint='rpc',
+                                 method='foo')
+        config.add_xmlrpc_method(lambda r: 'admin', endpoint='rpc',
+                                 method='foo', context=Admin)
+        config.add_xmlrpc_method(lambda r: 'admin', endpoint='rpc',
+                                 method='bar', context=Admin)
+        config.add_xmlrpc_method(lambda r: 'generic', endpoint='rpc',
+                                 method='bar')
+        endpoint = config.registry.xmlrpc_endpoints['rpc']
+        app = TestApp(config.make_wsgi_app())
+        self.assertFalse('foo' in endpoint.methods)
+        self.assertFalse('bar' in endpoint.methods)
+        self.assertEqual(self._callFUT(app, 'foo', ()), 'admin')
+        self.assertEqual(self._callFUT(app, 'bar', ()), 'admin')
+
+    def _makeIntrospectionApp(self, config):
+        config.include('pyramid_rpc.xmlrpc')
+        config.add_xmlrpc_endpoint('rpc', '/api/xmlrpc')
+        def add(request, a, b):
+            """ Add two numbers."""
+            return a + b
+        config.add_xmlrpc_method(add, endpoint='rpc', method='add',
+                                 signature=['int', 'int', 'int'])
+        config.add_xmlrpc_method(lambda r: None, endpoint='rpc',
+                                 method='nothing')
+        return TestApp(config.make_wsgi_app())
+
+    def test_introspection(self):
+        app = self._makeIntrospectionApp(self.config)
+        self.assertEqual(self._callFUT(app, 'system.listMethods', ()), [
+            'add', 'nothing', 'system.listMethods', 'system.methodHelp',
+            'system.methodSignature', 'system.multicall'])
+        self.assertEqual(
+            self._callFUT(app, 'system.methodSignature', ('add',)),
+            [['int', 'int', 'int']])
+        self.assertEqual(
+            self._callFUT(app, 'system.methodSignature', ('nothing',)),
+            'undef')
+        self.assertEqual(
+            self._callFUT(app, 'system.methodHelp', ('add',)),
+            'Add two numbers.')
+        self.assertEqual(
+            self._callFUT(app, 'system.methodHelp', ('nothing',)), '')
+        try:
+            self._callFUT(app, 'system.methodHelp', ('missing',))
+        except xmlrpclib.Fault:
+            exc = sys.exc_info()[1] # 2.5 compat
+            self.assertEqual(exc.faultCode, -32602)
+        else: # pragma: no cover
+            raise AssertionError
+
+    def test_introspection_in_multicall(self):
+        app = self._makeIntrospectionApp(self.config)
+        calls = [
+            {'methodName': 'system.methodHelp', 'params': ['add']},
+            {'methodName': 'system.methodSignature', 'params': ['add']},
+        ]
+        result = self._callFUT(app, 'system.multicall', (calls,))
+        self.assertEqual(result, [['Add two numbers.'],
+                                  [[['int', 'int', 'int']]]])
+
+    def test_introspection_prepared_on_commit(self):
+        from pyramid.config import Configurator
+        config = Configurator()
+        app = self._makeIntrospectionApp(config)
+        endpoint = app.app.registry.xmlrpc_endpoints['rpc']
+        snapshot = endpoint.introspection
+        self.assertTrue(('system.methodHelp', 'add') in snapshot)
+        self.assertEqual(self._callFUT(app, 'system.methodHelp', ('add',)),
+                         'Add two numbers.')
+        self.assertTrue(endpoint.introspection is snapshot)
+
+    def test_introspection_with_permissions(self):
+        from pyramid.security import NO_PERMISSION_REQUIRED
+        config = self.config
+        config.include('pyramid_rpc.xmlrpc')
+        config.set_default_permission('view')
+        config.add_xmlrpc_endpoint('rpc', '/api/xmlrpc')
+        config.add_xmlrpc_method(lambda r: 1, endpoint='rpc',
+                                 method='public',
+                                 permission=NO_PERMISSION_REQUIRED)
+        def admin(request):
+            """ Administer."""
+        config.add_xmlrpc_method(admin, endpoint='rpc', method='admin',
+                                 permission='admin')
+        policy = config.testing_securitypolicy(userid='bob',
+                                               permissive=False)
+        app = TestApp(config.make_wsgi_app())
+        endpoint = app.app.registry.xmlrpc_endpoints['rpc']
+        snapshot = endpoint.introspection
+        self.assertEqual(self._callFUT(app, 'system.listMethods', ()), [
+            'public', 'system.listMethods', 'system.methodHelp',
+            'system.methodSignature', 'system.multicall'])
+        for method in ('system.methodHelp', 'system.methodSignature'):
+            try:
+                self._callFUT(app, method, ('admin',))
+            except xmlrpclib.Fault:
+                exc = sys.exc_info()[1] # 2.5 compat
+                self.assertEqual(exc.faultCode, -32602)
+            else: # pragma: no cover
+                raise AssertionError
+        # the snapshot is only kept for callers permitted everything
+        self.assertTrue(endpoint.introspection is snapshot)
+        policy.permissive = True
+        self.assertEqual(self._callFUT(app, 'system.listMethods', ())[:2],
+                         ['admin', 'public'])
+        self.assertEqual(self._callFUT(app, 'system.methodHelp', ('admin',)),
+                         'Administer.')
+
+    def test_introspection_with_method_permitted_by_any_view(self):
+        config = self.config
+        config.include('pyramid_rpc.xmlrpc')
+        config.add_xmlrpc_endpoint('rpc', '/api/xmlrpc')
+        config.add_xmlrpc_method(lambda r: 1, endpoint='rpc',
+                                 method='dummy', permission='admin')
+        config.add_xmlrpc_method(lambda r: 2, endpoint='rpc',
+                                 method='dummy', request_param='x')
+        config.testing_securitypolicy(userid='bob', permissive=False)
+        app = TestApp(config.make_wsgi_app())
+        self.assertEqual(self._callFUT(app, 'system.listMethods', ())[0],
+                         'dummy')
+
+    def test_introspection_with_custom_renderer(self):
+        config = self.config
+        config.include('pyramid_rpc.xmlrpc')
+        config.add_renderer('other', DummyRenderer(('foo',)))
+        config.add_xmlrpc_endpoint('rpc', '/api/xmlrpc',
+                                   default_renderer='other')
+        app = TestApp(config.make_wsgi_app())
+        self.assertEqual(self._callFUT(app, 'system.listMethods', ()), 'foo')
+
     def test_it_with_general_exception(self):
         def view(request, a, b):
             raise Exception
@@ -317,6 +771,80 @@ class TestXMLRPCIntegration(unittest.TestCase):
         self.assertEqual(resp, val)
 
 
+class TestXMLRPCRenderer(unittest.TestCase):
+
+    def _callFUT(self, value, **kw):
+        from pyramid_rpc.xmlrpc import XMLRPCRenderer
+        renderer = XMLRPCRenderer(**kw)(None)
+        return renderer(value, {})
+
+    def test_static_fault(self):
+        from pyramid_rpc.xmlrpc import XmlRpcMethodNotFound
+        fault = XmlRpcMethodNotFound()
+        result = self._callFUT(fault)
+        self.assertEqual(result, xmlrpclib.dumps(fault, methodresponse=True))
+
+    def test_static_fault_with_encoding(self):
+        from pyramid_rpc.xmlrpc import XmlRpcParseError
+        result = self._callFUT(XmlRpcParseError(), encoding='iso-8859-1')
+        self.assertTrue('iso-8859-1' in result)
+
+    def test_modified_fault(self):
+        from pyramid_rpc.xmlrpc import XmlRpcApplicationError
+        fault = XmlRpcApplicationError()
+        fault.faultString = 'custom'
+        result = self._callFUT(fault)
+        self.assertTrue('custom' in result)
+
+    def test_same_as_dumps(self):
+        value = {'a': [1, 2.5, True, u'S\xe9<&>'], 'b': {}}
+        result = self._callFUT(value)
+        self.assertEqual(result, xmlrpclib.dumps((value,),
+                                                 methodresponse=True))
+
+    def test_use_i8(self):
+        result = self._callFUT(2 ** 40, use_i8=True)
+        self.assertEqual(xmlrpclib.loads(result)[0][0], 2 ** 40)
+
+    def test_chunk_size(self):
+        from pyramid_rpc.xmlrpc import XMLRPCRenderer
+        renderer = XMLRPCRenderer(chunk_size=256)(None)
+        request = testing.DummyRequest()
+        value = [{'id': i} for i in range(100)]
+        result = renderer(value, {'request': request})
+        self.assertEqual(result, None)
+        self.assertEqual(request.response.content_type, 'text/xml')
+        body = b''.join(request.response.app_iter)
+        self.assertEqual(xmlrpclib.loads(body)[0][0], value)
+
+    def test_file_is_streamed(self):
+        import io
+        from pyramid_rpc.xmlrpc import XMLRPCRenderer
+        renderer = XMLRPCRenderer()(None)
+        request = testing.DummyRequest()
+        result = renderer(io.BytesIO(b'data'), {'request': request})
+        self.assertEqual(result, None)
+        body = b''.join(request.response.app_iter)
+        self.assertEqual(xmlrpclib.loads(body)[0][0].data, b'data')
+
+    def test_instance_with_read_attribute_is_not_streamed(self):
+        from pyramid_rpc.xmlrpc import XMLRPCRenderer
+        class Message(object):
+            def __init__(self):
+                self.read = True
+        renderer = XMLRPCRenderer()(None)
+        request = testing.DummyRequest()
+        result = renderer(Message(), {'request': request})
+        self.assertEqual(xmlrpclib.loads(result)[0][0], {'read': True})
+
+    def test_chunk_size_fails_before_streaming(self):
+        from pyramid_rpc.xmlrpc import XMLRPCRenderer
+        renderer = XMLRPCRenderer(chunk_size=256)(None)
+        request = testing.DummyRequest()
+        self.assertRaises(TypeError, renderer, [object()],
+                          {'request': request})
+
+
 class DummyDecorator(object):
     called = False
 
@@ -0,0 +1,153 @@
+import datetime
+import unittest
+
+from pyramid_rpc.compat import xmlrpclib
+
+
+class Dummy(object):
+    def __init__(self):
+        self.a = 1
+        self.b = 'x<&>'
+
+
+class TestXmlRpcMarshaller(unittest.TestCase):
+
+    def _makeOne(self, **kw):
+        from pyramid_rpc.xmlrpcmarshaller import XmlRpcMarshaller
+        return XmlRpcMarshaller(**kw)
+
+    def _assertSameAsDumps(self, value, **kw):
+        expected = xmlrpclib.dumps((value,), methodresponse=True, **kw)
+        marshaller = self._makeOne(**kw)
+        self.assertEqual(marshaller.dumps(value), expected)
+        encoding = kw.get('encoding') or 'utf-8'
+        chunks = list(marshaller.iterdumps(value, chunk_size=16))
+        self.assertEqual(b''.join(chunks), expected.encode(encoding))
+
+    def test_scalars(self):
+        for value in (1, -2, 1.5, True, False, 'foo', '', u'S\xe9<&>'):
+            self._assertSameAsDumps(value)
+
+    def test_nested(self):
+        self._assertSameAsDumps(
+            {'a': [1, 2, {'b': [{}, []]}], 'c': {'d<': 'e'}, 'f': (1, 2)})
+
+    def test_binary_and_dates(self):
+        self._assertSameAsDumps([
+            b'abc' * 40,
+            bytearray(b'q'),
+            xmlrpclib.Binary(b'zz'),
+            datetime.datetime(2020, 1, 2, 3, 4, 5),
+            xmlrpclib.DateTime(0),
+        ])
+
+    def test_instance(self):
+        self._assertSameAsDumps([Dummy(), Dummy()])
+
+    def test_none(self):
+        self.assertRaises(TypeError, self._makeOne().dumps, None)
+        self._assertSameAsDumps([None, 1], allow_none=True)
+
+    def test_encoding(self):
+        self._assertSameAsDumps(u'S\xe9bastien', encoding='iso-8859-1')
+
+    def test_i8(self):
+        self.assertRaises(OverflowError, self._makeOne().dumps, 2 ** 40)
+        result = self._makeOne(use_i8=True).dumps([2 ** 40, 1])
+        self.assertTrue('<value><i8>1099511627776</i8></value>' in result)
+        self.assertEqual(xmlrpclib.loads(result)[0][0], [2 ** 40, 1])
+        self.assertRaises(OverflowError,
+                          self._makeOne(use_i8=True).dumps, 2 ** 64)
+
+    def test_fault(self):
+        fault = xmlrpclib.Fault(3, 'bad<')
+        marshaller = self._makeOne()
+        expected = xmlrpclib.dumps(fault, methodresponse=True)
+        self.assertEqual(marshaller.dumps(fault), expected)
+        self.assertEqual(b''.join(marshaller.iterdumps(fault)),
+                         expected.encode('utf-8'))
+
+    def test_unsupported(self):
+        class MyInt(int):
+            pass
+        marshaller = self._makeOne()
+        self.assertRaises(TypeError, marshaller.dumps, object())
+        self.assertRaises(TypeError, marshaller.dumps, [MyInt(1)])
+        self.assertRaises(TypeError, marshaller.dumps, {1: 2})
+        # the resolution is cached
+        self.assertRaises(TypeError, marshaller.dumps, [MyInt(1)])
+
+    def test_recursive(self):
+        l = [1]
+        l.append(l)
+        d = {}
+        d['d'] = d
+        marshaller = self._makeOne()
+        self.assertRaises(TypeError, marshaller.dumps, l)
+        self.assertRaises(TypeError, marshaller.dumps, d)
+        self.assertRaises(TypeError, list, marshaller.iterdumps(l))
+
+    def test_iterdumps_chunks(self):
+        value = [{'id': i, 'name': 'row %d' % i} for i in range(100)]
+        chunks = list(self._makeOne().iterdumps(value, chunk_size=1024))
+        self.assertTrue(len(chunks) > 1)
+        for chunk in chunks[:-1]:
+            self.assertTrue(len(chunk) >= 1024)
+        self.assertEqual(xmlrpclib.loads(b''.join(chunks))[0][0], value)
+
+    def test_file(self):
+        import io
+        data = bytes(bytearray(range(256))) * 1000
+        expected = xmlrpclib.dumps(([xmlrpclib.Binary(data), 1],),
+                                   methodresponse=True)
+        marshaller = self._makeOne()
+        f = io.BytesIO(data)
+        self.assertEqual(marshaller.dumps([f, 1]), expected)
+        self.assertTrue(f.closed)
+        chunks = list(marshaller.iterdumps([io.BytesIO(data), 1]))
+        self.assertEqual(b''.join(chunks), expected.encode('utf-8'))
+        # the file is encoded a block at a time
+        self.assertTrue(len(chunks) > 3)
+        self.assertTrue(max(len(chunk) for chunk in chunks) < 80 * 1024)
+
+    def test_file_with_short_reads(self):
+        import io
+        class ShortReader(io.RawIOBase):
+            def __init__(self, data):
+                self.data = io.BytesIO(data)
+            def readable(self):
+                return True
+            def read(self, size=-1):
+                return self.data.read(min(size, 1000))
+        data = b'x' * 100000
+        expected = xmlrpclib.dumps((xmlrpclib.Binary(data),),
+                                   methodresponse=True)
+        marshaller = self._makeOne()
+        result = b''.join(marshaller.iterdumps(ShortReader(data)))
+        self.assertEqual(result, expected.encode('utf-8'))
+
+    def test_instance_with_read_attribute(self):
+        class Book(object):
+            def __init__(self):
+                self.title = 'title'
+                self.read = True
+        value = Book()
+        expected = xmlrpclib.dumps((value,), methodresponse=True)
+        marshaller = self._makeOne()
+        self.assertEqual(marshaller.dumps(value), expected)
+        self.assertEqual(b''.join(marshaller.iterdumps(value)),
+                         expected.encode('utf-8'))
+
+    def test_mmap_and_memoryview(self):
+        import mmap
+        import tempfile
+        data = b'mapped data'
+        expected = xmlrpclib.dumps(([xmlrpclib.Binary(data)] * 2,),
+                                   methodresponse=True)
+        with tempfile.TemporaryFile() as f:
+            f.write(data)
+            f.flush()
+            mapped = mmap.mmap(f.fileno(), 0)
+            result = self._makeOne().dumps([mapped, memoryview(data)])
+        self.assertEqual(result, expected)
+        self.assertTrue(mapped.closed)
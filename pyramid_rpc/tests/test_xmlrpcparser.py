@@ -0,0 +1,130 @@
+import datetime
+import io
+import unittest
+
+from pyramid_rpc.compat import xmlrpclib
+
+
+class TestXmlRpcParser(unittest.TestCase):
+
+    def _makeOne(self, **kw):
+        from pyramid_rpc.xmlrpcparser import XmlRpcParser
+        return XmlRpcParser(**kw)
+
+    def _dumps(self, params, method='dummy', **kw):
+        return xmlrpclib.dumps(params, methodname=method, **kw).encode('utf-8')
+
+    def _assertSameAsLoads(self, body, **kw):
+        expected = xmlrpclib.loads(body)
+        parser = self._makeOne(**kw)
+        self.assertEqual(parser.loads(body), expected)
+        self.assertEqual(parser.load(io.BytesIO(body)), expected)
+
+    def test_scalars(self):
+        body = self._dumps((1, -2, 1.5, True, False, 'foo', '',
+                            u'S\xe9bastien'))
+        self._assertSameAsLoads(body)
+
+    def test_nested(self):
+        params = ({'a': [1, 2, {'b': [{}, []]}], 'c': {'d': 'e'}},
+                  [[1], [2, [3]]])
+        self._assertSameAsLoads(self._dumps(params))
+
+    def test_binary_and_datetime(self):
+        params = (xmlrpclib.Binary(b'\x00\x01binary'),
+                  xmlrpclib.DateTime(datetime.datetime(2016, 1, 2, 3, 4, 5)))
+        body = self._dumps(params)
+        parser = self._makeOne()
+        result, method = parser.loads(body)
+        self.assertEqual(method, 'dummy')
+        self.assertEqual(result[0].data, b'\x00\x01binary')
+        self.assertEqual(result[1].value, '20160102T03:04:05')
+
+    def test_nil_and_untyped_value(self):
+        body = (b'<?xml version="1.0"?><methodCall>'
+                b'<methodName>foo</methodName><params>'
+                b'<param><value>untyped</value></param>'
+                b'<param><value><nil/></value></param>'
+                b'<param><value><ex:i8 xmlns:ex="x">10</ex:i8></value></param>'
+                b'</params></methodCall>')
+        self._assertSameAsLoads(body)
+
+    def test_no_params(self):
+        self._assertSameAsLoads(self._dumps(()))
+
+    def test_small_chunks(self):
+        body = self._dumps(({'a': 'x' * 100, 'b': [1, 2, 3]},))
+        parser = self._makeOne(chunk_size=7)
+        self.assertEqual(parser.load(io.BytesIO(body)), xmlrpclib.loads(body))
+
+    def test_malformed(self):
+        from pyramid_rpc.xmlrpcparser import XmlRpcParserError
+        parser = self._makeOne()
+        self.assertRaises(XmlRpcParserError, parser.loads, b'<')
+        self.assertRaises(XmlRpcParserError, parser.loads,
+                          b'<methodCall><params><param><value><int>x</int>'
+                          b'</value></param></params></methodCall>')
+        self.assertRaises(XmlRpcParserError, parser.loads,
+                          b'<methodCall><params><param><value><bogus/>'
+                          b'</value></param></params></methodCall>')
+        self.assertRaises(XmlRpcParserError, parser.loads, b'<foo/>')
+
+    def test_fault(self):
+        from pyramid_rpc.xmlrpcparser import XmlRpcParserError
+        body = xmlrpclib.dumps(xmlrpclib.Fault(1, 'foo')).encode('utf-8')
+        self.assertRaises(XmlRpcParserError, self._makeOne().loads, body)
+
+    def test_doctype(self):
+        from pyramid_rpc.xmlrpcparser import XmlRpcParserError
+        body = (b'<?xml version="1.0"?><!DOCTYPE foo [<!ENTITY a "b">]>'
+                b'<methodCall><methodName>&a;</methodName></methodCall>')
+        self.assertRaises(XmlRpcParserError, self._makeOne().loads, body)
+
+    def test_max_depth(self):
+        from pyramid_rpc.xmlrpcparser import XmlRpcParserLimitError
+        body = self._dumps(([[[1]]],))
+        self._assertSameAsLoads(body, max_depth=3)
+        parser = self._makeOne(max_depth=2)
+        self.assertRaises(XmlRpcParserLimitError, parser.loads, body)
+
+    def test_max_elements(self):
+        from pyramid_rpc.xmlrpcparser import XmlRpcParserLimitError
+        body = self._dumps(([1, 2, 3, 4],))
+        parser = self._makeOne(max_elements=10)
+        self.assertRaises(XmlRpcParserLimitError, parser.loads, body)
+
+    def test_max_string_size(self):
+        from pyramid_rpc.xmlrpcparser import XmlRpcParserLimitError
+        body = self._dumps(('x' * 10,))
+        self._assertSameAsLoads(body, max_string_size=10)
+        parser = self._makeOne(max_string_size=9)
+        self.assertRaises(XmlRpcParserLimitError, parser.loads, body)
+        self.assertRaises(XmlRpcParserLimitError,
+                          parser.load, io.BytesIO(body))
+
+    def test_spool_threshold(self):
+        import tempfile
+        data = bytes(bytearray(range(256))) * 100
+        params = (xmlrpclib.Binary(data), xmlrpclib.Binary(b'small'))
+        body = self._dumps(params)
+        parser = self._makeOne(spool_threshold=1024, chunk_size=100)
+        result, method = parser.load(io.BytesIO(body))
+        self.assertTrue(isinstance(result[0], tempfile.SpooledTemporaryFile))
+        self.assertEqual(result[0].read(), data)
+        self.assertEqual(result[1].data, b'small')
+
+    def test_spool_threshold_with_invalid_base64(self):
+        from pyramid_rpc.xmlrpcparser import XmlRpcParserError
+        parser = self._makeOne(spool_threshold=4)
+        for value in (b'QUJD!EFC', b'QUJDREFCQ'):
+            body = (b'<?xml version="1.0"?><methodCall>'
+                    b'<methodName>foo</methodName><params><param><value>'
+                    b'<base64>' + value + b'</base64>'
+                    b'</value></param></params></methodCall>')
+            self.assertRaises(XmlRpcParserError, parser.loads, body)
+
+    def test_spool_threshold_with_max_string_size(self):
+        from pyramid_rpc.xmlrpcparser import XmlRpcParserLimitError
+        body = self._dumps((xmlrpclib.Binary(b'x' * 1000),))
+        parser = self._makeOne(spool_threshold=10, max_string_size=100)
+        self.assertRaises(XmlRpcParserLimitError, parser.loads, body)
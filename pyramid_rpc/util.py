@@ -1,3 +1,17 @@
+import collections
+import random
+import threading
+import time
+
+from pyramid.interfaces import IDefaultPermission
+from pyramid.interfaces import IRequest
+from pyramid.interfaces import IRootFactory
+from pyramid.request import apply_request_extensions
+from pyramid.security import NO_PERMISSION_REQUIRED
+from pyramid.traversal import DefaultRootFactory
+from zope.interface import alsoProvides
+
+
 # stole from pyramid 1.4
 def combine(*decorators):
     def decorated(view_callable):
@@ -6,3 +20,312 @@ def combine(*decorators):
             view_callable = decorator(view_callable)
         return view_callable
     return decorated
+
+
+def clone_request(request, rpc, context=None):
+    """ Make a new request for another call made through ``request``, such
+    as one running concurrently in another thread, with ``rpc`` as its
+    call.
+
+    The new request is made by the request factory from a copy of the
+    environ, with the request extensions applied, and only shares the
+    matched route of the original request. Attributes computed lazily, such
+    as a database session or the authenticated user, are computed anew
+    rather than shared with a request which may finish in the meantime.
+
+    The ``context`` of the new request is created by the factory of the
+    route, or the root factory, unless one is given.
+
+    """
+    environ = request.environ.copy()
+    # ad hoc attributes of webob requests are stored in the environ
+    environ.pop('webob.adhoc_attrs', None)
+    registry = request.registry
+    subrequest = request.__class__(environ)
+    subrequest.registry = registry
+    subrequest.matchdict = request.matchdict
+    subrequest.matched_route = request.matched_route
+    request_iface = getattr(request, 'request_iface', IRequest)
+    subrequest.request_iface = request_iface
+    if request_iface is not IRequest:
+        alsoProvides(subrequest, request_iface)
+    apply_request_extensions(subrequest)
+    subrequest.rpc = rpc
+    if context is None:
+        factory = getattr(request.matched_route, 'factory', None)
+        if factory is None:
+            factory = registry.queryUtility(
+                IRootFactory, default=DefaultRootFactory)
+        context = factory(subrequest)
+    subrequest.context = context
+    return subrequest
+
+
+def forbidden_methods(request, endpoint):
+    """ Return the names of the methods of ``endpoint`` which the caller
+    of ``request`` is not permitted to call.
+
+    ``endpoint.method_permissions`` maps each method to the permissions of
+    its views, ``None`` standing for the default permission. A method is
+    permitted when any of its views is.
+
+    """
+    default = request.registry.queryUtility(IDefaultPermission)
+    forbidden = set()
+    for method, permissions in endpoint.method_permissions.items():
+        for permission in permissions:
+            if permission is None:
+                permission = default
+            if (
+                permission is None or
+                permission == NO_PERMISSION_REQUIRED or
+                request.has_permission(permission, request.context)
+            ):
+                break
+        else:
+            forbidden.add(method)
+    return forbidden
+
+
+def parse_qualities(header):
+    """ Parse a header listing values with optional quality parameters,
+    such as ``Accept`` or ``Accept-Encoding``, into a dict mapping each
+    lowercased value to its quality."""
+    qualities = {}
+    for item in header.split(','):
+        params = item.split(';')
+        value = params[0].strip().lower()
+        if not value:
+            continue
+        quality = 1.0
+        for param in params[1:]:
+            name, _, q = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(q)
+                except ValueError:
+                    quality = 0.0
+        qualities[value] = quality
+    return qualities
+
+
+class ExceptionLogLimiter(object):
+    """ Sample and rate limit the logging of unexpected exceptions.
+
+    Every ``(method, exception type)`` pair is limited independently.
+
+    ``rate``
+
+        The number of exceptions per second that may be logged for each
+        pair. The default, ``None``, does not limit the rate.
+
+    ``burst``
+
+        The number of exceptions that may be logged in a burst before the
+        ``rate`` applies. Defaults to ``rate``, but at least 1.
+
+    ``sample``
+
+        The fraction of the exceptions, between 0 and 1, which are
+        considered for logging at all. Defaults to 1.
+
+    ``summary_interval``
+
+        The minimum number of seconds between summaries of the suppressed
+        exceptions. Defaults to 60. The endpoints log the summary on the
+        first request after the interval elapsed, whether or not it fails.
+
+    ``methods``
+
+        A dictionary mapping method names to a dictionary overriding any
+        of ``rate``, ``burst`` and ``sample`` for that method.
+
+    ``exceptions``
+
+        A dictionary mapping exception classes to a dictionary overriding
+        any of ``rate``, ``burst`` and ``sample`` for those exceptions,
+        including subclasses. Method overrides take precedence.
+
+    """
+    def __init__(self, rate=None, burst=None, sample=1.0,
+                 summary_interval=60.0, methods=None, exceptions=None,
+                 clock=time.time, random=random.random):
+        self.default = self._make_rule(
+            dict(rate=rate, burst=burst, sample=sample))
+        self.summary_interval = summary_interval
+        self.methods = dict(
+            (k, self._make_rule(v)) for k, v in (methods or {}).items())
+        self.exceptions = dict(
+            (k, self._make_rule(v)) for k, v in (exceptions or {}).items())
+        self.clock = clock
+        self.random = random
+        self.buckets = {}
+        self.suppressed = {}
+        self.last_summary = clock()
+        self.lock = threading.Lock()
+
+    def _make_rule(self, options):
+        rate = options.get('rate')
+        burst = options.get('burst')
+        if burst is None:
+            burst = max(rate or 0, 1)
+        return rate, burst, options.get('sample', 1.0)
+
+    def _find_rule(self, method, exc_class):
+        rule = self.methods.get(method)
+        if rule is None and self.exceptions:
+            for cls in exc_class.__mro__:
+                rule = self.exceptions.get(cls)
+                if rule is not None:
+                    break
+        return rule or self.default
+
+    def allow(self, method, exc):
+        """ Return ``True`` if ``exc`` raised by ``method`` should be logged,
+        otherwise count it as suppressed."""
+        exc_class = exc.__class__
+        rate, burst, sample = self._find_rule(method, exc_class)
+        key = (method, exc_class.__name__)
+        allowed = sample >= 1 or self.random() < sample
+        with self.lock:
+            if allowed and rate is not None:
+                now = self.clock()
+                tokens, last = self.buckets.get(key, (burst, now))
+                tokens = min(burst, tokens + (now - last) * rate)
+                allowed = tokens >= 1
+                if allowed:
+                    tokens -= 1
+                self.buckets[key] = (tokens, now)
+            if not allowed:
+                self.suppressed[key] = self.suppressed.get(key, 0) + 1
+        return allowed
+
+    def summarize(self):
+        """ Return a summary line of the exceptions suppressed since the
+        last summary, or ``None`` if there are none or it is not yet time
+        for another summary."""
+        now = self.clock()
+        if now - self.last_summary < self.summary_interval:
+            return None
+        with self.lock:
+            suppressed, self.suppressed = self.suppressed, {}
+            self.last_summary = now
+        if not suppressed:
+            return None
+        return 'suppressed %d exception logs: %s' % (
+            sum(suppressed.values()),
+            ', '.join('%s:%s=%d' % (method, name, count)
+                      for (method, name), count in sorted(
+                          suppressed.items(), key=str)))
+
+
+class IdempotencyTimeout(Exception):
+    """ Raised by :meth:`IdempotencyCache.acquire` when the call holding a
+    key does not finish within the cache's ``wait_timeout``."""
+
+
+class IdempotencyCache(object):
+    """ A bounded store of finished responses keyed by an idempotency key,
+    used to answer retries of a call without running it again.
+
+    ``ttl``
+
+        The number of seconds a finished response is kept. Defaults to
+        300.
+
+    ``max_entries``
+
+        The maximum number of finished responses kept, the oldest are
+        discarded first. Defaults to 10000.
+
+    ``wait_timeout``
+
+        The maximum number of seconds a duplicate waits for the call
+        holding its key to finish before :class:`IdempotencyTimeout` is
+        raised. ``None`` waits forever. Defaults to 30.
+
+    ``header``
+
+        The name of the request header containing the key. Defaults to
+        ``Idempotency-Key``.
+
+    ``field``
+
+        The name of a member of the request object which may contain the
+        key instead, for protocols which support it. Defaults to
+        ``idempotency_key``.
+
+    """
+    def __init__(self, ttl=300, max_entries=10000, wait_timeout=30,
+                 header='Idempotency-Key', field='idempotency_key',
+                 clock=time.time):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.wait_timeout = wait_timeout
+        self.header = header
+        self.field = field
+        self.clock = clock
+        # key -> (expires, value) of finished calls, oldest first
+        self.entries = collections.OrderedDict()
+        # key -> threading.Event of calls in progress
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, key):
+        """ Look up ``key``, returning a ``(found, value)`` tuple.
+
+        If a call with this key has finished, ``found`` is ``True`` and
+        ``value`` is its stored value. If a call with this key is in
+        progress, wait for it to finish first. Otherwise the caller now
+        holds the key and ``(False, None)`` is returned. The caller must
+        then pass it to either :meth:`complete` or :meth:`abandon`.
+
+        """
+        deadline = None
+        if self.wait_timeout is not None:
+            deadline = self.clock() + self.wait_timeout
+        while True:
+            with self.lock:
+                entry = self.entries.get(key)
+                if entry is not None:
+                    if entry[0] > self.clock():
+                        return True, entry[1]
+                    del self.entries[key]
+                event = self.pending.get(key)
+                if event is None:
+                    self.pending[key] = threading.Event()
+                    return False, None
+            timeout = None
+            if deadline is not None:
+                timeout = max(deadline - self.clock(), 0)
+            if not event.wait(timeout):
+                raise IdempotencyTimeout(key)
+
+    def complete(self, key, value):
+        """ Store ``value`` as the result of the call holding ``key`` and
+        release any duplicates waiting for it."""
+        with self.lock:
+            event = self.pending.pop(key, None)
+            entries = self.entries
+            entries.pop(key, None)
+            now = self.clock()
+            entries[key] = (now + self.ttl, value)
+            while entries:
+                oldest = next(iter(entries))
+                if (
+                    len(entries) <= self.max_entries and
+                    entries[oldest][0] > now
+                ):
+                    break
+                del entries[oldest]
+        if event is not None:
+            event.set()
+
+    def abandon(self, key):
+        """ Release ``key`` without storing a result, such as when the call
+        failed. Waiting duplicates retry and one of them will hold the
+        key."""
+        with self.lock:
+            event = self.pending.pop(key, None)
+        if event is not None:
+            event.set()
@@ -0,0 +1,442 @@
+"""Serve JSON-RPC endpoints over WebSocket connections.
+
+A minimal `RFC 6455 <https://tools.ietf.org/html/rfc6455>`_ server handing
+the messages of each connection to a
+:class:`~pyramid_rpc.connection.JsonRpcConnection`, which calls the
+endpoint's methods without the overhead of an HTTP request per call.
+
+"""
+import base64
+import hashlib
+import io
+import logging
+import os
+import socket
+import struct
+import threading
+
+from .compat import BaseHTTPRequestHandler
+from .compat import PY3
+from .compat import socketserver
+from .compat import text_type
+from .compat import url_unquote
+from .compat import urlsplit
+from .connection import JsonRpcConnection
+
+log = logging.getLogger(__name__)
+
+GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+OP_CONTINUATION = 0x0
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+CLOSE_NORMAL = 1000
+CLOSE_PROTOCOL_ERROR = 1002
+CLOSE_INVALID_DATA = 1007
+CLOSE_TOO_BIG = 1009
+
+
+class WebSocketError(Exception):
+    """ Raised when a peer violates the protocol, ``code`` is the status
+    the connection is closed with."""
+    def __init__(self, code, reason=''):
+        Exception.__init__(self, code, reason)
+        self.code = code
+        self.reason = reason
+
+
+def accept_key(key):
+    """ Return the ``Sec-WebSocket-Accept`` value answering the
+    ``Sec-WebSocket-Key`` ``key`` of a handshake."""
+    digest = hashlib.sha1((key.strip() + GUID).encode('ascii')).digest()
+    return base64.b64encode(digest).decode('ascii')
+
+
+def _mask(payload, key):
+    """ Apply the 4 byte mask ``key`` to ``payload``."""
+    size = len(payload)
+    key = (key * (size // 4 + 1))[:size]
+    if PY3:
+        # a single xor of big integers is much faster than a loop
+        value = int.from_bytes(payload, 'big') ^ int.from_bytes(key, 'big')
+        return value.to_bytes(size, 'big')
+    data = bytearray(payload)  # pragma: no cover
+    for i, byte in enumerate(bytearray(key)):
+        data[i] ^= byte
+    return bytes(data)
+
+
+def encode_frame(opcode, payload, fin=True, mask_key=None):
+    """ Encode a frame. Servers send unmasked frames while clients pass a
+    random 4 byte ``mask_key``."""
+    size = len(payload)
+    head = (0x80 if fin else 0) | opcode
+    mask_bit = 0x80 if mask_key is not None else 0
+    if size < 126:
+        header = struct.pack('!BB', head, mask_bit | size)
+    elif size < 0x10000:
+        header = struct.pack('!BBH', head, mask_bit | 126, size)
+    else:
+        header = struct.pack('!BBQ', head, mask_bit | 127, size)
+    if mask_key is not None:
+        return header + mask_key + _mask(payload, mask_key)
+    return header + payload
+
+
+def _read_exactly(rfile, size):
+    data = rfile.read(size)
+    if len(data) != size:
+        raise EOFError
+    return data
+
+
+def read_frame(rfile, max_size=None, masked=True):
+    """ Read a frame from ``rfile``, returning ``(fin, opcode, payload)``.
+
+    Frames received by a server must be ``masked``. ``EOFError`` is raised
+    when the connection is closed mid frame.
+
+    """
+    head, length = struct.unpack('!BB', _read_exactly(rfile, 2))
+    if head & 0x70:
+        raise WebSocketError(CLOSE_PROTOCOL_ERROR, 'reserved bits set')
+    if bool(length & 0x80) != masked:
+        raise WebSocketError(CLOSE_PROTOCOL_ERROR, 'bad masking')
+    fin = bool(head & 0x80)
+    opcode = head & 0x0F
+    size = length & 0x7F
+    if opcode >= OP_CLOSE and (size > 125 or not fin):
+        raise WebSocketError(CLOSE_PROTOCOL_ERROR, 'bad control frame')
+    if size == 126:
+        size, = struct.unpack('!H', _read_exactly(rfile, 2))
+    elif size == 127:
+        size, = struct.unpack('!Q', _read_exactly(rfile, 8))
+    if max_size is not None and size > max_size:
+        raise WebSocketError(CLOSE_TOO_BIG, 'message too big')
+    mask_key = _read_exactly(rfile, 4) if masked else None
+    payload = _read_exactly(rfile, size)
+    if mask_key is not None:
+        payload = _mask(payload, mask_key)
+    return fin, opcode, payload
+
+
+class WebSocket(object):
+    """ A WebSocket connection over the established streams ``rfile`` and
+    ``wfile``, after the opening handshake.
+
+    ``max_message_size``
+
+        Messages larger than this many bytes, including fragmented
+        messages, close the connection with status 1009.
+
+    Messages may be sent from any thread.
+
+    """
+    def __init__(self, rfile, wfile, max_message_size=1024 * 1024,
+                 masked=True):
+        self.rfile = rfile
+        self.wfile = wfile
+        self.max_message_size = max_message_size
+        # servers expect masked frames, clients unmasked frames
+        self.masked = masked
+        self.write_lock = threading.Lock()
+        self.closed = False
+
+    def write_frame(self, opcode, payload):
+        mask_key = None
+        if not self.masked:
+            # a client masking its frames
+            mask_key = os.urandom(4)
+        frame = encode_frame(opcode, payload, mask_key=mask_key)
+        with self.write_lock:
+            if self.closed:
+                return
+            self.wfile.write(frame)
+            self.wfile.flush()
+
+    def send(self, message):
+        """ Send ``message`` in a text frame when it is text, otherwise in
+        a binary frame."""
+        if isinstance(message, text_type):
+            self.write_frame(OP_TEXT, message.encode('utf-8'))
+        else:
+            self.write_frame(OP_BINARY, message)
+
+    def send_text(self, data):
+        """ Send the UTF-8 encoded bytes ``data`` in a text frame."""
+        self.write_frame(OP_TEXT, data)
+
+    def close(self, code=CLOSE_NORMAL, reason=''):
+        """ Send a close frame, no further messages are sent."""
+        payload = struct.pack('!H', code) + reason.encode('utf-8')
+        try:
+            self.write_frame(OP_CLOSE, payload)
+        except (IOError, OSError):
+            pass
+        self.closed = True
+
+    def receive(self):
+        """ Return the next message, as text for text messages and bytes
+        for binary messages, or ``None`` once the connection is closed.
+
+        Pings are answered while waiting. A protocol violation closes the
+        connection with the appropriate status.
+
+        """
+        try:
+            return self._receive()
+        except WebSocketError as ex:
+            log.debug('websocket error %s "%s"', ex.code, ex.reason)
+            self.close(ex.code, ex.reason)
+        except (EOFError, IOError, OSError):
+            self.closed = True
+        return None
+
+    def _receive(self):
+        opcode = None
+        fragments = []
+        size = 0
+        while True:
+            fin, frame_opcode, payload = read_frame(
+                self.rfile, self.max_message_size, masked=self.masked)
+            if frame_opcode == OP_PING:
+                self.write_frame(OP_PONG, payload)
+                continue
+            if frame_opcode == OP_PONG:
+                continue
+            if frame_opcode == OP_CLOSE:
+                code = CLOSE_NORMAL
+                if len(payload) >= 2:
+                    code, = struct.unpack('!H', payload[:2])
+                self.close(code)
+                return None
+            if frame_opcode == OP_CONTINUATION:
+                if opcode is None:
+                    raise WebSocketError(
+                        CLOSE_PROTOCOL_ERROR, 'unexpected continuation')
+            elif frame_opcode in (OP_TEXT, OP_BINARY):
+                if opcode is not None:
+                    raise WebSocketError(
+                        CLOSE_PROTOCOL_ERROR, 'expected continuation')
+                opcode = frame_opcode
+            else:
+                raise WebSocketError(CLOSE_PROTOCOL_ERROR, 'unknown opcode')
+            size += len(payload)
+            if (
+                self.max_message_size is not None and
+                size > self.max_message_size
+            ):
+                raise WebSocketError(CLOSE_TOO_BIG, 'message too big')
+            fragments.append(payload)
+            if fin:
+                break
+        message = b''.join(fragments)
+        if opcode == OP_TEXT:
+            try:
+                message = message.decode('utf-8')
+            except UnicodeDecodeError:
+                raise WebSocketError(CLOSE_INVALID_DATA, 'invalid utf-8')
+        return message
+
+
+class WebSocketHandler(BaseHTTPRequestHandler):
+    """ Answer the opening handshake of a connection and serve it to a
+    :class:`~pyramid_rpc.connection.JsonRpcConnection`."""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        log.debug(format, *args)
+
+    def make_environ(self):
+        """ Return the WSGI environ of the handshake request."""
+        path, _, query = self.path.partition('?')
+        host, port = self.server.server_address[:2]
+        environ = {
+            'REQUEST_METHOD': self.command,
+            'SCRIPT_NAME': '',
+            'PATH_INFO': url_unquote(path),
+            'QUERY_STRING': query,
+            'SERVER_NAME': str(host),
+            'SERVER_PORT': str(port),
+            'SERVER_PROTOCOL': self.request_version,
+            'REMOTE_ADDR': self.client_address[0],
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': io.BytesIO(),
+            'wsgi.errors': io.StringIO(),
+            'wsgi.version': (1, 0),
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for name, value in self.headers.items():
+            key = name.upper().replace('-', '_')
+            if key not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                key = 'HTTP_' + key
+            environ[key] = value
+        return environ
+
+    def refuse(self, status, reason):
+        self.close_connection = True
+        self.send_error(status, reason)
+
+    def origin_allowed(self):
+        """ Return whether the ``Origin`` of the handshake may open a
+        connection, see :func:`make_server`."""
+        origin = self.headers.get('Origin')
+        if origin is None:
+            # not sent by a browser
+            return True
+        origin = origin.rstrip('/').lower()
+        allowed = self.server.allowed_origins
+        if allowed is None:
+            host = self.headers.get('Host', '').lower()
+            return urlsplit(origin).netloc == host
+        return '*' in allowed or origin in allowed
+
+    def do_GET(self):
+        headers = self.headers
+        key = headers.get('Sec-WebSocket-Key')
+        if (
+            'websocket' not in headers.get('Upgrade', '').lower() or
+            'upgrade' not in headers.get('Connection', '').lower() or
+            key is None
+        ):
+            self.refuse(426, 'WebSocket upgrade required')
+            return
+        if headers.get('Sec-WebSocket-Version') != '13':
+            self.close_connection = True
+            self.send_response(426)
+            self.send_header('Sec-WebSocket-Version', '13')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if not self.origin_allowed():
+            log.debug('websocket origin "%s" refused',
+                      self.headers.get('Origin'))
+            self.refuse(403, 'Origin not allowed')
+            return
+
+        server = self.server
+        websocket = WebSocket(
+            self.rfile, self.wfile,
+            max_message_size=server.max_message_size)
+        try:
+            connection = JsonRpcConnection(
+                server.app, self.make_environ(), websocket.send_text,
+                executor=server.executor, max_pending=server.max_pending)
+        except LookupError:
+            self.refuse(404, 'No JSON-RPC endpoint')
+            return
+
+        self.send_response(101)
+        self.send_header('Upgrade', 'websocket')
+        self.send_header('Connection', 'Upgrade')
+        self.send_header('Sec-WebSocket-Accept', accept_key(key))
+        self.end_headers()
+        self.wfile.flush()
+        self.close_connection = True
+
+        server.connections.add(connection)
+        try:
+            while True:
+                message = websocket.receive()
+                if message is None:
+                    break
+                connection.handle(message)
+        finally:
+            connection.close()
+            server.connections.discard(connection)
+
+
+class WebSocketServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    """ A threaded server serving the JSON-RPC endpoints of a Pyramid
+    ``app`` over WebSocket connections, see :func:`make_server`."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, server_address, app, executor=None,
+                 max_message_size=1024 * 1024, allowed_origins=None,
+                 max_pending=None):
+        socketserver.TCPServer.__init__(
+            self, server_address, WebSocketHandler)
+        self.app = app
+        self.executor = executor
+        self.max_message_size = max_message_size
+        if allowed_origins is not None:
+            allowed_origins = frozenset(
+                origin.rstrip('/').lower() for origin in allowed_origins)
+        self.allowed_origins = allowed_origins
+        self.max_pending = max_pending
+        # the open connections
+        self.connections = set()
+
+    def notify_all(self, method, params=None):
+        """ Send a notification to every open connection."""
+        for connection in list(self.connections):
+            connection.notify(method, params)
+
+    def server_close(self):
+        socketserver.TCPServer.server_close(self)
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+
+    def handle_error(self, request, client_address):
+        log.debug('websocket connection error', exc_info=True)
+
+    def shutdown_request(self, request):
+        try:
+            request.shutdown(socket.SHUT_WR)
+        except (IOError, OSError):
+            pass
+        self.close_request(request)
+
+
+def make_server(host, port, app, workers=10, max_message_size=1024 * 1024,
+                allowed_origins=None, max_pending=100):
+    """ Create a :class:`WebSocketServer` listening on ``host`` and
+    ``port`` for the JSON-RPC endpoints of the Pyramid ``app``, usually the
+    result of :meth:`pyramid.config.Configurator.make_wsgi_app`.
+
+    ``workers``
+
+        The number of threads shared by all connections to run calls
+        concurrently. The responses of a connection's calls are sent as
+        they complete, identified by their id. With ``0`` the calls of a
+        connection are run one after another as they are received.
+
+    ``max_message_size``
+
+        The maximum size in bytes of a message received from a client.
+
+    ``allowed_origins``
+
+        The origins, such as ``'https://example.com'``, of the web pages
+        allowed to open connections, or ``['*']`` to allow any. Handshakes
+        whose ``Origin`` header is not allowed are refused with a
+        ``403 Forbidden`` response, as browsers send the cookies of the
+        server along with the handshake of any page. By default only pages
+        of the same origin as the server, according to the ``Host`` header,
+        are allowed. Clients other than browsers send no ``Origin`` and are
+        always allowed.
+
+    ``max_pending``
+
+        The maximum number of calls of a connection waiting for, or running
+        on, the ``workers``. Further messages are not read from the
+        connection until a call completes. Defaults to 100.
+
+    Start it with ``serve_forever()``.
+
+    """
+    executor = None
+    if workers:
+        from concurrent.futures import ThreadPoolExecutor
+        executor = ThreadPoolExecutor(workers)
+    return WebSocketServer(
+        (host, port), app, executor=executor,
+        max_message_size=max_message_size, allowed_origins=allowed_origins,
+        max_pending=max_pending)
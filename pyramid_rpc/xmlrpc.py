@@ -1,18 +1,43 @@
+import functools
+import inspect
+import itertools
 import logging
 
 import venusian
 from pyramid.exceptions import ConfigurationError
 from pyramid.httpexceptions import HTTPNotFound
+from pyramid.interfaces import IRendererFactory
+from pyramid.interfaces import IRouteRequest
+from pyramid.interfaces import IView
+from pyramid.interfaces import IViewClassifier
+from pyramid.interfaces import PHASE3_CONFIG
+from pyramid.renderers import RendererHelper
+from pyramid.renderers import null_renderer
 from pyramid.security import NO_PERMISSION_REQUIRED
+from pyramid.threadlocal import manager
+from zope.interface import Interface
+from zope.interface import providedBy
 
+from .call import RpcCall
+from .call import attach_call
 from .compat import (
     PY3,
     is_nonstr_iter,
+    string_types,
     xmlrpclib,
 )
+from .compression import DecompressionError
+from .compression import DecompressionLimitError
 from .mapper import MapplyViewMapper
 from .mapper import ViewMapperArgsInvalid
+from .util import clone_request
 from .util import combine
+from .util import forbidden_methods
+from .xmlrpcmarshaller import XmlRpcMarshaller
+from .xmlrpcmarshaller import is_file
+from .xmlrpcparser import XmlRpcParser
+from .xmlrpcparser import XmlRpcParserError
+from .xmlrpcparser import XmlRpcParserLimitError
 
 
 log = logging.getLogger(__name__)
@@ -23,6 +48,11 @@ _marker = object()
 
 DEFAULT_RENDERER = "xmlrpc"
 
+MULTICALL_METHOD = 'system.multicall'
+LIST_METHODS_METHOD = 'system.listMethods'
+METHOD_SIGNATURE_METHOD = 'system.methodSignature'
+METHOD_HELP_METHOD = 'system.methodHelp'
+
 
 class XmlRpcError(xmlrpclib.Fault):
     faultCode = None
@@ -52,9 +82,48 @@ class XmlRpcParseError(XmlRpcError):
     faultString = 'parse error; not well formed'
 
 
+class XmlRpcRequestInvalid(XmlRpcError):
+    faultCode = -32600
+    faultString = 'server error; invalid xml-rpc; not conforming to spec'
+
+
+# faults with a fixed representation whose bodies can be prepared up front
+STATIC_FAULTS = (
+    XmlRpcApplicationError,
+    XmlRpcMethodNotFound,
+    XmlRpcInvalidMethodParams,
+    XmlRpcParseError,
+    XmlRpcRequestInvalid,
+)
+
+
 class XMLRPCRenderer:
+    """ The ``xmlrpc`` renderer.
+
+    Responses are marshalled by a
+    :class:`pyramid_rpc.xmlrpcmarshaller.XmlRpcMarshaller` accepting the
+    ``encoding``, ``allow_none`` and ``use_i8`` options.
+
+    If ``chunk_size`` is set, successful responses are streamed through
+    ``response.app_iter`` in chunks of roughly that many bytes instead of
+    being built in memory. Only the first chunk is prepared before the
+    response is returned, so an object that cannot be marshalled further
+    into the result will truncate the response instead of producing a
+    fault.
+
+    A method returning a binary file or ``mmap`` is always streamed, using
+    chunks of 64KB unless ``chunk_size`` is set, such that the file is
+    base64 encoded into the response a block at a time.
+
+    """
     def __init__(self, **kw):
+        self.chunk_size = kw.pop('chunk_size', None)
         self.kw = kw
+        self.marshaller = XmlRpcMarshaller(**kw)
+        self.fault_bodies = {}
+        for fault_class in STATIC_FAULTS:
+            self.fault_bodies[fault_class] = self.marshaller.dumps(
+                fault_class())
 
     def __call__(self, info):
         def _render(value, system):
@@ -66,31 +135,99 @@ class XMLRPCRenderer:
                     response.content_type = 'text/xml'
 
             if isinstance(value, xmlrpclib.Fault):
-                obj = value
-            else:
-                obj = (value,)
-
-            return xmlrpclib.dumps(obj, methodresponse=True, **self.kw)
+                body = self.fault_bodies.get(value.__class__)
+                if (
+                    body is not None and
+                    value.faultCode == value.__class__.faultCode and
+                    value.faultString == value.__class__.faultString
+                ):
+                    return body
+
+            elif request is not None and (
+                self.chunk_size or is_file(value)
+            ):
+                chunks = self.marshaller.iterdumps(
+                    value, self.chunk_size or 64 * 1024)
+                # marshal the first chunk now to fail before streaming
+                first = next(chunks)
+                response.charset = self.marshaller.encoding
+                response.app_iter = itertools.chain((first,), chunks)
+                return None
+
+            return self.marshaller.dumps(value)
         return _render
 
 
+def log_suppressed(limiter):
+    """ Log the summary of the exceptions suppressed by ``limiter`` if it
+    is time for another one."""
+    summary = limiter.summarize()
+    if summary is not None:
+        log.error('xml-rpc %s', summary)
+
+
 def exception_view(exc, request):
+    rpc = getattr(request, 'rpc', None)
+    if rpc is None:
+        rpc = RpcCall()
     if isinstance(exc, xmlrpclib.Fault):
         fault = exc
     elif isinstance(exc, HTTPNotFound):
         fault = XmlRpcMethodNotFound()
-        log.debug('xml-rpc method not found "%s"', request.rpc_method)
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug('xml-rpc method not found "%s"', rpc.method)
     elif isinstance(exc, ViewMapperArgsInvalid):
         fault = XmlRpcInvalidMethodParams()
-        log.debug('xml-rpc method not found "%s"', request.rpc_method)
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug('xml-rpc method not found "%s"', rpc.method)
     else:
         fault = XmlRpcApplicationError()
-        log.exception('xml-rpc exception "%s"', exc)
+        limiter = getattr(rpc.endpoint, 'exception_log_limiter', None)
+        if limiter is None or limiter.allow(rpc.method, exc):
+            if log.isEnabledFor(logging.ERROR):
+                log.exception('xml-rpc exception "%s"', exc)
+        if limiter is not None:
+            log_suppressed(limiter)
 
     return fault
 
 
+def make_response(request, result, helper=None):
+    """ Render the ``result`` of a method into ``request.response`` using
+    ``helper``, or a :class:`pyramid.renderers.RendererHelper` of the
+    renderer of the call when it is ``None``."""
+    if helper is None:
+        helper = RendererHelper(name=request.rpc.renderer,
+                                registry=request.registry)
+    return helper.render_to_response(result, None, request=request)
+
+
+class xmlrpc_view(object):
+    """ Decorator that wraps a view and converts the result into a valid
+    XML-RPC Response object.
+
+    The result of a call within a ``system.multicall`` is returned as is
+    to be marshalled along with the other results.
+
+    """
+    def __init__(self, renderer=DEFAULT_RENDERER, helper=None):
+        self.renderer = renderer
+        self.helper = helper
+
+    def __call__(self, wrapped):
+        def wrapper(context, request):
+            rpc = request.rpc
+            rpc.renderer = self.renderer
+            result = wrapped(context, request)
+            if rpc.parent is None and not request.is_response(result):
+                result = make_response(request, result, self.helper)
+            return result
+        return wrapper
+
+
 class EndpointPredicate(object):
+    __slots__ = ('val',)
+
     def __init__(self, val, config):
         self.val = val
 
@@ -105,12 +242,17 @@ class EndpointPredicate(object):
             key = info['route'].name
             endpoint = request.registry.xmlrpc_endpoints[key]
 
+            # attach the call state along with the endpoint information
+            attach_call(request, RpcCall(endpoint))
+            if endpoint.compressor is not None:
+                request.add_response_callback(endpoint.compressor)
+            if endpoint.exception_log_limiter is not None:
+                # flush the summary even once the exceptions stopped
+                log_suppressed(endpoint.exception_log_limiter)
+
             # parse the request body
             setup_request(endpoint, request)
 
-            # update request with endpoint information
-            request.rpc_endpoint = endpoint
-
             # Always return True so that even if it isn't a valid RPC it
             # will fall through to the notfound_view which will still
             # return a valid XML-RPC response.
@@ -118,6 +260,8 @@ class EndpointPredicate(object):
 
 
 class MethodPredicate(object):
+    __slots__ = ('method',)
+
     def __init__(self, val, config):
         self.method = val
 
@@ -127,24 +271,313 @@ class MethodPredicate(object):
     phash = text
 
     def __call__(self, context, request):
-        return getattr(request, 'rpc_method') == self.method
+        return request.rpc.method == self.method
+
+
+def _find_method(context, request, method):
+    return request.registry.adapters.lookup(
+        (IViewClassifier, request.request_iface, providedBy(context)),
+        IView, name=method, default=None)
+
+
+def dispatch_view(context, request):
+    """ Call the view of the requested method, found in the method table
+    of the endpoint or by a lookup against the context for the methods
+    registered for a specific context."""
+    rpc = request.rpc
+    method = rpc.method
+    view = rpc.endpoint.methods.get(method)
+    if view is None:
+        view = _find_method(context, request, method)
+        if view is None:
+            log.debug('xml-rpc method not found "%s"', method)
+            raise XmlRpcMethodNotFound
+    return view(context, request)
+
+
+def register_method(config, endpoint, method, signature=None, help='',
+                    context=None, permission=None):
+    """ Add the view of ``method`` to the method table of ``endpoint`` when
+    the configuration is committed, listed by the introspection methods for
+    the callers granted ``permission`` or the default permission when it is
+    ``None``.
+
+    A method with a view registered for a specific ``context`` is left out
+    of the table, such that its views are always looked up against the
+    context of the request.
+
+    """
+    registry = config.registry
+
+    def register():
+        if context is not None:
+            endpoint.contextual_methods.add(method)
+            endpoint.methods.pop(method, None)
+        elif method not in endpoint.contextual_methods:
+            request_iface = registry.queryUtility(
+                IRouteRequest, name=endpoint.name)
+            view = registry.adapters.lookup(
+                (IViewClassifier, request_iface, Interface), IView,
+                name=method, default=None)
+            if view is not None:
+                endpoint.methods[method] = view
+        endpoint.method_info[method] = (signature, help)
+        # a method may have several views, each with its permission
+        endpoint.method_permissions.setdefault(method, []).append(permission)
+        # rebuilt with the new method when next requested
+        endpoint.introspection = None
+
+    config.action(None, register)
+
+
+def _method_help(view, attr=None):
+    if attr is not None:
+        view = getattr(view, attr, view)
+    return inspect.getdoc(view) or ''
+
+
+def build_introspection(registry, endpoint, hidden=()):
+    """ Build the responses of the introspection methods of ``endpoint``,
+    leaving out the ``hidden`` methods.
+
+    The result maps ``(method, name)`` to the value returned by the
+    introspection ``method`` for the method ``name`` along with the
+    marshalled response body and its charset, or ``None`` when the default
+    renderer of the endpoint is not a :class:`XMLRPCRenderer`.
+
+    """
+    factory = registry.queryUtility(
+        IRendererFactory, name=endpoint.default_renderer)
+    marshaller = None
+    if isinstance(factory, XMLRPCRenderer):
+        marshaller = factory.marshaller
+
+    snapshot = {}
+
+    def add(method, name, value):
+        body = charset = None
+        if marshaller is not None:
+            charset = marshaller.encoding
+            body = marshaller.dumps(value).encode(charset, 'xmlcharrefreplace')
+        snapshot[(method, name)] = (value, body, charset)
+
+    names = sorted(name for name in endpoint.method_info
+                   if name not in hidden)
+    add(LIST_METHODS_METHOD, None, names)
+    for name in names:
+        signature, help = endpoint.method_info[name]
+        add(METHOD_SIGNATURE_METHOD, name, signature or 'undef')
+        add(METHOD_HELP_METHOD, name, help)
+    return snapshot
+
+
+def _introspect(request, method, name=None):
+    rpc = request.rpc
+    endpoint = rpc.endpoint
+    forbidden = forbidden_methods(request, endpoint)
+    if forbidden:
+        # tailored to the caller, not kept
+        snapshot = build_introspection(request.registry, endpoint, forbidden)
+    else:
+        snapshot = endpoint.introspection
+        if snapshot is None:
+            snapshot = build_introspection(request.registry, endpoint)
+            endpoint.introspection = snapshot
+    try:
+        value, body, charset = snapshot[(method, name)]
+    except (KeyError, TypeError):
+        log.debug('xml-rpc %s of unknown method "%s"', method, name)
+        raise XmlRpcInvalidMethodParams
+    if body is None or rpc.parent is not None:
+        return value
+    response = request.response
+    response.body = body
+    response.content_type = 'text/xml'
+    response.charset = charset
+    return response
+
+
+def list_methods_view(request):
+    """ Return the names of the methods of the endpoint which the caller is
+    permitted to call."""
+    return _introspect(request, LIST_METHODS_METHOD)
+
+
+def method_signature_view(request, name):
+    """ Return the signatures of the method ``name`` as a list of lists of
+    type names, the type of the result first, or ``'undef'`` if they are
+    unknown."""
+    return _introspect(request, METHOD_SIGNATURE_METHOD, name)
+
+
+def method_help_view(request, name):
+    """ Return the documentation of the method ``name``."""
+    return _introspect(request, METHOD_HELP_METHOD, name)
+
+
+def _fault_struct(fault):
+    return {'faultCode': fault.faultCode, 'faultString': fault.faultString}
+
+
+def _make_subcall(rpc, call):
+    """ Return the :class:`RpcCall` for an entry of a ``system.multicall``
+    or a fault if it is invalid."""
+    if not isinstance(call, dict):
+        return XmlRpcRequestInvalid()
+    method = call.get('methodName')
+    params = call.get('params', ())
+    if (
+        not isinstance(method, string_types) or
+        not isinstance(params, (list, tuple))
+    ):
+        return XmlRpcRequestInvalid()
+    if method == MULTICALL_METHOD:
+        log.debug('xml-rpc recursive system.multicall rejected')
+        return XmlRpcRequestInvalid()
+    subcall = RpcCall(rpc.endpoint, method, tuple(params))
+    subcall.parent = rpc
+    return subcall
+
+
+def _invoke_subcall(context, request):
+    try:
+        result = dispatch_view(context, request)
+        if request.is_response(result):
+            log.debug('xml-rpc method "%s" returned a response within '
+                      'system.multicall', request.rpc.method)
+            raise XmlRpcApplicationError
+        return [result]
+    except Exception as exc:
+        return _fault_struct(exception_view(exc, request))
+
+
+def _dispatch_subcall(context, request, call):
+    """ Dispatch a call of a ``system.multicall`` using ``request``."""
+    if isinstance(call, xmlrpclib.Fault):
+        return _fault_struct(call)
+    rpc = request.rpc
+    request.rpc = call
+    try:
+        return _invoke_subcall(context, request)
+    finally:
+        request.rpc = rpc
+
+
+def _dispatch_subcall_threaded(request, call):
+    """ Dispatch a call of a ``system.multicall`` from a worker thread on
+    a new request made from the environ of ``request``, with its own
+    context and lazily computed attributes."""
+    if isinstance(call, xmlrpclib.Fault):
+        return _fault_struct(call)
+    subrequest = clone_request(request, call)
+    manager.push({'registry': request.registry, 'request': subrequest})
+    try:
+        return _invoke_subcall(subrequest.context, subrequest)
+    finally:
+        manager.pop()
+
+
+def multicall_view(request, calls):
+    """ Implement ``system.multicall`` by dispatching each call to the
+    methods of the endpoint in-process.
+
+    The result is a list containing the result of each successful call
+    wrapped in a single element list or a fault struct for each failed
+    call.
+
+    """
+    if not isinstance(calls, (list, tuple)):
+        raise XmlRpcInvalidMethodParams
+    rpc = request.rpc
+    subcalls = [_make_subcall(rpc, call) for call in calls]
+
+    context = request.context
+    executor = rpc.endpoint.multicall_executor
+    if executor is None or len(subcalls) < 2:
+        return [
+            _dispatch_subcall(context, request, call)
+            for call in subcalls
+        ]
+    dispatch = functools.partial(_dispatch_subcall_threaded, request)
+    return list(executor.map(dispatch, subcalls))
 
 
 class Endpoint(object):
-    def __init__(self, name, default_mapper, default_renderer):
+    __slots__ = (
+        'name',
+        'default_mapper',
+        'default_renderer',
+        'exception_log_limiter',
+        'parser',
+        'multicall_executor',
+        'compressor',
+        'decompressor',
+        'methods',
+        'contextual_methods',
+        'method_info',
+        'method_permissions',
+        'introspection',
+        'renderer_helpers',
+    )
+
+    def __init__(self, name, default_mapper, default_renderer,
+                 exception_log_limiter=None, parser=None,
+                 multicall_executor=None, compressor=None,
+                 decompressor=None):
         self.name = name
         self.default_mapper = default_mapper
         self.default_renderer = default_renderer
+        self.exception_log_limiter = exception_log_limiter
+        if parser is None:
+            parser = XmlRpcParser()
+        self.parser = parser
+        self.multicall_executor = multicall_executor
+        self.compressor = compressor
+        self.decompressor = decompressor
+        # method name -> view, filled as the configuration is committed
+        self.methods = {}
+        # names of the methods registered for a specific context
+        self.contextual_methods = set()
+        # method name -> (signature, help) of every registered method
+        self.method_info = {}
+        # method name -> permissions of its views
+        self.method_permissions = {}
+        # the prepared introspection responses, see build_introspection
+        self.introspection = None
+        # renderer name -> RendererHelper shared by the methods using it
+        self.renderer_helpers = {}
+
+    def renderer_helper(self, renderer, registry):
+        """ Return the :class:`pyramid.renderers.RendererHelper` rendering
+        the responses of the methods using ``renderer``."""
+        helper = self.renderer_helpers.get(renderer)
+        if helper is None:
+            helper = self.renderer_helpers[renderer] = RendererHelper(
+                name=renderer, registry=registry)
+        return helper
 
 
 def setup_request(endpoint, request):
+    body_file = request.body_file
     try:
-        params, method = xmlrpclib.loads(request.body)
-    except Exception:
+        if endpoint.decompressor is None:
+            params, method = endpoint.parser.load(body_file)
+        else:
+            params, method = endpoint.parser.load(
+                endpoint.decompressor.body_file(request))
+    except (XmlRpcParserLimitError, DecompressionLimitError) as ex:
+        log.debug('xml-rpc request exceeds parser limits: %s', ex)
+        raise XmlRpcRequestInvalid
+    except (XmlRpcParserError, DecompressionError) as ex:
+        log.debug('xml-rpc parse error: %s', ex)
         raise XmlRpcParseError
+    finally:
+        if request.is_body_seekable:
+            body_file.seek(0)
 
-    request.rpc_args = params
-    request.rpc_method = method
+    rpc = request.rpc
+    rpc.args = params
+    rpc.method = method
 
     if method is None:
         raise XmlRpcMethodNotFound
@@ -162,26 +595,121 @@ def add_xmlrpc_endpoint(config, name, *args, **kw):
         A default view mapper that will be passed as the ``mapper``
         argument to each of the endpoint's methods.
 
+    ``exception_log_limiter``
+
+        An optional :class:`pyramid_rpc.util.ExceptionLogLimiter` used to
+        sample and rate limit the logging of unexpected exceptions raised
+        by the endpoint's methods.
+
+    ``max_depth``
+
+        The maximum nesting of arrays and structs accepted in a request.
+        Defaults to 64.
+
+    ``max_elements``
+
+        The maximum number of XML elements accepted in a request. Defaults
+        to ``None``, meaning no limit.
+
+    ``max_string_size``
+
+        The maximum length of a single string or base64 value accepted in a
+        request. Defaults to ``None``, meaning no limit.
+
+    Requests exceeding any of these limits are rejected with a
+    :class:`~pyramid_rpc.xmlrpc.XmlRpcRequestInvalid` fault.
+
+    ``spool_threshold``
+
+        Base64 values in a request longer than this many characters are
+        decoded while parsing into a :class:`tempfile.SpooledTemporaryFile`
+        which is passed to the method instead of an
+        :class:`xmlrpclib.Binary`. Defaults to ``None``, decoding every
+        value in memory.
+
+    ``multicall_workers``
+
+        The number of threads used to run the calls of a
+        ``system.multicall`` concurrently. Defaults to ``None``, running
+        the calls one after another in the thread of the request.
+
+    ``compressor``
+
+        An optional :class:`pyramid_rpc.compression.ResponseCompressor`
+        used to compress the endpoint's responses with ``gzip`` or
+        ``deflate`` when the client accepts it.
+
+    ``decompressor``
+
+        An optional :class:`pyramid_rpc.compression.RequestDecompressor`
+        used to decode request bodies compressed with ``gzip`` or
+        ``deflate`` as they are parsed. Bodies exceeding its limits are
+        rejected with a :class:`~pyramid_rpc.xmlrpc.XmlRpcRequestInvalid`
+        fault.
+
+    Every endpoint provides the ``system.multicall``,
+    ``system.listMethods``, ``system.methodSignature`` and
+    ``system.methodHelp`` methods.
+
     A XML-RPC method also accepts all of the arguments supplied to
     Pyramid's ``add_route`` method.
 
     """
     default_mapper = kw.pop('default_mapper', MapplyViewMapper)
     default_renderer = kw.pop('default_renderer', DEFAULT_RENDERER)
+    exception_log_limiter = kw.pop('exception_log_limiter', None)
+    parser = XmlRpcParser(
+        max_depth=kw.pop('max_depth', 64),
+        max_elements=kw.pop('max_elements', None),
+        max_string_size=kw.pop('max_string_size', None),
+        spool_threshold=kw.pop('spool_threshold', None),
+    )
+    multicall_workers = kw.pop('multicall_workers', None)
+    compressor = kw.pop('compressor', None)
+    decompressor = kw.pop('decompressor', None)
+    multicall_executor = None
+    if multicall_workers:
+        from concurrent.futures import ThreadPoolExecutor
+        multicall_executor = ThreadPoolExecutor(multicall_workers)
 
     endpoint = Endpoint(
         name,
         default_mapper=default_mapper,
         default_renderer=default_renderer,
+        exception_log_limiter=exception_log_limiter,
+        parser=parser,
+        multicall_executor=multicall_executor,
+        compressor=compressor,
+        decompressor=decompressor,
     )
 
     config.registry.xmlrpc_endpoints[name] = endpoint
     kw['xmlrpc_endpoint'] = True
 
     config.add_route(name, *args, **kw)
+    config.add_view(dispatch_view, route_name=name,
+                    permission=NO_PERMISSION_REQUIRED,
+                    renderer=null_renderer)
     config.add_view(exception_view, route_name=name, context=Exception,
                     permission=NO_PERMISSION_REQUIRED,
                     renderer=endpoint.default_renderer)
+    for method, view, signature in (
+        (MULTICALL_METHOD, multicall_view, [['array', 'array']]),
+        (LIST_METHODS_METHOD, list_methods_view, [['array']]),
+        (METHOD_SIGNATURE_METHOD, method_signature_view,
+         [['array', 'string'], ['string', 'string']]),
+        (METHOD_HELP_METHOD, method_help_view, [['string', 'string']]),
+    ):
+        add_xmlrpc_method(config, view, endpoint=name, method=method,
+                          mapper=MapplyViewMapper, signature=signature,
+                          permission=NO_PERMISSION_REQUIRED)
+
+    def build():
+        endpoint.introspection = build_introspection(
+            config.registry, endpoint)
+
+    # prepare the introspection responses once every method is known
+    config.action(None, build, order=PHASE3_CONFIG + 1)
 
 
 def add_xmlrpc_method(config, view, **kw):
@@ -195,11 +723,26 @@ def add_xmlrpc_method(config, view, **kw):
 
         The name of the method.
 
+    ``signature``
+
+        An optional list of the signatures of the method returned by
+        ``system.methodSignature``. Each signature is a list of XML-RPC type
+        names, such as ``['string', 'int', 'array']``, starting with the
+        type of the result. A single signature may be passed as a flat list.
+
     A XML-RPC method also accepts all of the arguments supplied to
     Pyramid's ``add_view`` method.
 
+    The documentation of the method returned by ``system.methodHelp`` is
+    the docstring of the view.
+
+    The view is registered using the name of the method as its view name
+    and is found through a table of the endpoint's methods, such that
+    dispatching a call costs a single lookup regardless of the number of
+    methods.
+
     A view mapper is registered by default which will match the
-    ``request.rpc_args`` to parameters on the view. To override this
+    ``request.rpc.args`` to parameters on the view. To override this
     behavior simply set the ``mapper`` argument to None or another
     view mapper.
 
@@ -225,21 +768,47 @@ def add_xmlrpc_method(config, view, **kw):
             'Cannot register a XML-RPC method without specifying the '
             '"method"')
 
+    signature = kw.pop('signature', None)
+    if signature is not None:
+        if signature and is_nonstr_iter(signature[0]):
+            signature = [list(s) for s in signature]
+        else:
+            signature = [list(signature)]
+    help = _method_help(config.maybe_dotted(view), kw.get('attr'))
+
     mapper = kw.pop('mapper', _marker)
     if mapper is _marker:
         # only override mapper if not supplied
         mapper = endpoint.default_mapper
     kw['mapper'] = mapper
 
-    renderer = kw.pop('renderer', _marker)
-    if renderer is _marker:
+    renderer = kw.pop('renderer', None)
+    if renderer is None:
         # Only override renderer if not supplied
         renderer = endpoint.default_renderer
-    kw['renderer'] = renderer
+    kw['renderer'] = null_renderer
 
     kw['xmlrpc_method'] = method
 
-    config.add_view(view, route_name=endpoint_name, **kw)
+    rpc_decorator = xmlrpc_view(
+        renderer, endpoint.renderer_helper(renderer, config.registry))
+    decorator = kw.get('decorator', None)
+    if decorator is None:
+        decorator = rpc_decorator
+    else:
+        if not is_nonstr_iter(decorator):
+            decorator = (decorator,)
+        # we want to apply the view_wrapper first, then the other decorators
+        # and combine() reverses the order, so ours goes last
+        decorators = list(decorator) + [rpc_decorator]
+        decorator = combine(*decorators)
+    kw['decorator'] = decorator
+
+    # methods are registered as named views, found by the dispatch view
+    # through the method table of the endpoint
+    config.add_view(view, route_name=endpoint_name, name=method, **kw)
+    register_method(config, endpoint, method, signature, help,
+                    kw.get('context'), kw.get('permission'))
 
 
 class xmlrpc_method(object):
@@ -0,0 +1,430 @@
+"""A fast XML-RPC response marshaller.
+
+:class:`XmlRpcMarshaller` produces the same documents as
+:func:`xmlrpclib.dumps` but resolves the emitter for each type once and
+caches it, formats each scalar value with a single string operation and
+writes the whole document into one buffer. Large responses may also be
+produced incrementally in chunks suitable for a WSGI ``app_iter``, in which
+case files and mmaps are base64 encoded into the output a block at a time.
+
+"""
+import base64
+from datetime import datetime
+import io
+import mmap
+import tempfile
+
+from .compat import (
+    PY3,
+    binary_type,
+    integer_types,
+    text_type,
+    xmlrpclib,
+)
+
+
+MAXINT = 2 ** 31 - 1
+MININT = -2 ** 31
+MAXI8 = 2 ** 63 - 1
+MINI8 = -2 ** 63
+
+# the number of distinct struct member names kept escaped
+MAX_MEMBER_CACHE = 1024
+
+# the size of the blocks read from files, a multiple of the 57 bytes
+# encoded on each line by base64.encodebytes
+BINARY_BLOCK_SIZE = 57 * 1024
+
+# memo key of the files deferred while streaming a response
+_STREAMS = object()
+
+
+def escape(s):
+    if '&' in s:
+        s = s.replace('&', '&amp;')
+    if '<' in s:
+        s = s.replace('<', '&lt;')
+    if '>' in s:
+        s = s.replace('>', '&gt;')
+    return s
+
+
+def is_file(value):
+    """ Return whether ``value`` is a file or mmap marshalled as a base64
+    value read from its current position.
+
+    Besides :class:`io.IOBase`, :class:`tempfile.SpooledTemporaryFile` and
+    ``mmap`` instances, objects with callable ``read`` and ``readinto``
+    methods are considered files, such as Python 2 files.
+
+    """
+    if isinstance(value, (io.IOBase, tempfile.SpooledTemporaryFile,
+                          mmap.mmap)):
+        return True
+    return (
+        callable(getattr(value, 'read', None)) and
+        callable(getattr(value, 'readinto', None))
+    )
+
+
+def _cannot_marshal(self, value, write, memo):
+    raise TypeError('cannot marshal %s objects' % type(value))
+
+
+class _Base64Stream(object):
+    """ Iterate over the base64 encoded value of a file or mmap, closing it
+    once it has been read."""
+    __slots__ = ('file',)
+
+    def __init__(self, file):
+        self.file = file
+
+    def _read_block(self):
+        read = self.file.read
+        block = read(BINARY_BLOCK_SIZE)
+        if not block or len(block) == BINARY_BLOCK_SIZE:
+            return block
+        # fill short reads to keep the lines the same as encodebytes
+        blocks = [block]
+        size = len(block)
+        while size < BINARY_BLOCK_SIZE:
+            block = read(BINARY_BLOCK_SIZE - size)
+            if not block:
+                break
+            blocks.append(block)
+            size += len(block)
+        return b''.join(blocks)
+
+    def __iter__(self):
+        try:
+            yield '<value><base64>\n'
+            while True:
+                block = self._read_block()
+                if not block:
+                    break
+                yield base64.encodebytes(block).decode('ascii')
+            yield '</base64></value>\n'
+        finally:
+            close = getattr(self.file, 'close', None)
+            if close is not None:
+                close()
+
+
+class XmlRpcMarshaller(object):
+    """ Marshal XML-RPC responses, the same as
+    ``xmlrpclib.dumps(params, methodresponse=True)``.
+
+    ``encoding``
+
+        The encoding declared in the XML header. Defaults to ``utf-8``.
+
+    ``allow_none``
+
+        Marshal ``None`` as ``<nil/>`` instead of raising a ``TypeError``.
+
+    ``use_i8``
+
+        Marshal integers outside of the 32-bit range of ``<int>`` as
+        ``<i8>`` instead of raising an ``OverflowError``.
+
+    Binary files, such as those returned by :func:`open` or
+    :class:`tempfile.SpooledTemporaryFile`, and ``mmap`` objects are
+    marshalled as base64 values read from their current position. They are
+    closed once they have been marshalled.
+
+    """
+    dispatch = {}
+
+    def __init__(self, encoding=None, allow_none=False, use_i8=False):
+        if not encoding:
+            encoding = 'utf-8'
+        self.encoding = encoding
+        self.allow_none = allow_none
+        self.use_i8 = use_i8
+        if encoding != 'utf-8':
+            self.header = (
+                "<?xml version='1.0' encoding='%s'?>\n" % str(encoding))
+        else:
+            self.header = "<?xml version='1.0'?>\n"
+        # emitters resolved by type, extended as new types are seen
+        self.emitters = dict(self.dispatch)
+        self.members = {}
+
+    def emitter(self, value):
+        """ Return the function marshalling objects of the type of
+        ``value``."""
+        tp = type(value)
+        try:
+            return self.emitters[tp]
+        except KeyError:
+            pass
+        # mirror xmlrpclib: objects with a __dict__ are marshalled as a
+        # struct unless they subclass one of the basic types
+        f = self.dispatch['_arbitrary_instance']
+        if is_file(value):
+            f = self.dispatch['_file']
+        elif not hasattr(value, '__dict__'):
+            f = _cannot_marshal
+        else:
+            for base in tp.__mro__:
+                if base in self.dispatch:
+                    f = _cannot_marshal
+                    break
+        self.emitters[tp] = f
+        return f
+
+    def dump(self, value, write, memo):
+        emitters = self.emitters
+        tp = type(value)
+        f = emitters.get(tp) or self.emitter(value)
+        f(self, value, write, memo)
+
+    def dumps(self, value):
+        """ Return the response for ``value`` as a string.
+
+        ``value`` may be an :class:`xmlrpclib.Fault` to marshal a fault.
+
+        """
+        out = []
+        write = out.append
+        if isinstance(value, xmlrpclib.Fault):
+            self._dump_fault(value, write)
+        else:
+            write(self.header)
+            write('<methodResponse>\n<params>\n<param>\n')
+            self.dump(value, write, {})
+            write('</param>\n</params>\n</methodResponse>\n')
+        return ''.join(out)
+
+    def iterdumps(self, value, chunk_size=64 * 1024):
+        """ Yield the response for ``value`` as encoded chunks of roughly
+        ``chunk_size`` bytes.
+
+        A top-level array or struct is marshalled one item at a time so
+        that only about one chunk is held in memory at once.
+
+        """
+        encoding = self.encoding
+        if isinstance(value, xmlrpclib.Fault):
+            yield self.dumps(value).encode(encoding, 'xmlcharrefreplace')
+            return
+
+        out = []
+        write = out.append
+        write(self.header)
+        write('<methodResponse>\n<params>\n<param>\n')
+        tp = type(value)
+        f = self.emitters.get(tp) or self.emitter(value)
+        if f is XmlRpcMarshaller._dump_array:
+            items = value
+            write('<value><array><data>\n')
+            close = '</data></array></value>\n'
+        elif f is XmlRpcMarshaller._dump_struct:
+            items = value.items()
+            write('<value><struct>\n')
+            close = '</struct></value>\n'
+        else:
+            items = None
+            close = ''
+
+        streams = []
+        memo = {id(value): None, _STREAMS: streams}
+        dump = self.dump
+        struct = f is XmlRpcMarshaller._dump_struct
+        size = 0
+        if items is None:
+            f(self, value, write, memo)
+            items = ()
+        for item in items:
+            start = len(out)
+            if struct:
+                k, v = item
+                self._dump_member(k, v, write, memo)
+            else:
+                dump(item, write, memo)
+            if streams:
+                for chunk in self._flush(out):
+                    yield chunk
+                del out[:]
+                del streams[:]
+                size = 0
+                continue
+            size += sum(map(len, out[start:]))
+            if size >= chunk_size:
+                yield ''.join(out).encode(encoding, 'xmlcharrefreplace')
+                del out[:]
+                size = 0
+        write(close)
+        write('</param>\n</params>\n</methodResponse>\n')
+        for chunk in self._flush(out):
+            yield chunk
+
+    def _flush(self, out):
+        """ Yield the encoded contents of ``out``, reading any deferred
+        files a block at a time."""
+        encoding = self.encoding
+        pending = []
+        for piece in out:
+            if piece.__class__ is _Base64Stream:
+                if pending:
+                    yield ''.join(pending).encode(
+                        encoding, 'xmlcharrefreplace')
+                    pending = []
+                for text in piece:
+                    yield text.encode('ascii')
+            else:
+                pending.append(piece)
+        if pending:
+            yield ''.join(pending).encode(encoding, 'xmlcharrefreplace')
+
+    def _dump_fault(self, value, write):
+        write(self.header)
+        write('<methodResponse>\n<fault>\n')
+        self._dump_struct({
+            'faultCode': value.faultCode,
+            'faultString': value.faultString,
+        }, write, {})
+        write('</fault>\n</methodResponse>\n')
+
+    def _dump_nil(self, value, write, memo):
+        if not self.allow_none:
+            raise TypeError(
+                'cannot marshal None unless allow_none is enabled')
+        write('<value><nil/></value>')
+    dispatch[type(None)] = _dump_nil
+
+    def _dump_bool(self, value, write, memo):
+        if value:
+            write('<value><boolean>1</boolean></value>\n')
+        else:
+            write('<value><boolean>0</boolean></value>\n')
+    dispatch[bool] = _dump_bool
+
+    def _dump_int(self, value, write, memo):
+        if value > MAXINT or value < MININT:
+            if self.use_i8 and MINI8 <= value <= MAXI8:
+                write('<value><i8>%d</i8></value>\n' % value)
+                return
+            raise OverflowError('int exceeds XML-RPC limits')
+        write('<value><int>%d</int></value>\n' % value)
+    for tp in integer_types:
+        dispatch[tp] = _dump_int
+    del tp
+
+    def _dump_double(self, value, write, memo):
+        write('<value><double>%r</double></value>\n' % (value,))
+    dispatch[float] = _dump_double
+
+    def _dump_string(self, value, write, memo):
+        write('<value><string>%s</string></value>\n' % escape(value))
+    dispatch[text_type] = _dump_string
+
+    def _dump_bytes(self, value, write, memo):
+        write('<value><base64>\n%s</base64></value>\n' %
+              base64.encodebytes(value).decode('ascii'))
+    if PY3: # pragma: no cover
+        dispatch[binary_type] = _dump_bytes
+        dispatch[bytearray] = _dump_bytes
+        dispatch[memoryview] = _dump_bytes
+    else:
+        dispatch[binary_type] = _dump_string
+
+    def _dump_array(self, value, write, memo):
+        i = id(value)
+        if i in memo:
+            raise TypeError('cannot marshal recursive sequences')
+        memo[i] = None
+        emitters = self.emitters
+        write('<value><array><data>\n')
+        for v in value:
+            tp = type(v)
+            # inline the most common scalars
+            if tp is text_type:
+                write('<value><string>%s</string></value>\n' % escape(v))
+            elif tp is int and MININT <= v <= MAXINT:
+                write('<value><int>%d</int></value>\n' % v)
+            else:
+                f = emitters.get(tp) or self.emitter(v)
+                f(self, v, write, memo)
+        write('</data></array></value>\n')
+        del memo[i]
+    dispatch[tuple] = _dump_array
+    dispatch[list] = _dump_array
+
+    def _member(self, k):
+        # the escaped opening of a member, cached as keys tend to repeat
+        try:
+            return self.members[k]
+        except KeyError:
+            pass
+        except TypeError:
+            raise TypeError('dictionary key must be string')
+        if not isinstance(k, text_type):
+            if PY3 or not isinstance(k, binary_type):
+                raise TypeError('dictionary key must be string')
+        member = '<member>\n<name>%s</name>\n' % escape(k)
+        if len(self.members) < MAX_MEMBER_CACHE:
+            self.members[k] = member
+        return member
+
+    def _dump_member(self, k, v, write, memo):
+        members = self.members
+        member = members.get(k) if type(k) is text_type else None
+        if member is None:
+            member = self._member(k)
+        tp = type(v)
+        if tp is text_type:
+            write('%s<value><string>%s</string></value>\n</member>\n' %
+                  (member, escape(v)))
+        elif tp is int and MININT <= v <= MAXINT:
+            write('%s<value><int>%d</int></value>\n</member>\n' %
+                  (member, v))
+        else:
+            write(member)
+            f = self.emitters.get(tp) or self.emitter(v)
+            f(self, v, write, memo)
+            write('</member>\n')
+
+    def _dump_struct(self, value, write, memo):
+        i = id(value)
+        if i in memo:
+            raise TypeError('cannot marshal recursive dictionaries')
+        memo[i] = None
+        dump_member = self._dump_member
+        write('<value><struct>\n')
+        for k, v in value.items():
+            dump_member(k, v, write, memo)
+        write('</struct></value>\n')
+        del memo[i]
+    dispatch[dict] = _dump_struct
+
+    def _dump_datetime(self, value, write, memo):
+        write('<value><dateTime.iso8601>%s</dateTime.iso8601></value>\n' %
+              xmlrpclib._strftime(value))
+    dispatch[datetime] = _dump_datetime
+
+    def _dump_datetime_wrapper(self, value, write, memo):
+        write('<value><dateTime.iso8601>%s</dateTime.iso8601></value>\n' %
+              value.value)
+    dispatch[xmlrpclib.DateTime] = _dump_datetime_wrapper
+
+    def _dump_file(self, value, write, memo):
+        stream = _Base64Stream(value)
+        streams = memo.get(_STREAMS)
+        if streams is None:
+            write(''.join(stream))
+        else:
+            # encoded when the response is flushed
+            streams.append(stream)
+            write(stream)
+    dispatch['_file'] = _dump_file
+    dispatch[mmap.mmap] = _dump_file
+
+    def _dump_binary_wrapper(self, value, write, memo):
+        self._dump_bytes(value.data, write, memo)
+    dispatch[xmlrpclib.Binary] = _dump_binary_wrapper
+
+    def _dump_instance(self, value, write, memo):
+        # store instance attributes as a struct, like xmlrpclib
+        self._dump_struct(value.__dict__, write, memo)
+    dispatch['_arbitrary_instance'] = _dump_instance
@@ -0,0 +1,316 @@
+"""A streaming XML-RPC request parser.
+
+:class:`XmlRpcParser` is a replacement for :func:`xmlrpclib.loads` built
+directly on :mod:`xml.parsers.expat`. It feeds the document to expat in
+chunks as it is read from a file, builds the parameters as it goes and
+enforces limits on the size and shape of the document. Large base64 values
+may be decoded incrementally into temporary files.
+
+"""
+import base64
+import binascii
+from decimal import Decimal
+import tempfile
+from xml.parsers import expat
+
+from .compat import xmlrpclib
+
+
+class XmlRpcParserError(ValueError):
+    """ Raised when a document is not a well formed XML-RPC request."""
+
+
+class XmlRpcParserLimitError(XmlRpcParserError):
+    """ Raised when a document exceeds one of the parser's limits."""
+
+
+class _Base64Spool(object):
+    """ Decode a base64 value into a ``SpooledTemporaryFile`` as its text
+    is received."""
+
+    def __init__(self, max_size):
+        self.file = tempfile.SpooledTemporaryFile(max_size=max_size)
+        self.pending = ''
+
+    def write(self, text):
+        text = self.pending + ''.join(text.split())
+        end = len(text) - len(text) % 4
+        if end:
+            self.file.write(base64.b64decode(text[:end], validate=True))
+        self.pending = text[end:]
+
+    def close(self):
+        if self.pending:
+            # incomplete final quantum
+            raise binascii.Error('incorrect padding')
+        self.file.seek(0)
+        return self.file
+
+
+class _Unmarshaller(object):
+    """ The state of a single parse, receiving events from expat."""
+
+    def __init__(self, parser):
+        self.max_depth = parser.max_depth
+        self.max_elements = parser.max_elements
+        self.max_string_size = parser.max_string_size
+        self.spool_threshold = parser.spool_threshold
+        self.spool = None
+        self.base64 = False
+        self.type = None
+        self.stack = []
+        self.marks = []
+        self.data = []
+        self.size = 0
+        self.elements = 0
+        self.value = False
+        self.methodname = None
+
+    def start(self, tag, attrs):
+        if ':' in tag:
+            tag = tag.split(':')[-1]
+        self.elements += 1
+        if (
+            self.max_elements is not None and
+            self.elements > self.max_elements
+        ):
+            raise XmlRpcParserLimitError('too many elements')
+        if tag == 'array' or tag == 'struct':
+            self.marks.append(len(self.stack))
+            if (
+                self.max_depth is not None and
+                len(self.marks) > self.max_depth
+            ):
+                raise XmlRpcParserLimitError('too deeply nested')
+        if self.value and tag not in self.dispatch:
+            raise XmlRpcParserError('unknown tag %r' % tag)
+        self.data = []
+        self.size = 0
+        self.value = (tag == 'value')
+        self.base64 = (
+            tag == 'base64' and self.spool_threshold is not None)
+
+    def characters(self, text):
+        self.size += len(text)
+        if (
+            self.max_string_size is not None and
+            self.size > self.max_string_size
+        ):
+            raise XmlRpcParserLimitError('value too large')
+        if self.base64 and (
+            self.spool is not None or self.size > self.spool_threshold
+        ):
+            try:
+                if self.spool is None:
+                    self.spool = _Base64Spool(self.spool_threshold)
+                    self.data.append(text)
+                    text = ''.join(self.data)
+                    self.data = []
+                self.spool.write(text)
+            except ValueError as ex:
+                raise XmlRpcParserError('invalid base64 value: %s' % ex)
+            return
+        self.data.append(text)
+
+    def end(self, tag):
+        data = ''.join(self.data)
+        # text following an end tag is whitespace within the parent
+        self.data = []
+        self.size = 0
+        f = self.dispatch.get(tag)
+        if f is None:
+            if ':' not in tag:
+                return # unknown tag ?
+            f = self.dispatch.get(tag.split(':')[-1])
+            if f is None:
+                return # unknown tag ?
+        try:
+            f(self, data)
+        except XmlRpcParserError:
+            raise
+        except (TypeError, ValueError, ArithmeticError) as ex:
+            raise XmlRpcParserError('invalid %s value: %s' % (tag, ex))
+
+    def close(self):
+        if self.type is None or self.marks:
+            raise XmlRpcParserError('incomplete request')
+        if self.type == 'fault':
+            raise XmlRpcParserError('unexpected fault')
+        return tuple(self.stack), self.methodname
+
+    dispatch = {}
+
+    def end_nil(self, data):
+        self.stack.append(None)
+        self.value = False
+    dispatch['nil'] = end_nil
+
+    def end_boolean(self, data):
+        if data == '0':
+            self.stack.append(False)
+        elif data == '1':
+            self.stack.append(True)
+        else:
+            raise XmlRpcParserError('bad boolean value')
+        self.value = False
+    dispatch['boolean'] = end_boolean
+
+    def end_int(self, data):
+        self.stack.append(int(data))
+        self.value = False
+    dispatch['i1'] = end_int
+    dispatch['i2'] = end_int
+    dispatch['i4'] = end_int
+    dispatch['i8'] = end_int
+    dispatch['int'] = end_int
+    dispatch['biginteger'] = end_int
+
+    def end_double(self, data):
+        self.stack.append(float(data))
+        self.value = False
+    dispatch['double'] = end_double
+    dispatch['float'] = end_double
+
+    def end_bigdecimal(self, data):
+        self.stack.append(Decimal(data))
+        self.value = False
+    dispatch['bigdecimal'] = end_bigdecimal
+
+    def end_string(self, data):
+        self.stack.append(data)
+        self.value = False
+    dispatch['string'] = end_string
+    dispatch['name'] = end_string # struct keys are always strings
+
+    def end_array(self, data):
+        mark = self.marks.pop()
+        # map arrays to Python lists
+        self.stack[mark:] = [self.stack[mark:]]
+        self.value = False
+    dispatch['array'] = end_array
+
+    def end_struct(self, data):
+        mark = self.marks.pop()
+        # map structs to Python dictionaries
+        items = self.stack[mark:]
+        self.stack[mark:] = [dict(zip(items[::2], items[1::2]))]
+        self.value = False
+    dispatch['struct'] = end_struct
+
+    def end_base64(self, data):
+        if self.spool is not None:
+            spool, self.spool = self.spool, None
+            self.stack.append(spool.close())
+        else:
+            self.stack.append(xmlrpclib.Binary(base64.b64decode(data)))
+        self.base64 = False
+        self.value = False
+    dispatch['base64'] = end_base64
+
+    def end_dateTime(self, data):
+        value = xmlrpclib.DateTime()
+        value.decode(data)
+        self.stack.append(value)
+    dispatch['dateTime.iso8601'] = end_dateTime
+
+    def end_value(self, data):
+        # if we stumble upon a value element with no internal
+        # elements, treat it as a string element
+        if self.value:
+            self.end_string(data)
+    dispatch['value'] = end_value
+
+    def end_params(self, data):
+        self.type = 'params'
+    dispatch['params'] = end_params
+
+    def end_fault(self, data):
+        self.type = 'fault'
+    dispatch['fault'] = end_fault
+
+    def end_methodName(self, data):
+        self.methodname = data
+        self.type = 'methodName' # no params
+    dispatch['methodName'] = end_methodName
+
+
+def _reject_doctype(*args):
+    raise XmlRpcParserError('document type declarations are not allowed')
+
+
+class XmlRpcParser(object):
+    """ Parse XML-RPC requests into a ``(params, methodname)`` tuple, the
+    same as :func:`xmlrpclib.loads`.
+
+    ``max_depth``
+
+        The maximum nesting of arrays and structs. Defaults to 64.
+
+    ``max_elements``
+
+        The maximum number of elements in the document. Defaults to
+        ``None``, meaning no limit.
+
+    ``max_string_size``
+
+        The maximum length of a single string, base64 or other scalar
+        value. Defaults to ``None``, meaning no limit.
+
+    ``spool_threshold``
+
+        Base64 values larger than this many characters are decoded as they
+        are parsed into a :class:`tempfile.SpooledTemporaryFile`, keeping up
+        to ``spool_threshold`` bytes in memory, which is passed to the view,
+        positioned at the start, instead of an :class:`xmlrpclib.Binary`.
+        Defaults to ``None``, decoding every value in memory.
+
+    ``chunk_size``
+
+        The number of bytes read from the file at a time.
+
+    Malformed documents raise :class:`XmlRpcParserError` and documents
+    exceeding a limit raise :class:`XmlRpcParserLimitError`.
+
+    """
+    def __init__(self, max_depth=64, max_elements=None, max_string_size=None,
+                 spool_threshold=None, chunk_size=64 * 1024):
+        self.max_depth = max_depth
+        self.max_elements = max_elements
+        self.max_string_size = max_string_size
+        self.spool_threshold = spool_threshold
+        self.chunk_size = chunk_size
+
+    def _make_parser(self):
+        target = _Unmarshaller(self)
+        parser = expat.ParserCreate(None, None)
+        parser.buffer_text = True
+        parser.StartElementHandler = target.start
+        parser.EndElementHandler = target.end
+        parser.CharacterDataHandler = target.characters
+        parser.StartDoctypeDeclHandler = _reject_doctype
+        return parser, target
+
+    def load(self, fp):
+        """ Parse the request read from the file-like object ``fp``."""
+        parser, target = self._make_parser()
+        read = fp.read
+        chunk_size = self.chunk_size
+        try:
+            while True:
+                chunk = read(chunk_size)
+                if not chunk:
+                    break
+                parser.Parse(chunk, False)
+            parser.Parse(b'', True)
+        except expat.ExpatError as ex:
+            raise XmlRpcParserError(str(ex))
+        return target.close()
+
+    def loads(self, data):
+        """ Parse the request contained in the bytes ``data``."""
+        parser, target = self._make_parser()
+        try:
+            parser.Parse(data, True)
+        except expat.ExpatError as ex:
+            raise XmlRpcParserError(str(ex))
+        return target.close()
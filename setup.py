@@ -77,6 +77,8 @@ setup(name='pyramid_rpc',
           'testing': testing_extras,
           'docs': docs_require,
           'amf': ['pyamf'],
+          'msgpack': ['msgpack'],
+          'cbor': ['cbor2'],
       },
       test_suite="pyramid_rpc.tests",
       )